@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Cost of keeping a batch of decisions within the SWF limits.
+
+Compares ``simpleflow.swf.decisions.DecisionBatch``, which caches the size of
+each decision, with serializing the whole list on every scheduled task as the
+executor used to do.
+
+Usage::
+
+    PYTHONPATH=. python benchmarks/bench_decisions.py [--decisions 100] [--input-size 1000,8000]
+"""
+from __future__ import absolute_import, division, print_function
+
+import collections
+import json
+import timeit
+
+import click
+
+import swf.models.decision
+from simpleflow.swf.decisions import DecisionBatch
+
+
+ActivityType = collections.namedtuple('ActivityType', 'name version')
+
+
+def make_decisions(nb_decisions, input_size):
+    activity_type = ActivityType('benchmarks.activity', 'v1')
+    return [
+        swf.models.decision.ActivityTaskDecision(
+            'schedule',
+            activity_id='activity-benchmarks.activity-{}'.format(index),
+            activity_type=activity_type,
+            input={'args': ['x' * input_size], 'kwargs': {}},
+            task_list='benchmarks',
+        ) for index in range(nb_decisions)
+    ]
+
+
+def legacy(decisions, max_size):
+    batch = []
+    for decision in decisions:
+        if len(json.dumps(batch + [decision])) > max_size:
+            break
+        batch.append(decision)
+    return batch
+
+
+def incremental(decisions, max_size):
+    batch = DecisionBatch(max_decisions=len(decisions) + 2, max_size=max_size)
+    for decision in decisions:
+        batch.schedule([decision], 'resume')
+    return batch
+
+
+@click.command()
+@click.option('--decisions', 'nb_decisions', default=100, help='Decisions per batch.')
+@click.option('--input-size', default='100,1000,8000', help='Comma-separated input sizes.')
+@click.option('--repeat', default=5, help='Runs per measure; the best one is kept.')
+def main(nb_decisions, input_size, repeat):
+    max_size = 10 ** 9
+    print('{:>10} {:>10} {:>12} {:>12} {:>8}'.format(
+        'decisions', 'input', 'legacy (ms)', 'batch (ms)', 'speedup'))
+    for size in [int(s) for s in input_size.split(',')]:
+        decisions = make_decisions(nb_decisions, size)
+        legacy_time = min(timeit.repeat(
+            lambda: legacy(decisions, max_size), number=1, repeat=repeat))
+        batch_time = min(timeit.repeat(
+            lambda: incremental(decisions, max_size), number=1, repeat=repeat))
+        print('{:>10} {:>10} {:>12.2f} {:>12.2f} {:>8.1f}'.format(
+            nb_decisions, size, legacy_time * 1000, batch_time * 1000,
+            legacy_time / batch_time))
+
+
+if __name__ == '__main__':
+    main()
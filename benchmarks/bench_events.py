@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Construction time and memory of history events.
+
+Compares ``swf.models.event.EventFactory`` with the previous implementation,
+which copied every attribute on the event with ``setattr`` and decoded the
+JSON input eagerly. Each measure runs in a fresh process.
+
+Usage::
+
+    PYTHONPATH=. python benchmarks/bench_events.py [--sizes 10000,50000] [--repeat 3]
+"""
+from __future__ import absolute_import, division, print_function
+
+import json
+import multiprocessing
+import time
+
+import click
+import psutil
+from future.utils import iteritems
+
+from swf.models.event import EventFactory
+from swf.utils import camel_to_underscore, decapitalize
+
+
+class LegacyEvent(object):
+    """
+    Event as implemented before attributes were looked up lazily.
+    """
+    _name = None
+    _attributes_key = None
+
+    def __init__(self, id, state, timestamp, raw_data):
+        self._id = id
+        self._state = state
+        self._timestamp = timestamp
+        self._input = {}
+        self.raw = raw_data or {}
+        for key, value in iteritems(self.raw[self._attributes_key]):
+            setattr(self, camel_to_underscore(key), value)
+
+    @property
+    def input(self):
+        return self._input
+
+    @input.setter
+    def input(self, value):
+        self._input = json.loads(value)
+
+
+def legacy_event_factory(raw_event):
+    event_name = raw_event['eventType']
+    event_type = None
+    for name in ('ChildWorkflowExecution', 'ExternalWorkflow', 'WorkflowExecution',
+                 'DecisionTask', 'ActivityTask', 'Marker', 'Timer'):
+        if name in event_name:
+            event_type = name
+            break
+    left, sep, right = event_name.partition(event_type)
+    state = camel_to_underscore(left + right)
+    klass = LegacyEvent
+    klass._name = event_name
+    klass._attributes_key = decapitalize(event_name) + 'EventAttributes'
+    return klass(raw_event['eventId'], state, raw_event['eventTimestamp'], raw_event)
+
+
+FACTORIES = {
+    'current': EventFactory,
+    'legacy': legacy_event_factory,
+}
+
+
+def make_raw_events(size):
+    """
+    Activity tasks scheduled, started and completed, up to *size* events.
+
+    :type size: int
+    :rtype: list[dict]
+    """
+    events = []
+    timestamp = 1500000000.0
+    while len(events) < size:
+        scheduled_id = len(events) + 1
+        events.append({
+            'eventId': scheduled_id,
+            'eventType': 'ActivityTaskScheduled',
+            'eventTimestamp': timestamp,
+            'activityTaskScheduledEventAttributes': {
+                'activityId': 'activity-{}'.format(scheduled_id),
+                'activityType': {'name': 'tests.data.activities.increment', 'version': 'test'},
+                'decisionTaskCompletedEventId': scheduled_id - 1,
+                'input': json.dumps({'args': [scheduled_id], 'kwargs': {}}),
+                'taskList': {'name': 'test'},
+                'heartbeatTimeout': '300',
+                'scheduleToCloseTimeout': '300',
+                'scheduleToStartTimeout': '300',
+                'startToCloseTimeout': '300',
+            },
+        })
+        events.append({
+            'eventId': scheduled_id + 1,
+            'eventType': 'ActivityTaskStarted',
+            'eventTimestamp': timestamp,
+            'activityTaskStartedEventAttributes': {
+                'identity': '{"hostname": "localhost", "pid": 1234}',
+                'scheduledEventId': scheduled_id,
+            },
+        })
+        events.append({
+            'eventId': scheduled_id + 2,
+            'eventType': 'ActivityTaskCompleted',
+            'eventTimestamp': timestamp,
+            'activityTaskCompletedEventAttributes': {
+                'result': json.dumps(scheduled_id + 1),
+                'scheduledEventId': scheduled_id,
+                'startedEventId': scheduled_id + 1,
+            },
+        })
+    return events[:size]
+
+
+def measure(implementation, size, queue):
+    raw_events = make_raw_events(size)
+    factory = FACTORIES[implementation]
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    start = time.time()
+    events = [factory(raw_event) for raw_event in raw_events]
+    duration = time.time() - start
+    rss_after = process.memory_info().rss
+    queue.put((duration, rss_after - rss_before, len(events)))
+
+
+def run(implementation, size):
+    """
+    :return: construction time in seconds and RSS increase in bytes
+    :rtype: (float, int)
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=measure, args=(implementation, size, queue))
+    process.start()
+    duration, rss, _ = queue.get()
+    process.join()
+    return duration, rss
+
+
+@click.command()
+@click.option('--sizes', default='10000,50000', help='Comma-separated numbers of events.')
+@click.option('--repeat', default=3, help='Runs per measure; the best one is kept.')
+def main(sizes, repeat):
+    print('{:>8} {:>8} {:>10} {:>10} {:>12}'.format(
+        'impl', 'events', 'time (s)', 'us/event', 'RSS (MiB)'))
+    for size in [int(s) for s in sizes.split(',')]:
+        for implementation in sorted(FACTORIES):
+            results = [run(implementation, size) for _ in range(repeat)]
+            duration = min(r[0] for r in results)
+            rss = min(r[1] for r in results)
+            print('{:>8} {:>8} {:>10.3f} {:>10.2f} {:>12.1f}'.format(
+                implementation, size, duration, duration * 1e6 / size, rss / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
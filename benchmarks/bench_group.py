@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Replay time of workflows submitting a huge ``Group`` with ``max_parallel``.
+
+Compares ``simpleflow.canvas.GroupFuture``, which counts its unfinished
+futures incrementally and aggregates their state and results in one pass,
+with the previous implementation, which scanned every future submitted so
+far before submitting the next one. In the replayed histories, the first
+half of the group is completed; replaying submits it, then schedules up to
+``max_parallel`` activities.
+
+Usage::
+
+    PYTHONPATH=. python benchmarks/bench_group.py [--sizes 10000,50000] [--max-parallel 100]
+"""
+from __future__ import absolute_import, division, print_function
+
+import timeit
+
+import click
+
+import swf.models
+from swf.models.history import builder
+from swf.responses import Response
+
+from simpleflow import activity, futures, Workflow
+from simpleflow.canvas import AggregateException, Group, GroupFuture
+from simpleflow.swf.executor import Executor
+
+
+DOMAIN = swf.models.Domain('benchmarks')
+
+
+class LegacyGroupFuture(GroupFuture):
+    """
+    Bookkeeping as implemented before the counters.
+    """
+    def _submit_next(self):
+        while len(self.futures) < len(self.activities):
+            if self.max_parallel and self._count_pending_or_running >= self.max_parallel:
+                break
+            future = self._submit_activity(self.activities[len(self.futures)])
+            self.futures.append(future)
+
+    @property
+    def _count_pending_or_running(self):
+        return len([True for f in self.futures if f.pending or f.running])
+
+    def sync_state(self):
+        if all(a.finished for a in self.futures) and self._futures_contain_all_activities:
+            self._state = futures.FINISHED
+        elif any(a.cancelled for a in self.futures):
+            self._state = futures.CANCELLED
+        elif any(a.running for a in self.futures):
+            self._state = futures.RUNNING
+
+    def sync_result(self):
+        self._result = []
+        exceptions = []
+        for future in self.futures:
+            if future.finished:
+                self._result.append(future.result)
+                exception = future.exception
+                exceptions.append(exception)
+            else:
+                self._result.append(None)
+                exceptions.append(None)
+        if any(ex for ex in exceptions):
+            self._exception = AggregateException(exceptions)
+
+
+class LegacyGroup(Group):
+    def submit(self, executor):
+        return LegacyGroupFuture(self.activities, executor, self.max_parallel)
+
+
+GROUPS = {
+    'current': Group,
+    'legacy': LegacyGroup,
+}
+
+
+@activity.with_attributes(version='bench', task_list='benchmarks')
+def process(item):
+    return item
+
+
+class GroupWorkflow(Workflow):
+    name = 'benchmarks.group'
+    version = 'bench'
+    task_list = 'benchmarks'
+    decision_tasks_timeout = '300'
+    execution_timeout = '3600'
+
+    def run(self, implementation, size, max_parallel):
+        group = GROUPS[implementation](max_parallel=max_parallel)
+        group.extend((process, item) for item in range(size))
+        return futures.wait(self.submit(group))
+
+
+def make_history(implementation, size, max_parallel):
+    """
+    History of a group whose first half is completed.
+
+    :rtype: builder.History
+    """
+    history = builder.History(GroupWorkflow, input={
+        'args': [implementation, size, max_parallel],
+        'kwargs': {},
+    })
+    decision_id = history.last_id
+    for item in range(size // 2):
+        history.add_activity_task(
+            process, decision_id,
+            activity_id='activity-{}-{}'.format(process.name, item + 1),
+            input={'args': [item], 'kwargs': {}},
+            result=item)
+    history.add_decision_task()
+    return history
+
+
+def run(implementation, size, max_parallel, repeat):
+    """
+    :return: best replay time in seconds
+    :rtype: float
+    """
+    history = make_history(implementation, size, max_parallel)
+    executor = Executor(DOMAIN, GroupWorkflow)
+    response = Response(token='token', history=history, execution=None)
+    durations = []
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        decisions, _ = executor.replay(response)
+        durations.append(timeit.default_timer() - start)
+    assert len(decisions) == min(max_parallel, size - size // 2), len(decisions)
+    return min(durations)
+
+
+@click.command()
+@click.option('--sizes', default='10000,50000', help='Comma-separated numbers of activities.')
+@click.option('--max-parallel', default=100, help='max_parallel of the group.')
+@click.option('--legacy-max-size', default=50000,
+              help='Skip the legacy implementation for larger groups, as it is quadratic.')
+@click.option('--repeat', default=3, help='Runs per measure; the best one is kept.')
+def main(sizes, max_parallel, legacy_max_size, repeat):
+    print('{:>8} {:>8} {:>10} {:>10}'.format('impl', 'size', 'time (s)', 'us/task'))
+    for size in [int(s) for s in sizes.split(',')]:
+        for implementation in sorted(GROUPS):
+            if implementation == 'legacy' and size > legacy_max_size:
+                print('{:>8} {:>8} {:>10}'.format(implementation, size, 'skipped'))
+                continue
+            duration = run(implementation, size, max_parallel, repeat)
+            print('{:>8} {:>8} {:>10.3f} {:>10.2f}'.format(
+                implementation, size, duration, duration * 1e6 / size))
+
+
+if __name__ == '__main__':
+    main()
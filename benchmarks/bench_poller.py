@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput of an activity worker process, polling included.
+
+Compares the sequential poller (poll, process, complete) with polling
+threads feeding several executors (``--nb-executors``). SWF is replaced by a
+fake that answers polls and completions after a fixed latency; boto needs
+AWS credentials to build the models, but no request is sent.
+
+Usage::
+
+    PYTHONPATH=. python benchmarks/bench_poller.py [--tasks 200] [--latency 0.02] \\
+        [--executors 1,4,8]
+"""
+from __future__ import absolute_import, division, print_function
+
+import json
+import multiprocessing
+import threading
+import time
+
+import click
+
+import swf.exceptions
+import swf.models
+from simpleflow.swf.process.worker.base import ActivityPoller
+
+
+class FakeActivityPoller(ActivityPoller):
+    def __init__(self, nb_tasks, latency, activity, **kwargs):
+        super(FakeActivityPoller, self).__init__(
+            swf.models.Domain('benchmarks'), 'benchmarks', heartbeat=0, **kwargs)
+        self._nb_tasks = nb_tasks
+        self._latency = latency
+        self._activity = activity
+        self._lock = threading.Lock()
+        self._polled = 0
+        self.completed = multiprocessing.Value('i', 0)
+
+    def poll(self, task_list=None, identity=None):
+        time.sleep(self._latency)
+        with self._lock:
+            index = self._polled
+            if index >= self._nb_tasks:
+                if self.completed.value >= self._nb_tasks:
+                    self.is_alive = False
+                raise swf.exceptions.PollTimeout('no task')
+            self._polled += 1
+        data = {
+            'taskToken': 'token-{}'.format(index),
+            'activityType': {'name': self._activity, 'version': 'benchmarks'},
+            'workflowExecution': {'workflowId': 'benchmarks', 'runId': 'benchmarks'},
+            'input': json.dumps({'args': [index], 'kwargs': {}}),
+            'activityId': 'activity-{}'.format(index),
+            'startedEventId': index,
+        }
+        task = swf.models.ActivityTask.from_poll(self.domain, self.task_list, data)
+        return task.task_token, task
+
+    def complete(self, token, result=None):
+        time.sleep(self._latency)
+        with self.completed.get_lock():
+            self.completed.value += 1
+
+    def fail(self, token, task, reason=None, details=None):
+        print('task {} failed: {}'.format(token, reason))
+        self.complete(token)
+
+    def bind_signal_handlers(self):
+        pass
+
+    def set_process_name(self, name=None):
+        pass
+
+
+@click.command()
+@click.option('--tasks', 'nb_tasks', default=200, help='Number of tasks.')
+@click.option('--latency', default=0.02, help='Latency of the SWF calls (seconds).')
+@click.option('--executors', default='1,4,8', help='Comma-separated numbers of executors.')
+@click.option('--activity', default='tests.data.activities.increment',
+              help='Activity run by each task.')
+def main(nb_tasks, latency, executors, activity):
+    print('{:>8} {:>10} {:>8} {:>10} {:>10}'.format(
+        'prefork', 'executors', 'tasks', 'time (s)', 'tasks/s'))
+    for prefork in (False, True):
+        for nb_executors in [int(n) for n in executors.split(',')]:
+            poller = FakeActivityPoller(
+                nb_tasks, latency, activity,
+                prefork=prefork,
+                nb_executors=nb_executors,
+                nb_pollers=2 if nb_executors > 1 else 1,
+            )
+            start = time.time()
+            poller.start()
+            duration = time.time() - start
+            print('{:>8} {:>10} {:>8} {:>10.3f} {:>10.1f}'.format(
+                str(prefork), nb_executors, poller.completed.value, duration,
+                poller.completed.value / duration))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Time and peak memory of the decider hot path on synthetic histories.
+
+Histories are built with ``swf.models.history.builder.History`` for a
+workflow mixing ``Group`` fan-outs of activities with large inputs, retried
+activities, child workflows and signals. The last fan-out is left to
+schedule, so that replaying the history produces decisions. The measured
+stages are:
+
+- ``from_event_list``: ``swf.models.History.from_event_list`` on the raw
+  events, as returned by ``PollForDecisionTask``;
+- ``parse``: ``simpleflow.history.History.parse``;
+- ``replay``: ``simpleflow.swf.executor.Executor.replay``, end to end;
+- ``serialize``: JSON serialization of the decisions.
+
+The results may be stored as JSON and compared with those of another
+commit; the comparison exits with status 1 if a stage became slower, or
+used more memory, than allowed by ``--threshold``.
+
+Usage::
+
+    PYTHONPATH=. python benchmarks/bench_replay.py run [--sizes 1000,10000,50000] [--output before.json]
+    PYTHONPATH=. python benchmarks/bench_replay.py compare before.json after.json [--threshold 0.1]
+"""
+from __future__ import absolute_import, division, print_function
+
+import gc
+import json
+import platform
+import subprocess
+import sys
+import timeit
+
+import click
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+import swf.models
+from swf.models.history import builder
+from swf.responses import Response
+
+from simpleflow import activity, futures, Workflow
+from simpleflow.canvas import Group
+from simpleflow.history import History
+from simpleflow.swf.executor import Executor
+
+
+STAGES = ('from_event_list', 'parse', 'replay', 'serialize')
+
+DOMAIN = swf.models.Domain('benchmarks')
+
+
+@activity.with_attributes(version='bench', task_list='benchmarks')
+def process(index, item, payload):
+    return len(payload) + item
+
+
+@activity.with_attributes(version='bench', task_list='benchmarks', retry=2)
+def flaky(index, item):
+    return item
+
+
+class ChildWorkflow(Workflow):
+    name = 'benchmarks.replay.child'
+    version = 'bench'
+    task_list = 'benchmarks'
+    decision_tasks_timeout = '300'
+    execution_timeout = '3600'
+
+    @classmethod
+    def get_workflow_id(cls, *args, **kwargs):
+        return 'benchmarks-replay-child-{}'.format(kwargs['index'])
+
+    def run(self, index):
+        return index
+
+
+class ReplayWorkflow(Workflow):
+    """
+    Rounds of a fan-out, a child workflow and a signal.
+    """
+    name = 'benchmarks.replay'
+    version = 'bench'
+    task_list = 'benchmarks'
+    decision_tasks_timeout = '300'
+    execution_timeout = '3600'
+
+    def run(self, rounds, fanout, flaky_every, payload_size):
+        payload = 'x' * payload_size
+        for index in range(rounds):
+            group = Group()
+            for item in range(fanout):
+                if item % flaky_every:
+                    group.append(process, index, item, payload)
+                else:
+                    group.append(flaky, index, item)
+            futures.wait(self.submit(group))
+            futures.wait(self.submit(ChildWorkflow, index=index))
+            futures.wait(self.submit(self.wait_signal('round-{}'.format(index))))
+
+
+def make_history(size, fanout=50, flaky_every=10, failures=1, payload_size=2000):
+    """
+    History of a ``ReplayWorkflow`` execution, of about *size* events.
+
+    :param size: number of events
+    :type size: int
+    :param fanout: activities per group
+    :type fanout: int
+    :param flaky_every: one activity in *flaky_every* fails before completing
+    :type flaky_every: int
+    :param failures: failed attempts of these activities
+    :type failures: int
+    :param payload_size: characters in the input of the other activities
+    :type payload_size: int
+    :return: the history and the number of decisions expected from a replay
+    :rtype: (builder.History, int)
+    """
+    nb_flaky = len(range(0, fanout, flaky_every))
+    # Activities, retries, child workflow, signal and decision tasks
+    round_size = 3 * fanout + 3 * failures * nb_flaky + 3 + 1 + 3 * 3
+    # The last round only has its decision task, as the first two events
+    rounds = max(int(round((size - 3) / round_size)), 0) + 1
+    input = {
+        'args': [rounds, fanout, flaky_every, payload_size],
+        'kwargs': {},
+    }
+    history = builder.History(ReplayWorkflow, input=input)
+    payload = 'x' * payload_size
+    counters = {}
+
+    def activity_id(func):
+        counters[func] = counters.get(func, 0) + 1
+        return 'activity-{}-{}'.format(func.name, counters[func])
+
+    for index in range(rounds - 1):
+        decision_id = history.last_id
+        for item in range(fanout):
+            if item % flaky_every:
+                history.add_activity_task(
+                    process, decision_id, activity_id=activity_id(process),
+                    input={'args': [index, item, payload], 'kwargs': {}},
+                    result=payload_size + item)
+                continue
+            flaky_id = activity_id(flaky)
+            flaky_input = {'args': [index, item], 'kwargs': {}}
+            for _ in range(failures):
+                history.add_activity_task(flaky, decision_id, activity_id=flaky_id,
+                                          input=flaky_input, last_state='failed')
+            history.add_activity_task(flaky, decision_id, activity_id=flaky_id,
+                                      input=flaky_input, result=item)
+        history.add_decision_task()
+        history.add_child_workflow(
+            ChildWorkflow,
+            workflow_id=ChildWorkflow.get_workflow_id(index=index),
+            task_list=ChildWorkflow.task_list,
+            input={'args': [], 'kwargs': {'index': index}},
+            result=json.dumps(index))
+        history.add_decision_task()
+        history.add_signal('round-{}'.format(index),
+                           input={'args': [index], 'kwargs': {}, '__propagate': False})
+        history.add_decision_task()
+    return history, fanout
+
+
+def measure(func, repeat):
+    """
+    Best time of *func* over *repeat* runs, then its peak of allocated
+    memory, if ``tracemalloc`` is available.
+
+    :type func: callable
+    :type repeat: int
+    :return: time in seconds, peak memory in bytes (or None) and the result
+    :rtype: (float, Optional[int], Any)
+    """
+    durations = []
+    result = None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = timeit.default_timer()
+        result = func()
+        durations.append(timeit.default_timer() - start)
+
+    peak = None
+    if tracemalloc is not None:
+        result = None
+        gc.collect()
+        tracemalloc.start()
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return min(durations), peak, result
+
+
+def run_size(size, repeat):
+    """
+    :return: time and peak memory of each stage
+    :rtype: dict[str, dict[str, Any]]
+    """
+    built, nb_expected = make_history(size)
+    raw_events = [event.raw for event in built.events]
+    results = {'events': len(raw_events)}
+
+    duration, peak, history = measure(
+        lambda: swf.models.History.from_event_list(raw_events), repeat)
+    results['from_event_list'] = {'time': duration, 'peak': peak}
+
+    def parse():
+        parsed = History(history)
+        parsed.parse()
+        return parsed
+    duration, peak, _ = measure(parse, repeat)
+    results['parse'] = {'time': duration, 'peak': peak}
+
+    executor = Executor(DOMAIN, ReplayWorkflow)
+    execution = swf.models.WorkflowExecution(
+        DOMAIN, 'benchmarks-replay', run_id='run-id',
+        workflow_type=swf.models.WorkflowType(DOMAIN, ReplayWorkflow.name, ReplayWorkflow.version))
+    response = Response(token='token', history=history, execution=execution)
+    duration, peak, (decisions, _) = measure(lambda: executor.replay(response), repeat)
+    results['replay'] = {'time': duration, 'peak': peak}
+    if len(decisions) != nb_expected:
+        raise click.ClickException('the history of {} events replays into {} decisions, '
+                                   'expected {}'.format(len(raw_events), len(decisions), nb_expected))
+
+    duration, peak, _ = measure(lambda: json.dumps(decisions), repeat)
+    results['serialize'] = {'time': duration, 'peak': peak}
+    return results
+
+
+def get_commit():
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('utf-8').strip()
+
+
+def format_peak(peak):
+    return '-' if peak is None else '{:.1f}'.format(peak / 2 ** 20)
+
+
+@click.group()
+def main():
+    pass
+
+
+@main.command()
+@click.option('--sizes', default='1000,10000,50000', help='Comma-separated numbers of events.')
+@click.option('--repeat', default=3, help='Runs per measure; the best one is kept.')
+@click.option('--output', type=click.Path(), help='Store the results in this JSON file.')
+def run(sizes, repeat, output):
+    """
+    Measure the stages on histories of each size.
+    """
+    report = {
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'results': {},
+    }
+    print('{:>8} {:>16} {:>10} {:>10} {:>12}'.format(
+        'events', 'stage', 'time (s)', 'us/event', 'peak (MiB)'))
+    for size in [int(s) for s in sizes.split(',')]:
+        results = run_size(size, repeat)
+        report['results'][str(size)] = results
+        for stage in STAGES:
+            print('{:>8} {:>16} {:>10.3f} {:>10.2f} {:>12}'.format(
+                results['events'], stage, results[stage]['time'],
+                results[stage]['time'] * 1e6 / results['events'],
+                format_peak(results[stage]['peak'])))
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+@main.command()
+@click.argument('baseline', type=click.File())
+@click.argument('current', type=click.File())
+@click.option('--threshold', default=0.1, help='Relative increase flagged as a regression.')
+def compare(baseline, current, threshold):
+    """
+    Compare the results of two runs, e.g. of two commits.
+    """
+    baseline = json.load(baseline)
+    current = json.load(current)
+    print('{} -> {}'.format(baseline.get('commit'), current.get('commit')))
+    print('{:>8} {:>16} {:>10} {:>10} {:>8} {:>8}  {}'.format(
+        'size', 'stage', 'before', 'after', 'time', 'peak', ''))
+    regressions = 0
+    sizes = set(baseline['results']) & set(current['results'])
+    for size in sorted(sizes, key=int):
+        for stage in STAGES:
+            before = baseline['results'][size][stage]
+            after = current['results'][size][stage]
+            changes = {}
+            for key in ('time', 'peak'):
+                if before[key] and after[key] is not None:
+                    changes[key] = after[key] / before[key] - 1
+            flagged = [key for key, change in sorted(changes.items()) if change > threshold]
+            regressions += bool(flagged)
+            print('{:>8} {:>16} {:>10.3f} {:>10.3f} {:>8} {:>8}  {}'.format(
+                size, stage, before['time'], after['time'],
+                '{:+.0%}'.format(changes['time']) if 'time' in changes else '-',
+                '{:+.0%}'.format(changes['peak']) if 'peak' in changes else '-',
+                'REGRESSION ({})'.format(', '.join(flagged)) if flagged else ''))
+    if regressions:
+        print('{} regression(s) above {:.0%}'.format(regressions, threshold))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
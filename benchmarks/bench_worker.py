@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput of activity workers.
+
+Compares running each task in a new process (``spawn``) with running the
+tasks in a warm executor process (``--prefork``). SWF calls are replaced by
+a fake poller, so only the cost of process management and imports is
+measured. The activity is looked up by name, as a worker does. boto needs
+AWS credentials to build the models, but no request is sent.
+
+Usage::
+
+    PYTHONPATH=. python benchmarks/bench_worker.py [--tasks 200] \\
+        [--activity tests.data.activities.increment]
+"""
+from __future__ import absolute_import, division, print_function
+
+import json
+import multiprocessing
+import time
+
+import click
+
+import swf.models
+from simpleflow.swf.process.worker.base import spawn
+from simpleflow.swf.process.worker.prefork import ExecutorPool
+
+
+class FakePoller(object):
+    task_list = 'benchmarks'
+
+    def __init__(self):
+        self.domain = swf.models.Domain('benchmarks')
+        self.results = multiprocessing.Queue()
+
+    def heartbeat(self, token):
+        return {}
+
+    def _complete(self, token, result):
+        self.results.put(token)
+
+    def fail(self, token, task, reason=None, details=None):
+        self.results.put(token)
+        print('task {} failed: {}'.format(token, reason))
+
+
+def make_task(poller, activity, index):
+    data = {
+        'taskToken': 'token-{}'.format(index),
+        'activityType': {'name': activity, 'version': 'benchmarks'},
+        'workflowExecution': {'workflowId': 'benchmarks', 'runId': 'benchmarks'},
+        'input': json.dumps({'args': [index], 'kwargs': {}}),
+        'activityId': 'activity-{}'.format(index),
+        'startedEventId': index,
+    }
+    return swf.models.ActivityTask.from_poll(poller.domain, poller.task_list, data)
+
+
+def run_spawn(poller, tasks):
+    for task in tasks:
+        spawn(poller, task.task_token, task)
+        poller.results.get()
+
+
+def run_prefork(poller, tasks):
+    pool = ExecutorPool(poller)
+    for task in tasks:
+        pool.run(task.task_token, task)
+        poller.results.get()
+    pool.stop()
+
+
+MODES = {
+    'spawn': run_spawn,
+    'prefork': run_prefork,
+}
+
+
+@click.command()
+@click.option('--tasks', 'nb_tasks', default=200, help='Number of tasks.')
+@click.option('--activity', default='tests.data.activities.increment',
+              help='Activity run by each task.')
+def main(nb_tasks, activity):
+    poller = FakePoller()
+    tasks = [make_task(poller, activity, index) for index in range(nb_tasks)]
+    print('{:>8} {:>8} {:>10} {:>10}'.format('mode', 'tasks', 'time (s)', 'tasks/s'))
+    for mode in sorted(MODES):
+        start = time.time()
+        MODES[mode](poller, tasks)
+        duration = time.time() - start
+        print('{:>8} {:>8} {:>10.3f} {:>10.1f}'.format(
+            mode, nb_tasks, duration, nb_tasks / duration))
+
+
+if __name__ == '__main__':
+    main()
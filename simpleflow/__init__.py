@@ -4,6 +4,7 @@ import logging.config
 
 from .activity import Activity  # NOQA
 from .workflow import Workflow  # NOQA
+from .preload import on_worker_init  # NOQA
 
 from . import settings
 
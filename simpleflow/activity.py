@@ -1,3 +1,5 @@
+import threading
+
 from . import settings
 from . import registry
 
@@ -24,6 +26,7 @@ def with_attributes(
         schedule_to_start_timeout=settings.ACTIVITY_SCHEDULE_TO_START_TIMEOUT,
         heartbeat_timeout=settings.ACTIVITY_HEARTBEAT_TIMEOUT,
         idempotent=None,
+        codec=None,
 ):
     """
     Decorator: wrap a function/class into an Activity.
@@ -48,6 +51,8 @@ def with_attributes(
     :type heartbeat_timeout: str
     :param idempotent: True if the activity is idempotent.
     :type idempotent: Optional[bool]
+    :param codec: codec of the payloads, see :mod:`simpleflow.codec`.
+    :type codec: Optional[str]
     :rtype: () -> Activity[()]
 
     """
@@ -62,11 +67,49 @@ def with_attributes(
             heartbeat_timeout,
             task_priority=task_priority,
             idempotent=idempotent,
+            codec=codec,
         )
 
     return wrap
 
 
+# Context of the last task of each function activity, per thread: tasks of
+# the same activity may run concurrently in several threads.
+_thread_contexts = threading.local()
+
+
+def set_context(func, context):
+    """
+    Attach the context of a task to the callable of a function activity,
+    for the current thread.
+
+    In the main thread, i.e. when tasks run sequentially, it is also set as
+    the ``context`` attribute of the callable, for code that reads it there.
+
+    :type func: Callable
+    :type context: Optional[dict]
+    """
+    contexts = getattr(_thread_contexts, 'contexts', None)
+    if contexts is None:
+        contexts = _thread_contexts.contexts = {}
+    contexts[func] = context
+    if isinstance(threading.current_thread(), threading._MainThread):
+        func.context = context
+
+
+def get_context(func):
+    """
+    Context of the last task of a function activity in the current thread.
+
+    :type func: Callable
+    :rtype: Optional[dict]
+    """
+    contexts = getattr(_thread_contexts, 'contexts', {})
+    if func in contexts:
+        return contexts[func]
+    return getattr(func, "context", None)
+
+
 class Activity(object):
     def __init__(self, callable,
                  name=None,
@@ -79,7 +122,8 @@ class Activity(object):
                  schedule_to_start_timeout=None,
                  heartbeat_timeout=None,
                  task_priority=PRIORITY_NOT_SET,
-                 idempotent=None):
+                 idempotent=None,
+                 codec=None):
         self._callable = callable
 
         self._name = name
@@ -89,6 +133,7 @@ class Activity(object):
         self.retry = retry
         self.raises_on_failure = raises_on_failure
         self.idempotent = idempotent
+        self.codec = codec
         self.task_start_to_close_timeout = start_to_close_timeout
         self.task_schedule_to_close_timeout = schedule_to_close_timeout
         self.task_schedule_to_start_timeout = schedule_to_start_timeout
@@ -105,7 +150,7 @@ class Activity(object):
 
     @property
     def context(self):
-        return getattr(self.callable, "context", None)
+        return get_context(self.callable)
 
     @property
     def name(self):
@@ -0,0 +1,170 @@
+"""
+Batched map: many small items processed by one activity task.
+
+:meth:`simpleflow.Workflow.map_batched` schedules :func:`run_batch` once per
+batch of items. On the worker, it runs the activity on each item, optionally
+in a thread pool, and returns the result or the error of each one; the
+workflow gets a :class:`BatchItemFuture` per item, as with ``map``.
+"""
+from __future__ import absolute_import
+
+import logging
+import threading
+import traceback
+from multiprocessing.pool import ThreadPool
+
+from simpleflow import exceptions, futures
+from simpleflow.activity import Activity, get_context
+from simpleflow.task import ActivityTask
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_ACTIVITY_NAME = 'simpleflow.batch.run_batch'
+
+_batch_activities = {}
+_batch_activities_lock = threading.Lock()
+
+
+def run_batch(activity_name, items, nb_threads=None):
+    """
+    Run an activity on each item of a batch.
+
+    :param activity_name: name of the activity
+    :type activity_name: str
+    :param items: argument of each call
+    :type items: list[Any]
+    :param nb_threads: threads running the items; sequentially if unset
+    :type nb_threads: Optional[int]
+    :return: ``{"result": ...}`` or ``{"error": {"reason": ..., "details": ...}}``
+        for each item
+    :rtype: list[dict[str, Any]]
+    """
+    from simpleflow.swf.process.worker.dispatch.dynamic_dispatcher import Dispatcher
+
+    activity = Dispatcher.dispatch_activity(activity_name)
+    # Set by ActivityTask.execute()
+    context = get_context(run_batch)
+
+    def run_item(item):
+        try:
+            return {'result': ActivityTask(activity, item, context=context).execute()}
+        except Exception as err:
+            logger.info('{} failed on item {!r}: {}'.format(activity_name, item, err))
+            return {'error': {'reason': str(err), 'details': traceback.format_exc()}}
+
+    if not nb_threads or nb_threads < 2:
+        return [run_item(item) for item in items]
+    pool = ThreadPool(min(nb_threads, len(items)) or 1)
+    try:
+        return pool.map(run_item, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def batch_activity(activity):
+    """
+    Activity running batches of *activity*, with its version, task list,
+    retries and timeouts. The timeouts apply to a whole batch.
+
+    :type activity: Activity
+    :rtype: Activity
+    """
+    key = (activity.name, activity.version, activity.task_list)
+    with _batch_activities_lock:
+        batch = _batch_activities.get(key)
+        if batch is None:
+            batch = _batch_activities[key] = Activity(
+                run_batch,
+                name=BATCH_ACTIVITY_NAME,
+                version=activity.version,
+                task_list=activity.task_list,
+                retry=activity.retry,
+                raises_on_failure=activity.raises_on_failure,
+                start_to_close_timeout=activity.task_start_to_close_timeout,
+                schedule_to_close_timeout=activity.task_schedule_to_close_timeout,
+                schedule_to_start_timeout=activity.task_schedule_to_start_timeout,
+                heartbeat_timeout=activity.task_heartbeat_timeout,
+                task_priority=activity.task_priority,
+                idempotent=activity.idempotent,
+                codec=activity.codec,
+            )
+        return batch
+
+
+class BatchItemFuture(futures.Future):
+    """
+    Future of an item of a batch, derived from the future of its batch in
+    the group of batches, once submitted.
+
+    A failed item has a :class:`exceptions.TaskFailed` exception and no
+    result; if the whole batch failed, each item has its exception. As for
+    an activity task, reading the result of a failed item raises its
+    exception if the activity raises on failure.
+
+    :type group: simpleflow.canvas.GroupFuture
+    :type raises_on_failure: bool
+    """
+    def __init__(self, group, batch_index, item_index, name, raises_on_failure=False):
+        # No super().__init__(): the state is the batch's
+        self.group = group
+        self.batch_index = batch_index
+        self.item_index = item_index
+        self.name = name
+        self.raises_on_failure = raises_on_failure
+
+    @property
+    def batch(self):
+        """
+        :rtype: Optional[futures.Future]
+        """
+        if self.batch_index < len(self.group.futures):
+            return self.group.futures[self.batch_index]
+        return None
+
+    @property
+    def _state(self):
+        batch = self.batch
+        return batch.state if batch is not None else futures.PENDING
+
+    def _outcome(self):
+        batch = self.batch
+        if batch is None or batch.state != futures.FINISHED or batch._exception or not batch._result:
+            return {}
+        return batch._result[self.item_index]
+
+    @property
+    def _result(self):
+        return self._outcome().get('result')
+
+    @property
+    def result(self):
+        if self._state != futures.FINISHED:
+            self.wait()
+        exception = self._exception
+        if exception is not None and self.raises_on_failure:
+            raise exception
+        return self._result
+
+    @property
+    def _exception(self):
+        batch = self.batch
+        if batch is not None and batch._exception:
+            return batch._exception
+        error = self._outcome().get('error')
+        if error:
+            return exceptions.TaskFailed(self.name, error.get('reason'), error.get('details'))
+        return None
+
+    def wait(self):
+        batch = self.batch
+        if batch is None:
+            # Not submitted yet, because of max_parallel
+            self.group.wait()
+        else:
+            batch.wait()
+
+    def cancel(self):
+        batch = self.batch
+        return batch.cancel() if batch is not None else False
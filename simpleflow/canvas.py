@@ -154,6 +154,11 @@ class Group(object):
 
 
 class GroupFuture(futures.Future):
+    """
+    Future of a group. The futures pending or running when last checked are
+    tracked apart, so that submitting an activity under ``max_parallel``
+    doesn't scan all the futures of a huge group.
+    """
 
     def __init__(self, activities, executor, max_parallel=None):
         super(GroupFuture, self).__init__()
@@ -161,16 +166,42 @@ class GroupFuture(futures.Future):
         self.futures = []
         self.executor = executor
         self.max_parallel = max_parallel
+        self._unfinished = []
 
-        for a in self.activities:
-            if not self.max_parallel or self._count_pending_or_running < self.max_parallel:
-                future = self._submit_activity(a)
-                self.futures.append(future)
-                if self._count_pending_or_running == self.max_parallel:
-                    break
+        self._submit_next()
 
-        self.sync_state()
-        self.sync_result()
+        self._sync()
+
+    def _append_future(self, future):
+        self.futures.append(future)
+        if future.state in (futures.PENDING, futures.RUNNING):
+            self._unfinished.append(future)
+
+    def _submit_next(self):
+        """
+        Submit the next activities, up to max_parallel unfinished ones.
+        """
+        while len(self.futures) < len(self.activities):
+            # Only check the unfinished futures again when at the limit
+            if (self.max_parallel and len(self._unfinished) >= self.max_parallel and
+                    self._count_pending_or_running >= self.max_parallel):
+                break
+            self._append_future(self._submit_activity(self.activities[len(self.futures)]))
+
+    def wait(self):
+        """
+        Wait for the activities in order, submitting the next ones as they
+        finish. Waiting on a SWF future raises ExecutionBlocked: the group
+        is then rebuilt on the next decision.
+        """
+        index = 0
+        while index < len(self.futures):
+            future = self.futures[index]
+            if not future.finished:
+                future.wait()
+            self._submit_next()
+            index += 1
+        self._sync()
 
     def _submit_activity(self, act):
         if isinstance(act, ActivityTask):
@@ -184,35 +215,66 @@ class GroupFuture(futures.Future):
         raise TypeError('Wrong type for `act` ({}). Expecting `Submittable`, `Group` or `FuncGroup`'.format(type(act)))
 
     def sync_state(self):
-        if all(a.finished for a in self.futures) and self._futures_contain_all_activities:
-            self._state = futures.FINISHED
-        elif any(a.cancelled for a in self.futures):
-            self._state = futures.CANCELLED
-        elif any(a.running for a in self.futures):
-            self._state = futures.RUNNING
+        self._sync(result=False)
+
+    def sync_result(self):
+        self._sync(state=False)
+
+    def _sync(self, state=True, result=True):
+        """
+        Update the state and/or the result of the group in a single pass
+        over its futures.
+        """
+        all_finished = True
+        any_cancelled = any_running = False
+        results = []
+        exceptions = []
+        failed = False
+        for future in self.futures:
+            future_state = future.state
+            if future_state == futures.FINISHED:
+                if result:
+                    results.append(future.result)
+                    exception = future.exception
+                    exceptions.append(exception)
+                    failed = failed or bool(exception)
+                continue
+            all_finished = False
+            if future_state == futures.CANCELLED:
+                any_cancelled = True
+            elif future_state == futures.RUNNING:
+                any_running = True
+            if result:
+                results.append(None)
+                exceptions.append(None)
+
+        if state:
+            if all_finished and self._is_complete():
+                self._state = futures.FINISHED
+            elif any_cancelled:
+                self._state = futures.CANCELLED
+            elif any_running:
+                self._state = futures.RUNNING
+        if result:
+            self._result = results
+            if failed:
+                self._exception = AggregateException(exceptions)
+
+    def _is_complete(self):
+        """
+        Whether no activity remains to submit.
+        """
+        return self._futures_contain_all_activities
 
     @property
     def _count_pending_or_running(self):
-        return len([True for f in self.futures if f.pending or f.running])
+        self._unfinished = [f for f in self._unfinished if f.state in (futures.PENDING, futures.RUNNING)]
+        return len(self._unfinished)
 
     @property
     def _futures_contain_all_activities(self):
         return len(self.futures) == len(self.activities)
 
-    def sync_result(self):
-        self._result = []
-        exceptions = []
-        for future in self.futures:
-            if future.finished:
-                self._result.append(future.result)
-                exception = future.exception
-                exceptions.append(exception)
-            else:
-                self._result.append(None)
-                exceptions.append(None)
-        if any(ex for ex in exceptions):
-            self._exception = AggregateException(exceptions)
-
     @property
     def count_finished_activities(self):
         return sum(1 if a.finished else 0
@@ -250,28 +312,42 @@ class ChainFuture(GroupFuture):
         self._result = None
         self._exception = None
         self.futures = []
+        self._unfinished = []
         self._has_failed = False
+        self.send_result = send_result
+
+        self._submit_next()
 
+        self._sync()
+
+    def _submit_next(self):
+        """
+        Submit the next activities while the previous ones are finished
+        and successful.
+        """
         previous_result = None
-        for i, a in enumerate(self.activities):
-            if send_result and i > 0:
+        while len(self.futures) < len(self.activities) and not self._has_failed:
+            if self.futures:
+                previous = self.futures[-1]
+                if not previous.finished:
+                    break
+                if previous.exception:
+                    self._has_failed = True
+                    break
+                previous_result = previous.result
+            a = self.activities[len(self.futures)]
+            if self.send_result and self.futures:
                 a.args.append(previous_result)
-            future = self._submit_activity(a)
-            self.futures.append(future)
-            if not future.finished:
-                break
-            if future.finished and future.exception:
+            self.futures.append(self._submit_activity(a))
+        if self.futures and len(self.futures) == len(self.activities):
+            # Last activity: it may have failed
+            last = self.futures[-1]
+            if last.finished and last.exception:
                 self._has_failed = True
-                break
-            previous_result = future.result
-
-        self.sync_state()
-        self.sync_result()
 
-    def sync_state(self):
-        if all(a.finished for a in self.futures) and (self._futures_contain_all_activities or self._has_failed):
-            self._state = futures.FINISHED
-        elif any(a.cancelled for a in self.futures):
-            self._state = futures.CANCELLED
-        elif any(a.running for a in self.futures):
-            self._state = futures.RUNNING
+    def _is_complete(self):
+        """
+        Whether no activity remains to submit, or none will be after a
+        failure.
+        """
+        return self._futures_contain_all_activities or self._has_failed
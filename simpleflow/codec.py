@@ -0,0 +1,228 @@
+"""
+Encoding of the payloads exchanged through SWF: workflow and activity inputs
+and results.
+
+A payload is JSON, optionally compressed then framed as
+``!<codec>:<base64 of the compressed JSON>``. JSON never starts with ``!``:
+payloads are self-describing, so that any reader decodes them whatever the
+codec of the writer, and plain and compressed payloads coexist in a
+history.
+
+The codec is chosen by the ``codec`` attribute of an activity or a workflow,
+defaulting to ``settings.PAYLOAD_CODEC``. JSON is encoded with ``orjson``
+when it's installed; ``zstd`` needs ``zstandard``.
+"""
+from __future__ import absolute_import
+
+import abc
+import base64
+import json
+import zlib
+
+from simpleflow import settings
+from simpleflow.utils import json_dumps
+from simpleflow.utils.json_dumps import _serialize_complex_object
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+__all__ = ['dumps', 'loads', 'encode', 'decode', 'detect', 'register']
+
+
+JSON = 'json'
+
+PREFIX = '!'
+
+# Shorter JSON isn't worth compressing.
+MIN_COMPRESSED_LENGTH = 256
+
+
+class Codec(object):
+    """
+    Compression of the JSON of payloads.
+    """
+    __metaclass__ = abc.ABCMeta
+
+    name = None
+
+    @abc.abstractmethod
+    def compress(self, data):
+        """
+        :type data: bytes
+        :rtype: bytes
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def decompress(self, data):
+        """
+        :type data: bytes
+        :rtype: bytes
+        """
+        raise NotImplementedError
+
+
+class ZlibCodec(Codec):
+    name = 'zlib'
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def compress(self, data):
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data):
+        return zlib.decompress(data)
+
+
+class ZstdCodec(Codec):
+    name = 'zstd'
+
+    def __init__(self, level=3):
+        self.level = level
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def decompress(self, data):
+        return zstandard.ZstdDecompressor().decompress(data)
+
+
+CODECS = {}
+
+
+def register(codec):
+    """
+    Make a codec available by its name.
+
+    :type codec: Codec
+    """
+    CODECS[codec.name] = codec
+
+
+register(ZlibCodec())
+if zstandard is not None:
+    register(ZstdCodec())
+
+
+def get_codec(name):
+    """
+    :param name: codec name; None for the default one
+    :type name: Optional[str]
+    :return: the codec, None for plain JSON
+    :rtype: Optional[Codec]
+    """
+    if name is None:
+        name = settings.PAYLOAD_CODEC
+    if not name or name == JSON:
+        return None
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError('unknown payload codec {!r} (available: {})'.format(
+            name, ', '.join(sorted(CODECS)) or 'none'))
+
+
+def to_json(obj):
+    """
+    :type obj: Any
+    :rtype: str
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                obj,
+                default=_serialize_complex_object,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+            ).decode('utf-8')
+        except TypeError:
+            # e.g. integers over 64 bits
+            pass
+    return json_dumps(obj)
+
+
+def from_json(message):
+    """
+    :type message: str
+    :rtype: Any
+    """
+    if orjson is not None:
+        return orjson.loads(message)
+    return json.loads(message)
+
+
+def encode(message, codec=None):
+    """
+    Compress a JSON message, unless it's too short or doesn't shrink.
+
+    :param message: JSON
+    :type message: str
+    :param codec: codec name; None for the default one
+    :type codec: Optional[str]
+    :rtype: str
+    """
+    compressor = get_codec(codec)
+    if compressor is None or len(message) < MIN_COMPRESSED_LENGTH:
+        return message
+    data = base64.b64encode(compressor.compress(message.encode('utf-8')))
+    framed = '{}{}:{}'.format(PREFIX, compressor.name, data.decode('ascii'))
+    return framed if len(framed) < len(message) else message
+
+
+def detect(message):
+    """
+    :param message: payload
+    :type message: str
+    :return: the name of the codec of a payload
+    :rtype: str
+    """
+    if not message.startswith(PREFIX):
+        return JSON
+    return message[len(PREFIX):].split(':', 1)[0]
+
+
+def decode(message):
+    """
+    :param message: payload
+    :type message: str
+    :return: JSON
+    :rtype: str
+    """
+    name = detect(message)
+    if name == JSON:
+        return message
+    if name not in CODECS:
+        raise ValueError('cannot decode a {!r} payload (available: {})'.format(
+            name, ', '.join(sorted(CODECS)) or 'none'))
+    data = base64.b64decode(message[len(PREFIX) + len(name) + 1:])
+    return CODECS[name].decompress(data).decode('utf-8')
+
+
+def dumps(obj, codec=None):
+    """
+    Encode a payload.
+
+    :type obj: Any
+    :param codec: codec name; None for the default one
+    :type codec: Optional[str]
+    :rtype: str
+    """
+    return encode(to_json(obj), codec)
+
+
+def loads(message):
+    """
+    Decode a payload, whatever its codec.
+
+    :type message: str
+    :rtype: Any
+    """
+    return from_json(decode(message))
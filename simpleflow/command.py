@@ -5,12 +5,13 @@ import json
 import logging
 import multiprocessing
 import os
+import shutil
 import signal
 import sys
+import tempfile
 import time
 from uuid import uuid4
 
-import boto.connection
 import click
 
 import swf.exceptions
@@ -19,9 +20,10 @@ import swf.querysets
 
 from simpleflow.history import History
 from simpleflow.swf.stats import pretty
-from simpleflow.swf import helpers
+from simpleflow.swf import helpers, payloads
 from simpleflow.swf.process import decider
 from simpleflow.swf.process import worker
+from simpleflow.swf.repair import RepairIndex
 from simpleflow.swf.utils import get_workflow_history
 from simpleflow.utils import json_dumps
 from simpleflow import __version__
@@ -48,24 +50,6 @@ def get_workflow(clspath):
     return cls
 
 
-def disable_boto_connection_pooling():
-    # boto connection pooling doesn't work very well with multiprocessing, it
-    # provokes some errors like this:
-    #
-    #    [Errno 1] _ssl.c:1429: error:1408F119:SSL routines:SSL3_GET_RECORD:decryption failed or bad record mac
-    # when polling on analysis-testjbb-repair-a61ff96e854344748e308fefc9ddff61
-    #
-    # It's because when forking, file handles are copied and sockets are shared.
-    # Even sockets that handle SSL conections to AWS services, but SSL
-    # connections are stateful! So with multiple workers, it collides.
-    #
-    # To disable boto's connection pooling (which in practice makes boto open a
-    # *NEW* connection for each call), we make make boto believe we run on
-    # Google App Engine, where it disables connection pooling. There's no
-    # "direct" setting, so that's a hack but that works.
-    boto.connection.ON_APP_ENGINE = True
-
-
 def comma_separated_list(value):
     """
     Transforms a comma-separated list into a list of strings.
@@ -126,6 +110,10 @@ def transform_input(wf_input):
     return wf_input
 
 
+@click.option('--local-threads', default=False, is_flag=True,
+              help='With --local-workers, run the activities in threads instead of processes.')
+@click.option('--local-workers', type=int, required=False,
+              help='With --local, number of activities running concurrently (default: one at a time).')
 @click.option('--local', default=False, is_flag=True,
               required=False,
               help='Run the workflow locally without calling Amazon SWF.')
@@ -166,7 +154,9 @@ def start_workflow(workflow,
                    decision_tasks_timeout,
                    input,
                    input_file,
-                   local):
+                   local,
+                   local_workers=None,
+                   local_threads=False):
     workflow_class = get_workflow(workflow)
 
     wf_input = get_or_load_input(input_file, input)
@@ -174,7 +164,11 @@ def start_workflow(workflow,
     if local:
         from .local import Executor
 
-        Executor(workflow_class).run(wf_input)
+        Executor(
+            workflow_class,
+            nb_workers=local_workers,
+            use_threads=local_threads,
+        ).run(wf_input)
 
         return
 
@@ -236,6 +230,23 @@ def restart_workflow(domain, workflow_id, run_id):
     ))
 
 
+@click.argument('run_id', required=False)
+@click.argument('workflow_id')
+@click.argument('domain',
+                envvar='SWF_DOMAIN',
+                )
+@cli.command(
+    'workflow.gc',
+    help='Delete the offloaded payloads of the closed execution WORKFLOW_ID and optionally RUN_ID.')
+def gc_workflow(domain, workflow_id, run_id):
+    ex = helpers.get_workflow_execution(domain, workflow_id, run_id)
+    if ex.status != ex.STATUS_CLOSED:
+        logger.error('execution {} {} is still open, exiting.'.format(ex.workflow_id, ex.run_id))
+        sys.exit(1)
+    count = payloads.collect(ex.workflow_id, ex.run_id)
+    print('deleted {} payloads of {} {}'.format(count, ex.workflow_id, ex.run_id))
+
+
 def with_format(ctx):
     return pretty.formatted(
         with_header=ctx.parent.params['header'],
@@ -353,6 +364,26 @@ def task_info(ctx, domain, workflow_id, task_id, details):
     print(with_format(ctx)(helpers.get_task)(domain, workflow_id, task_id, details))
 
 
+@click.option('--gc-freeze',
+              is_flag=True,
+              default=False,
+              help='Call gc.freeze() before forking so children share more memory (Python 3.7+).')
+@click.option('--preload',
+              type=comma_separated_list,
+              required=False,
+              help='Comma-separated modules to import before forking.')
+@click.option('--cpu-affinity',
+              is_flag=True,
+              default=False,
+              help='Pin each process, and the processes it starts, to one of the available CPUs.')
+@click.option('--max-processes',
+              type=int,
+              required=False,
+              help='Scale the processes up to this number after the task list backlog.')
+@click.option('--min-processes',
+              type=int,
+              required=False,
+              help='With --max-processes, minimum number of processes (default: 1).')
 @click.option('--nb-processes', '-N', type=int)
 @click.option('--log-level', '-l')
 @click.option('--task-list')
@@ -362,7 +393,8 @@ def task_info(ctx, domain, workflow_id, task_id, details):
               help='SWF Domain')
 @click.argument('workflows', nargs=-1, required=True)
 @cli.command('decider.start', help='Start a decider process to manage workflow executions.')
-def start_decider(workflows, domain, task_list, log_level, nb_processes):
+def start_decider(workflows, domain, task_list, log_level, nb_processes, preload, gc_freeze,
+                  min_processes, max_processes, cpu_affinity):
     if log_level:
         logger.warning(
             "Deprecated: --log-level will be removed, use LOG_LEVEL environment variable instead"
@@ -373,14 +405,71 @@ def start_decider(workflows, domain, task_list, log_level, nb_processes):
         task_list,
         None,
         nb_processes,
+        preload_modules=preload,
+        gc_freeze=gc_freeze,
+        min_processes=min_processes,
+        max_processes=max_processes,
+        cpu_affinity=cpu_affinity,
     )
 
 
+@click.option('--gc-freeze',
+              is_flag=True,
+              default=False,
+              help='Call gc.freeze() before forking so children share more memory (Python 3.7+).')
+@click.option('--preload',
+              type=comma_separated_list,
+              required=False,
+              help='Comma-separated modules to import before forking.')
+@click.option('--max-children-memory',
+              type=int,
+              required=False,
+              help='Delay polling while the tasks of a process use more memory (MB).')
+@click.option('--min-available-memory',
+              type=int,
+              required=False,
+              help='Delay polling while the host has less available memory (MB).')
+@click.option('--max-load',
+              type=float,
+              required=False,
+              help='Delay polling while the 1-minute load average per CPU is higher.')
+@click.option('--nb-pollers',
+              type=int,
+              default=1,
+              help='Threads polling tasks in each process, with --nb-executors.')
+@click.option('--nb-executors',
+              type=int,
+              default=1,
+              help='Tasks processed at the same time by each process.')
+@click.option('--max-memory-per-child',
+              type=int,
+              required=False,
+              help='With --prefork, resident memory in MB above which a process is replaced.')
+@click.option('--max-tasks-per-child',
+              type=int,
+              required=False,
+              help='With --prefork, number of tasks run by a process before it is replaced.')
+@click.option('--prefork',
+              is_flag=True,
+              default=False,
+              help='Run the tasks in warm processes instead of one new process per task.')
 @click.option('--heartbeat',
               type=int,
               required=False,
               default=60,
               help='Heartbeat interval in seconds (0 to disable heartbeating).')
+@click.option('--cpu-affinity',
+              is_flag=True,
+              default=False,
+              help='Pin each process, and the processes it starts, to one of the available CPUs.')
+@click.option('--max-processes',
+              type=int,
+              required=False,
+              help='Scale the processes up to this number after the task list backlog.')
+@click.option('--min-processes',
+              type=int,
+              required=False,
+              help='With --max-processes, minimum number of processes (default: 1).')
 @click.option('--nb-processes', '-N', type=int)
 @click.option('--log-level', '-l')
 @click.option('--task-list',
@@ -393,7 +482,10 @@ def start_decider(workflows, domain, task_list, log_level, nb_processes):
 @click.argument('unused_workflow',
                 required=False)
 @cli.command('worker.start', help='Start a worker process to handle activity tasks.')
-def start_worker(unused_workflow, domain, task_list, log_level, nb_processes, heartbeat):
+def start_worker(unused_workflow, domain, task_list, log_level, nb_processes, heartbeat,
+                 prefork, max_tasks_per_child, max_memory_per_child, preload, gc_freeze,
+                 nb_executors, nb_pollers, min_processes, max_processes, cpu_affinity,
+                 max_load, min_available_memory, max_children_memory):
     if log_level:
         logger.warning(
             "Deprecated: --log-level will be removed, use LOG_LEVEL environment variable instead"
@@ -407,6 +499,19 @@ def start_worker(unused_workflow, domain, task_list, log_level, nb_processes, he
         task_list,
         nb_processes,
         heartbeat,
+        prefork=prefork,
+        max_tasks_per_child=max_tasks_per_child,
+        max_memory_per_child=max_memory_per_child,
+        preload_modules=preload,
+        gc_freeze=gc_freeze,
+        nb_executors=nb_executors,
+        nb_pollers=nb_pollers,
+        min_processes=min_processes,
+        max_processes=max_processes,
+        cpu_affinity=cpu_affinity,
+        max_load=max_load,
+        min_available_memory=min_available_memory,
+        max_children_memory=max_children_memory,
     )
 
 
@@ -493,8 +598,6 @@ def standalone(context,
     with a single main process.
 
     """
-    disable_boto_connection_pooling()
-
     if force_activities and not repair:
         raise ValueError(
             "You should only use --force-activities with --repair."
@@ -522,70 +625,79 @@ def standalone(context,
         # get the previous execution input if none passed
         if not input and not input_file:
             wf_input = previous_history.events[0].input
+        # the deciders share an index of the completed tasks
+        repair_directory = tempfile.mkdtemp(prefix='simpleflow-repair-')
+        repair_index = RepairIndex.build(
+            previous_history, os.path.join(repair_directory, 'repair.sqlite'))
     else:
-        previous_history = None
-
-    task_list = create_unique_task_list(workflow_id)
-    logger.info('using task list {}'.format(task_list))
-    decider_proc = multiprocessing.Process(
-        target=decider.command.start,
-        args=(
-            [workflow],
-            domain,
-            task_list,
-        ),
-        kwargs={
-            'nb_processes': nb_deciders,
-            'repair_with': previous_history,
-            'force_activities': force_activities,
-            'is_standalone': True,
-        },
-    )
-    decider_proc.start()
+        repair_directory = None
+        repair_index = None
 
-    worker_proc = multiprocessing.Process(
-        target=worker.command.start,
-        args=(
-            domain,
-            task_list,
-        ),
-        kwargs={
-            'nb_processes': nb_workers,
-            'heartbeat': heartbeat,
-        },
-    )
-    worker_proc.start()
+    try:
+        task_list = create_unique_task_list(workflow_id)
+        logger.info('using task list {}'.format(task_list))
+        decider_proc = multiprocessing.Process(
+            target=decider.command.start,
+            args=(
+                [workflow],
+                domain,
+                task_list,
+            ),
+            kwargs={
+                'nb_processes': nb_deciders,
+                'repair_with': repair_index,
+                'force_activities': force_activities,
+                'is_standalone': True,
+            },
+        )
+        decider_proc.start()
+
+        worker_proc = multiprocessing.Process(
+            target=worker.command.start,
+            args=(
+                domain,
+                task_list,
+            ),
+            kwargs={
+                'nb_processes': nb_workers,
+                'heartbeat': heartbeat,
+            },
+        )
+        worker_proc.start()
 
-    print('starting workflow {}'.format(workflow), file=sys.stderr)
-    ex = start_workflow.callback(
-        workflow,
-        domain,
-        workflow_id,
-        task_list,
-        execution_timeout,
-        tags,
-        decision_tasks_timeout,
-        json_dumps(wf_input),
-        None,
-        local=False,
-    )
-    while True:
-        time.sleep(2)
-        ex = helpers.get_workflow_execution(
+        print('starting workflow {}'.format(workflow), file=sys.stderr)
+        ex = start_workflow.callback(
+            workflow,
             domain,
-            ex.workflow_id,
-            ex.run_id,
+            workflow_id,
+            task_list,
+            execution_timeout,
+            tags,
+            decision_tasks_timeout,
+            json_dumps(wf_input),
+            None,
+            local=False,
         )
-        if display_status:
-            print('status: {}'.format(ex.status), file=sys.stderr)
-        if ex.status == ex.STATUS_CLOSED:
-            print('execution {} finished'.format(ex.workflow_id), file=sys.stderr)
-            break
-
-    os.kill(worker_proc.pid, signal.SIGTERM)
-    worker_proc.join()
-    os.kill(decider_proc.pid, signal.SIGTERM)
-    decider_proc.join()
+        while True:
+            time.sleep(2)
+            ex = helpers.get_workflow_execution(
+                domain,
+                ex.workflow_id,
+                ex.run_id,
+            )
+            if display_status:
+                print('status: {}'.format(ex.status), file=sys.stderr)
+            if ex.status == ex.STATUS_CLOSED:
+                print('execution {} finished'.format(ex.workflow_id), file=sys.stderr)
+                break
+
+        os.kill(worker_proc.pid, signal.SIGTERM)
+        worker_proc.join()
+        os.kill(decider_proc.pid, signal.SIGTERM)
+        decider_proc.join()
+    finally:
+        if repair_directory:
+            shutil.rmtree(repair_directory, ignore_errors=True)
 
 
 @click.option('--domain',
@@ -648,3 +760,136 @@ def activity_rerun(domain,
     # finally replay the function with the correct arguments
     result = func(*args, **kwargs)
     logger.info("Result (JSON): {}".format(json_dumps(result, compact=False)))
+
+
+@click.option('--output', '-o',
+              required=True,
+              help='File to write; gzipped if its name ends with .gz.')
+@click.argument('run_id', required=False)
+@click.argument('workflow_id')
+@click.argument('domain',
+                envvar='SWF_DOMAIN',
+                )
+@cli.command('workflow.history', help='Record the history of a workflow execution to replay it offline.')
+def save_workflow_history(domain, workflow_id, run_id, output):
+    from simpleflow.swf import replay
+
+    execution = helpers.get_workflow_execution(domain, workflow_id, run_id)
+    replay.save_history(output, execution)
+
+
+@click.option('--output',
+              type=click.Path(),
+              help='Write the measures to this JSON file.')
+@click.option('--allocations',
+              type=int, default=0,
+              help='Show the N lines holding the most memory after a replay.')
+@click.option('--profile',
+              type=int, default=0,
+              help='Show the N functions with the most cumulative CPU time.')
+@click.option('--decisions/--no-decisions',
+              default=False,
+              help='Show the decisions of each replay.')
+@click.option('--repeat',
+              type=int, default=1,
+              help='Replays of each history; the best times are kept.')
+@click.option('--workflow',
+              required=False,
+              help='Workflow class; defaults to the name of the workflow type.')
+@click.argument('paths', nargs=-1, required=True)
+@cli.command('replay', help='Replay recorded histories, or directories of them, with the current workflow code.')
+@click.pass_context
+def replay_histories(ctx, paths, workflow, repeat, decisions, profile, allocations, output):
+    """
+    Histories are recorded with ``simpleflow workflow.history``; a replay
+    makes no SWF request.
+
+    """
+    import cProfile
+    import pstats
+    from simpleflow.swf import replay
+
+    profiler = cProfile.Profile() if profile else None
+    results = []
+    for path in replay.find_histories(paths):
+        logger.info('replaying {}'.format(path))
+        results.append(replay.replay(path, workflow, repeat=repeat, profiler=profiler,
+                                     trace_memory=bool(allocations)))
+
+    def replay_table():
+        header = ('history', 'events', 'decisions', 'wall_time', 'cpu_time', 'peak_memory')
+        rows = [(
+            result.path,
+            result.nb_events,
+            len(result.decisions),
+            result.wall_time,
+            result.cpu_time,
+            result.peak_memory,
+        ) for result in results]
+        return header, rows
+
+    print(with_format(ctx)(replay_table)())
+    print('total: {} histories, wall time {:.3f}s, CPU time {:.3f}s'.format(
+        len(results),
+        sum(result.wall_time for result in results),
+        sum(result.cpu_time for result in results),
+    ))
+
+    if decisions:
+        for result in results:
+            print('\n{}:'.format(result.path))
+            print(json_dumps(result.decisions, pretty=True))
+    if profiler is not None:
+        print('')
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(profile)
+    if allocations:
+        print('\n{:>12} {:>10}  {}'.format('size (KiB)', 'blocks', 'line'))
+        for location, size, count in replay.top_allocations(results, allocations):
+            print('{:>12.1f} {:>10}  {}'.format(size / 1024.0, count, location))
+
+    if output:
+        with open(output, 'w') as fp:
+            fp.write(json_dumps([{
+                'history': result.path,
+                'workflow_id': result.execution.workflow_id,
+                'run_id': result.execution.run_id,
+                'events': result.nb_events,
+                'decisions': result.decision_types,
+                'wall_time': result.wall_time,
+                'cpu_time': result.cpu_time,
+                'peak_memory': result.peak_memory,
+            } for result in results], pretty=True))
+
+
+@click.option('--poll-timeout',
+              type=float, default=60,
+              help='Seconds a poll waits for a task.')
+@click.option('--register-domain', '-d',
+              multiple=True,
+              help='Register this domain if needed; may be repeated.')
+@click.option('--port',
+              type=int, default=8999,
+              help='Port to listen on.')
+@click.option('--host',
+              default='127.0.0.1',
+              help='Address to listen on.')
+@click.argument('database')
+@cli.command('swf.serve', help='Serve a local SWF-compatible engine on the SQLite DATABASE.')
+def swf_serve(database, host, port, register_domain, poll_timeout):
+    """
+    The deciders and workers use it with SWF_BACKEND=http://HOST:PORT, or
+    use the database directly with SWF_BACKEND=sqlite:///path/to/DATABASE.
+
+    """
+    from boto.swf.exceptions import SWFDomainAlreadyExistsError
+    from swf import backends
+    from swf.backends.server import serve
+
+    engine = backends.Engine(database, poll_timeout=poll_timeout)
+    connection = backends.Layer1(engine)
+    for domain in register_domain:
+        try:
+            connection.register_domain(domain, '30')
+        except SWFDomainAlreadyExistsError:
+            pass
+    serve(engine, host, port)
@@ -3,12 +3,11 @@ import re
 import sys
 import subprocess
 import functools
-import json
 
 from builtins import map
 
 from future.utils import iteritems
-from simpleflow import compat
+from simpleflow import codec, compat
 
 try:
     import cPickle as pickle
@@ -17,7 +16,6 @@ except ImportError:
 import base64
 import logging
 
-from simpleflow.utils import json_dumps
 
 __all__ = ['program', 'python']
 
@@ -103,7 +101,7 @@ def check_keyword_arguments(argspec, kwargs):
 
 
 def format_arguments_json(*args, **kwargs):
-    return json_dumps({
+    return codec.dumps({
         'args': args,
         'kwargs': kwargs,
     })
@@ -197,7 +195,7 @@ def python(interpreter='python'):
                 if not compat.PY2:
                     output = output.decode('utf-8', errors='replace')
                 last_line = output.rstrip().rsplit('\n', 1)[-1]
-                d = json.loads(last_line)
+                d = codec.loads(last_line)
                 return d
             except BaseException as ex:
                 logger.warning('Exception in python.execute: {}'.format(ex))
@@ -359,7 +357,7 @@ if __name__ == '__main__':
 
     funcname = cmd_arguments.funcname
     try:
-        arguments = json.loads(cmd_arguments.funcargs)
+        arguments = codec.loads(cmd_arguments.funcargs)
     except:
         raise ValueError('cannot load arguments from {}'.format(
             cmd_arguments.funcargs))
@@ -386,4 +384,4 @@ if __name__ == '__main__':
         print(encoded_err)
         sys.exit(1)
     else:
-        print(json_dumps(result))
+        print(codec.dumps(result))
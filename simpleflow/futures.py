@@ -36,21 +36,17 @@ _STATE_TO_DESCRIPTION_MAP = {
 
 def get_result_or_raise(future):
     """Returns the ``result`` of *future* if it is available, otherwise
-    raise."""
-    if future.state == PENDING:
-        raise exceptions.ExecutionBlocked()
+    raise (or block, see :meth:`Future.wait`)."""
     return future.result
 
 
 def wait(*fs):
     """Returns a list of the results of futures if there are available.
 
-    Raises a ``exceptions.ExecutionBlocked`` otherwise.
+    Raises a ``exceptions.ExecutionBlocked`` otherwise, or blocks until they
+    are with an executor running the tasks in the background.
 
     """
-    if any(future.state == PENDING for future in fs):
-        raise exceptions.ExecutionBlocked()
-
     return [future.result for future in fs]
 
 
@@ -72,6 +68,14 @@ class Future(object):
             _STATE_TO_DESCRIPTION_MAP[self._state])
 
     def wait(self):
+        """Wait for the computation to finish.
+
+        The SWF executor cannot wait: it raises
+        cls::`exceptions.ExecutionBlocked` and the workflow is replayed once
+        the task finished. An executor running tasks in the background
+        blocks instead.
+
+        """
         raise exceptions.ExecutionBlocked
 
     @property
@@ -79,7 +83,7 @@ class Future(object):
         """Raise a cls::`exceptions.ExecutionBlocked` when the result is not
         available."""
         if self._state != FINISHED:
-            return self.wait()
+            self.wait()
 
         return self._result
 
@@ -111,7 +115,7 @@ class Future(object):
 
         """
         if self._state != FINISHED:
-            return self.wait()
+            self.wait()
 
         return self._exception
 
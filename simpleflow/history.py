@@ -21,8 +21,12 @@ class History(object):
     :type _external_workflows_canceling: collections.OrderedDict[str, dict[str, Any]]
     :ivar _signals: activity events
     :type _signals: collections.OrderedDict[str, dict[str, Any]]
+    :ivar _markers: recorded markers, by name
+    :type _markers: collections.OrderedDict[str, list[dict[str, Any]]]
     :ivar _tasks: ordered list of tasks/etc
     :type _tasks: list[dict[str, Any]]
+    :ivar _last_event_id: id of the last parsed event
+    :type _last_event_id: int
     """
 
     def __init__(self, history):
@@ -33,7 +37,9 @@ class History(object):
         self._external_workflows_canceling = collections.OrderedDict()
         self._signals = collections.OrderedDict()
         self._signaled_workflows = collections.defaultdict(list)
+        self._markers = collections.OrderedDict()
         self._tasks = []
+        self._last_event_id = 0
 
     @property
     def activities(self):
@@ -75,6 +81,14 @@ class History(object):
         """
         return self._signaled_workflows
 
+    @property
+    def markers(self):
+        """
+        :return: recorded markers, by name
+        :rtype: collections.OrderedDict[str, list[dict[str, Any]]]
+        """
+        return self._markers
+
     @property
     def tasks(self):
         return self._tasks
@@ -88,6 +102,22 @@ class History(object):
         """
         return self._history.events
 
+    @property
+    def raw_history(self):
+        """
+        :return: the history being parsed
+        :rtype: swf.models.history.History
+        """
+        return self._history
+
+    @property
+    def last_event_id(self):
+        """
+        :return: id of the last parsed event, 0 if nothing was parsed yet
+        :rtype: int
+        """
+        return self._last_event_id
+
     def parse_activity_event(self, events, event):
         """
         Aggregate all the attributes of an activity in a single entry.
@@ -422,21 +452,196 @@ class History(object):
             workflow['workflow_id'] = event.workflow_execution['workflowId']
             workflow['cancel_requested_timestamp'] = event.timestamp
 
+    def parse_marker_event(self, events, event):
+        """
+        Parse a marker event.
+        :param events:
+        :param event:
+        """
+        if event.state == 'recorded':
+            marker = {
+                'type': 'marker',
+                'name': event.marker_name,
+                'state': event.state,
+                'details': getattr(event, 'details', None),
+                'event_id': event.id,
+                'timestamp': event.timestamp,
+            }
+            self._markers.setdefault(event.marker_name, []).append(marker)
+
     TYPE_TO_PARSER = {
         'ActivityTask': parse_activity_event,
         'ChildWorkflowExecution': parse_child_workflow_event,
         'WorkflowExecution': parse_workflow_event,
         'ExternalWorkflowExecution': parse_external_workflow_event,
+        'Marker': parse_marker_event,
     }
 
     def parse(self):
         """
         Parse the events.
         Update the corresponding statuses.
+
+        Only the events appended since the previous call are parsed, so
+        calling this method several times is cheap and doesn't alter the
+        result.
         """
 
         events = self.events
-        for event in events:
+        for index in range(self._last_event_id, len(events)):
+            event = events[index]
             parser = self.TYPE_TO_PARSER.get(event.type)
             if parser:
                 parser(self, events, event)
+        self._last_event_id = len(events)
+
+    def update(self, history):
+        """
+        Replace the raw history by *history*, a more recent version of it
+        (SWF histories are append-only), and parse the new events.
+
+        :param history: raw history starting with the events already parsed
+        :type history: swf.models.history.History
+        :raise: ValueError if *history* doesn't extend the parsed events
+        """
+        last_event_id = self._last_event_id
+        if len(history) < last_event_id:
+            raise ValueError('history has {} events, {} already parsed'.format(
+                len(history), last_event_id))
+        if last_event_id:
+            for index in (0, last_event_id - 1):
+                if not same_event(history.events[index], self.events[index]):
+                    raise ValueError('event {} differs from the parsed one'.format(
+                        index + 1))
+        self._history = history
+        self.parse()
+
+
+def same_event(event, other):
+    """
+    Check whether two events of the same execution are equivalent.
+
+    :type event: swf.models.event.Event
+    :type other: swf.models.event.Event
+    :rtype: bool
+    """
+    if event is other:
+        return True
+    return (event.id == other.id and
+            event.type == other.type and
+            event.state == other.state and
+            event.raw.get('eventTimestamp') == other.raw.get('eventTimestamp'))
+
+
+class HistoryCache(object):
+    """
+    Bounded LRU cache of parsed histories, keyed by workflow execution run id.
+
+    Each entry remembers the id of the last event it parsed: when a decision
+    task brings the same execution back, only the events appended since then
+    are parsed. Anything unexpected falls back to a full parse.
+
+    :ivar max_size: maximum number of cached histories
+    :type max_size: int
+    :ivar hits: number of histories reused
+    :type hits: int
+    :ivar misses: number of histories parsed from scratch
+    :type misses: int
+    :ivar fallbacks: number of cached histories that couldn't be reused
+    :type fallbacks: int
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._histories = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def __len__(self):
+        return len(self._histories)
+
+    def __contains__(self, run_id):
+        return run_id in self._histories
+
+    def get(self, run_id):
+        """
+        Get the cached history of an execution and mark it as recently used.
+
+        :param run_id:
+        :type run_id: str
+        :rtype: Optional[History]
+        """
+        history = self._histories.pop(run_id, None)
+        if history is not None:
+            self._histories[run_id] = history
+        return history
+
+    def put(self, run_id, history):
+        """
+        Cache a parsed history, evicting the least recently used ones.
+
+        :param run_id:
+        :type run_id: str
+        :param history:
+        :type history: History
+        """
+        self._histories.pop(run_id, None)
+        if self.max_size <= 0:
+            return
+        self._histories[run_id] = history
+        while len(self._histories) > self.max_size:
+            self._histories.popitem(last=False)
+
+    def pop(self, run_id):
+        """
+        Forget an execution, typically when it is closed.
+
+        :param run_id:
+        :type run_id: str
+        :rtype: Optional[History]
+        """
+        return self._histories.pop(run_id, None)
+
+    def parse(self, run_id, raw_history):
+        """
+        Get the parsed version of *raw_history*, reusing the cached one if any.
+
+        :param run_id:
+        :type run_id: str
+        :param raw_history:
+        :type raw_history: swf.models.history.History
+        :rtype: History
+        """
+        history = self.get(run_id)
+        if history is not None:
+            try:
+                history.update(raw_history)
+            except Exception as err:
+                logger.warning('history cache: cannot reuse history of run_id={}, '
+                               'parsing it again: {}'.format(run_id, err))
+                self.fallbacks += 1
+                history = None
+            else:
+                self.hits += 1
+
+        if history is None:
+            self.misses += 1
+            history = History(raw_history)
+            history.parse()
+
+        self.put(run_id, history)
+        return history
+
+    @property
+    def stats(self):
+        """
+        :return: cache counters
+        :rtype: dict[str, int]
+        """
+        return {
+            'size': len(self._histories),
+            'hits': self.hits,
+            'misses': self.misses,
+            'fallbacks': self.fallbacks,
+        }
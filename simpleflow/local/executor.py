@@ -1,6 +1,11 @@
 import logging
+import multiprocessing
+import pickle
+import threading
+from multiprocessing.pool import ThreadPool
 
 from simpleflow import (
+    compat,
     exceptions,
     executor,
     futures,
@@ -16,17 +21,130 @@ from simpleflow.history import History
 
 logger = logging.getLogger(__name__)
 
+# Seconds between two checks of the pool processes while waiting for a
+# result.
+WORKER_CHECK_INTERVAL = 1.0
+
+
+class Future(futures.Future):
+    """
+    Future of an activity running in the background. Waiting for its result
+    blocks until the activity finishes.
+    """
+    def __init__(self, check=None):
+        """
+        :param check: called periodically while waiting for the result
+        :type check: Optional[() -> None]
+        """
+        super(Future, self).__init__()
+        self._done = threading.Event()
+        self._check = check
+        self._task_failed = None
+        self._task_failed_raised = False
+
+    def __deepcopy__(self, memo):
+        # Tasks copy their arguments; a future is shared, not copied
+        return self
+
+    def wait(self):
+        while not self._done.wait(WORKER_CHECK_INTERVAL):
+            if self._check is not None:
+                self._check()
+
+    @property
+    def result(self):
+        self.wait()
+        if self._task_failed is not None:
+            self._task_failed_raised = True
+            raise self._task_failed
+        return self._result
+
+    def set_finished(self, result):
+        super(Future, self).set_finished(result)
+        self._done.set()
+
+    def set_exception(self, exception, task_failed=None):
+        """
+        :param exception:
+        :type exception: Exception
+        :param task_failed: raised when getting the result
+        :type task_failed: Optional[exceptions.TaskFailed]
+        """
+        self._task_failed = task_failed
+        super(Future, self).set_exception(exception)
+        self._done.set()
+
+
+def _picklable(err):
+    try:
+        pickle.dumps(err)
+    except Exception:
+        return Exception(repr(err))
+    return err
+
+
+def execute_task(task):
+    """
+    Execute a task, in a thread.
+
+    :type task: simpleflow.task.Task
+    :return: whether the task succeeded, its result or exception
+    :rtype: (bool, Any)
+    """
+    try:
+        return True, task.execute()
+    except Exception as err:
+        return False, err
+
+
+def execute_activity(name, args, kwargs, context):
+    """
+    Execute an activity in a pool process. Like an activity worker, the
+    activity is looked up by name.
+
+    :return: whether the activity succeeded, its result or exception
+    :rtype: (bool, Any)
+    """
+    from simpleflow.swf.process.worker.dispatch import dynamic_dispatcher
+
+    try:
+        activity = dynamic_dispatcher.Dispatcher.dispatch_activity(name)
+        return True, ActivityTask(activity, *args, context=context, **kwargs).execute()
+    except Exception as err:
+        return False, _picklable(err)
+
 
 class Executor(executor.Executor):
     """
-    Executes all tasks synchronously in a single local process.
+    Executes all tasks in a single local process: synchronously by default,
+    or concurrently in a pool of processes or threads.
+
+    With a pool, submit() returns pending futures and the workflow only
+    blocks when it needs a result. Child workflows, signals and other
+    submittables still run inline.
 
     """
-    def __init__(self, workflow_class):
+    def __init__(self, workflow_class, nb_workers=None, use_threads=False):
+        """
+        :param workflow_class:
+        :type workflow_class: type
+        :param nb_workers: size of the pool running the activities; None
+                           to run them synchronously
+        :type nb_workers: Optional[int]
+        :param use_threads: use threads instead of processes. Processes
+                            import the activities by name, like workers.
+        :type use_threads: bool
+        """
         super(Executor, self).__init__(workflow_class)
         self.update_workflow_class()
         self.nb_activities = 0
         self.signals_sent = set()
+        self.nb_workers = nb_workers
+        self.use_threads = use_threads
+        self._pool = None
+        self._workers = []
+        self._pending = []
+        self._history_lock = threading.Lock()
 
     def update_workflow_class(self):
         """
@@ -78,6 +196,9 @@ class Executor(executor.Executor):
             raise TypeError('invalid type {} for {}'.format(
                 type(func), func))
 
+        if self._pool is not None and isinstance(task, ActivityTask):
+            return self.submit_to_pool(task, func, context, args, kwargs)
+
         try:
             future._result = task.execute()
             state = 'completed'
@@ -91,15 +212,151 @@ class Executor(executor.Executor):
         finally:
             future._state = futures.FINISHED
 
-        self._history.add_activity_task(
-            func,
-            decision_id=None,
-            last_state=state,
-            activity_id=context["activity_id"],
-            input={'args': args, 'kwargs': kwargs},
-            result=future._result)
+        with self._history_lock:
+            self._history.add_activity_task(
+                func,
+                decision_id=None,
+                last_state=state,
+                activity_id=context["activity_id"],
+                input={'args': args, 'kwargs': kwargs},
+                result=future._result)
+        return future
+
+    def submit_to_pool(self, task, activity, context, args, kwargs):
+        """
+        Run an activity task in the pool.
+
+        The ActivityTaskScheduled event is added now, the started and closing
+        events when the activity finishes, so that the history has the same
+        shape as a SWF one.
+
+        :type task: ActivityTask
+        :type activity: Activity
+        :type context: dict
+        :rtype: Future
+        """
+        check = None if self.use_threads else self.check_pool
+        future = Future(check)
+        future.set_running()
+        with self._history_lock:
+            self._history.add_activity_task_scheduled(
+                activity,
+                decision_id=None,
+                activity_id=context["activity_id"],
+                input={'args': args, 'kwargs': kwargs})
+            scheduled_id = self._history.last_id
+
+        def finish(succeeded, value):
+            with self._history_lock:
+                if future.finished:
+                    # Already failed as its worker was lost
+                    return
+                self._history.add_activity_task_started(scheduled=scheduled_id)
+                started_id = self._history.last_id
+                if succeeded:
+                    self._history.add_activity_task_completed(
+                        scheduled=scheduled_id,
+                        started=started_id,
+                        result=value)
+                else:
+                    self._history.add_activity_task_failed(
+                        scheduled=scheduled_id,
+                        started=started_id)
+                if succeeded:
+                    future.set_finished(value)
+                else:
+                    self._fail(future, activity, value)
+
+        def on_done(outcome):
+            # Runs in the result thread of the pool: the future must be
+            # finished whatever happens, else waiting for it blocks forever.
+            try:
+                finish(*outcome)
+            except Exception as err:
+                logger.exception('cannot record the outcome of {}'.format(activity.name))
+                with self._history_lock:
+                    if not future.finished:
+                        self._fail(future, activity, err)
+
+        def on_error(err):
+            # E.g. the result couldn't be pickled back from the pool process
+            on_done((False, err))
+
+        callbacks = {'callback': on_done}
+        if not compat.PY2:
+            callbacks['error_callback'] = on_error
+        if self.use_threads:
+            self._pool.apply_async(execute_task, (task,), **callbacks)
+        else:
+            self._pool.apply_async(
+                execute_activity,
+                (activity.name, task.args, task.kwargs, task.context),
+                **callbacks)
+        self._pending.append((future, activity))
         return future
 
+    @staticmethod
+    def _fail(future, activity, exception):
+        logger.info('rescuing exception: {}'.format(exception))
+        task_failed = None
+        if activity.raises_on_failure:
+            message = exception.args[0] if exception.args else ''
+            task_failed = exceptions.TaskFailed(activity.name, message)
+        future.set_exception(exception, task_failed)
+
+    def check_pool(self):
+        """
+        Fail the pending activities if a pool process died (killed, out of
+        memory, crashed...): the pool replaces it, but its task is lost and
+        would never finish. The next activities run in a new pool.
+        """
+        if not any(worker.exitcode is not None for worker in self._workers):
+            return
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            logger.error('a process of the pool died, failing the pending activities')
+            pool.terminate()
+        with self._history_lock:
+            for future, activity in self._pending:
+                if not future.finished:
+                    self._fail(future, activity, exceptions.TaskTerminated(
+                        'a process of the pool died'))
+        self.start_pool()
+
+    def start_pool(self):
+        if self.nb_workers is None:
+            return
+        if self.use_threads:
+            self._pool = ThreadPool(self.nb_workers)
+        else:
+            children = set(multiprocessing.active_children())
+            self._pool = multiprocessing.Pool(self.nb_workers)
+            # The processes of the pool are only replaced if one dies
+            self._workers = [
+                process for process in multiprocessing.active_children()
+                if process not in children
+            ]
+
+    def stop_pool(self):
+        """
+        Wait for the activities still running, then stop the pool.
+
+        :raise exceptions.TaskFailed: if an activity that raises on failure
+                                      failed and the workflow didn't get
+                                      the exception yet
+        """
+        # A task lost with a process of the pool would block the pool
+        # forever: waiting for the futures fails them in this case.
+        for future, _ in self._pending:
+            future.wait()
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.close()
+            pool.join()
+        for future, _ in self._pending:
+            if future._task_failed is not None and not future._task_failed_raised:
+                raise future._task_failed
+
     def run(self, input=None):
         if input is None:
             input = {}
@@ -110,7 +367,15 @@ class Executor(executor.Executor):
         self.initialize_history(input)
 
         self.before_replay()
-        result = self.run_workflow(*args, **kwargs)
+        self.start_pool()
+        try:
+            result = self.run_workflow(*args, **kwargs)
+        except Exception:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool = None
+            raise
+        self.stop_pool()
 
         # Hack: self._history must be available to the callback as a
         # simpleflow.history.History, not a swf.models.history.builder.History
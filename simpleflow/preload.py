@@ -0,0 +1,121 @@
+"""
+Preparation of a supervisor process before it forks its children.
+
+Modules listed with ``--preload`` are imported and the functions decorated
+with :func:`on_worker_init` are run in the supervisor, so that deciders,
+workers and activity processes inherit them instead of paying the import and
+initialization cost again. With ``gc.freeze()`` (Python 3.7+), the objects
+created so far are moved out of the garbage collector's reach, so that the
+children don't touch, hence copy, the memory pages holding them.
+"""
+from __future__ import absolute_import
+
+import gc
+import importlib
+import logging
+import time
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+_initializers = []
+_pending = []  # initializers not called yet
+_initialized = False
+
+
+def on_worker_init(func):
+    """
+    Register a function to call once per process before deciders and
+    workers start.
+
+    Functions registered after the initializers have run, e.g. by a module
+    imported in an activity process, are called immediately.
+
+    :param func:
+    :type func: callable
+    :return: the function
+    :rtype: callable
+    """
+    _initializers.append(func)
+    if _initialized:
+        func()
+    else:
+        _pending.append(func)
+    return func
+
+
+def preload_modules(modules):
+    """
+    :param modules: names of the modules to import
+    :type modules: list[str]
+    """
+    for name in modules or ():
+        logger.debug('preloading module {}'.format(name))
+        importlib.import_module(name)
+
+
+def run_initializers():
+    """
+    Call the functions registered with :func:`on_worker_init` that have not
+    been called yet.
+
+    :return: number of initializers called
+    :rtype: int
+    """
+    global _initialized
+    _initialized = True
+    count = 0
+    while _pending:
+        func = _pending.pop(0)
+        logger.debug('running initializer {}'.format(getattr(func, '__name__', func)))
+        func()
+        count += 1
+    return count
+
+
+def freeze_gc():
+    """
+    Move the existing objects to the permanent generation of the garbage
+    collector.
+
+    :return: whether gc.freeze() is available
+    :rtype: bool
+    """
+    freeze = getattr(gc, 'freeze', None)
+    if freeze is None:
+        logger.warning('gc.freeze() requires Python 3.7+, ignored')
+        return False
+    gc.collect()
+    freeze()
+    return True
+
+
+def prepare(modules=None):
+    """
+    Preload the modules and run the initializers, logging the time spent
+    and the memory used.
+
+    :param modules: names of the modules to import
+    :type modules: Optional[list[str]]
+    :return: duration in seconds, RSS before and after in bytes
+    :rtype: dict[str, float|int]
+    """
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    start = time.time()
+
+    preload_modules(modules)
+    count = run_initializers()
+
+    stats = {
+        'duration': time.time() - start,
+        'rss_before': rss_before,
+        'rss_after': process.memory_info().rss,
+    }
+    logger.info('preloaded {} modules and ran {} initializers in {:.3f}s, '
+                'rss before={} after={}'.format(
+                    len(modules or ()), count, stats['duration'],
+                    stats['rss_before'], stats['rss_after']))
+    return stats
@@ -0,0 +1,166 @@
+from __future__ import absolute_import, division
+
+import logging
+import math
+import multiprocessing
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Idle ratio above which a child is removed when there is no backlog
+IDLE_RATIO_THRESHOLD = 0.5
+
+
+class LoadStats(object):
+    """
+    Time spent waiting for work (idle) and working (busy) by the children
+    of a supervisor. The counters live in shared memory: they are created
+    before forking, updated by the children and read by the supervisor.
+    """
+    def __init__(self):
+        self._times = multiprocessing.Array('d', 2)
+
+    def add(self, idle=0., busy=0.):
+        """
+        :param idle: seconds spent waiting for work
+        :type idle: float
+        :param busy: seconds spent working
+        :type busy: float
+        """
+        with self._times.get_lock():
+            self._times[0] += idle
+            self._times[1] += busy
+
+    def snapshot(self):
+        """
+        :return: total idle and busy times, in seconds
+        :rtype: (float, float)
+        """
+        with self._times.get_lock():
+            return self._times[0], self._times[1]
+
+
+def get_target(current, pending, idle_ratio, min_children, max_children):
+    """
+    Number of children needed for a backlog.
+
+    With pending tasks, there are enough children to keep the busy ones
+    busy and take every pending task at once: traffic is bursty and
+    waiting tasks may time out. Without backlog, an idle pool shrinks by
+    one child at a time.
+
+    :param current: current number of children
+    :type current: int
+    :param pending: tasks waiting in the task list
+    :type pending: int
+    :param idle_ratio: share of time the children spent waiting, if known
+    :type idle_ratio: Optional[float]
+    :param min_children:
+    :type min_children: int
+    :param max_children:
+    :type max_children: int
+    :rtype: int
+    """
+    if idle_ratio is None:
+        busy = current
+    else:
+        busy = int(math.ceil(current * (1. - idle_ratio)))
+    if pending > 0:
+        target = max(current, busy + pending)
+    elif idle_ratio is not None and idle_ratio > IDLE_RATIO_THRESHOLD:
+        target = current - 1
+    else:
+        target = current
+    return max(min_children, min(max_children, target))
+
+
+class Autoscaler(object):
+    """
+    Adjusts the number of children of a supervisor between *min_children*
+    and *max_children*, depending on the backlog of their task list and on
+    their idle ratio.
+
+    :ivar nb_pending: backlog at the last check
+    :type nb_pending: Optional[int]
+    :ivar idle_ratio: idle ratio since the previous check
+    :type idle_ratio: Optional[float]
+    """
+    def __init__(self, min_children, max_children, get_backlog, stats=None, interval=10):
+        """
+        :param min_children:
+        :type min_children: int
+        :param max_children:
+        :type max_children: int
+        :param get_backlog: returns the number of pending tasks
+        :type get_backlog: () -> int
+        :param stats: idle and busy times reported by the children
+        :type stats: Optional[LoadStats]
+        :param interval: seconds between two checks
+        :type interval: float
+        """
+        if min_children < 0 or max_children < max(1, min_children):
+            raise ValueError('invalid bounds: min_children={} max_children={}'.format(
+                min_children, max_children))
+        self.min_children = min_children
+        self.max_children = max_children
+        self.interval = interval
+        self._get_backlog = get_backlog
+        self._stats = stats
+        self._last_times = stats.snapshot() if stats is not None else None
+        self._next_check = time.time() + interval
+        self.nb_pending = None
+        self.idle_ratio = None
+
+    def clamp(self, nb_children):
+        """
+        :type nb_children: Optional[int]
+        :return: *nb_children* within the bounds, *min_children* if None
+        :rtype: int
+        """
+        if nb_children is None:
+            return max(1, self.min_children)
+        return max(self.min_children, min(self.max_children, nb_children))
+
+    def timeout(self):
+        """
+        :return: seconds until the next check
+        :rtype: float
+        """
+        return max(0., self._next_check - time.time())
+
+    def _get_idle_ratio(self):
+        if self._stats is None:
+            return None
+        times = self._stats.snapshot()
+        idle = times[0] - self._last_times[0]
+        busy = times[1] - self._last_times[1]
+        self._last_times = times
+        if idle + busy <= 0:
+            return None
+        return idle / (idle + busy)
+
+    def get_target(self, current):
+        """
+        Number of children to run, *current* before the next check or if
+        the backlog is unavailable.
+
+        :param current: current number of children
+        :type current: int
+        :rtype: int
+        """
+        if time.time() < self._next_check:
+            return current
+        self._next_check = time.time() + self.interval
+
+        self.idle_ratio = self._get_idle_ratio()
+        try:
+            self.nb_pending = self._get_backlog()
+        except Exception as err:
+            logger.warning('autoscaler: cannot get the backlog: {}'.format(err))
+            return current
+        target = get_target(current, self.nb_pending, self.idle_ratio,
+                            self.min_children, self.max_children)
+        logger.debug('autoscaler: children={} pending={} idle_ratio={} target={}'.format(
+            current, self.nb_pending, self.idle_ratio, target))
+        return target
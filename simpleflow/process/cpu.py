@@ -0,0 +1,158 @@
+"""
+CPUs available to the current process: affinity mask and cgroup (v1 or v2)
+CPU quota, as set by container runtimes.
+"""
+from __future__ import absolute_import, division
+
+import logging
+import math
+import multiprocessing
+import os
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+PROC_SELF_CGROUP = '/proc/self/cgroup'
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def get_cgroup_paths(proc_self_cgroup=PROC_SELF_CGROUP):
+    """
+    Cgroup of the current process by controller, as listed in
+    /proc/self/cgroup. The cgroup v2 hierarchy has an empty controller name.
+
+    :param proc_self_cgroup:
+    :type proc_self_cgroup: str
+    :rtype: dict[str, str]
+    """
+    paths = {}
+    for line in (_read(proc_self_cgroup) or '').splitlines():
+        parts = line.split(':', 2)
+        if len(parts) != 3:
+            continue
+        for controller in parts[1].split(','):
+            paths[controller] = parts[2]
+    return paths
+
+
+def _ancestors(root, path):
+    """
+    Directories from the cgroup of the process up to the mount point.
+    """
+    path = (path or '/').strip('/')
+    while path:
+        yield os.path.join(root, path)
+        path = os.path.dirname(path)
+    yield root
+
+
+def _read_quota_v2(directory):
+    # "max 100000" or "<quota> <period>"
+    content = _read(os.path.join(directory, 'cpu.max'))
+    if not content:
+        return None
+    values = content.split()
+    if values[0] == 'max':
+        return None
+    return int(values[0]) / int(values[1])
+
+
+def _read_quota_v1(directory):
+    quota = _read(os.path.join(directory, 'cpu.cfs_quota_us'))
+    period = _read(os.path.join(directory, 'cpu.cfs_period_us'))
+    if not quota or not period or int(quota) <= 0:
+        return None
+    return int(quota) / int(period)
+
+
+def get_cgroup_cpu_limit(cgroup_root=CGROUP_ROOT, proc_self_cgroup=PROC_SELF_CGROUP):
+    """
+    CPU quota of the cgroup of the current process and of its ancestors,
+    in CPUs: 1.5 means 150ms of CPU time every 100ms.
+
+    :param cgroup_root: mount point of the cgroup filesystem
+    :type cgroup_root: str
+    :param proc_self_cgroup:
+    :type proc_self_cgroup: str
+    :return: the smallest quota, None if unlimited or unknown
+    :rtype: Optional[float]
+    """
+    paths = get_cgroup_paths(proc_self_cgroup)
+    if os.path.exists(os.path.join(cgroup_root, 'cgroup.controllers')):
+        directories = _ancestors(cgroup_root, paths.get(''))
+        read_quota = _read_quota_v2
+    else:
+        for name in ('cpu', 'cpu,cpuacct', 'cpuacct,cpu'):
+            mount_point = os.path.join(cgroup_root, name)
+            if os.path.isdir(mount_point):
+                break
+        else:
+            return None
+        directories = _ancestors(mount_point, paths.get('cpu'))
+        read_quota = _read_quota_v1
+
+    limits = []
+    for directory in directories:
+        try:
+            quota = read_quota(directory)
+        except (ValueError, IndexError, ZeroDivisionError) as err:
+            logger.warning('cannot read the CPU quota in {}: {}'.format(directory, err))
+            continue
+        if quota is not None:
+            limits.append(quota)
+    return min(limits) if limits else None
+
+
+def get_available_cpus():
+    """
+    CPUs the current process may run on.
+
+    :return: CPU numbers, None if unknown
+    :rtype: Optional[list[int]]
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    try:
+        return sorted(psutil.Process().cpu_affinity())
+    except (AttributeError, NotImplementedError, psutil.Error):  # macOS
+        return None
+
+
+def cpu_count():
+    """
+    Number of CPUs the current process can use: those of its affinity mask,
+    within the cgroup quota. Unlike multiprocessing.cpu_count(), this is not
+    the number of CPUs of the host in a container.
+
+    :rtype: int
+    """
+    cpus = get_available_cpus()
+    count = len(cpus) if cpus else multiprocessing.cpu_count()
+    limit = get_cgroup_cpu_limit()
+    if limit is not None:
+        count = min(count, max(1, int(math.ceil(limit))))
+    return count
+
+
+def set_cpu_affinity(cpus):
+    """
+    Restrict the current process, and the processes it will start, to
+    some CPUs.
+
+    :param cpus: CPU numbers
+    :type cpus: list[int]
+    """
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    else:
+        psutil.Process().cpu_affinity(list(cpus))
@@ -1,13 +1,17 @@
+import errno
+import fcntl
 import functools
 import logging
 import multiprocessing
 import os
+import select
 import signal
 import time
 import types
 
 import psutil
 
+from . import cpu
 from .named_mixin import NamedMixin, with_state
 
 logger = logging.getLogger(__name__)
@@ -25,6 +29,62 @@ def reset_signal_handlers(func):
         signal.signal(signal.SIGTERM, signal.SIG_DFL)
         signal.signal(signal.SIGINT, signal.SIG_DFL)
         signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        try:
+            # Don't wake up the supervisor on our signals
+            signal.set_wakeup_fd(-1)
+        except ValueError:  # not the main thread
+            pass
+        return func(*args, **kwargs)
+
+    wrapped.__wrapped__ = func
+    return wrapped
+
+
+def log_startup(func, forked_at):
+    """
+    Decorator that logs the time a worker process took to start and its
+    memory when the decorated function is called. The unique set size (USS)
+    is the memory not shared with the supervisor.
+
+    :param forked_at: time the process was started
+    :type forked_at: float
+    """
+
+    @functools.wraps(func)
+    def wrapped(*args, **kwargs):
+        process = psutil.Process()
+        try:
+            memory = process.memory_full_info()
+            uss = memory.uss
+        except psutil.AccessDenied:
+            memory = process.memory_info()
+            uss = None
+        logger.info('process: started pid={} in {:.3f}s rss={} uss={}'.format(
+            process.pid, time.time() - forked_at, memory.rss, uss))
+        return func(*args, **kwargs)
+
+    wrapped.__wrapped__ = func
+    return wrapped
+
+
+def pin_to_cpu(func, cpu_number):
+    """
+    Decorator that restricts the process calling the decorated function to
+    one CPU. The processes it starts inherit the restriction.
+
+    :param cpu_number:
+    :type cpu_number: int
+    """
+
+    @functools.wraps(func)
+    def wrapped(*args, **kwargs):
+        try:
+            cpu.set_cpu_affinity([cpu_number])
+        except (AttributeError, OSError, psutil.Error) as err:
+            logger.warning('process: cannot pin pid={} to cpu={}: {}'.format(
+                os.getpid(), cpu_number, err))
+        else:
+            logger.debug('process: pinned pid={} to cpu={}'.format(os.getpid(), cpu_number))
         return func(*args, **kwargs)
 
     wrapped.__wrapped__ = func
@@ -44,12 +104,17 @@ class Supervisor(NamedMixin):
     style.
     """
 
-    def __init__(self, payload, arguments=None, nb_children=None, background=False):
+    def __init__(self, payload, arguments=None, nb_children=None, background=False,
+                 autoscaler=None, cpu_affinity=False):
         """
         Initializes a Manager() instance, with a payload (a callable that will be
         executed on worker processes), some arguments (a list or tuple of arguments
         to pass to the callable on workers), and nb_children (the expected number
-        of workers, which defaults to the number of CPU cores if not passed).
+        of workers, which defaults to the number of CPU cores available to the
+        process, within its cgroup quota, if not passed).
+
+        With an autoscaler, nb_children is only the initial number of workers:
+        it then follows the autoscaler's target.
 
         :param payload:
         :type payload: callable
@@ -59,12 +124,26 @@ class Supervisor(NamedMixin):
         :type nb_children: int
         :param background: wether the supervisor process should launch in background
         :type background: bool
+        :param autoscaler: adjusts the number of workers
+        :type autoscaler: Optional[simpleflow.process.autoscaler.Autoscaler]
+        :param cpu_affinity: pin each worker to one of the available CPUs
+        :type cpu_affinity: bool
         """
         # NB: below, compare explicitly to "None" there because nb_children could be 0
-        if nb_children is None:
-            self._nb_children = multiprocessing.cpu_count()
+        if autoscaler is not None:
+            self._nb_children = autoscaler.clamp(nb_children)
+        elif nb_children is None:
+            self._nb_children = cpu.cpu_count()
         else:
             self._nb_children = nb_children
+        self._autoscaler = autoscaler
+        self._cpus = None
+        if cpu_affinity:
+            self._cpus = cpu.get_available_cpus()
+            if not self._cpus:
+                logger.warning('process: CPU affinity is not supported, ignored')
+        # CPU of each pinned worker, by pid
+        self._pinned = {}
         self._payload = payload
         self._payload_friendly_name = self.payload_friendly_name()
         self._named_mixin_properties = ["_payload_friendly_name", "_nb_children"]
@@ -72,7 +151,11 @@ class Supervisor(NamedMixin):
         self._background = background
 
         self._processes = []
+        # Processes asked to stop by the autoscaler, not to be replaced
+        self._retiring = set()
         self._terminating = False
+        # Self-pipe written on signals, see bind_signal_handlers()
+        self._wakeup_fds = None
 
         super(Supervisor, self).__init__()
 
@@ -96,18 +179,110 @@ class Supervisor(NamedMixin):
         """
         if self._terminating:
             return
-        for _ in range(len(self._processes), self._nb_children):
+        for _ in range(len(self._processes) - len(self._retiring), self._nb_children):
+            target = log_startup(reset_signal_handlers(self._payload), time.time())
+            cpu_number = self._get_free_cpu()
+            if cpu_number is not None:
+                target = pin_to_cpu(target, cpu_number)
             child = multiprocessing.Process(
-                target=reset_signal_handlers(self._payload),
+                target=target,
                 args=self._args
             )
             child.start()
             self._processes.append(child)
+            if cpu_number is not None:
+                self._pinned[child.pid] = cpu_number
+
+    def _get_free_cpu(self):
+        """
+        With CPU affinity, the available CPU with the fewest workers.
+
+        :rtype: Optional[int]
+        """
+        if not self._cpus:
+            return None
+        usage = dict.fromkeys(self._cpus, 0)
+        for cpu_number in self._pinned.values():
+            usage[cpu_number] += 1
+        return min(self._cpus, key=lambda cpu_number: usage[cpu_number])
+
+    def _stop_worker_processes(self):
+        """
+        Gracefully stop the most recent worker processes above self._nb_children.
+        """
+        running = [p for p in self._processes if p.pid not in self._retiring]
+        for child in reversed(running[self._nb_children:]):
+            logger.info("process: scaling down, sending SIGTERM to pid={}".format(child.pid))
+            self._retiring.add(child.pid)
+            try:
+                os.kill(child.pid, signal.SIGTERM)
+            except OSError:  # Already exited, reaped on the next wake-up
+                pass
+
+    def _reap_worker_processes(self):
+        """
+        Join the worker processes that exited and forget them. Each check is a
+        non-blocking waitpid() on the process.
+        """
+        for process in list(self._processes):
+            if process.is_alive():
+                continue
+            process.join()
+            self._processes.remove(process)
+            self._pinned.pop(process.pid, None)
+            if process.pid in self._retiring:
+                self._retiring.discard(process.pid)
+            else:
+                logger.debug("process: pid={} exited with code={}".format(
+                    process.pid, process.exitcode))
+
+    def _autoscale(self):
+        """
+        Update self._nb_children from the autoscaler.
+        """
+        if self._autoscaler is None or self._terminating:
+            return
+        target = self._autoscaler.get_target(self._nb_children)
+        if target != self._nb_children:
+            logger.info("process: scaling from {} to {} children".format(
+                self._nb_children, target))
+            self._nb_children = target
+            self._stop_worker_processes()
+
+    def _wait_for_events(self, timeout=None):
+        """
+        Sleep until a signal is received (e.g. SIGCHLD when a worker exits) or
+        the timeout expires.
+
+        :param timeout: seconds; None to wait for a signal only
+        :type timeout: Optional[float]
+        """
+        if self._wakeup_fds is None:
+            # No wake-up pipe outside of the main thread
+            time.sleep(timeout if timeout is not None else 0.1)
+            return
+        read_fd = self._wakeup_fds[0]
+        try:
+            ready, _, _ = select.select([read_fd], [], [], timeout)
+        except (OSError, select.error) as err:  # Python 2 doesn't retry on EINTR
+            if err.args[0] != errno.EINTR:
+                raise
+            return
+        if ready:
+            try:
+                while os.read(read_fd, 4096):
+                    pass
+            except OSError as err:
+                if err.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
 
     def target(self):
         """
         Supervisor's main "target", as defined in the `multiprocessing` API. It's the
         code that the manager will execute once started.
+
+        It sleeps until a signal arrives, then replaces the workers that exited.
+        With an autoscaler, it also wakes up to adjust the number of workers.
         """
         # handle signals
         self.bind_signal_handlers()
@@ -120,17 +295,17 @@ class Supervisor(NamedMixin):
         self._start_worker_processes()
 
         # wait for all processes to finish
-        while True:
-            # if terminating, join all processes and exit the loop so we finish
-            # the supervisor process
-            if self._terminating:
-                for proc in self._processes:
-                    proc.join()
-                break
-
-            # wait 0.1s
-            # TODO: evaluate if it has a performance impact ; a priori no, but ?
-            time.sleep(0.1)
+        while not self._terminating:
+            timeout = self._autoscaler.timeout() if self._autoscaler is not None else None
+            self._wait_for_events(timeout)
+            self._reap_worker_processes()
+            self._autoscale()
+            self._start_worker_processes()
+
+        # if terminating, join all processes and exit so we finish the
+        # supervisor process
+        for proc in self._processes:
+            proc.join()
 
     def bind_signal_handlers(self):
         """
@@ -148,36 +323,28 @@ class Supervisor(NamedMixin):
                 signal_name, os.getpid()))
             self.terminate()
 
-        # NB: Function is nested to have a reference to *self*.
         def _handle_sigchld(signum, frame):
             """
             Handles SIGCHLD signal at supervisor process level. By construction this
             handler is only attached to this process, not worker processes nor deciders.
+
+            Nothing to do here: the signal wakes up the main loop through the
+            wake-up fd, which reaps and replaces the exited workers.
             """
-            logger.debug("process: caught signal signal=SIGCHLD, will cleanup zombies "
-                         "from pid={}".format(os.getpid()))
-
-            # cleanup children
-            # NB: here we use psutil's Process() API because it helps us identifying children
-            # reliably and determining their state ; we could list children via self._processes
-            # but identifying if they're alive is more tricky (???????)
-            for child in psutil.Process().children():
-                try:
-                    name, status = child.name(), child.status()
-                except psutil.NoSuchProcess:  # May be untimely deceased
-                    name, status = "unknown", "unknown"
-                logger.debug("  child: name=%s pid=%d status=%s" % (name, child.pid, status))
-                if status in (psutil.STATUS_ZOMBIE, "unknown"):
-                    logger.debug("  process {} is zombie, will cleanup".format(child.pid))
-                    to_clean = [p for p in self._processes if p.pid == child.pid]
-                    for process in to_clean:
-                        # join process to clean it up
-                        process.join()
-                        # remove the process from self._processes so it will be replaced later
-                        self._processes.remove(process)
-
-            # compensate lost children here
-            self._start_worker_processes()
+
+        # write a byte to a pipe on each signal, so the main loop can wait
+        # for them; only possible from the main thread
+        read_fd, write_fd = os.pipe()
+        for fd in (read_fd, write_fd):
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        try:
+            signal.set_wakeup_fd(write_fd)
+        except ValueError:
+            os.close(read_fd)
+            os.close(write_fd)
+        else:
+            self._wakeup_fds = (read_fd, write_fd)
 
         # bind SIGTERM and SIGINT
         signal.signal(signal.SIGTERM, _handle_graceful_shutdown)
@@ -13,6 +13,14 @@ class Registry(object):
     def __getitem__(self, label):
         return self._tasks[label]
 
+    def tasks(self):
+        """
+        Registered tasks, of all labels.
+
+        :rtype: list[simpleflow.activity.Activity]
+        """
+        return [task for tasks in list(self._tasks.values()) for task in list(tasks.values())]
+
     def register(self, task, label=None):
         """
         Register a simpleflow.activity.Activity.
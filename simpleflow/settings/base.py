@@ -73,6 +73,20 @@ ACTIVITY_HEARTBEAT_TIMEOUT = str
 
 LOGGING = dict
 
+DECIDER_HISTORY_CACHE_SIZE = int
+
+TYPE_REGISTRATION_CONCURRENCY = int
+
+AUTOSCALE_INTERVAL = float
+
+PAYLOAD_CODEC = str
+PAYLOAD_STORAGE = str_or_none
+PAYLOAD_OFFLOAD_THRESHOLD = int
+
+RESULT_CACHE = str_or_none
+RESULT_CACHE_TTL = int
+RESULT_CACHE_MAX_SIZE = int
+
 SIMPLEFLOW_S3_HOST = str
 
 METROLOGY_BUCKET = str
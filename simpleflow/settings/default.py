@@ -17,6 +17,34 @@ ACTIVITY_SCHEDULE_TO_CLOSE_TIMEOUT = ACTIVITY_DEFAULT_TIMEOUT
 ACTIVITY_SCHEDULE_TO_START_TIMEOUT = ACTIVITY_DEFAULT_TIMEOUT
 ACTIVITY_HEARTBEAT_TIMEOUT = ACTIVITY_DEFAULT_TIMEOUT
 
+# Number of parsed histories a decider keeps between decision tasks (0 disables).
+DECIDER_HISTORY_CACHE_SIZE = 32
+
+# Number of threads registering activity and workflow types at startup.
+TYPE_REGISTRATION_CONCURRENCY = 8
+
+# Seconds between two checks of the backlog by an autoscaling supervisor.
+AUTOSCALE_INTERVAL = 10
+
+# Codec of the payloads: "json", or "zlib" or "zstd" to compress them.
+PAYLOAD_CODEC = 'json'
+
+# Where to store the activity inputs and results too large for SWF:
+# "s3://bucket/prefix" or a local directory (None disables offloading).
+# Payloads are kept when an execution closes: delete them with
+# `simpleflow workflow.gc` or expire them with a retention policy.
+PAYLOAD_STORAGE = None
+# Length in characters above which a payload is offloaded.
+PAYLOAD_OFFLOAD_THRESHOLD = 16384
+
+# Where workers cache the results of idempotent activities, shared by all
+# executions: "s3://bucket/prefix" or a local directory (None disables it).
+RESULT_CACHE = None
+# Seconds a cached result is valid (0: forever).
+RESULT_CACHE_TTL = 7 * 24 * 3600
+# Bytes above which the oldest cached results are evicted (0: unbounded).
+RESULT_CACHE_MAX_SIZE = 1024 ** 3
+
 SIMPLEFLOW_S3_HOST = 's3.amazonaws.com'
 METROLOGY_BUCKET = 'metrology_bucket'
 METROLOGY_PATH_PREFIX = None
@@ -1,6 +1,14 @@
+import errno
+import io
+import os
+import shutil
+import threading
+import time
+
 from boto.s3 import connection
 from boto.s3.key import Key
 from boto.s3.bucket import Bucket
+from boto.utils import parse_ts
 from . import settings
 
 BUCKET_CACHE = {}
@@ -50,3 +58,155 @@ def push_content(bucket, path, content, content_type=None):
 def list_keys(bucket, path=None):
     bucket = get_bucket(bucket)
     return bucket.list(path)
+
+
+def split_url(url):
+    """
+    Split a storage URL: ``s3://bucket/path`` or a local path, optionally
+    as a ``file://`` URL.
+
+    :type url: str
+    :return: (scheme, bucket, path); the bucket is None for a local path
+    :rtype: (str, Optional[str], str)
+    """
+    if url.startswith('s3://'):
+        bucket, _, path = url[len('s3://'):].partition('/')
+        return 's3', bucket, path
+    if url.startswith('file://'):
+        url = url[len('file://'):]
+    return 'file', None, url
+
+
+def read(url):
+    scheme, bucket, path = split_url(url)
+    if scheme == 's3':
+        return pull_content(bucket, path)
+    with io.open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _make_parent_directory(path):
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # Created concurrently
+            if not os.path.isdir(directory):
+                raise
+
+
+def write(url, content, content_type=None):
+    scheme, bucket, path = split_url(url)
+    if scheme == 's3':
+        return push_content(bucket, path, content, content_type=content_type)
+    _make_parent_directory(path)
+    # Write then rename, so that readers never see a partial file
+    tmp_path = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.current_thread().ident)
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.rename(tmp_path, path)
+
+
+def create(url, content):
+    """
+    Write an object unless it already exists.
+
+    It's atomic for a local path. S3 has no conditional writes: two writers
+    checking at the same time may both create the object.
+
+    :type url: str
+    :type content: str
+    :return: whether the object was created
+    :rtype: bool
+    """
+    scheme, bucket, path = split_url(url)
+    if scheme == 's3':
+        if exists(url):
+            return False
+        push_content(bucket, path, content)
+        return True
+    _make_parent_directory(path)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except OSError as err:
+        if err.errno == errno.EEXIST:
+            return False
+        raise
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    return True
+
+
+def exists(url):
+    scheme, bucket, path = split_url(url)
+    if scheme == 's3':
+        return get_bucket(bucket).get_key(path) is not None
+    return os.path.exists(path)
+
+
+def delete(url):
+    scheme, bucket, path = split_url(url)
+    if scheme == 's3':
+        get_bucket(bucket).delete_key(path)
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        # Already deleted
+        pass
+
+
+def list_objects(url):
+    """
+    List the objects under a URL.
+
+    :type url: str
+    :return: URL, size in bytes and modification timestamp of each object
+    :rtype: list[(str, int, float)]
+    """
+    scheme, bucket, path = split_url(url)
+    if scheme == 's3':
+        prefix = path.rstrip('/') + '/'
+        return [
+            ('s3://{}/{}'.format(bucket, key.name), key.size,
+             time.mktime(parse_ts(key.last_modified).timetuple()))
+            for key in list_keys(bucket, prefix)
+        ]
+    objects = []
+    for directory, _, files in os.walk(path):
+        for filename in files:
+            filename = os.path.join(directory, filename)
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                # Deleted meanwhile
+                continue
+            objects.append((filename, stat.st_size, stat.st_mtime))
+    return objects
+
+
+def delete_tree(url):
+    """
+    Delete everything under a URL.
+
+    :type url: str
+    :return: number of deleted objects
+    :rtype: int
+    """
+    scheme, bucket, path = split_url(url)
+    if scheme == 's3':
+        prefix = path.rstrip('/') + '/'
+        names = [key.name for key in list_keys(bucket, prefix)]
+        if names:
+            get_bucket(bucket).delete_keys(names)
+        return len(names)
+    if not os.path.isdir(path):
+        return 0
+    count = sum(len(files) for _, _, files in os.walk(path))
+    shutil.rmtree(path, ignore_errors=True)
+    return count
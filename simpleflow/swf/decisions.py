@@ -0,0 +1,137 @@
+from __future__ import absolute_import
+
+import json
+
+import swf.models.decision
+from simpleflow import exceptions
+from simpleflow.swf import constants
+
+
+# We keep a 5kB of error margin for headers, json structure, and the
+# timer decision, and 32kB for the context, even if we don't use it now.
+REQUEST_SIZE_MARGIN = 5000 + 32000
+
+
+class DecisionBatch(object):
+    """
+    Decisions of a decision task, kept within the SWF limits.
+
+    The serialized size of each decision is computed once, when it is added,
+    so checking the size of the request doesn't serialize the whole batch
+    again.
+
+    See: http://docs.aws.amazon.com/amazonswf/latest/developerguide/swf-dg-limits.html
+
+    :ivar max_decisions: maximum number of decisions per decision task
+    :type max_decisions: int
+    :ivar max_size: maximum size of the serialized decisions, in bytes
+    :type max_size: int
+    :ivar decisions: the decisions
+    :type decisions: list[swf.models.decision.base.Decision]
+    :ivar size: size of the decisions serialized as a JSON list, in bytes
+    :type size: int
+    """
+
+    def __init__(self, max_decisions=None, max_size=None):
+        if max_decisions is None:
+            max_decisions = constants.MAX_DECISIONS
+        if max_size is None:
+            max_size = constants.MAX_REQUEST_SIZE - REQUEST_SIZE_MARGIN
+        self.max_decisions = max_decisions
+        self.max_size = max_size
+        self.decisions = []
+        self._sizes_total = 0
+        self.size = len('[]')
+
+    def __len__(self):
+        return len(self.decisions)
+
+    def __iter__(self):
+        return iter(self.decisions)
+
+    def __getitem__(self, index):
+        return self.decisions[index]
+
+    @staticmethod
+    def serialized_size(decision):
+        """
+        :param decision:
+        :type decision: swf.models.decision.base.Decision
+        :return: size of the decision serialized in JSON
+        :rtype: int
+        """
+        return len(json.dumps(decision))
+
+    def size_with(self, sizes):
+        """
+        Size of the batch if decisions of the given sizes were added.
+
+        :param sizes: serialized sizes of the decisions
+        :type sizes: list[int]
+        :rtype: int
+        """
+        # json.dumps() separates list items with ', '
+        nb_decisions = len(self.decisions) + len(sizes)
+        separators = 2 * (nb_decisions - 1) if nb_decisions else 0
+        return len('[]') + self._sizes_total + sum(sizes) + separators
+
+    def append(self, decision, size=None):
+        """
+        Add a decision, regardless of the limits.
+
+        :param decision:
+        :type decision: swf.models.decision.base.Decision
+        :param size: serialized size of the decision, if known
+        :type size: Optional[int]
+        """
+        if size is None:
+            size = self.serialized_size(decision)
+        self.decisions.append(decision)
+        self._sizes_total += size
+        self.size = self.size_with([])
+
+    def add_timer(self, id):
+        """
+        Add a timer firing immediately, to wake the workflow up as soon as
+        the decisions are processed.
+
+        :param id: timer id
+        :type id: str
+        """
+        timer = swf.models.decision.TimerDecision(
+            'start',
+            id=id,
+            start_to_fire_timeout='0')
+        self.append(timer)
+
+    def schedule(self, decisions, wake_up_id):
+        """
+        Add the decisions of a task if they fit within the limits.
+
+        If they would exceed the request size, they are not added. If the
+        batch is full, no other task can be scheduled. In both cases a timer
+        to resume the workflow is added and the execution is blocked.
+
+        :param decisions: decisions scheduling a task
+        :type decisions: list[swf.models.decision.base.Decision]
+        :param wake_up_id: id of the wake-up timer
+        :type wake_up_id: str
+        :raise: exceptions.ExecutionBlocked
+        """
+        sizes = [self.serialized_size(decision) for decision in decisions]
+        if self.size_with(sizes) > self.max_size:
+            # TODO: at this point we may check that the batch is not empty
+            # If it's the case, it means that a single decision was weighting
+            # more than 900kB, so we have bigger problems.
+            self.add_timer(wake_up_id)
+            raise exceptions.ExecutionBlocked()
+
+        for decision, size in zip(decisions, sizes):
+            self.append(decision, size)
+
+        # Check if we won't exceed max decisions -1
+        # TODO: if we had exactly MAX_DECISIONS - 1 to take, this will wake up
+        # the workflow for no reason. Evaluate if we can do better.
+        if len(self.decisions) == self.max_decisions - 1:
+            self.add_timer(wake_up_id)
+            raise exceptions.ExecutionBlocked()
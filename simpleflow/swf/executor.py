@@ -3,7 +3,6 @@ from __future__ import absolute_import
 import hashlib
 import json
 import logging
-import multiprocessing
 import re
 import traceback
 
@@ -12,6 +11,7 @@ import swf.format
 import swf.models
 import swf.models.decision
 from simpleflow import (
+    codec,
     exceptions,
     executor,
     futures,
@@ -21,99 +21,38 @@ from simpleflow.activity import Activity, PRIORITY_NOT_SET
 from simpleflow.base import Submittable
 from simpleflow.history import History
 from simpleflow.signal import WaitForSignal
-from simpleflow.swf.helpers import swf_identity
+from simpleflow.swf.utils import hash_arguments
 from simpleflow.swf.task import ActivityTask, WorkflowTask, SignalTask
 from simpleflow.task import (
     ActivityTask as BaseActivityTask,
     WorkflowTask as BaseWorkflowTask,
     SignalTask as BaseSignalTask,
 )
-from simpleflow.utils import issubclass_, json_dumps, hex_hash
-from simpleflow.swf import constants
-from simpleflow.utils import retry
+from simpleflow.utils import issubclass_, hex_hash
+from simpleflow.swf import constants, payloads, registration, repair
+from simpleflow.swf.decisions import DecisionBatch
 from simpleflow.workflow import Workflow
-from swf.core import ConnectedSWFObject
 
 logger = logging.getLogger(__name__)
 
 __all__ = ['Executor']
 
 
-# if "poll_for_activity_task" doesn't contain a "taskToken"
-# key, then retry ; it happens (not often) that the decider
-# doesn't get the scheduled task while it should...
-@retry.with_delay(nb_times=3,
-                  delay=retry.exponential,
-                  on_exceptions=KeyError)
-def run_fake_activity_task(domain, task_list, result):
-    conn = ConnectedSWFObject().connection
-    resp = conn.poll_for_activity_task(
-        domain,
-        task_list,
-        identity=swf_identity(),
-    )
-    conn.respond_activity_task_completed(
-        resp['taskToken'],
-        result,
-    )
-
-
-# TODO: test that correctly! At the time of writing this I don't have any real
-# world crawl containing child workflows, so this is not guaranteed to work the
-# first time, and it's a bit hard to test end-to-end even with moto.mock_swf
-# (child workflows are not really well supported there too).
-# ---
-# if "poll_for_decision_task" doesn't contain a "taskToken"
-# key, then retry ; it happens (not often) that the decider
-# doesn't get the scheduled task while it should...
-@retry.with_delay(nb_times=3,
-                  delay=retry.exponential,
-                  on_exceptions=KeyError)
-def run_fake_child_workflow_task(domain, task_list, result=None):
-    conn = ConnectedSWFObject().connection
-    resp = conn.poll_for_decision_task(
-        domain,
-        task_list,
-        identity=swf_identity(),
-    )
-    conn.respond_decision_task_completed(
-        resp['taskToken'],
-        decisions=[
-            {
-                'decisionType': 'CompleteWorkflowExecution',
-                'completeWorkflowExecutionDecisionAttributes': {
-                    'result': result,
-                },
-            }
-        ]
-    )
-
-
-def run_fake_task_worker(domain, task_list, former_event):
-    if former_event['type'] == 'activity':
-        worker_proc = multiprocessing.Process(
-            target=run_fake_activity_task,
-            args=(
-                domain,
-                task_list,
-                former_event['result'],
-            ),
-        )
-    elif former_event['type'] == 'child_workflow':
-        worker_proc = multiprocessing.Process(
-            target=run_fake_child_workflow_task,
-            args=(
-                domain,
-                task_list,
-            ),
-            kwargs={
-                'result': former_event['result'],
-            },
-        )
-    else:
-        raise Exception('Wrong event type {}'.format(former_event['type']))
-
-    worker_proc.start()
+# Events that only acknowledge decisions or report progress: they cannot
+# change the state of a future, hence the outcome of a replay.
+IDLE_EVENT_TYPES = frozenset((
+    'DecisionTaskScheduled',
+    'DecisionTaskStarted',
+    'ActivityTaskScheduled',
+    'ActivityTaskStarted',
+    'ActivityTaskCancelRequested',
+    'StartChildWorkflowExecutionInitiated',
+    'ChildWorkflowExecutionStarted',
+    'SignalExternalWorkflowExecutionInitiated',
+    'RequestCancelExternalWorkflowExecutionInitiated',
+    'TimerStarted',
+    'MarkerRecorded',
+))
 
 
 class TaskRegistry(dict):
@@ -152,10 +91,12 @@ class Executor(executor.Executor):
     :type domain: swf.models.domain.Domain
     :ivar task_list: task list
     :type task_list: Optional[str]
-    :ivar repair_with: previous history to use for repairing
-    :type repair_with: Optional[simpleflow.history.History]
+    :ivar repair_with: previous history or its index to use for repairing
+    :type repair_with: Optional[simpleflow.history.History | simpleflow.swf.repair.RepairIndex]
     :ivar force_activities: regex with activities to force
     :type _history: History
+    :ivar skipped_replays: number of decision tasks answered without replay
+    :type skipped_replays: int
 
     """
 
@@ -171,6 +112,7 @@ class Executor(executor.Executor):
             self.force_activities = re.compile(force_activities)
         else:
             self.force_activities = None
+        self.skipped_replays = 0
         self.reset()
 
     # noinspection PyAttributeOutsideInit
@@ -183,9 +125,10 @@ class Executor(executor.Executor):
 
         """
         self._open_activity_count = 0
-        self._decisions = []
+        self._decisions = DecisionBatch()
         self._tasks = TaskRegistry()
         self._idempotent_tasks_to_submit = set()
+        self._repaired_results = None
         self._execution = None
         self.current_priority = None
         self.create_workflow()
@@ -209,8 +152,7 @@ class Executor(executor.Executor):
             # If a_task is idempotent, we can do better and hash arguments.
             # It makes the workflow resistant to retries or variations on the
             # same task name (see #11).
-            arguments = json_dumps({"args": args, "kwargs": kwargs}, sort_keys=True)
-            suffix = hashlib.md5(arguments.encode('utf-8')).hexdigest()
+            suffix = hash_arguments(args, kwargs)
 
         if isinstance(a_task, (WorkflowTask,)):
             # Some task types must have globally unique names.
@@ -241,16 +183,11 @@ class Executor(executor.Executor):
                     self.domain,
                     name=event['activity_type']['name'],
                     version=event['activity_type']['version'])
-                logger.info('creating activity type {} in domain {}'.format(
-                    activity_type.name,
-                    self.domain.name))
-                try:
-                    activity_type.save()
-                except swf.exceptions.AlreadyExistsError:
-                    logger.info(
-                        'oops: Activity type {} in domain {} already exists, creation failed, continuing...'.format(
-                            activity_type.name,
-                            self.domain.name))
+                # The type may have been wrongly marked as known, e.g. if it
+                # was deprecated since.
+                registration.forget(registration.ACTIVITY, self.domain,
+                                    activity_type.name, activity_type.version)
+                registration.save_type(registration.ACTIVITY, activity_type)
                 return None
             logger.info('failed to schedule {}: {}'.format(
                 event['activity_type']['name'],
@@ -261,7 +198,7 @@ class Executor(executor.Executor):
             future.set_running()
         elif state == 'completed':
             result = event['result']
-            future.set_finished(json.loads(result) if result else None)
+            future.set_finished(payloads.resolve(codec.loads(result)) if result else None)
         elif state == 'canceled':
             future.set_cancelled()
         elif state == 'failed':
@@ -297,15 +234,9 @@ class Executor(executor.Executor):
                     name=event['name'],
                     version=event['version'],
                 )
-                logger.info('Creating workflow type {} in domain {}'.format(
-                    workflow_type.name,
-                    self.domain.name,
-                ))
-                try:
-                    workflow_type.save()
-                except swf.exceptions.AlreadyExistsError:
-                    # Could have be created by a concurrent workflow execution.
-                    pass
+                registration.forget(registration.WORKFLOW, self.domain,
+                                    workflow_type.name, workflow_type.version)
+                registration.save_type(registration.WORKFLOW, workflow_type)
                 return None
             future.set_exception(exceptions.TaskFailed(
                 name=event['id'],
@@ -315,7 +246,7 @@ class Executor(executor.Executor):
         elif state == 'started':
             future.set_running()
         elif state == 'completed':
-            future.set_finished(json.loads(event['result']))
+            future.set_finished(codec.loads(event['result']))
         elif state == 'failed':
             future.set_exception(exceptions.TaskFailed(
                 name=event['id'],
@@ -543,43 +474,24 @@ class Executor(executor.Executor):
         #             a_task.run_id = self._execution_context['run_id']
 
         # NB: ``decisions`` contains a single decision.
-        decisions = a_task.schedule(self.domain, task_list, priority=self.current_priority)
+        if isinstance(a_task, ActivityTask):
+            decisions = a_task.schedule(self.domain, task_list, priority=self.current_priority,
+                                        execution_context=self._execution_context,
+                                        codec=getattr(self._workflow_class, 'codec', None))
+        else:
+            decisions = a_task.schedule(self.domain, task_list, priority=self.current_priority)
 
         # Ready to schedule
         if isinstance(a_task, ActivityTask):
             self._open_activity_count += 1
 
-        # Check if we won't violate the 1MB limit on API requests ; if so, do NOT
-        # schedule the requested task and block execution instead, with a timer
-        # to wake up the workflow immediately after completing these decisions.
-        # See: http://docs.aws.amazon.com/amazonswf/latest/developerguide/swf-dg-limits.html
-        request_size = len(json.dumps(self._decisions + decisions))
-        # We keep a 5kB of error margin for headers, json structure, and the
-        # timer decision, and 32kB for the context, even if we don't use it now.
-        if request_size > constants.MAX_REQUEST_SIZE - 5000 - 32000:
-            # TODO: at this point we may check that self._decisions is not empty
-            # If it's the case, it means that a single decision was weighting
-            # more than 900kB, so we have bigger problems.
-            self._add_start_timer_decision('resume-after-{}'.format(a_task.id))
-            raise exceptions.ExecutionBlocked()
-
-        self._decisions.extend(decisions)
-
-        # Check if we won't exceed max decisions -1
-        # TODO: if we had exactly MAX_DECISIONS - 1 to take, this will wake up
-        # the workflow for no reason. Evaluate if we can do better.
-        if len(self._decisions) == constants.MAX_DECISIONS - 1:
-            # We add a timer to wake up the workflow immediately after
-            # completing these decisions.
-            self._add_start_timer_decision('resume-after-{}'.format(a_task.id))
-            raise exceptions.ExecutionBlocked()
+        # Check we won't violate the limits on decisions and API requests
+        # size; if so, block execution with a timer to wake up the workflow
+        # immediately after completing these decisions.
+        self._decisions.schedule(decisions, 'resume-after-{}'.format(a_task.id))
 
     def _add_start_timer_decision(self, id):
-        timer = swf.models.decision.TimerDecision(
-            'start',
-            id=id,
-            start_to_fire_timeout='0')
-        self._decisions.append(timer)
+        self._decisions.add_timer(id)
 
     EVENT_TYPE_TO_FUTURE = {
         'activity': resume_activity,
@@ -594,7 +506,7 @@ class Executor(executor.Executor):
 
         If the task was scheduled, returns a future that wraps its state,
         otherwise schedules it.
-        If in repair mode, we may fake the task to repair from the previous history.
+        If in repair mode, we may reuse the result of the task in the previous history.
 
         :param a_task:
         :type a_task: ActivityTask | WorkflowTask | SignalTask
@@ -616,26 +528,18 @@ class Executor(executor.Executor):
         force_execution = (self.force_activities and
                            self.force_activities.search(a_task.id))
 
+        # tasks repaired in a previous decision
+        if not event:
+            future = self._get_future_from_repair_marker(a_task)
+
         # try to fill in the blanks with the workflow we're trying to repair if any
         # TODO: maybe only do that for idempotent tasks?? (not enough information to decide?)
-        if not event and self.repair_with and not force_execution:
+        if not event and not future and self.repair_with and not force_execution:
             # try to find a former event matching this task
-            former_event = self.find_event(a_task, self.repair_with)
+            former_event = self._find_former_event(a_task)
             # ... but only keep the event if the task was successful
             if former_event and former_event['state'] == 'completed':
-                logger.info(
-                    'faking task completed successfully in previous '
-                    'workflow: {}'.format(former_event['id'])
-                )
-                json_hash = hashlib.md5(json_dumps(former_event).encode('utf-8')).hexdigest()
-                fake_task_list = "FAKE-" + json_hash
-
-                # schedule task on a fake task list
-                self.schedule_task(a_task, task_list=fake_task_list)
-                future = futures.Future()
-
-                # start a dedicated process to handle the fake activity
-                run_fake_task_worker(self.domain.name, fake_task_list, former_event)
+                future = self._repair_task(a_task, former_event)
 
         # back to normal execution flow
         if event:
@@ -657,6 +561,93 @@ class Executor(executor.Executor):
 
         return future
 
+    def _find_former_event(self, a_task):
+        """
+        Get the event of a task in the execution to repair, if any.
+
+        :type a_task: ActivityTask | WorkflowTask | SignalTask
+        :rtype: Optional[dict]
+        """
+        if isinstance(self.repair_with, History):
+            return self.find_event(a_task, self.repair_with)
+        if not isinstance(a_task, (ActivityTask, WorkflowTask)):
+            return None
+        return self.repair_with.get(a_task.id)
+
+    def _get_future_from_repair_marker(self, a_task):
+        """
+        Get the future of a task whose previous result was recorded in a
+        marker, if any.
+
+        :type a_task: ActivityTask | WorkflowTask | SignalTask
+        :rtype: Optional[futures.Future]
+        """
+        if self._repaired_results is None:
+            self._repaired_results = dict(
+                repair.parse_marker(marker['details'])
+                for marker in self._history.markers.get(repair.MARKER_NAME, ())
+            )
+        if a_task.id not in self._repaired_results:
+            return None
+        result = self._repaired_results[a_task.id]
+        if result is repair.IN_INDEX:
+            former_event = self._find_former_event(a_task) if self.repair_with else None
+            if former_event is None:
+                logger.warning('result of {} not found in the repair index, '
+                               'executing it again'.format(a_task.id))
+                return None
+            result = former_event['result']
+        future = futures.Future()
+        future.set_finished(payloads.resolve(codec.loads(result)) if result else None)
+        return future
+
+    def _repair_task(self, a_task, former_event):
+        """
+        Reuse the result of a task that completed in the previous execution:
+        record it in a marker and return a finished future.
+
+        The limits of the decision batch apply to markers too: past them,
+        the workflow is woken up by a timer to record the next ones.
+
+        :type a_task: ActivityTask | WorkflowTask
+        :param former_event: completed task in the previous execution
+        :type former_event: dict
+        :return: the future, None if the task must be executed again
+        :rtype: Optional[futures.Future]
+        :raise: exceptions.ExecutionBlocked if too many decisions waiting
+        """
+        # Not pointing to the payloads of the previous execution, which may
+        # be collected
+        result = payloads.localize(former_event['result'], self._workflow_id, self._run_id)
+        marker = repair.make_marker(a_task.id, result)
+        if marker is None:
+            marker = self._make_large_repair_marker(a_task, result)
+        logger.info(
+            'reusing task completed successfully in previous '
+            'workflow: {}'.format(former_event['id'])
+        )
+        self._decisions.schedule([marker], 'resume-after-{}'.format(a_task.id))
+        future = futures.Future()
+        future.set_finished(payloads.resolve(codec.loads(result)) if result else None)
+        return future
+
+    def _make_large_repair_marker(self, a_task, result):
+        """
+        Marker for a result too large for its details.
+
+        :type a_task: ActivityTask | WorkflowTask
+        :param result: raw result
+        :type result: str
+        :rtype: swf.models.decision.MarkerDecision
+        """
+        reference = payloads.make_reference(result, self._workflow_id, self._run_id)
+        if reference is not None:
+            marker = repair.make_marker(a_task.id, json.dumps(reference))
+            if marker is not None:
+                return marker
+        # Later decisions read it from the repair index again
+        return repair.make_index_marker(a_task.id)
+
     def _compute_priority(self, priority_set_on_submit, a_task):
         """
         Computes the correct task priority, with the following precedence (first
@@ -750,12 +741,14 @@ class Executor(executor.Executor):
         iterable = task.get_actual_value(iterable)
         return super(Executor, self).starmap(callable, iterable)
 
-    def replay(self, decision_response):
+    def replay(self, decision_response, history_cache=None):
         """Replay the workflow from the start until it blocks.
         Called by the DeciderWorker.
 
         :param decision_response: an object wrapping the PollForDecisionTask response
         :type  decision_response: swf.responses.Response
+        :param history_cache: parsed histories of the previous decision tasks
+        :type  history_cache: Optional[simpleflow.history.HistoryCache]
 
         :returns: a list of decision and a context dict (obsolete, empty)
         :rtype: ([swf.models.decision.base.Decision], dict)
@@ -763,8 +756,20 @@ class Executor(executor.Executor):
         self.reset()
 
         history = decision_response.history
-        self._history = History(history)
-        self._history.parse()
+        run_id = self._get_run_id(decision_response)
+        if history_cache is not None and run_id:
+            self._history = history_cache.parse(run_id, history)
+        else:
+            self._history = History(history)
+            self._history.parse()
+
+        if self._can_skip_replay(history):
+            self.skipped_replays += 1
+            logger.info('no new event can change the workflow state, '
+                        'skipping replay ({} skipped)'.format(self.skipped_replays))
+            self.decref_workflow()
+            return [], {}
+
         self.build_execution_context(decision_response)
         self._execution = decision_response.execution
 
@@ -786,7 +791,7 @@ class Executor(executor.Executor):
             ))
             self.after_replay()
             self.decref_workflow()
-            return self._decisions, {}
+            return self._decisions.decisions, {}
         except exceptions.TaskException as err:
             reason = 'Workflow execution error in task {}: "{}"'.format(
                 err.task.name,
@@ -803,6 +808,7 @@ class Executor(executor.Executor):
             )
             self.after_closed()
             self.decref_workflow()
+            self._forget_history(history_cache, run_id)
             return [decision], {}
 
         except Exception as err:
@@ -824,16 +830,61 @@ class Executor(executor.Executor):
             )
             self.after_closed()
             self.decref_workflow()
+            self._forget_history(history_cache, run_id)
             return [decision], {}
 
         self.after_replay()
         decision = swf.models.decision.WorkflowExecutionDecision()
-        decision.complete(result=swf.format.result(json_dumps(result)))
+        result = codec.dumps(result, getattr(self._workflow_class, 'codec', None))
+        decision.complete(result=swf.format.result(result))
         self.on_completed()
         self.after_closed()
         self.decref_workflow()
+        self._forget_history(history_cache, run_id)
         return [decision], {}
 
+    def _can_skip_replay(self, history):
+        """
+        Check whether the events since the last completed decision task can
+        change the outcome of a replay. Only workflows with
+        ``skip_idle_replays`` set take this shortcut.
+
+        :param history: raw history
+        :type history: swf.models.history.History
+        :rtype: bool
+        """
+        if not getattr(self._workflow_class, 'skip_idle_replays', False):
+            return False
+        if self.repair_with:
+            return False
+        for event in reversed(history.events):
+            if event.name == 'DecisionTaskCompleted':
+                return True
+            if event.name not in IDLE_EVENT_TYPES:
+                return False
+        return False
+
+    @staticmethod
+    def _get_run_id(decision_response):
+        """
+        :type decision_response: swf.responses.Response
+        :return: the run id of the execution, if known
+        :rtype: Optional[str]
+        """
+        execution = getattr(decision_response, 'execution', None)
+        return getattr(execution, 'run_id', None)
+
+    @staticmethod
+    def _forget_history(history_cache, run_id):
+        """
+        Drop the history of a closing execution from the cache.
+
+        :type history_cache: Optional[simpleflow.history.HistoryCache]
+        :type run_id: Optional[str]
+        """
+        if history_cache is not None and run_id:
+            history_cache.pop(run_id)
+
     def decref_workflow(self):
         """
         Set the `_workflow` ivar to None in the hope of reducing memory consumption.
@@ -11,6 +11,7 @@ import swf.models
 import swf.querysets
 from future.utils import iteritems
 from simpleflow.activity import Activity
+from simpleflow.swf import payloads
 from simpleflow.utils import json_dumps
 
 from .stats import pretty
@@ -122,8 +123,8 @@ def find_activity(history, scheduled_id=None, activity_id=None, input=None):
     if isinstance(func, Activity):
         func = func.callable
 
-    # get the input
-    input_ = input or found_activity["input"]
+    # get the input, read from the storage if it was offloaded
+    input_ = input or payloads.resolve(found_activity["input"])
     if input_ is None:
         input_ = {}
     args = input_.get('args', ())
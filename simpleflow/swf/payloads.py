@@ -0,0 +1,201 @@
+"""
+Offloading of activity inputs and results too large for SWF.
+
+When ``settings.PAYLOAD_STORAGE`` is set, a JSON payload longer than
+``settings.PAYLOAD_OFFLOAD_THRESHOLD`` characters is stored under
+``<storage>/<workflow id>/<run id>/<sha256 of the payload>.json`` and SWF
+only gets a reference, ``{"__simpleflow_payload__": <url>}``. The reader
+(the worker for inputs, the decider for results) resolves it when it
+decodes the payload.
+
+Payloads are not deleted by the decider when it closes an execution: SWF
+may still reject the closing decision. Once the execution is closed,
+``simpleflow workflow.gc`` deletes them with ``collect``; a retention policy
+on the storage, such as an S3 lifecycle rule, works too. A repair copies the
+previous payloads it reuses under the new execution (see ``localize``), so
+collecting the previous execution afterwards is safe; don't collect it while
+it is being repaired.
+"""
+from __future__ import absolute_import
+
+import collections
+import hashlib
+import json
+import logging
+import threading
+
+from simpleflow import codec, settings, storage
+
+logger = logging.getLogger(__name__)
+
+
+PAYLOAD_KEY = '__simpleflow_payload__'
+
+# Payloads are immutable: a decider replaying a workflow reads the same
+# results at each decision task, so keep the last ones.
+CACHE_SIZE = 32
+
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def is_enabled():
+    """
+    :rtype: bool
+    """
+    return bool(settings.PAYLOAD_STORAGE)
+
+
+def execution_url(workflow_id, run_id):
+    """
+    URL under which the payloads of an execution are stored.
+
+    :type workflow_id: Optional[str]
+    :type run_id: Optional[str]
+    :rtype: str
+    """
+    parts = [settings.PAYLOAD_STORAGE.rstrip('/')]
+    # Without an execution (e.g. a replay outside of SWF), payloads are not
+    # garbage-collected.
+    if workflow_id and run_id:
+        parts += [workflow_id, run_id]
+    return '/'.join(parts)
+
+
+def _cache_get(url):
+    with _cache_lock:
+        content = _cache.pop(url, None)
+        if content is not None:
+            _cache[url] = content
+        return content
+
+
+def _cache_put(url, content):
+    with _cache_lock:
+        _cache.pop(url, None)
+        _cache[url] = content
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def offload(message, workflow_id=None, run_id=None):
+    """
+    Store a JSON payload if it's over the threshold.
+
+    :param message: JSON payload
+    :type message: str
+    :type workflow_id: Optional[str]
+    :type run_id: Optional[str]
+    :return: the payload or the JSON of its reference
+    :rtype: str
+    """
+    reference = make_reference(message, workflow_id, run_id)
+    if reference is None:
+        return message
+    return json.dumps(reference)
+
+
+def make_reference(message, workflow_id=None, run_id=None):
+    """
+    Store a JSON payload if it's over the threshold.
+
+    :param message: JSON payload
+    :type message: str
+    :type workflow_id: Optional[str]
+    :type run_id: Optional[str]
+    :return: the reference to the stored payload, None if not offloaded
+    :rtype: Optional[dict[str, str]]
+    """
+    if not is_enabled() or len(message) <= settings.PAYLOAD_OFFLOAD_THRESHOLD:
+        return None
+    digest = hashlib.sha256(message.encode('utf-8')).hexdigest()
+    url = '{}/{}.json'.format(execution_url(workflow_id, run_id), digest)
+    # Same content, same URL: no need to store it twice
+    if _cache_get(url) is None:
+        logger.debug('offloading a {} characters payload to {}'.format(len(message), url))
+        storage.write(url, message, content_type='application/json')
+        _cache_put(url, message)
+    return {PAYLOAD_KEY: url}
+
+
+def is_reference(value):
+    """
+    :type value: Any
+    :rtype: bool
+    """
+    return isinstance(value, dict) and len(value) == 1 and PAYLOAD_KEY in value
+
+
+def resolve(value):
+    """
+    Load the payload a decoded value refers to, if it's a reference.
+
+    :param value: decoded JSON
+    :type value: Any
+    :return: the value or the payload it refers to
+    :rtype: Any
+    """
+    if not is_reference(value):
+        return value
+    url = value[PAYLOAD_KEY]
+    content = _cache_get(url)
+    if content is None:
+        content = storage.read(url)
+        _cache_put(url, content)
+    return codec.loads(content)
+
+
+def localize(message, workflow_id, run_id):
+    """
+    Copy the payload a JSON message refers to under an execution, if it's
+    stored under another one, so that collecting the other execution
+    doesn't lose it.
+
+    :param message: JSON payload, possibly a reference
+    :type message: Optional[str]
+    :type workflow_id: Optional[str]
+    :type run_id: Optional[str]
+    :return: the message or the JSON of the reference to the copy
+    :rtype: Optional[str]
+    """
+    if not message or not is_enabled():
+        return message
+    try:
+        value = codec.loads(message)
+    except ValueError:
+        return message
+    if not is_reference(value):
+        return message
+    url = value[PAYLOAD_KEY]
+    if url.startswith(execution_url(workflow_id, run_id) + '/'):
+        return message
+    content = _cache_get(url)
+    if content is None:
+        content = storage.read(url)
+    return offload(content, workflow_id, run_id)
+
+
+def collect(workflow_id, run_id):
+    """
+    Delete the payloads of an execution whose history isn't needed
+    anymore. Errors are logged and ignored.
+
+    :type workflow_id: str
+    :type run_id: str
+    :return: number of deleted payloads
+    :rtype: int
+    """
+    if not (workflow_id and run_id):
+        return 0
+    url = execution_url(workflow_id, run_id)
+    try:
+        count = storage.delete_tree(url)
+    except Exception as err:
+        logger.warning('cannot delete the payloads under {}: {}'.format(url, err))
+        return 0
+    if count:
+        logger.info('deleted {} payloads under {}'.format(count, url))
+    with _cache_lock:
+        for key in [key for key in _cache if key.startswith(url + '/')]:
+            del _cache[key]
+    return count
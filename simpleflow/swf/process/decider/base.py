@@ -6,9 +6,13 @@ import swf.actors
 import swf.exceptions
 import swf.format
 import swf.models.decision
+from swf.core import connection_pool
 
+from simpleflow import settings
+from simpleflow.history import HistoryCache
 from simpleflow.process import Supervisor, with_state
 from simpleflow.swf.process import Poller
+from simpleflow.swf.process.poller import make_autoscaler
 
 
 logger = logging.getLogger(__name__)
@@ -21,13 +25,35 @@ class Decider(Supervisor):
     :ivar _poller: decider poller.
     :type _poller: DeciderPoller
     """
-    def __init__(self, poller, nb_children=None):
+    def __init__(self, poller, nb_children=None, min_children=None, max_children=None,
+                 cpu_affinity=False):
+        """
+        :param poller:
+        :type poller: simpleflow.swf.process.Poller
+        :param nb_children: number of processes, initial one with autoscaling
+        :type nb_children: Optional[int]
+        :param min_children: with autoscaling, minimum number of processes
+        :type min_children: Optional[int]
+        :param max_children: maximum number of processes; enables autoscaling
+        :type max_children: Optional[int]
+        :param cpu_affinity: pin each process to a CPU
+        :type cpu_affinity: bool
+        """
         self._poller = poller
         super(Decider, self).__init__(
             payload=self._poller.start,
             nb_children=nb_children,
+            autoscaler=make_autoscaler(poller, min_children, max_children),
+            cpu_affinity=cpu_affinity,
         )
 
+    @property
+    def poller(self):
+        """
+        :rtype: DeciderPoller
+        """
+        return self._poller
+
 
 class DeciderPoller(Poller, swf.actors.Decider):
     """
@@ -39,6 +65,8 @@ class DeciderPoller(Poller, swf.actors.Decider):
     :type _workflow_executors: dict[str, simpleflow.swf.executor.Executor]
     :ivar nb_retries: # of retries allowed
     :type nb_retries: int
+    :ivar _history_cache: parsed histories kept between decision tasks
+    :type _history_cache: simpleflow.history.HistoryCache
     """
     def __init__(self, workflow_executors, domain, task_list, nb_retries=3,
                  *args, **kwargs):
@@ -58,8 +86,16 @@ class DeciderPoller(Poller, swf.actors.Decider):
         behind this is to limit operational burden by having a single service
         handling multiple workflows.
 
+        Parsing the history gets slower as the execution grows, so the
+        parsed histories are kept in a small LRU cache: when SWF sends a new
+        decision task for the same execution, only the new events are parsed.
+
         :param workflow_executors: executors handling workflow executions.
         :type  workflow_executors: list[simpleflow.swf.executor.Executor]
+        :param history_cache_size: keyword-only, number of cached
+                                   histories; defaults to
+                                   settings.DECIDER_HISTORY_CACHE_SIZE.
+        :type  history_cache_size: Optional[int]
 
         """
         self._workflow_name = '{}'.format(','.join(
@@ -84,6 +120,11 @@ class DeciderPoller(Poller, swf.actors.Decider):
         self.nb_retries = nb_retries
         self.domain = domain
 
+        history_cache_size = kwargs.pop('history_cache_size', None)
+        if history_cache_size is None:
+            history_cache_size = settings.DECIDER_HISTORY_CACHE_SIZE
+        self._history_cache = HistoryCache(history_cache_size)
+
         # All executors must have the same domain.
         self._check_all_domains_identical()
 
@@ -97,6 +138,15 @@ class DeciderPoller(Poller, swf.actors.Decider):
             workflows=','.join(self._workflow_executors),
         )
 
+    @property
+    def workflows(self):
+        """
+        Workflows handled by this poller.
+
+        :rtype: list[type(simpleflow.workflow.Workflow)]
+        """
+        return [ex.workflow_class for ex in self._workflow_executors.values()]
+
     def _check_all_domains_identical(self):
         for ex in self._workflow_executors.values():
             if ex.domain.name != self.domain.name:
@@ -128,8 +178,23 @@ class DeciderPoller(Poller, swf.actors.Decider):
 
     @with_state('polling')
     def poll(self, task_list=None, identity=None, **kwargs):
+        if len(self._history_cache):
+            # Only fetch the events we don't know yet
+            kwargs.setdefault('known_history', self._get_known_history)
         return swf.actors.Decider.poll(self, task_list, identity, **kwargs)
 
+    def _get_known_history(self, run_id):
+        """
+        :param run_id:
+        :type run_id: str
+        :return: the raw history cached for this execution, if any
+        :rtype: Optional[swf.models.history.History]
+        """
+        history = self._history_cache.get(run_id)
+        if history is None:
+            return None
+        return history.raw_history
+
     @with_state('completing')
     def complete(self, token, decisions=None, execution_context=None):
         return swf.actors.Decider.complete(self, token, decisions, execution_context)
@@ -152,6 +217,8 @@ class DeciderPoller(Poller, swf.actors.Decider):
             self._complete(decision_response.token, decisions)
         except Exception as err:
             logger.error('cannot complete decision: {}'.format(err))
+        logger.debug('history cache: {}'.format(self._history_cache.stats))
+        logger.debug('connection pool: {}'.format(connection_pool.stats))
 
     @with_state('deciding')
     def decide(self, decision_response):
@@ -165,7 +232,8 @@ class DeciderPoller(Poller, swf.actors.Decider):
         :return: the decisions.
         :rtype: list[swf.models.decision.base.Decision]
         """
-        worker = DeciderWorker(self.domain, self._workflow_executors)
+        worker = DeciderWorker(self.domain, self._workflow_executors,
+                               history_cache=self._history_cache)
         decisions = worker.decide(decision_response, self.task_list)
         return decisions
 
@@ -177,11 +245,14 @@ class DeciderWorker(object):
     :type _domain: swf.models.Domain
     :ivar _workflow_executors: executors.
     :type _workflow_executors: dict[str, simpleflow.swf.executor.Executor]
+    :ivar _history_cache: parsed histories of previous decision tasks.
+    :type _history_cache: Optional[simpleflow.history.HistoryCache]
     """
 
-    def __init__(self, domain, workflow_executors):
+    def __init__(self, domain, workflow_executors, history_cache=None):
         self._domain = domain
         self._workflow_executors = workflow_executors
+        self._history_cache = history_cache
 
     def decide(self, decision_response, task_list):
         """
@@ -208,7 +279,10 @@ class DeciderWorker(object):
             )
             self._workflow_executors[workflow_name] = workflow_executor
         try:
-            decisions = workflow_executor.replay(decision_response)
+            decisions = workflow_executor.replay(
+                decision_response,
+                history_cache=self._history_cache,
+            )
             if isinstance(decisions, tuple) and len(decisions) == 2:  # (decisions, obsolete context)
                 decisions = decisions[0]
         except Exception as err:
@@ -219,5 +293,8 @@ class DeciderWorker(object):
             decision = swf.models.decision.WorkflowExecutionDecision()
             decision.fail(reason=swf.format.reason(message), details=swf.format.details(details))
             decisions = [decision]
+            if self._history_cache is not None and decision_response.execution:
+                # Don't trust a history a failed replay may have left half-parsed
+                self._history_cache.pop(decision_response.execution.run_id)
 
         return decisions
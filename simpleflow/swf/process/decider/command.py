@@ -1,6 +1,8 @@
 from __future__ import absolute_import
 import logging
 
+from simpleflow import preload
+from simpleflow.swf import registration
 from . import helpers
 
 
@@ -8,7 +10,9 @@ logger = logging.getLogger(__name__)
 
 
 def start(workflows, domain, task_list, log_level=None, nb_processes=None,
-          repair_with=None, force_activities=None, is_standalone=False):
+          repair_with=None, force_activities=None, is_standalone=False,
+          preload_modules=None, gc_freeze=False, min_processes=None, max_processes=None,
+          cpu_affinity=False):
     """
     Start a decider.
     :param workflows:
@@ -22,21 +26,38 @@ def start(workflows, domain, task_list, log_level=None, nb_processes=None,
     :param nb_processes:
     :type nb_processes:
     :param repair_with:
-    :type repair_with: Optional[simpleflow.history.History]
+    :type repair_with: Optional[simpleflow.history.History | simpleflow.swf.repair.RepairIndex]
     :param force_activities:
     :type force_activities:
     :param is_standalone: Whether the executor use this task list (and pass it to the workers)
     :type is_standalone: bool
+    :param preload_modules: modules to import before forking the deciders
+    :type preload_modules: Optional[list[str]]
+    :param gc_freeze: call gc.freeze() before forking the deciders
+    :type gc_freeze: bool
+    :param min_processes: with autoscaling, minimum number of processes
+    :type min_processes: Optional[int]
+    :param max_processes: maximum number of processes; enables autoscaling
+    :type max_processes: Optional[int]
+    :param cpu_affinity: pin each process to a CPU
+    :type cpu_affinity: bool
     """
     if log_level:
         logger.warning(
             "Deprecated: --log-level will be removed, use LOG_LEVEL environment variable instead"
         )
+    preload.prepare(preload_modules)
     decider = helpers.make_decider(
         workflows, domain, task_list, nb_processes,
         repair_with=repair_with,
         force_activities=force_activities,
         is_standalone=is_standalone,
+        min_children=min_processes,
+        max_children=max_processes,
+        cpu_affinity=cpu_affinity,
     )
+    registration.register_types(domain, workflows=decider.poller.workflows)
+    if gc_freeze:
+        preload.freeze_gc()
     decider.is_alive = True
     decider.start()
@@ -23,7 +23,7 @@ def load_workflow_executor(domain, workflow_name, task_list=None, repair_with=No
     :param task_list:
     :type task_list: Optional[str]
     :param repair_with:
-    :type repair_with: Optional[simpleflow.history.History]
+    :type repair_with: Optional[simpleflow.history.History | simpleflow.swf.repair.RepairIndex]
     :param force_activities:
     :type force_activities: Optional[str]
     :return: Executor for this workflow
@@ -55,7 +55,7 @@ def make_decider_poller(workflows, domain, task_list, repair_with=None,
     :param task_list:
     :type task_list:
     :param repair_with:
-    :type repair_with: Optional[simpleflow.history.History]
+    :type repair_with: Optional[simpleflow.history.History | simpleflow.swf.repair.RepairIndex]
     :param force_activities:
     :type force_activities: Optional[str]
     :param is_standalone: Whether the executor use this task list (and pass it to the workers)
@@ -81,7 +81,8 @@ def make_decider_poller(workflows, domain, task_list, repair_with=None,
 
 def make_decider(workflows, domain, task_list, nb_children=None,
                  repair_with=None, force_activities=None,
-                 is_standalone=False):
+                 is_standalone=False, min_children=None, max_children=None,
+                 cpu_affinity=False):
     """
     Instantiate a Decider.
     :param workflows:
@@ -93,11 +94,17 @@ def make_decider(workflows, domain, task_list, nb_children=None,
     :param nb_children:
     :type nb_children: Optional[int]
     :param repair_with: previous history
-    :type repair_with: Optional[simpleflow.history.History]
+    :type repair_with: Optional[simpleflow.history.History | simpleflow.swf.repair.RepairIndex]
     :param force_activities: Regex matching the activities to force
     :type force_activities: Optional[str]
     :param is_standalone: Whether the executor use this task list (and pass it to the workers)
     :type is_standalone: bool
+    :param min_children: with autoscaling, minimum number of processes
+    :type min_children: Optional[int]
+    :param max_children: maximum number of processes; enables autoscaling
+    :type max_children: Optional[int]
+    :param cpu_affinity: pin each process to a CPU
+    :type cpu_affinity: bool
     :return:
     :rtype: Decider
     """
@@ -106,4 +113,6 @@ def make_decider(workflows, domain, task_list, nb_children=None,
                                  force_activities=force_activities,
                                  is_standalone=is_standalone,
                                  )
-    return Decider(poller, nb_children=nb_children)
+    return Decider(poller, nb_children=nb_children,
+                   min_children=min_children, max_children=max_children,
+                   cpu_affinity=cpu_affinity)
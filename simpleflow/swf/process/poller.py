@@ -1,27 +1,36 @@
+from __future__ import division
+
 import abc
 import logging
+import math
 import os
 import signal
+import time
 
 import swf.actors
 import swf.exceptions
-from simpleflow import utils
+from simpleflow import settings, utils
 from simpleflow.process import NamedMixin, with_state
+from simpleflow.process.autoscaler import Autoscaler, LoadStats
 from simpleflow.swf.helpers import swf_identity
 
 
 logger = logging.getLogger(__name__)
 
 
-__all__ = ['Poller']
+__all__ = ['Poller', 'make_autoscaler']
 
 
 class Poller(swf.actors.Actor, NamedMixin):
     """Multi-processing implementation of a SWF actor.
 
+    :ivar stats: time spent polling and processing by the processes
+                 sharing this poller, read by the autoscaler
+    :type stats: simpleflow.process.autoscaler.LoadStats
     """
     def __init__(self, domain, task_list=None):
         self.is_alive = False
+        self.stats = LoadStats()
         self._named_mixin_properties = ["task_list"]
 
         super(Poller, self).__init__(domain, task_list)
@@ -73,11 +82,18 @@ class Poller(swf.actors.Actor, NamedMixin):
         self.is_alive = True
         self.set_process_name()
         while self.is_alive:
+            polling_at = time.time()
             try:
                 response = self._poll()
             except swf.exceptions.PollTimeout:
+                self.stats.add(idle=time.time() - polling_at)
                 continue
-            self.process(response)
+            processing_at = time.time()
+            self.stats.add(idle=processing_at - polling_at)
+            try:
+                self.process(response)
+            finally:
+                self.stats.add(busy=time.time() - processing_at)
 
     @with_state('stopping')
     def stop_gracefully(self):
@@ -163,3 +179,33 @@ class Poller(swf.actors.Actor, NamedMixin):
             )
             raise
         return response
+
+
+def make_autoscaler(poller, min_children=None, max_children=None):
+    """
+    Autoscaler sizing the processes of a poller after the backlog of its task
+    list and the idle ratio they report.
+
+    :param poller: poller with a count_pending() method
+    :type poller: Poller
+    :param min_children: default: 1
+    :type min_children: Optional[int]
+    :param max_children: None to disable autoscaling
+    :type max_children: Optional[int]
+    :rtype: Optional[simpleflow.process.autoscaler.Autoscaler]
+    """
+    if max_children is None:
+        return None
+    # A process handles several tasks at once with several executors
+    capacity = getattr(poller, 'nb_executors', 1)
+
+    def get_backlog():
+        return int(math.ceil(poller.count_pending() / capacity))
+
+    return Autoscaler(
+        min_children if min_children is not None else 1,
+        max_children,
+        get_backlog,
+        stats=poller.stats,
+        interval=settings.AUTOSCALE_INTERVAL,
+    )
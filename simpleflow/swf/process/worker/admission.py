@@ -0,0 +1,145 @@
+"""
+Admission control of activity tasks: a worker doesn't poll while its host
+is over budget, leaving the tasks to less loaded workers of the task list.
+"""
+from __future__ import absolute_import, division
+
+import logging
+import os
+import threading
+import time
+
+import psutil
+
+from simpleflow.process import cpu
+
+logger = logging.getLogger(__name__)
+
+
+# Delay between two checks of an overloaded host (seconds)
+CHECK_DELAY = 5
+
+MB = 1024 * 1024
+
+
+class AdmissionControl(object):
+    """
+    Checks the resources of the host before polling a task.
+
+    :ivar stats: number of checks, of delays and their reasons, and total
+                 delay in seconds
+    :type stats: dict
+    """
+    def __init__(self, max_load=None, min_available_memory=None, max_children_memory=None,
+                 check_delay=CHECK_DELAY):
+        """
+        :param max_load: 1-minute load average per available CPU
+        :type max_load: Optional[float]
+        :param min_available_memory: memory available on the host, in MB
+        :type min_available_memory: Optional[int]
+        :param max_children_memory: resident memory of the processes started
+                                    by the worker, in MB
+        :type max_children_memory: Optional[int]
+        :param check_delay: seconds between two checks when over budget
+        :type check_delay: float
+        """
+        self.max_load = max_load
+        self.min_available_memory = min_available_memory
+        self.max_children_memory = max_children_memory
+        self.check_delay = check_delay
+        self._nb_cpus = cpu.cpu_count()
+        self._lock = threading.Lock()
+        self.stats = {
+            'checks': 0,
+            'delays': 0,
+            'delay': 0.,
+            'reasons': {},
+        }
+
+    @classmethod
+    def from_limits(cls, max_load=None, min_available_memory=None, max_children_memory=None):
+        """
+        :return: an admission control, None without limits
+        :rtype: Optional[AdmissionControl]
+        """
+        if max_load is None and min_available_memory is None and max_children_memory is None:
+            return None
+        return cls(max_load, min_available_memory, max_children_memory)
+
+    def get_load(self):
+        """
+        :return: 1-minute load average per CPU
+        :rtype: float
+        """
+        return os.getloadavg()[0] / self._nb_cpus
+
+    @staticmethod
+    def get_available_memory():
+        """
+        :return: memory available on the host, in MB
+        :rtype: float
+        """
+        return psutil.virtual_memory().available / MB
+
+    @staticmethod
+    def get_children_memory():
+        """
+        :return: resident memory of the processes started by this one, in MB
+        :rtype: float
+        """
+        rss = 0
+        for child in psutil.Process().children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return rss / MB
+
+    def check(self):
+        """
+        Check the limits.
+
+        :return: why the host is over budget, None if it isn't
+        :rtype: Optional[str]
+        """
+        with self._lock:
+            self.stats['checks'] += 1
+        if self.max_load is not None:
+            load = self.get_load()
+            if load > self.max_load:
+                return 'load'
+        if self.min_available_memory is not None:
+            available = self.get_available_memory()
+            if available < self.min_available_memory:
+                return 'available_memory'
+        if self.max_children_memory is not None:
+            rss = self.get_children_memory()
+            if rss > self.max_children_memory:
+                return 'children_memory'
+        return None
+
+    def wait(self, is_alive=lambda: True):
+        """
+        Sleep while the host is over budget.
+
+        :param is_alive: stop waiting when it returns False
+        :type is_alive: () -> bool
+        :return: seconds waited
+        :rtype: float
+        """
+        reason = self.check()
+        if reason is None:
+            return 0.
+        start = time.time()
+        with self._lock:
+            self.stats['delays'] += 1
+            self.stats['reasons'][reason] = self.stats['reasons'].get(reason, 0) + 1
+        logger.info('admission: host over budget ({}), delaying polling'.format(reason))
+        while reason is not None and is_alive():
+            time.sleep(self.check_delay)
+            reason = self.check()
+        delay = time.time() - start
+        with self._lock:
+            self.stats['delay'] += delay
+        logger.info('admission: polling delayed by {:.1f}s, stats={}'.format(delay, self.stats))
+        return delay
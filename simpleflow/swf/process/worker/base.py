@@ -1,30 +1,61 @@
-import json
 import logging
 import multiprocessing
 import os
+import threading
+import time
 import traceback
 
 import psutil
+from future.moves import queue
 import swf.actors
 import swf.exceptions
 import swf.format
+import swf.querysets
+from simpleflow import codec
 from simpleflow.process import Supervisor, with_state
 from simpleflow.swf.process import Poller
+from simpleflow.swf import payloads, result_cache
+from simpleflow.swf.process.poller import make_autoscaler
 from simpleflow.swf.task import ActivityTask
 from simpleflow.swf.utils import sanitize_activity_context
-from simpleflow.utils import json_dumps
+from swf.core import connection_pool
 
+from .admission import AdmissionControl
 from .dispatch import dynamic_dispatcher
+from .heartbeat import HeartbeatManager, HeartbeatedTask
+from .prefork import ExecutorPool
 
 logger = logging.getLogger(__name__)
 
+# Delay between two checks of a running task (seconds)
+WAIT_DELAY = 1
+
+# Heartbeat timeout by (domain, activity type name, version)
+_heartbeat_timeouts = {}
+_heartbeat_timeouts_lock = threading.Lock()
+
 
 class Worker(Supervisor):
-    def __init__(self, poller, nb_children=None):
+    def __init__(self, poller, nb_children=None, min_children=None, max_children=None,
+                 cpu_affinity=False):
+        """
+        :param poller:
+        :type poller: simpleflow.swf.process.Poller
+        :param nb_children: number of processes, initial one with autoscaling
+        :type nb_children: Optional[int]
+        :param min_children: with autoscaling, minimum number of processes
+        :type min_children: Optional[int]
+        :param max_children: maximum number of processes; enables autoscaling
+        :type max_children: Optional[int]
+        :param cpu_affinity: pin each process to a CPU
+        :type cpu_affinity: bool
+        """
         self._poller = poller
         super(Worker, self).__init__(
             payload=self._poller.start,
             nb_children=nb_children,
+            autoscaler=make_autoscaler(poller, min_children, max_children),
+            cpu_affinity=cpu_affinity,
         )
 
 
@@ -33,7 +64,10 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
     Polls an activity and handles it in the worker.
 
     """
-    def __init__(self, domain, task_list, heartbeat=60):
+    def __init__(self, domain, task_list, heartbeat=60, prefork=False,
+                 max_tasks_per_child=None, max_memory_per_child=None,
+                 nb_executors=1, nb_pollers=1, max_load=None,
+                 min_available_memory=None, max_children_memory=None):
         """
 
         :param domain:
@@ -42,12 +76,45 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
         :type task_list:
         :param heartbeat:
         :type heartbeat:
+        :param prefork: run the tasks in a warm process instead of a new one
+        :type prefork: bool
+        :param max_tasks_per_child: with prefork, tasks run by a process
+                                    before it's replaced
+        :type max_tasks_per_child: Optional[int]
+        :param max_memory_per_child: with prefork, resident memory in MB
+                                     above which a process is replaced
+        :type max_memory_per_child: Optional[int]
+        :param nb_executors: number of tasks processed at the same time
+        :type nb_executors: int
+        :param nb_pollers: number of threads polling tasks for the
+                           executors, when there are several executors
+        :type nb_pollers: int
+        :param max_load: don't poll above this load average per CPU
+        :type max_load: Optional[float]
+        :param min_available_memory: don't poll below this memory (MB)
+                                     available on the host
+        :type min_available_memory: Optional[int]
+        :param max_children_memory: don't poll above this resident memory
+                                    (MB) of the task processes
+        :type max_children_memory: Optional[int]
         """
         self.nb_retries = 3
         # heartbeat=0 is a special value to disable heartbeating. We want to
         # replace it by None because multiprocessing.Process.join() treats
         # this as "no timeout"
         self._heartbeat = heartbeat or None
+        self.heartbeat_manager = None
+        if self._heartbeat:
+            self.heartbeat_manager = HeartbeatManager(self.heartbeat, self._heartbeat)
+        self._prefork = prefork
+        self._max_tasks_per_child = max_tasks_per_child
+        self._max_memory_per_child = max_memory_per_child
+        # Executor pools by thread
+        self._executor_pools = {}
+        self.nb_executors = max(1, nb_executors or 1)
+        self.nb_pollers = max(1, min(nb_pollers or 1, self.nb_executors))
+        self.admission_control = AdmissionControl.from_limits(
+            max_load, min_available_memory, max_children_memory)
 
         super(ActivityPoller, self).__init__(domain, task_list)
 
@@ -58,6 +125,113 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
             self.task_list,
         )
 
+    def start(self):
+        try:
+            if self.nb_executors > 1:
+                self.start_concurrently()
+            else:
+                super(ActivityPoller, self).start()
+        finally:
+            for executor_pool in list(self._executor_pools.values()):
+                executor_pool.stop()
+
+    @with_state('running')
+    def start_concurrently(self):
+        """
+        Poll tasks from *nb_pollers* threads and process them in
+        *nb_executors* threads.
+
+        A thread polls only when an executor is available, so that no task
+        waits in the process while it could be handled by another worker.
+        """
+        logger.info("starting %s on domain %s with %d executors",
+                    self.name, self.domain.name, self.nb_executors)
+        self.bind_signal_handlers()
+        self.is_alive = True
+        self.set_process_name()
+
+        available = threading.Semaphore(self.nb_executors)
+        requests = queue.Queue(maxsize=self.nb_executors)
+
+        def poll():
+            while self.is_alive:
+                available.acquire()
+                if not self.is_alive:
+                    available.release()
+                    break
+                try:
+                    response = self._poll()
+                except swf.exceptions.PollTimeout:
+                    available.release()
+                    continue
+                except Exception as err:
+                    logger.exception('cannot poll: {}'.format(err))
+                    available.release()
+                    time.sleep(1)
+                    continue
+                requests.put(response)
+
+        def execute():
+            while True:
+                waiting_at = time.time()
+                request = requests.get()
+                processing_at = time.time()
+                self.stats.add(idle=processing_at - waiting_at)
+                if request is None:
+                    break
+                try:
+                    self.process(request)
+                except Exception as err:
+                    logger.exception('cannot process task: {}'.format(err))
+                finally:
+                    self.stats.add(busy=time.time() - processing_at)
+                    available.release()
+
+        executors = [threading.Thread(target=execute, name='executor-{}'.format(index))
+                     for index in range(self.nb_executors)]
+        pollers = [threading.Thread(target=poll, name='poller-{}'.format(index))
+                   for index in range(self.nb_pollers)]
+        for thread in executors + pollers:
+            thread.daemon = True
+            thread.start()
+
+        # Join with a timeout so that signals are handled
+        while any(thread.is_alive() for thread in pollers):
+            for thread in pollers:
+                thread.join(WAIT_DELAY)
+        for _ in executors:
+            requests.put(None)
+        for thread in executors:
+            thread.join()
+
+    def get_executor_pool(self):
+        """
+        Executor pool of the current thread, None without prefork.
+
+        :rtype: Optional[ExecutorPool]
+        """
+        if not self._prefork:
+            return None
+        ident = threading.current_thread().ident
+        executor_pool = self._executor_pools.get(ident)
+        if executor_pool is None:
+            executor_pool = self._executor_pools.setdefault(ident, ExecutorPool(
+                self,
+                max_tasks=self._max_tasks_per_child,
+                max_memory=self._max_memory_per_child,
+            ))
+        return executor_pool
+
+    def _poll(self):
+        """
+        Poll a task once the host has enough resources to run it.
+        """
+        if self.admission_control is not None:
+            self.admission_control.wait(lambda: self.is_alive)
+            if not self.is_alive:
+                raise swf.exceptions.PollTimeout('stopping')
+        return super(ActivityPoller, self)._poll()
+
     @with_state('polling')
     def poll(self, task_list=None, identity=None):
         return swf.actors.ActivityWorker.poll(self, task_list, identity)
@@ -70,7 +244,42 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
         :type request: (str, swf.models.ActivityTask)
         """
         token, task = request
-        spawn(self, token, task, self._heartbeat)
+        heartbeat_timeout = self.get_heartbeat_timeout(task)
+        executor_pool = self.get_executor_pool()
+        if executor_pool is not None:
+            executor_pool.run(token, task, self._heartbeat, heartbeat_timeout)
+        else:
+            spawn(self, token, task, self._heartbeat, heartbeat_timeout)
+        logger.debug('connection pool: {}'.format(connection_pool.stats))
+
+    @staticmethod
+    def get_heartbeat_timeout(task):
+        """
+        Heartbeat timeout of a task: the default of its activity type, which
+        the type is registered and the decider schedules the tasks with. The
+        activity isn't imported, the processes running the tasks are forked
+        from here, and the type is described once per process.
+
+        :param task:
+        :type task: swf.models.ActivityTask
+        :return: timeout in seconds, None if unknown
+        :rtype: Optional[str|int]
+        """
+        activity_type = task.activity_type
+        key = (task.domain.name, activity_type.name, activity_type.version)
+        with _heartbeat_timeouts_lock:
+            if key in _heartbeat_timeouts:
+                return _heartbeat_timeouts[key]
+        try:
+            timeout = swf.querysets.ActivityTypeQuerySet(task.domain).get(
+                activity_type.name, activity_type.version).task_heartbeat_timeout
+        except Exception as err:
+            logger.debug('cannot get the heartbeat timeout of {}: {}'.format(
+                activity_type.name, err))
+            return None
+        with _heartbeat_timeouts_lock:
+            _heartbeat_timeouts[key] = timeout
+        return timeout
 
     @with_state('completing')
     def complete(self, token, result=None):
@@ -133,19 +342,26 @@ class ActivityWorker(object):
         """
         logger.debug('ActivityWorker.process() pid={}'.format(os.getpid()))
         activity = self.dispatch(task)
-        input = json.loads(task.input)
-        args = input.get('args', ())
-        kwargs = input.get('kwargs', {})
         context = sanitize_activity_context(task.context)
         try:
-            result = ActivityTask(activity, *args, context=context, **kwargs).execute()
+            input = payloads.resolve(codec.loads(task.input))
+            args = input.get('args', ())
+            kwargs = input.get('kwargs', {})
+            activity_task = ActivityTask(activity, *args, context=context, **kwargs)
+            cache = result_cache.get_cache() if activity.idempotent else None
+            if cache is not None:
+                result = cache.get_or_compute(activity, args, kwargs, activity_task.execute)
+            else:
+                result = activity_task.execute()
         except Exception as err:
             logger.exception("process error: {}".format(str(err)))
             tb = traceback.format_exc()
             return poller.fail(token, task, reason=str(err), details=tb)
 
         try:
-            poller._complete(token, json_dumps(result))
+            result = codec.dumps(result, input.get('codec'))
+            result = payloads.offload(result, context['workflow_id'], context['run_id'])
+            poller._complete(token, result)
         except Exception as err:
             logger.exception("complete error")
             reason = 'cannot complete task {}: {}'.format(
@@ -155,6 +371,24 @@ class ActivityWorker(object):
             poller.fail(token, task, reason)
 
 
+def get_heartbeat_manager(poller, heartbeat):
+    """
+    Heartbeat manager of the poller, or a new one if it doesn't have any.
+
+    :param poller:
+    :type poller: ActivityPoller
+    :param heartbeat: maximum heartbeat delay (seconds), None to disable
+    :type heartbeat: Optional[int]
+    :rtype: Optional[HeartbeatManager]
+    """
+    if not heartbeat:
+        return None
+    manager = getattr(poller, 'heartbeat_manager', None)
+    if manager is None:
+        manager = poller.heartbeat_manager = HeartbeatManager(poller.heartbeat, heartbeat)
+    return manager
+
+
 def process_task(poller, token, task):
     """
 
@@ -170,7 +404,7 @@ def process_task(poller, token, task):
     worker.process(poller, token, task)
 
 
-def spawn(poller, token, task, heartbeat=60):
+def spawn(poller, token, task, heartbeat=60, heartbeat_timeout=None):
     """
     Spawn a process and wait for it to end, sending heartbeats to SWF.
     :param poller:
@@ -179,8 +413,10 @@ def spawn(poller, token, task, heartbeat=60):
     :type token: str
     :param task:
     :type task: swf.models.ActivityTask
-    :param heartbeat: heartbeat delay (seconds)
-    :type heartbeat: int
+    :param heartbeat: maximum heartbeat delay (seconds), None to disable
+    :type heartbeat: Optional[int]
+    :param heartbeat_timeout: heartbeat timeout of the task (seconds)
+    :type heartbeat_timeout: Optional[str|int]
     """
     logger.debug('spawn() pid={} heartbeat={}'.format(os.getpid(), heartbeat))
     worker = multiprocessing.Process(
@@ -192,47 +428,31 @@ def spawn(poller, token, task, heartbeat=60):
     def worker_alive():
         return psutil.pid_exists(worker.pid)
 
-    while worker_alive():
-        worker.join(timeout=heartbeat)
-        if not worker_alive():
-            # Most certainly unneeded: we'll see
-            if worker.exitcode is None:
-                # race condition, try and re-join
-                worker.join(timeout=0)
+    manager = get_heartbeat_manager(poller, heartbeat)
+    with HeartbeatedTask(manager, token, task, worker.terminate, heartbeat_timeout) as heartbeated:
+        while worker_alive():
+            worker.join(timeout=WAIT_DELAY)
+            if heartbeated.stopped.is_set():
+                # Either the task was cancelled and the worker terminated,
+                # or it no longer exists and the subprocess is responsible
+                # for completing it.
+                # TODO: kill the worker at this point but make it configurable.
+                return
+            if not worker_alive():
+                # Most certainly unneeded: we'll see
                 if worker.exitcode is None:
-                    logger.warning("process {} is dead but multiprocessing doesn't know it (simpleflow bug)".format(
-                        worker.pid
-                    ))
-            if worker.exitcode != 0:
-                poller.fail(
-                    token,
-                    task,
-                    reason='process {} died: exit code {}'.format(
-                        worker.pid,
-                        worker.exitcode)
-                )
-            return
-        try:
-            logger.debug(
-                'heartbeating for pid={} (token={})'.format(worker.pid, token)
-            )
-            response = poller.heartbeat(token)
-        except swf.exceptions.DoesNotExistError as error:
-            # The subprocess is responsible for completing the task.
-            # Either the task or the workflow execution no longer exists.
-            logger.debug('heartbeat failed: {}'.format(error))
-            # TODO: kill the worker at this point but make it configurable.
-            return
-        except Exception as error:
-            # Let's crash if it cannot notify the heartbeat failed.  The
-            # subprocess will become orphan and the heartbeat timeout may
-            # eventually trigger on Amazon SWF side.
-            logger.error('cannot send heartbeat for task {}: {}'.format(
-                task.activity_type.name,
-                error))
-            raise
-
-        if response and response.get('cancelRequested'):
-            # Task cancelled.
-            worker.terminate()  # SIGTERM
-            return
+                    # race condition, try and re-join
+                    worker.join(timeout=0)
+                    if worker.exitcode is None:
+                        logger.warning("process {} is dead but multiprocessing doesn't know it (simpleflow bug)".format(
+                            worker.pid
+                        ))
+                if worker.exitcode != 0:
+                    poller.fail(
+                        token,
+                        task,
+                        reason='process {} died: exit code {}'.format(
+                            worker.pid,
+                            worker.exitcode)
+                    )
+                return
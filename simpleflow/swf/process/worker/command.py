@@ -1,6 +1,8 @@
 from __future__ import absolute_import
 
 import swf.models
+from simpleflow import preload
+from simpleflow.swf import registration
 
 from .base import (
     Worker,
@@ -8,7 +10,10 @@ from .base import (
 )
 
 
-def make_worker_poller(domain, task_list, heartbeat):
+def make_worker_poller(domain, task_list, heartbeat, prefork=False,
+                       max_tasks_per_child=None, max_memory_per_child=None,
+                       nb_executors=1, nb_pollers=1, max_load=None,
+                       min_available_memory=None, max_children_memory=None):
     """
     Make a worker poller for the domain and task list.
     :param domain:
@@ -17,14 +22,42 @@ def make_worker_poller(domain, task_list, heartbeat):
     :type task_list: str
     :param heartbeat:
     :type heartbeat: int
+    :param prefork: reuse a warm process to run the tasks
+    :type prefork: bool
+    :param max_tasks_per_child: tasks run by a warm process before it's replaced
+    :type max_tasks_per_child: Optional[int]
+    :param max_memory_per_child: memory (MB) above which a warm process is replaced
+    :type max_memory_per_child: Optional[int]
+    :param nb_executors: tasks processed at the same time by each process
+    :type nb_executors: int
+    :param nb_pollers: polling threads of each process
+    :type nb_pollers: int
+    :param max_load: don't poll above this load average per CPU
+    :type max_load: Optional[float]
+    :param min_available_memory: don't poll below this available memory (MB)
+    :type min_available_memory: Optional[int]
+    :param max_children_memory: don't poll above this memory (MB) of the tasks
+    :type max_children_memory: Optional[int]
     :return:
     :rtype: ActivityPoller
     """
     domain = swf.models.Domain(domain)
-    return ActivityPoller(domain, task_list, heartbeat)
+    return ActivityPoller(domain, task_list, heartbeat,
+                          prefork=prefork,
+                          max_tasks_per_child=max_tasks_per_child,
+                          max_memory_per_child=max_memory_per_child,
+                          nb_executors=nb_executors,
+                          nb_pollers=nb_pollers,
+                          max_load=max_load,
+                          min_available_memory=min_available_memory,
+                          max_children_memory=max_children_memory)
 
 
-def start(domain, task_list, nb_processes=None, heartbeat=60):
+def start(domain, task_list, nb_processes=None, heartbeat=60, prefork=False,
+          max_tasks_per_child=None, max_memory_per_child=None,
+          preload_modules=None, gc_freeze=False, nb_executors=1, nb_pollers=1,
+          min_processes=None, max_processes=None, cpu_affinity=False,
+          max_load=None, min_available_memory=None, max_children_memory=None):
     """
     Start a worker for the given domain and task_list.
     :param domain:
@@ -35,8 +68,48 @@ def start(domain, task_list, nb_processes=None, heartbeat=60):
     :type nb_processes: Optional[int]
     :param heartbeat: heartbeat frequency in seconds
     :type heartbeat: int
+    :param prefork: reuse a warm process to run the tasks
+    :type prefork: bool
+    :param max_tasks_per_child: tasks run by a warm process before it's replaced
+    :type max_tasks_per_child: Optional[int]
+    :param max_memory_per_child: memory (MB) above which a warm process is replaced
+    :type max_memory_per_child: Optional[int]
+    :param preload_modules: modules to import before forking the workers
+    :type preload_modules: Optional[list[str]]
+    :param gc_freeze: call gc.freeze() before forking the workers
+    :type gc_freeze: bool
+    :param nb_executors: tasks processed at the same time by each process
+    :type nb_executors: int
+    :param nb_pollers: polling threads of each process
+    :type nb_pollers: int
+    :param min_processes: with autoscaling, minimum number of processes
+    :type min_processes: Optional[int]
+    :param max_processes: maximum number of processes; enables autoscaling
+    :type max_processes: Optional[int]
+    :param cpu_affinity: pin each process, and the tasks it runs, to a CPU
+    :type cpu_affinity: bool
+    :param max_load: don't poll above this load average per CPU
+    :type max_load: Optional[float]
+    :param min_available_memory: don't poll below this available memory (MB)
+    :type min_available_memory: Optional[int]
+    :param max_children_memory: don't poll above this memory (MB) of the tasks
+    :type max_children_memory: Optional[int]
     """
-    poller = make_worker_poller(domain, task_list, heartbeat)
-    worker = Worker(poller, nb_processes)
+    preload.prepare(preload_modules)
+    registration.register_types(domain)
+    poller = make_worker_poller(domain, task_list, heartbeat,
+                                prefork=prefork,
+                                max_tasks_per_child=max_tasks_per_child,
+                                max_memory_per_child=max_memory_per_child,
+                                nb_executors=nb_executors,
+                                nb_pollers=nb_pollers,
+                                max_load=max_load,
+                                min_available_memory=min_available_memory,
+                                max_children_memory=max_children_memory)
+    worker = Worker(poller, nb_processes,
+                    min_children=min_processes, max_children=max_processes,
+                    cpu_affinity=cpu_affinity)
+    if gc_freeze:
+        preload.freeze_gc()
     worker.is_alive = True
     worker.start()
@@ -1,6 +1,12 @@
+from __future__ import division
+
+import heapq
+import itertools
 import logging
 import multiprocessing
 import os
+import random
+import threading
 import time
 
 import swf.exceptions
@@ -10,7 +16,7 @@ from simpleflow.utils import retry
 logger = logging.getLogger(__name__)
 
 
-__all__ = ['Heartbeater', 'HeartbeatProcess']
+__all__ = ['Heartbeater', 'HeartbeatProcess', 'HeartbeatManager']
 
 
 @deprecated
@@ -116,3 +122,300 @@ class Heartbeater(object):  # Are people using it?
         self._heartbeater.terminate()
 
         return self
+
+
+# Fraction of the heartbeat timeout of a task between two heartbeats.
+INTERVAL_RATIO = 1 / 3
+# Relative variation of the intervals, so that heartbeats don't all fall at
+# the same time.
+JITTER = 0.1
+# Heartbeats due in less than this delay (seconds) are sent together.
+COALESCE_DELAY = 1.0
+
+
+def parse_timeout(timeout):
+    """
+    :param timeout: timeout in seconds, or "NONE"
+    :type timeout: Optional[str|int|float]
+    :return: timeout in seconds, None if unlimited or invalid
+    :rtype: Optional[float]
+    """
+    try:
+        timeout = float(timeout)
+    except (TypeError, ValueError):
+        return None
+    return timeout if timeout > 0 else None
+
+
+class HeartbeatManager(object):
+    """Sends the heartbeats of all the tasks in flight from a single thread.
+
+    The interval of each task is a fraction of its heartbeat timeout, capped
+    by the default interval, with some jitter. Heartbeats due at about the
+    same time are sent in a single wake-up of the thread.
+
+    When SWF requests the cancellation of a task, its ``on_cancel`` callback
+    is called; when the task no longer exists, its ``on_lost`` callback is
+    called. Both are called from the heartbeat thread, after the task is
+    removed.
+
+    :ivar nb_heartbeats: number of heartbeats sent
+    :type nb_heartbeats: int
+    """
+
+    def __init__(self, heartbeat, interval=60):
+        """
+        :param heartbeat: callable sending a heartbeat
+        :type heartbeat: callable(token: str): dict
+        :param interval: default and maximum interval, in seconds
+        :type interval: int | float
+        """
+        self._heartbeat = heartbeat
+        self._interval = interval
+        self._tasks = {}
+        self._schedule = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = None
+        self._pid = None
+        # Guards the start of the thread
+        self._start_lock = threading.Lock()
+        self._start_lock_pid = os.getpid()
+        self.nb_heartbeats = 0
+
+    def get_interval(self, timeout=None):
+        """
+        :param timeout: heartbeat timeout of the task, in seconds
+        :type timeout: Optional[str|int|float]
+        :return: interval between two heartbeats, in seconds
+        :rtype: float
+        """
+        interval = self._interval
+        timeout = parse_timeout(timeout)
+        if timeout is not None:
+            interval = min(interval, timeout * INTERVAL_RATIO)
+        return interval * random.uniform(1 - JITTER, 1 + JITTER)
+
+    def _get_start_lock(self):
+        if self._start_lock_pid != os.getpid():
+            # A thread of the parent may have held it during the fork(); the
+            # child is still single-threaded when it first gets there.
+            self._start_lock = threading.Lock()
+            self._start_lock_pid = os.getpid()
+        return self._start_lock
+
+    def _ensure_started(self):
+        """
+        Start the thread unless it runs in this process. The caller holds
+        the start lock.
+        """
+        # Threads don't survive a fork()
+        if self._thread is None or self._pid != os.getpid():
+            self._tasks = {}
+            self._schedule = []
+            self._condition = threading.Condition()
+            self._pid = os.getpid()
+            self._stopped = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stopped,),
+                                            name='heartbeat')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop heartbeating all the tasks and wait for the thread to end. The
+        thread starts again if a task is added.
+        """
+        with self._get_start_lock():
+            if self._thread is None or self._pid != os.getpid():
+                return
+            with self._condition:
+                self._stopped.set()
+                self._tasks = {}
+                self._schedule = []
+                self._condition.notify()
+            thread, self._thread = self._thread, None
+        thread.join()
+
+    def add(self, token, task, on_cancel=None, on_lost=None, timeout=None):
+        """
+        Heartbeat a task until it's removed.
+
+        :param token:
+        :type token: str
+        :param task:
+        :type task: swf.models.ActivityTask
+        :param on_cancel: called when the cancellation of the task is requested
+        :type on_cancel: Optional[callable()]
+        :param on_lost: called when the task no longer exists
+        :type on_lost: Optional[callable()]
+        :param timeout: heartbeat timeout of the task, in seconds
+        :type timeout: Optional[str|int|float]
+        """
+        with self._lock():
+            interval = self.get_interval(timeout)
+            self._tasks[token] = (task, on_cancel, on_lost, interval)
+            self._push(token, time.time() + interval)
+
+    def remove(self, token):
+        """
+        Stop heartbeating a task.
+
+        :param token:
+        :type token: str
+        """
+        with self._lock():
+            self._tasks.pop(token, None)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __contains__(self, token):
+        return token in self._tasks
+
+    def _lock(self):
+        """
+        :return: the condition of the running thread, to lock the tasks
+        :rtype: threading.Condition
+        """
+        with self._get_start_lock():
+            self._ensure_started()
+            return self._condition
+
+    def _push(self, token, due):
+        heapq.heappush(self._schedule, (due, next(self._counter), token))
+        self._condition.notify()
+
+    def _pop_due(self, stopped):
+        """
+        Wait for heartbeats to be due and return them.
+
+        :param stopped: set when the manager is stopped
+        :type stopped: threading.Event
+        :return: the due heartbeats, None once stopped
+        :rtype: Optional[list[(str, swf.models.ActivityTask, callable, callable, float)]]
+        """
+        with self._condition:
+            while True:
+                if stopped.is_set():
+                    return None
+                # Drop removed tasks
+                while self._schedule and self._schedule[0][2] not in self._tasks:
+                    heapq.heappop(self._schedule)
+                if not self._schedule:
+                    self._condition.wait()
+                    continue
+                delay = self._schedule[0][0] - time.time()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                due = []
+                tokens = set()
+                limit = time.time() + COALESCE_DELAY
+                while self._schedule and self._schedule[0][0] <= limit:
+                    _, _, token = heapq.heappop(self._schedule)
+                    if token in self._tasks and token not in tokens:
+                        tokens.add(token)
+                        due.append((token,) + self._tasks[token])
+                if due:
+                    return due
+
+    def _run(self, stopped):
+        while True:
+            due = self._pop_due(stopped)
+            if due is None:
+                return
+            for token, task, on_cancel, on_lost, interval in due:
+                callback = self._send(token, task, on_cancel, on_lost)
+                with self._condition:
+                    if callback is not None:
+                        self._tasks.pop(token, None)
+                    elif token in self._tasks:
+                        self._push(token, time.time() + interval)
+                if callback is not None:
+                    try:
+                        callback()
+                    except Exception as error:
+                        logger.exception('heartbeat callback failed for task {}: {}'.format(
+                            task.activity_type.name, error))
+
+    def _send(self, token, task, on_cancel, on_lost):
+        """
+        Send a heartbeat.
+
+        :return: callback to call for the response, if any
+        :rtype: Optional[callable]
+        """
+        try:
+            logger.debug('heartbeating task {} (token={})'.format(
+                task.activity_type.name, token))
+            response = self._heartbeat(token) or {}
+            self.nb_heartbeats += 1
+        except swf.exceptions.DoesNotExistError as error:
+            # Either the task or the workflow execution no longer exists.
+            logger.debug('heartbeat failed: {}'.format(error))
+            return on_lost or (lambda: None)
+        except Exception as error:
+            # Try again at the next interval; the heartbeat timeout may
+            # eventually trigger on Amazon SWF side.
+            logger.error('cannot send heartbeat for task {}: {}'.format(
+                task.activity_type.name,
+                error))
+            return None
+
+        if response.get('cancelRequested'):
+            return on_cancel or (lambda: None)
+        return None
+
+
+class HeartbeatedTask(object):
+    """Context manager heartbeating a task run by another process.
+
+    ``stopped`` is set when the task is cancelled, after calling
+    ``terminate``, or when it no longer exists.
+
+    :ivar stopped:
+    :type stopped: threading.Event
+    :ivar cancelled: whether the cancellation of the task was requested
+    :type cancelled: bool
+    """
+
+    def __init__(self, manager, token, task, terminate, timeout=None):
+        """
+        :param manager: heartbeat manager, None to disable heartbeats
+        :type manager: Optional[HeartbeatManager]
+        :param token:
+        :type token: str
+        :param task:
+        :type task: swf.models.ActivityTask
+        :param terminate: terminate the process running the task
+        :type terminate: callable()
+        :param timeout: heartbeat timeout of the task, in seconds
+        :type timeout: Optional[str|int|float]
+        """
+        self._manager = manager
+        self._token = token
+        self._task = task
+        self._terminate = terminate
+        self._timeout = timeout
+        self.stopped = threading.Event()
+        self.cancelled = False
+
+    def _on_cancel(self):
+        self.cancelled = True
+        self.stopped.set()
+        self._terminate()
+
+    def _on_lost(self):
+        self.stopped.set()
+
+    def __enter__(self):
+        if self._manager is not None:
+            self._manager.add(self._token, self._task, self._on_cancel, self._on_lost,
+                              self._timeout)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._manager is not None:
+            self._manager.remove(self._token)
@@ -0,0 +1,238 @@
+"""
+Warm executor processes reused across activity tasks.
+
+In the default mode, each activity task runs in a new process (see
+:func:`simpleflow.swf.process.worker.base.spawn`), that imports the activity
+module again. With prefork enabled, each worker child keeps an executor
+process that runs the tasks one after the other and is recycled after a
+number of tasks or when its memory grows too much.
+
+Heartbeats, cancellation and process failures are handled as in the default
+mode, by the heartbeat manager of the worker.
+"""
+from __future__ import absolute_import
+
+import logging
+import multiprocessing
+import os
+import signal
+import traceback
+
+import psutil
+import swf.models
+
+from .heartbeat import HeartbeatedTask
+
+logger = logging.getLogger(__name__)
+
+
+def executor_loop(poller, connection):
+    """
+    Run the tasks received from the worker until it asks to stop or goes
+    away. The RSS of the process is sent back after each task.
+
+    :param poller:
+    :type poller: simpleflow.swf.process.worker.base.ActivityPoller
+    :param connection: executor end of the pipe
+    :type connection: multiprocessing.connection.Connection
+    """
+    # Avoid a circular import
+    from .base import ActivityWorker
+
+    # The worker's handler would only stop polling, but cancelling a task
+    # terminates its process.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    worker = ActivityWorker()
+    process = psutil.Process()
+    while True:
+        try:
+            data = connection.recv()
+        except EOFError:
+            break
+        if data is None:
+            break
+
+        task = swf.models.ActivityTask.from_poll(poller.domain, poller.task_list, data)
+        token = task.task_token
+        try:
+            worker.process(poller, token, task)
+        except Exception as err:
+            # Unlike in a spawned process, the task is failed here because
+            # the process is still alive.
+            logger.exception('process error: {}'.format(err))
+            poller.fail(token, task, reason=str(err), details=traceback.format_exc())
+
+        try:
+            connection.send(process.memory_info().rss)
+        except (IOError, OSError):
+            # The worker retired this executor while it was busy.
+            break
+
+
+class ExecutorProcess(object):
+    """
+    Process running activity tasks for a worker child.
+
+    :ivar nb_tasks: number of tasks sent to the process
+    :type nb_tasks: int
+    :ivar rss: resident memory of the process after its last task, in bytes
+    :type rss: int
+    """
+
+    def __init__(self, poller):
+        """
+        :param poller:
+        :type poller: simpleflow.swf.process.worker.base.ActivityPoller
+        """
+        self._connection, child_connection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=executor_loop,
+            args=(poller, child_connection),
+        )
+        self._process.start()
+        child_connection.close()
+        self.nb_tasks = 0
+        self.rss = 0
+
+    @property
+    def pid(self):
+        return self._process.pid
+
+    def is_alive(self):
+        return self._process.is_alive()
+
+    def run(self, poller, token, task, heartbeat=60, heartbeat_timeout=None):
+        """
+        Send a task to the process and wait for it to end, sending
+        heartbeats to SWF.
+
+        :param poller:
+        :type poller: simpleflow.swf.process.worker.base.ActivityPoller
+        :param token:
+        :type token: str
+        :param task:
+        :type task: swf.models.ActivityTask
+        :param heartbeat: maximum heartbeat delay (seconds), None to disable
+        :type heartbeat: Optional[int]
+        :param heartbeat_timeout: heartbeat timeout of the task (seconds)
+        :type heartbeat_timeout: Optional[str|int]
+        :return: whether the process can run another task
+        :rtype: bool
+        """
+        # Avoid a circular import
+        from .base import WAIT_DELAY, get_heartbeat_manager
+
+        self.nb_tasks += 1
+        self._connection.send(task.context)
+        manager = get_heartbeat_manager(poller, heartbeat)
+        with HeartbeatedTask(manager, token, task, self._process.terminate,
+                             heartbeat_timeout) as heartbeated:
+            while True:
+                try:
+                    ready = self._connection.poll(WAIT_DELAY)
+                except (IOError, OSError, EOFError):
+                    ready = True
+                if heartbeated.stopped.is_set():
+                    # Either the task was cancelled and the process
+                    # terminated, or it no longer exists; the process may
+                    # still complete it but can't be reused until then.
+                    return False
+                if ready:
+                    try:
+                        self.rss = self._connection.recv()
+                        return True
+                    except (IOError, OSError, EOFError):
+                        self._process.join()
+                        poller.fail(
+                            token,
+                            task,
+                            reason='process {} died: exit code {}'.format(
+                                self.pid,
+                                self._process.exitcode)
+                        )
+                        return False
+
+    def stop(self, wait=True):
+        """
+        Ask the process to exit once idle. A busy process isn't waited for.
+
+        :param wait: wait for an idle process to exit
+        :type wait: bool
+        """
+        try:
+            self._connection.send(None)
+        except (IOError, OSError):
+            pass
+        self._connection.close()
+        if wait:
+            self._process.join()
+
+
+class ExecutorPool(object):
+    """
+    Warm executor process of a worker child, recycled when it has run
+    *max_tasks* tasks or uses more than *max_memory* megabytes.
+
+    :ivar nb_executors: number of executor processes started
+    :type nb_executors: int
+    """
+
+    def __init__(self, poller, max_tasks=None, max_memory=None):
+        """
+        :param poller:
+        :type poller: simpleflow.swf.process.worker.base.ActivityPoller
+        :param max_tasks: tasks per executor process, unlimited if None
+        :type max_tasks: Optional[int]
+        :param max_memory: resident memory per executor process in MB,
+                           unlimited if None
+        :type max_memory: Optional[int]
+        """
+        self._poller = poller
+        self._max_tasks = max_tasks
+        self._max_memory = max_memory
+        self._executor = None
+        self._pid = None
+        self.nb_executors = 0
+
+    def _get_executor(self):
+        # An executor started before a fork belongs to the parent process.
+        if self._executor is None or self._pid != os.getpid() or not self._executor.is_alive():
+            self._executor = ExecutorProcess(self._poller)
+            self._pid = os.getpid()
+            self.nb_executors += 1
+            logger.debug('started executor process pid={}'.format(self._executor.pid))
+        return self._executor
+
+    def _must_recycle(self, executor):
+        if self._max_tasks and executor.nb_tasks >= self._max_tasks:
+            return 'max tasks reached ({})'.format(executor.nb_tasks)
+        if self._max_memory and executor.rss > self._max_memory * 1024 * 1024:
+            return 'max memory reached ({} bytes)'.format(executor.rss)
+        return None
+
+    def run(self, token, task, heartbeat=60, heartbeat_timeout=None):
+        """
+        Run a task in the executor process.
+
+        :param token:
+        :type token: str
+        :param task:
+        :type task: swf.models.ActivityTask
+        :param heartbeat: maximum heartbeat delay (seconds), None to disable
+        :type heartbeat: Optional[int]
+        :param heartbeat_timeout: heartbeat timeout of the task (seconds)
+        :type heartbeat_timeout: Optional[str|int]
+        """
+        executor = self._get_executor()
+        reusable = executor.run(self._poller, token, task, heartbeat, heartbeat_timeout)
+        reason = self._must_recycle(executor) if reusable else 'not reusable'
+        if reason:
+            logger.debug('recycling executor process pid={}: {}'.format(executor.pid, reason))
+            executor.stop(wait=reusable)
+            self._executor = None
+
+    def stop(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.stop()
+        self._executor = None
@@ -0,0 +1,285 @@
+"""
+Registration of activity and workflow types on SWF.
+
+Types are registered in bulk when a decider or a worker starts, including
+the child workflows the decider's workflows can start, and the types known to
+exist are kept in a process-wide cache. Scheduling a task only needs the name
+and version of its type, so it never calls the type APIs; a type is
+registered lazily only when SWF reports it doesn't exist.
+"""
+from __future__ import absolute_import
+
+import collections
+import logging
+import sys
+import threading
+from multiprocessing.pool import ThreadPool
+
+import swf.exceptions
+import swf.models
+from simpleflow import settings
+from simpleflow.registry import registry
+
+logger = logging.getLogger(__name__)
+
+
+ACTIVITY = 'activity'
+WORKFLOW = 'workflow'
+
+# Name and version of a type, all a decision needs to reference it.
+TypeRef = collections.namedtuple('TypeRef', 'name version')
+
+_lock = threading.Lock()
+_known_types = set()
+_type_refs = {}
+
+
+def _domain_name(domain):
+    return getattr(domain, 'name', domain)
+
+
+def _key(kind, domain, name, version):
+    return kind, _domain_name(domain), name, version
+
+
+def type_ref(name, version):
+    """
+    Shared reference to a type, for decisions.
+
+    :param name:
+    :type name: str
+    :param version:
+    :type version: str
+    :rtype: TypeRef
+    """
+    key = (name, version)
+    ref = _type_refs.get(key)
+    if ref is None:
+        ref = _type_refs.setdefault(key, TypeRef(name, version))
+    return ref
+
+
+def is_known(kind, domain, name, version):
+    """
+    :param kind: ACTIVITY or WORKFLOW
+    :type kind: str
+    :param domain:
+    :type domain: str | swf.models.Domain
+    :param name:
+    :type name: str
+    :param version:
+    :type version: str
+    :return: whether the type is known to exist on SWF
+    :rtype: bool
+    """
+    return _key(kind, domain, name, version) in _known_types
+
+
+def mark_known(kind, domain, name, version):
+    with _lock:
+        _known_types.add(_key(kind, domain, name, version))
+
+
+def forget(kind, domain, name, version):
+    with _lock:
+        _known_types.discard(_key(kind, domain, name, version))
+
+
+def clear():
+    """
+    Forget all the known types.
+    """
+    with _lock:
+        _known_types.clear()
+
+
+def activity_type_model(domain, activity):
+    """
+    :param domain:
+    :type domain: swf.models.Domain
+    :param activity:
+    :type activity: simpleflow.activity.Activity
+    :rtype: swf.models.ActivityType
+    """
+    kwargs = {}
+    for attr in ('task_list',
+                 'task_heartbeat_timeout',
+                 'task_schedule_to_close_timeout',
+                 'task_schedule_to_start_timeout',
+                 'task_start_to_close_timeout'):
+        value = getattr(activity, attr, None)
+        if value is not None:
+            kwargs[attr] = value
+    return swf.models.ActivityType(domain, activity.name, version=activity.version, **kwargs)
+
+
+def workflow_type_model(domain, workflow, name=None):
+    """
+    :param domain:
+    :type domain: swf.models.Domain
+    :param workflow:
+    :type workflow: type(simpleflow.workflow.Workflow)
+    :param name: type name, defaults to the name of the workflow
+    :type name: Optional[str]
+    :rtype: swf.models.WorkflowType
+    """
+    kwargs = {}
+    for attr in ('task_list',
+                 'child_policy',
+                 'execution_timeout',
+                 'decision_tasks_timeout'):
+        value = getattr(workflow, attr, None)
+        if value is not None:
+            kwargs[attr] = value
+    return swf.models.WorkflowType(domain, name or workflow.name,
+                                   version=workflow.version, **kwargs)
+
+
+def save_type(kind, model):
+    """
+    Register a type unless it's known to exist.
+
+    :param kind: ACTIVITY or WORKFLOW
+    :type kind: str
+    :param model:
+    :type model: swf.models.ActivityType | swf.models.WorkflowType
+    :return: whether the type was created
+    :rtype: bool
+    """
+    if is_known(kind, model.domain, model.name, model.version):
+        return False
+    logger.info('creating {} type {} in domain {}'.format(
+        kind, model.name, _domain_name(model.domain)))
+    try:
+        model.save()
+        created = True
+    except swf.exceptions.AlreadyExistsError:
+        # Could have been created by a concurrent process.
+        created = False
+    mark_known(kind, model.domain, model.name, model.version)
+    return created
+
+
+def registered_activities():
+    """
+    Activities of the simpleflow registry.
+
+    :rtype: list[simpleflow.activity.Activity]
+    """
+    activities = {}
+    for activity in registry.tasks():
+        activities[(activity.name, activity.version)] = activity
+    return list(activities.values())
+
+
+def child_workflow_name(workflow):
+    """
+    Type name of a workflow started as a child workflow.
+
+    :type workflow: type(simpleflow.workflow.Workflow)
+    :rtype: str
+    """
+    return workflow.__module__ + '.' + workflow.__name__
+
+
+def module_workflows(workflows):
+    """
+    Workflows defined in or imported by the modules of *workflows*: the
+    ones they can start as child workflows.
+
+    :type workflows: list[type(simpleflow.workflow.Workflow)]
+    :rtype: list[type(simpleflow.workflow.Workflow)]
+    """
+    from simpleflow.workflow import Workflow
+
+    found = {}
+    for workflow in workflows:
+        module = sys.modules.get(workflow.__module__)
+        for obj in list(vars(module).values()) if module is not None else ():
+            if (isinstance(obj, type) and issubclass(obj, Workflow) and obj is not Workflow and
+                    obj.version is not None):
+                found[child_workflow_name(obj)] = obj
+    return list(found.values())
+
+
+def register_types(domain, activities=None, workflows=None, child_workflows=None, nb_threads=None):
+    """
+    Concurrently register the types that are not known yet.
+
+    Child workflows are registered under the name their decisions use, the
+    path of their class.
+
+    Errors are logged and don't prevent the other registrations; a type
+    that couldn't be registered will be when a task of this type is
+    scheduled.
+
+    :param domain:
+    :type domain: str | swf.models.Domain
+    :param activities: defaults to the activities of the simpleflow registry
+    :type activities: Optional[list[simpleflow.activity.Activity]]
+    :param workflows:
+    :type workflows: Optional[list[type(simpleflow.workflow.Workflow)]]
+    :param child_workflows: defaults to the workflows of the modules of
+                            *workflows*
+    :type child_workflows: Optional[list[type(simpleflow.workflow.Workflow)]]
+    :param nb_threads: defaults to settings.TYPE_REGISTRATION_CONCURRENCY
+    :type nb_threads: Optional[int]
+    :return: number of types created, already existing and in error
+    :rtype: dict[str, int]
+    """
+    if not isinstance(domain, swf.models.Domain):
+        domain = swf.models.Domain(domain)
+    if activities is None:
+        activities = registered_activities()
+    workflows = workflows or []
+    if child_workflows is None:
+        child_workflows = module_workflows(workflows)
+
+    # (kind, type name, object), without duplicates
+    types = {}
+    for activity in activities:
+        types[(ACTIVITY, activity.name, activity.version)] = activity
+    for workflow in workflows:
+        types[(WORKFLOW, workflow.name, workflow.version)] = workflow
+    for workflow in child_workflows:
+        types[(WORKFLOW, child_workflow_name(workflow), workflow.version)] = workflow
+
+    todo = [
+        (kind, name, obj) for (kind, name, version), obj in types.items()
+        if not is_known(kind, domain, name, version)
+    ]
+
+    counts = {'created': 0, 'existing': len(types) - len(todo), 'errors': 0}
+    if not todo:
+        return counts
+
+    def register(item):
+        kind, name, obj = item
+        try:
+            if kind == ACTIVITY:
+                model = activity_type_model(domain, obj)
+            else:
+                model = workflow_type_model(domain, obj, name=name)
+            return 'created' if save_type(kind, model) else 'existing'
+        except Exception as err:
+            logger.warning('cannot register {} type {}: {}'.format(kind, name, err))
+            return 'errors'
+
+    if nb_threads is None:
+        nb_threads = settings.TYPE_REGISTRATION_CONCURRENCY
+    nb_threads = max(1, min(nb_threads, len(todo)))
+    if nb_threads == 1:
+        results = [register(item) for item in todo]
+    else:
+        pool = ThreadPool(nb_threads)
+        try:
+            results = pool.map(register, todo)
+        finally:
+            pool.close()
+            pool.join()
+
+    for result in results:
+        counts[result] += 1
+    logger.info('registered types in domain {}: {created} created, '
+                '{existing} existing, {errors} errors'.format(domain.name, **counts))
+    return counts
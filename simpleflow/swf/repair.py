@@ -0,0 +1,154 @@
+"""
+Repair of a workflow execution with the results of a previous one.
+
+The activities and child workflows that completed in the previous execution
+are not run again: the decider records their result in a marker of the new
+execution, then uses it as if the task had just completed. Later replays
+find the result in the marker.
+
+The previous history is indexed in a SQLite file by ``RepairIndex``, so that
+all the decider processes share it: only its path is pickled. A result too
+large for a marker is offloaded with the payloads of the new execution when
+payload storage is enabled; otherwise the marker only holds the task id and
+the deciders read the result from the index.
+"""
+from __future__ import absolute_import
+
+import logging
+import os
+import sqlite3
+
+import swf.constants
+import swf.models.decision
+
+logger = logging.getLogger(__name__)
+
+
+MARKER_NAME = 'simpleflow.repair'
+
+# Types of the tasks reused from the previous execution.
+REPAIRED_TYPES = ('activity', 'child_workflow')
+
+# Result of a marker whose result is in the repair index.
+IN_INDEX = object()
+
+
+def make_marker(task_id, result):
+    """
+    Decision recording the result of a task in the previous execution.
+
+    The details are ``<task id>\\n<raw result>``: task ids cannot contain a
+    newline, and the result is kept as is.
+
+    :param task_id: activity or child workflow id
+    :type task_id: str
+    :param result: raw result, None if the task didn't return anything
+    :type result: Optional[str]
+    :return: the decision, None if the result doesn't fit in a marker
+    :rtype: Optional[swf.models.decision.MarkerDecision]
+    """
+    details = '{}\n{}'.format(task_id, result or '')
+    if len(details) > swf.constants.MAX_DETAILS_LENGTH:
+        return None
+    decision = swf.models.decision.MarkerDecision()
+    decision.record(MARKER_NAME, details=details)
+    return decision
+
+
+def make_index_marker(task_id):
+    """
+    Decision recording that a task reuses its result in the previous
+    execution, when the result doesn't fit in a marker: the details are only
+    the task id, the result is read from the repair index.
+
+    :param task_id: activity or child workflow id
+    :type task_id: str
+    :rtype: swf.models.decision.MarkerDecision
+    """
+    decision = swf.models.decision.MarkerDecision()
+    decision.record(MARKER_NAME, details=task_id)
+    return decision
+
+
+def parse_marker(details):
+    """
+    :param details: details of a repair marker
+    :type details: str
+    :return: the task id and its raw result, None if it didn't return
+             anything, IN_INDEX if it must be read from the repair index
+    :rtype: (str, Optional[str])
+    """
+    if '\n' not in details:
+        return details, IN_INDEX
+    task_id, result = details.split('\n', 1)
+    return task_id, result or None
+
+
+class RepairIndex(object):
+    """
+    Completed tasks of a previous execution, by id.
+
+    :ivar path: SQLite file
+    :type path: str
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+        self._pid = None
+
+    @classmethod
+    def build(cls, history, path):
+        """
+        Index the tasks that completed in a history.
+
+        :param history: parsed history of the previous execution
+        :type history: simpleflow.history.History
+        :param path: SQLite file to create
+        :type path: str
+        :rtype: RepairIndex
+        """
+        db = sqlite3.connect(path)
+        try:
+            db.execute('DROP TABLE IF EXISTS tasks')
+            db.execute('CREATE TABLE tasks (id TEXT PRIMARY KEY, type TEXT, result TEXT)')
+            db.executemany(
+                'INSERT OR REPLACE INTO tasks VALUES (?, ?, ?)',
+                (
+                    (task['id'], task['type'], task.get('result'))
+                    for task in history.tasks
+                    if task['type'] in REPAIRED_TYPES and task['state'] == 'completed'
+                ),
+            )
+            db.commit()
+            count = db.execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+        finally:
+            db.close()
+        logger.info('indexed {} completed tasks in {}'.format(count, path))
+        return cls(path)
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def _connection(self):
+        if self._db is None or self._pid != os.getpid():
+            # Connections inherited from the parent process are left alone
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._db
+
+    def get(self, task_id):
+        """
+        :param task_id: activity or child workflow id
+        :type task_id: str
+        :return: the task if it completed in the previous execution
+        :rtype: Optional[dict[str, Any]]
+        """
+        row = self._connection().execute(
+            'SELECT type, result FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        if row is None:
+            return None
+        return {'id': task_id, 'type': row[0], 'state': 'completed', 'result': row[1]}
@@ -0,0 +1,260 @@
+"""
+Offline replay of recorded workflow histories.
+
+A history is recorded once from SWF with :func:`save_history`, as a JSON
+file holding the execution and its raw events (gzipped if the path ends with
+``.gz``). :func:`replay` then runs the current workflow code on it through
+:meth:`simpleflow.swf.executor.Executor.replay`, as a decider would, without
+calling SWF: the models are bound to an :class:`OfflineConnection`.
+"""
+from __future__ import absolute_import, division
+
+import gc
+import gzip
+import io
+import json
+import logging
+import os
+import time
+import timeit
+
+import boto.swf.layer1
+from boto.regioninfo import RegionInfo
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+import swf.models
+from swf.responses import Response
+
+from simpleflow.swf.process.decider.helpers import load_workflow_executor
+from simpleflow.utils import json_dumps
+
+logger = logging.getLogger(__name__)
+
+try:
+    process_time = time.process_time
+except AttributeError:
+    # Python 2
+    process_time = time.clock
+
+
+class OfflineError(Exception):
+    """
+    SWF request made by an offline replay.
+    """
+
+
+class OfflineConnection(boto.swf.layer1.Layer1):
+    """
+    SWF connection of the models of a replay: any request fails.
+    """
+    def __init__(self):
+        # No endpoint, credentials nor HTTP connection
+        self.region = RegionInfo(name='offline', endpoint='offline')
+
+    def json_request(self, action, data, object_hook=None):
+        raise OfflineError('{} requested during an offline replay'.format(action))
+
+    def close(self):
+        pass
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 'b')
+    return io.open(path, mode + 'b')
+
+
+def save_history(path, execution, history=None):
+    """
+    Record the history of an execution.
+
+    :type path: str
+    :type execution: swf.models.WorkflowExecution
+    :param history: history of the execution; fetched from SWF if missing
+    :type history: Optional[swf.models.History]
+    """
+    if history is None:
+        history = execution.history()
+    record = {
+        'execution': {
+            'domain': execution.domain.name,
+            'workflow_id': execution.workflow_id,
+            'run_id': execution.run_id,
+            'workflow_type': {
+                'name': execution.workflow_type.name,
+                'version': execution.workflow_type.version,
+            },
+            'task_list': execution.task_list,
+        },
+        'events': [event.raw for event in history.events],
+    }
+    with _open(path, 'w') as fp:
+        fp.write(json_dumps(record).encode('utf-8'))
+
+
+def load_history(path):
+    """
+    Load a recorded history; its models are bound to an offline connection.
+
+    :type path: str
+    :rtype: (swf.models.WorkflowExecution, swf.models.History)
+    """
+    with _open(path, 'r') as fp:
+        record = json.loads(fp.read().decode('utf-8'))
+    data = record['execution']
+    connection = OfflineConnection()
+    domain = swf.models.Domain(data['domain'], connection=connection)
+    workflow_type = swf.models.WorkflowType(
+        domain,
+        data['workflow_type']['name'],
+        data['workflow_type']['version'],
+        connection=connection,
+    )
+    execution = swf.models.WorkflowExecution(
+        domain,
+        data['workflow_id'],
+        run_id=data['run_id'],
+        workflow_type=workflow_type,
+        task_list=data.get('task_list'),
+        connection=connection,
+    )
+    return execution, swf.models.History.from_event_list(record['events'])
+
+
+def find_histories(paths):
+    """
+    Recorded histories in these files or directories, recursively.
+
+    :type paths: list[str]
+    :rtype: list[str]
+    """
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+        for directory, _, filenames in os.walk(path):
+            found.extend(
+                os.path.join(directory, filename) for filename in filenames
+                if filename.endswith(('.json', '.json.gz'))
+            )
+    return sorted(found)
+
+
+class ReplayResult(object):
+    """
+    Outcome of the replay of a history.
+
+    :ivar decisions: decisions of the last replay
+    :type decisions: list[swf.models.decision.base.Decision]
+    :ivar wall_time: best wall time of a replay, in seconds
+    :type wall_time: float
+    :ivar cpu_time: best CPU time of a replay, in seconds
+    :type cpu_time: float
+    :ivar peak_memory: peak of memory allocated by a replay, in bytes, if
+        traced
+    :type peak_memory: Optional[int]
+    :ivar snapshot: memory allocated when the replay returned, if traced
+    :type snapshot: Optional[tracemalloc.Snapshot]
+    """
+    def __init__(self, path, execution, nb_events):
+        self.path = path
+        self.execution = execution
+        self.nb_events = nb_events
+        self.decisions = []
+        self.wall_time = None
+        self.cpu_time = None
+        self.peak_memory = None
+        self.snapshot = None
+
+    @property
+    def decision_types(self):
+        """
+        :rtype: list[str]
+        """
+        return [decision['decisionType'] for decision in self.decisions]
+
+
+def replay(path, workflow=None, repeat=1, profiler=None, trace_memory=False):
+    """
+    Replay a recorded history.
+
+    The wall and CPU times are the best of *repeat* replays; profiling and
+    tracing the memory take an extra replay each, so they don't distort
+    these times.
+
+    :param path: recorded history
+    :type path: str
+    :param workflow: path of the workflow class; defaults to the name of
+        the workflow type
+    :type workflow: Optional[str]
+    :type repeat: int
+    :param profiler: profiler enabled during a replay, if any
+    :type profiler: Optional[cProfile.Profile]
+    :param trace_memory: trace the allocations with ``tracemalloc``
+    :type trace_memory: bool
+    :rtype: ReplayResult
+    """
+    execution, history = load_history(path)
+    executor = load_workflow_executor(execution.domain,
+                                      workflow or execution.workflow_type.name,
+                                      task_list=execution.task_list)
+    response = Response(token='replay', history=history, execution=execution)
+    result = ReplayResult(path, execution, len(history.events))
+
+    for _ in range(repeat):
+        gc.collect()
+        wall_start, cpu_start = timeit.default_timer(), process_time()
+        result.decisions, _ = executor.replay(response)
+        wall_time = timeit.default_timer() - wall_start
+        cpu_time = process_time() - cpu_start
+        if result.wall_time is None or wall_time < result.wall_time:
+            result.wall_time = wall_time
+        if result.cpu_time is None or cpu_time < result.cpu_time:
+            result.cpu_time = cpu_time
+
+    if profiler is not None:
+        profiler.enable()
+        try:
+            executor.replay(response)
+        finally:
+            profiler.disable()
+
+    if trace_memory and tracemalloc is not None:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            executor.replay(response)
+            result.snapshot = tracemalloc.take_snapshot()
+            result.peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    elif trace_memory:
+        logger.warning('tracemalloc is not available, not tracing the memory')
+    return result
+
+
+def top_allocations(results, limit=10):
+    """
+    Lines holding the most memory when the replays returned, over the
+    traced results.
+
+    :type results: list[ReplayResult]
+    :type limit: int
+    :return: location, size in bytes and number of blocks of each line
+    :rtype: list[(str, int, int)]
+    """
+    allocations = {}
+    for result in results:
+        if result.snapshot is None:
+            continue
+        for stat in result.snapshot.statistics('lineno'):
+            location = str(stat.traceback)
+            size, count = allocations.get(location, (0, 0))
+            allocations[location] = (size + stat.size, count + stat.count)
+    ranked = sorted(allocations.items(), key=lambda item: item[1][0], reverse=True)
+    return [(location, size, count) for location, (size, count) in ranked[:limit]]
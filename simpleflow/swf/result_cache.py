@@ -0,0 +1,291 @@
+"""
+Cache of the results of idempotent activities, shared by all executions.
+
+When ``settings.RESULT_CACHE`` is set, a worker looks the result of an
+idempotent activity up under
+``<cache>/<activity name>/<version>/<hash of the arguments>.json`` before
+running it, and stores it once it succeeded. Identical calls running at the
+same time are computed once: the threads of a process wait for the first
+one, and other workers wait for the result as long as the lease stored
+next to the entry by the worker computing it is valid. The lease is short
+and renewed while computing, so that a dead worker is noticed quickly; a
+waiter stops waiting after half its own start-to-close timeout and computes
+the result itself. Leases are created atomically in a local directory; S3
+has no conditional writes, so two workers may rarely compute the same call.
+
+Entries expire after ``settings.RESULT_CACHE_TTL`` seconds; when the cache
+grows over ``settings.RESULT_CACHE_MAX_SIZE`` bytes, the oldest entries are
+evicted.
+"""
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+
+from simpleflow import codec, settings, storage
+from simpleflow.swf.utils import hash_arguments
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds a lease is valid, renewed every third of it while computing.
+LEASE_DURATION = 30
+
+# Longest wait for a result computed by another worker when the activity
+# has no start-to-close timeout.
+DEFAULT_MAX_WAIT = 300
+
+# Puts between two evictions.
+EVICTION_INTERVAL = 100
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Cache configured by the settings.
+
+    :return: the cache, None if disabled
+    :rtype: Optional[ResultCache]
+    """
+    if not settings.RESULT_CACHE:
+        return None
+    key = (settings.RESULT_CACHE, settings.RESULT_CACHE_TTL, settings.RESULT_CACHE_MAX_SIZE)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ResultCache(*key)
+        return cache
+
+
+def _max_wait(activity):
+    """
+    Half the start-to-close timeout of the activity: a worker waiting for a
+    result computed by another one still has time to compute it itself.
+    """
+    try:
+        return int(activity.task_start_to_close_timeout) / 2.0
+    except (TypeError, ValueError):
+        # None or "NONE"
+        return DEFAULT_MAX_WAIT
+
+
+def _read_lease(lease_url):
+    """
+    :return: expiration timestamp of a lease, 0 if there is none
+    :rtype: float
+    """
+    try:
+        content = storage.read(lease_url)
+    except Exception:
+        # Released
+        return 0
+    try:
+        return float(content)
+    except ValueError:
+        # Being written
+        return time.time() + LEASE_DURATION
+
+
+class ResultCache(object):
+    """
+    :ivar url: root of the entries
+    :type url: str
+    :ivar ttl: seconds an entry is valid; 0 for ever
+    :type ttl: int
+    :ivar max_size: bytes above which entries are evicted; 0 for no limit
+    :type max_size: int
+    :ivar poll_interval: seconds between two checks for a result computed
+        by another worker
+    :type poll_interval: float
+    :ivar lease_duration: seconds a lease is valid unless renewed
+    :type lease_duration: float
+    """
+
+    def __init__(self, url, ttl=0, max_size=0, poll_interval=1.0, lease_duration=LEASE_DURATION):
+        self.url = url.rstrip('/')
+        self.ttl = ttl
+        self.max_size = max_size
+        self.poll_interval = poll_interval
+        self.lease_duration = lease_duration
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._computing = {}
+
+    def entry_url(self, activity, args, kwargs):
+        """
+        :type activity: simpleflow.activity.Activity
+        :type args: Sequence[Any]
+        :type kwargs: Mapping[str, Any]
+        :rtype: str
+        """
+        return '{}/{}/{}/{}.json'.format(
+            self.url, activity.name, activity.version, hash_arguments(args, kwargs))
+
+    def get(self, url):
+        """
+        :param url: entry URL
+        :type url: str
+        :return: whether there is a valid entry, and its result
+        :rtype: (bool, Any)
+        """
+        try:
+            entry = codec.loads(storage.read(url))
+        except Exception as err:
+            logger.debug('no cached result at {}: {}'.format(url, err))
+            return False, None
+        if self.ttl and entry['created'] + self.ttl < time.time():
+            logger.debug('cached result at {} expired'.format(url))
+            storage.delete(url)
+            return False, None
+        return True, entry['result']
+
+    def put(self, url, result, payload_codec=None):
+        """
+        :param url: entry URL
+        :type url: str
+        :type result: Any
+        :param payload_codec: codec of the entry
+        :type payload_codec: Optional[str]
+        """
+        entry = codec.dumps({'created': time.time(), 'result': result}, payload_codec)
+        storage.write(url, entry, content_type='application/json')
+        with self._lock:
+            self._puts += 1
+            evict = self._puts % EVICTION_INTERVAL == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """
+        Delete the expired entries, then the oldest ones while the cache is
+        over its maximum size.
+
+        :return: number of deleted entries
+        :rtype: int
+        """
+        objects = sorted(
+            (obj for obj in storage.list_objects(self.url) if obj[0].endswith('.json')),
+            key=lambda obj: obj[2],
+        )
+        now = time.time()
+        total_size = sum(size for _, size, _ in objects)
+        count = 0
+        for url, size, modified in objects:
+            expired = self.ttl and modified + self.ttl < now
+            if not expired and (not self.max_size or total_size <= self.max_size):
+                continue
+            storage.delete(url)
+            total_size -= size
+            count += 1
+        if count:
+            logger.info('evicted {} cached results from {}'.format(count, self.url))
+        return count
+
+    def _acquire_lease(self, lease_url):
+        """
+        :return: whether the lease was acquired
+        :rtype: bool
+        """
+        expires = str(time.time() + self.lease_duration)
+        if storage.create(lease_url, expires):
+            return True
+        if _read_lease(lease_url) > time.time():
+            return False
+        # Expired: its holder died
+        storage.delete(lease_url)
+        return storage.create(lease_url, expires)
+
+    def _renew_lease(self, lease_url, stop):
+        while not stop.wait(self.lease_duration / 3.0):
+            storage.write(lease_url, str(time.time() + self.lease_duration))
+
+    def _wait(self, url, lease_url, max_wait):
+        """
+        Wait for the result computed by another worker, while its lease is
+        valid and at most *max_wait* seconds.
+
+        :return: whether the result is there, and the result
+        :rtype: (bool, Any)
+        """
+        deadline = time.time() + max_wait
+        while True:
+            expires = _read_lease(lease_url)
+            hit, result = self.get(url)
+            now = time.time()
+            if hit or expires < now or deadline < now:
+                return hit, result
+            time.sleep(self.poll_interval)
+
+    def _local_lock(self, url):
+        with self._lock:
+            lock, users = self._computing.get(url, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._computing[url] = (lock, users + 1)
+        return lock
+
+    def _release_local_lock(self, url):
+        with self._lock:
+            lock, users = self._computing[url]
+            if users == 1:
+                del self._computing[url]
+            else:
+                self._computing[url] = (lock, users - 1)
+
+    def get_or_compute(self, activity, args, kwargs, compute):
+        """
+        Cached result of an activity, computed if needed.
+
+        :type activity: simpleflow.activity.Activity
+        :type args: Sequence[Any]
+        :type kwargs: Mapping[str, Any]
+        :param compute: run the activity
+        :type compute: () -> Any
+        :rtype: Any
+        """
+        url = self.entry_url(activity, args, kwargs)
+        lock = self._local_lock(url)
+        try:
+            with lock:
+                return self._get_or_compute(url, activity, compute)
+        finally:
+            self._release_local_lock(url)
+
+    def _get_or_compute(self, url, activity, compute):
+        hit, result = self.get(url)
+        lease_url = url[:-len('.json')] + '.lease'
+        leased = not hit and self._acquire_lease(lease_url)
+        if not hit and not leased:
+            logger.info('waiting for {} to be computed by another worker'.format(url))
+            hit, result = self._wait(url, lease_url, _max_wait(activity))
+            if not hit:
+                # Computed anyway if the other worker is still at it
+                leased = self._acquire_lease(lease_url)
+        if hit:
+            self.hits += 1
+            logger.info('using the cached result of {}'.format(activity.name))
+            return result
+
+        self.misses += 1
+        stop = threading.Event()
+        if leased:
+            renewal = threading.Thread(target=self._renew_lease, args=(lease_url, stop))
+            renewal.daemon = True
+            renewal.start()
+        try:
+            result = compute()
+            try:
+                self.put(url, result, activity.codec)
+            except Exception as err:
+                logger.warning('cannot cache the result of {}: {}'.format(activity.name, err))
+            return result
+        finally:
+            if leased:
+                stop.set()
+                renewal.join()
+                storage.delete(lease_url)
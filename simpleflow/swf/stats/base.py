@@ -1,6 +1,14 @@
-from itertools import chain
+from datetime import datetime
 
-from future.utils import iteritems
+import pytz
+
+from .columnar import ColumnarHistory
+
+
+def _to_datetime(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=pytz.UTC)
 
 
 def get_start_to_close_timing(event):
@@ -20,6 +28,15 @@ def get_start_to_close_timing(event):
 class WorkflowStats(object):
     def __init__(self, history):
         self._history = history
+        self._columnar_history = None
+
+    def _columnar(self):
+        """
+        :rtype: ColumnarHistory
+        """
+        if self._columnar_history is None:
+            self._columnar_history = ColumnarHistory(self._history.raw_history)
+        return self._columnar_history
 
     def total_time(self):
         """
@@ -48,17 +65,13 @@ class WorkflowStats(object):
              ('activity-module.otherfunc-1', 'completed', scheduled, start, end, 13.37)]
 
         """
-        history = self._history
-        history.parse()
-
-        events = chain(
-            iteritems(history._activities),
-            iteritems(history._child_workflows),
-        )
-        return [
-            (name,) + get_start_to_close_timing(attributes) for
-            name, attributes in events
-        ]
+        rows = []
+        for name, last_state, scheduled, start, end, _ in self._columnar().get_timings():
+            start = _to_datetime(start)
+            end = _to_datetime(end)
+            duration = (end - start).total_seconds() if start is not None else None
+            rows.append((name, last_state, _to_datetime(scheduled), start, end, duration))
+        return rows
 
     def get_timings_with_percentage(self):
         """
@@ -0,0 +1,383 @@
+"""
+Columnar representation of a workflow execution history.
+
+The events of a ``swf.models.history.History`` are stored in parallel arrays
+(event id, type code, state code, timestamp, scheduled event id, task and
+name indexes) built in a single pass over the raw events. Timing and
+concurrency queries then work on these arrays without building dicts nor
+datetime objects; they are vectorized when numpy is installed.
+"""
+from __future__ import absolute_import, division
+
+import array
+from builtins import range
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Event type -> attribute holding the task id on the first event of a task
+TASK_ID_KEYS = {
+    'ActivityTask': 'activityId',
+    'ChildWorkflowExecution': 'workflowId',
+}
+
+# Event type -> attribute referencing the first event of a task
+TASK_REFERENCE_KEYS = {
+    'ActivityTask': 'scheduledEventId',
+    'ChildWorkflowExecution': 'initiatedEventId',
+}
+
+# Events that are not part of the life of a task
+IGNORED_STATES = frozenset((
+    'cancel_requested',
+    'request_cancel_failed',
+))
+
+# Event type -> attribute holding the task type
+TASK_TYPE_KEYS = {
+    'ActivityTask': 'activityType',
+    'ChildWorkflowExecution': 'workflowType',
+}
+
+
+def _as_ndarray(values):
+    """
+    numpy view of an ``array.array``, without copy.
+
+    :type values: array.array
+    :rtype: numpy.ndarray
+    """
+    return numpy.frombuffer(values, dtype='{}{}'.format(
+        'f' if values.typecode == 'd' else 'i', values.itemsize))
+
+
+def _to_list(values):
+    """
+    :param values: floats, NaN when unknown
+    :type values: numpy.ndarray
+    :return: the values, None when unknown
+    :rtype: list[Optional[float]]
+    """
+    result = values.astype(object)
+    result[numpy.isnan(values)] = None
+    return result.tolist()
+
+
+class ColumnarHistory(object):
+    """
+    History events as parallel arrays.
+
+    Events that belong to a task (activity or child workflow) carry the
+    index of the task in ``tasks``; other events have ``-1``.
+
+    :ivar event_id: event ids
+    :type event_id: array.array
+    :ivar type_code: index of the event type in ``types``
+    :type type_code: array.array
+    :ivar state_code: index of the event state in ``states``
+    :type state_code: array.array
+    :ivar timestamp: event timestamps, in seconds since the epoch
+    :type timestamp: array.array
+    :ivar scheduled_event_id: id of the event that scheduled or initiated
+                              the task, 0 if none
+    :type scheduled_event_id: array.array
+    :ivar task_index: index of the task in ``tasks``, -1 if none
+    :type task_index: array.array
+    :ivar name_index: index of the task name in ``names``, -1 if none
+    :type name_index: array.array
+    :ivar types: event types
+    :type types: list[str]
+    :ivar states: event states
+    :type states: list[str]
+    :ivar names: activity and workflow type names
+    :type names: list[str]
+    :ivar tasks: task ids, in order of appearance
+    :type tasks: list[str]
+    :ivar task_types: event type of each task, e.g. 'ActivityTask'
+    :type task_types: list[str]
+    """
+
+    def __init__(self, history):
+        """
+        :param history: raw history
+        :type history: swf.models.history.History | list[swf.models.event.Event]
+        """
+        self.event_id = array.array('l')
+        self.type_code = array.array('b')
+        self.state_code = array.array('b')
+        self.timestamp = array.array('d')
+        self.scheduled_event_id = array.array('l')
+        self.task_index = array.array('l')
+        self.name_index = array.array('l')
+
+        self.types = []
+        self.states = []
+        self.names = []
+        self.tasks = []
+        self.task_types = []
+
+        self._build(getattr(history, 'events', history))
+
+    def __len__(self):
+        return len(self.event_id)
+
+    @staticmethod
+    def _code(table, codes, value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(table)
+            table.append(value)
+        return code
+
+    def _build(self, events):
+        type_codes = {}
+        state_codes = {}
+        name_codes = {}
+        task_codes = {}
+
+        for event in events:
+            event_type = event.type
+            attributes = event.attributes
+            scheduled_id = 0
+            task = -1
+            name = -1
+
+            if event_type in TASK_ID_KEYS and event.state not in IGNORED_STATES:
+                reference = attributes.get(TASK_REFERENCE_KEYS[event_type])
+                if reference:
+                    scheduled_id = reference
+                    task = self.task_index[reference - 1]
+                    name = self.name_index[reference - 1]
+                else:
+                    task_id = attributes.get(TASK_ID_KEYS[event_type])
+                    if task_id is not None:
+                        if task_id not in task_codes:
+                            self.task_types.append(event_type)
+                        task = self._code(self.tasks, task_codes, task_id)
+                    task_type = attributes.get(TASK_TYPE_KEYS[event_type])
+                    if task_type:
+                        name = self._code(self.names, name_codes, task_type['name'])
+
+            self.event_id.append(event.id)
+            self.type_code.append(self._code(self.types, type_codes, event_type))
+            self.state_code.append(self._code(self.states, state_codes, event.state))
+            self.timestamp.append(float(event.raw['eventTimestamp']))
+            self.scheduled_event_id.append(scheduled_id)
+            self.task_index.append(task)
+            self.name_index.append(name)
+
+    def _code_of(self, table, value):
+        try:
+            return table.index(value)
+        except ValueError:
+            return -1
+
+    def total_time(self):
+        """
+        :return: time between the first and the last event, in seconds
+        :rtype: float
+        """
+        if not len(self):
+            return 0.
+        return self.timestamp[-1] - self.timestamp[0]
+
+    def _task_columns(self):
+        """
+        Per-task position of the last event, of the last scheduling and of
+        the last start (-1 if none); numpy arrays when numpy is installed.
+
+        :rtype: (list[int], list[int], list[int]) | (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        nb_tasks = len(self.tasks)
+        scheduled = self._code_of(self.states, 'scheduled')
+        started = self._code_of(self.states, 'started')
+
+        if numpy is not None:
+            task_index = _as_ndarray(self.task_index)
+            state_code = _as_ndarray(self.state_code)
+            positions = numpy.arange(len(self))
+            is_task = task_index >= 0
+
+            def last_position(mask):
+                result = numpy.full(nb_tasks, -1, dtype=numpy.int64)
+                numpy.maximum.at(result, task_index[mask], positions[mask])
+                return result
+
+            return (
+                last_position(is_task),
+                last_position(is_task & (state_code == scheduled)),
+                last_position(is_task & (state_code == started)),
+            )
+
+        last = [-1] * nb_tasks
+        last_scheduled = [-1] * nb_tasks
+        last_started = [-1] * nb_tasks
+        state_code = self.state_code
+        for position, task in enumerate(self.task_index):
+            if task < 0:
+                continue
+            last[task] = position
+            state = state_code[position]
+            if state == scheduled:
+                last_scheduled[task] = position
+            elif state == started:
+                last_started[task] = position
+        return last, last_scheduled, last_started
+
+    def _timing_arrays(self):
+        """
+        Timing columns of the tasks, activities first then child workflows,
+        as numpy arrays. Unknown timestamps and durations are NaN.
+
+        :return: task indexes, last state codes, scheduled, start and end
+                 timestamps, durations
+        :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        last, last_scheduled, last_started = self._task_columns()
+        timestamp = _as_ndarray(self.timestamp)
+        state_code = _as_ndarray(self.state_code)
+
+        is_child = numpy.array([kind != 'ActivityTask' for kind in self.task_types], dtype=bool)
+        # Stable: tasks of each kind stay in order of appearance
+        order = numpy.argsort(is_child, kind='mergesort')
+        last = last[order]
+        last_scheduled = last_scheduled[order]
+        last_started = last_started[order]
+
+        def timestamps(positions, known):
+            result = numpy.full(len(positions), numpy.nan)
+            result[known] = timestamp[positions[known]]
+            return result
+
+        has_started = last_started >= 0
+        scheduled = timestamps(last_scheduled, (last_scheduled >= 0) & ~is_child[order])
+        start = timestamps(last_started, has_started)
+        end = timestamps(last, has_started)
+        return order, state_code[last], scheduled, start, end, end - start
+
+    def _timing_rows(self, arrays):
+        """
+        :param arrays: result of :meth:`_timing_arrays`
+        :rtype: list[(str, str, float, float, float, float)]
+        """
+        order, state, scheduled, start, end, duration = arrays
+        tasks = self.tasks
+        states = self.states
+        return list(zip(
+            [tasks[task] for task in order.tolist()],
+            [states[code] for code in state.tolist()],
+            _to_list(scheduled),
+            _to_list(start),
+            _to_list(end),
+            _to_list(duration),
+        ))
+
+    def get_timings(self):
+        """
+        Time spent in each task between its start and its last event.
+
+        Activities come first, then child workflows. Child workflows have
+        no scheduled timestamp.
+
+        :return: (task id, last state, scheduled, start, end, duration);
+                 timestamps are floats, None when unknown.
+        :rtype: list[(str, str, float, float, float, float)]
+        """
+        if numpy is not None:
+            return self._timing_rows(self._timing_arrays())
+
+        last, last_scheduled, last_started = self._task_columns()
+        timestamp = self.timestamp
+        state_code = self.state_code
+        states = self.states
+
+        rows = []
+        for kind in ('ActivityTask', 'ChildWorkflowExecution'):
+            for task in range(len(self.tasks)):
+                if self.task_types[task] != kind:
+                    continue
+                position = last[task]
+                state = states[state_code[position]]
+                scheduled = None
+                if kind == 'ActivityTask' and last_scheduled[task] >= 0:
+                    scheduled = timestamp[last_scheduled[task]]
+                if last_started[task] < 0:
+                    start = end = duration = None
+                else:
+                    start = timestamp[last_started[task]]
+                    end = timestamp[position]
+                    duration = end - start
+                rows.append((self.tasks[task], state, scheduled, start, end, duration))
+        return rows
+
+    def get_timings_with_percentage(self):
+        """
+        Same as :meth:`get_timings` with the percentage of the total time
+        appended; tasks that didn't run are None.
+
+        :rtype: list[Optional[(str, str, float, float, float, float, float)]]
+        """
+        total_time = self.total_time()
+        if numpy is not None:
+            arrays = self._timing_arrays()
+            duration = arrays[-1]
+            # Tasks that didn't run have a NaN or null duration
+            has_run = numpy.nan_to_num(duration) != 0
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                percentage = duration / total_time * 100.
+            return [
+                (row + (percent,) if ran else None)
+                for row, percent, ran in zip(self._timing_rows(arrays), percentage.tolist(), has_run.tolist())
+            ]
+
+        return [
+            (row + (row[-1] / total_time * 100.,) if row[-1] else None)
+            for row in self.get_timings()
+        ]
+
+    def get_concurrency(self):
+        """
+        Number of tasks running after each task start or end.
+
+        :return: (timestamp, number of running tasks)
+        :rtype: list[(float, int)]
+        """
+        if numpy is not None:
+            _, _, _, start, end, _ = self._timing_arrays()
+            has_started = ~numpy.isnan(start)
+            times = numpy.concatenate((start[has_started], end[has_started]))
+            nb_started = int(has_started.sum())
+            changes = numpy.concatenate((
+                numpy.ones(nb_started, dtype=numpy.int64),
+                -numpy.ones(nb_started, dtype=numpy.int64),
+            ))
+            # By time, ends before starts at the same time
+            order = numpy.lexsort((changes, times))
+            return list(zip(times[order].tolist(), numpy.cumsum(changes[order]).tolist()))
+
+        changes = []
+        for _, _, _, start, end, _ in self.get_timings():
+            if start is None:
+                continue
+            changes.append((start, 1))
+            if end is not None:
+                changes.append((end, -1))
+        # Ends before starts at the same time
+        changes.sort()
+
+        result = []
+        running = 0
+        for timestamp, change in changes:
+            running += change
+            result.append((timestamp, running))
+        return result
+
+    def max_concurrency(self):
+        """
+        :return: maximum number of tasks running at the same time
+        :rtype: int
+        """
+        return max([running for _, running in self.get_concurrency()] or [0])
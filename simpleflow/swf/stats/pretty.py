@@ -3,14 +3,16 @@ from datetime import datetime
 from functools import partial, wraps
 from itertools import chain
 
+import pytz
 from future.utils import iteritems
 
 from simpleflow import compat
 from simpleflow.history import History
+from simpleflow.swf import payloads
 from simpleflow.utils import json_dumps
 from tabulate import tabulate
 
-from . import WorkflowStats
+from .columnar import ColumnarHistory
 
 TEMPLATE = '''
 Workflow Execution {workflow_id}
@@ -136,8 +138,12 @@ def info(workflow_execution):
     return header, rows
 
 
+def _to_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=pytz.UTC)
+
+
 def profile(workflow_execution, nb_tasks=None):
-    stats = WorkflowStats(History(workflow_execution.history()))
+    history = ColumnarHistory(workflow_execution.history())
 
     header = (
         'Task',
@@ -150,26 +156,26 @@ def profile(workflow_execution, nb_tasks=None):
         'Percentage of total time',
     )
 
-    values = (
-        (task,
-         last_state,
-         scheduled.strftime(TIME_FORMAT) if scheduled else None,
-         (start - scheduled).total_seconds() if scheduled else None,
-         start.strftime(TIME_FORMAT) if start else None,
-         (end - start).total_seconds() if start else None,
-         end.strftime(TIME_FORMAT) if end else None,
-         percent) for task, last_state, scheduled, start, end, timing, percent in
-        (row for row in stats.get_timings_with_percentage() if row is not None)
-    )
     rows = sorted(
-        values,
+        (row for row in history.get_timings_with_percentage() if row is not None),
         key=operator.itemgetter(5),
         reverse=True,
     )
-
     if nb_tasks:
         rows = rows[:nb_tasks]
 
+    # Only build the datetimes of the displayed rows
+    rows = [
+        (task,
+         last_state,
+         _to_datetime(scheduled).strftime(TIME_FORMAT) if scheduled else None,
+         start - scheduled if scheduled else None,
+         _to_datetime(start).strftime(TIME_FORMAT) if start else None,
+         end - start if start else None,
+         _to_datetime(end).strftime(TIME_FORMAT) if end else None,
+         percent) for task, last_state, scheduled, start, end, timing, percent in rows
+    ]
+
     return header, rows
 
 
@@ -261,7 +267,7 @@ def get_task(workflow_execution, task_id, details=False):
                 task['version'],
                 state,
                 task[state + '_timestamp'],
-                task['input'],
+                payloads.resolve(task['input']),
                 task.get('result'),  # Absent for failed tasks
                 task.get('reason'),
             ]]
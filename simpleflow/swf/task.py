@@ -3,7 +3,8 @@ import logging
 import swf.models
 import swf.models.decision
 
-from simpleflow import task
+from simpleflow import codec, task
+from simpleflow.swf import payloads, registration
 
 logger = logging.getLogger(__name__)
 
@@ -31,26 +32,15 @@ class ActivityTask(task.ActivityTask):
         :type domain: swf.models.Domain
         :param task_list:
         :type task_list: Optional[str]
-        :param kwargs:
+        :param kwargs: timeouts, priority, the ``execution_context`` of the
+            executor, whose execution owns an offloaded input, and the
+            ``codec`` of the workflow.
         :return:
         :rtype: list[swf.models.decision.Decision]
         """
         activity = self.activity
-        # FIXME Always involve a GET call to the SWF API which introduces useless
-        # latency if the ActivityType already exists.
-        model = swf.models.ActivityType(
-            domain,
-            activity.name,
-            version=activity.version,
-        )
-
-        input = {
-            'args': self.args,
-            'kwargs': self.kwargs,
-        }
+        model = registration.type_ref(activity.name, activity.version)
 
-        if task_list is None:
-            task_list = activity.task_list
         task_timeout = kwargs.get(
             'task_timeout',
             activity.task_start_to_close_timeout,
@@ -67,6 +57,24 @@ class ActivityTask(task.ActivityTask):
             'heartbeat_timeout',
             activity.task_heartbeat_timeout,
         )
+
+        input = {
+            'args': self.args,
+            'kwargs': self.kwargs,
+        }
+        payload_codec = activity.codec or kwargs.get('codec')
+        if payload_codec:
+            # The worker encodes the result alike
+            input['codec'] = payload_codec
+        context = kwargs.get('execution_context') or {}
+        input = payloads.offload(
+            codec.dumps(input, payload_codec),
+            context.get('workflow_id'),
+            context.get('run_id'),
+        )
+
+        if task_list is None:
+            task_list = activity.task_list
         task_priority = kwargs.get('priority')
 
         decision = swf.models.decision.ActivityTaskDecision(
@@ -75,13 +83,14 @@ class ActivityTask(task.ActivityTask):
             activity_type=model,
             control=None,
             task_list=task_list,
-            input=input,
             task_timeout=str(task_timeout) if task_timeout else None,
             duration_timeout=str(duration_timeout) if duration_timeout else None,
             schedule_timeout=str(schedule_timeout) if schedule_timeout else None,
             heartbeat_timeout=str(heartbeat_timeout) if heartbeat_timeout else None,
             task_priority=task_priority,
         )
+        # Already encoded
+        decision.update_attributes({'input': input})
 
         return [decision]
 
@@ -119,12 +128,9 @@ class WorkflowTask(task.WorkflowTask):
         :rtype: list[swf.models.decision.Decision]
         """
         workflow = self.workflow
-        # FIXME Always involve a GET call to the SWF API which introduces useless
-        # latency if the WorkflowType already exists.
-        model = swf.models.WorkflowType(
-            domain,
-            workflow.__module__ + '.' + workflow.__name__,
-            version=workflow.version,
+        model = registration.type_ref(
+            registration.child_workflow_name(workflow),
+            workflow.version,
         )
 
         input = {
@@ -144,11 +150,11 @@ class WorkflowTask(task.WorkflowTask):
             workflow_id=self.id,
             workflow_type=model,
             task_list=task_list or self.task_list,
-            input=input,
             tag_list=tag_list,
             child_policy=getattr(workflow, 'child_policy', None),
             execution_timeout=str(execution_timeout) if execution_timeout else None,
         )
+        decision.update_attributes({'input': codec.dumps(input, getattr(workflow, 'codec', None))})
 
         return [decision]
 
@@ -1,9 +1,12 @@
 from __future__ import absolute_import
 
+import hashlib
+
 import swf.exceptions
 import swf.models
 import swf.querysets
 from simpleflow.history import History
+from simpleflow.utils import json_dumps
 
 
 # TODO: move this function inside a QuerySet object when we merge the
@@ -59,3 +62,15 @@ def sanitize_activity_context(context):
         "activity_id": context["activityId"],
         "input": context["input"]
     }
+
+
+def hash_arguments(args, kwargs):
+    """
+    Hash of the arguments of a task, stable across executions.
+
+    :type args: Sequence[Any]
+    :type kwargs: Mapping[str, Any]
+    :rtype: str
+    """
+    arguments = json_dumps({"args": args, "kwargs": kwargs}, sort_keys=True)
+    return hashlib.md5(arguments.encode('utf-8')).hexdigest()
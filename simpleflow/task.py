@@ -5,7 +5,7 @@ from copy import deepcopy
 
 from simpleflow.base import Submittable
 from . import futures
-from .activity import Activity
+from .activity import Activity, set_context
 
 
 def get_actual_value(value):
@@ -81,9 +81,10 @@ class ActivityTask(Task):
             return task.execute()
         else:
             # NB: the following line attaches some *state* to the callable, so it
-            # can be used directly for advanced usage. This works well because we
-            # don't do multithreading, but if we ever do, DANGER!
-            method.context = self.context
+            # can be used directly for advanced usage. It is kept per thread, so
+            # concurrent tasks of the same activity don't see each other's; the
+            # main thread also sets it as the ``context`` attribute of `method`.
+            set_context(method, self.context)
             return method(*self.args, **self.kwargs)
 
 
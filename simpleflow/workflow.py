@@ -2,7 +2,7 @@ from __future__ import absolute_import
 
 from simpleflow.base import Submittable
 from simpleflow.signal import WaitForSignal
-from . import canvas
+from . import batch, canvas
 from . import task
 from ._decorators import deprecated
 from .activity import Activity
@@ -26,6 +26,16 @@ class Workflow(Submittable):
     task_list = None
     task_priority = None
 
+    # On SWF, answer decision tasks whose new events can't change the state
+    # of any future (e.g. ActivityTaskStarted) without replaying the workflow.
+    # Hooks such as before_replay() are not called then, and a workflow
+    # that enables this must not depend on a future being running.
+    skip_idle_replays = False
+
+    # Codec of the payloads of the workflow and, unless they set theirs, of
+    # its activities; see simpleflow.codec.
+    codec = None
+
     def __init__(self, executor):
         self._executor = executor
 
@@ -96,6 +106,45 @@ class Workflow(Submittable):
         group = canvas.Group(*[task.ActivityTask(activity, *i) for i in iterable])
         return self.submit(group).futures
 
+    def map_batched(self, activity, iterable, batch_size=100, max_parallel=None, nb_threads=None):
+        """
+        Like :meth:`map`, but with one activity task per batch of
+        *batch_size* values, which runs *activity* on each of them.
+
+        The timeouts and retries of *activity* apply to a whole batch. A
+        failed value has a ``TaskFailed`` exception, raised when reading its
+        result if *activity* raises on failure; the other values of its
+        batch succeed.
+
+        :param activity: activity.
+        :type  activity: Activity
+        :param iterable: collections of arguments passed to the task.
+        :type  iterable: collection.Iterable[Any]
+        :param batch_size: values per activity task.
+        :type  batch_size: int
+        :param max_parallel: maximum number of batches running at once.
+        :type  max_parallel: Optional[int]
+        :param nb_threads: threads running the values of a batch on the
+                           worker; sequentially if unset.
+        :type  nb_threads: Optional[int]
+        :rtype: list[simpleflow.batch.BatchItemFuture]
+
+        """
+        items = list(iterable)
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        runner = batch.batch_activity(activity)
+        group = canvas.Group(
+            *[task.ActivityTask(runner, activity.name, values, nb_threads) for values in batches],
+            max_parallel=max_parallel
+        )
+        future = self.submit(group)
+        return [
+            batch.BatchItemFuture(future, batch_index, item_index, activity.name,
+                                  raises_on_failure=activity.raises_on_failure)
+            for batch_index, values in enumerate(batches)
+            for item_index in range(len(values))
+        ]
+
     def fail(self, reason, details=None):
         self._executor.fail(reason, details)
 
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import boto.exception
 
+from simpleflow import logger
+from swf.models.event import EventFactory
 from swf.models.history import History
 from swf.models.workflow import WorkflowExecution, WorkflowType
 from swf.actors.core import Actor
@@ -52,13 +54,46 @@ class Decider(Actor):
 
             raise ResponseError(e.body['message'])
 
+    def count_pending(self, task_list=None):
+        """Returns the approximate number of decision tasks waiting
+        in a task list
+
+        :param  task_list: task list to count; defaults to the actor's
+        :type   task_list: str
+
+        :returns: number of pending decision tasks
+        :rtype: int
+        """
+        task_list = task_list or self.task_list
+        try:
+            response = self.connection.count_pending_decision_tasks(
+                self.domain.name,
+                task_list,
+            )
+        except boto.exception.SWFResponseError as e:
+            if e.error_code == 'UnknownResourceFault':
+                raise DoesNotExistError(
+                    "Unable to count decision tasks",
+                    e.body['message'],
+                )
+
+            raise ResponseError(e.body['message'])
+
+        return response['count']
+
     def poll(self, task_list=None,
              identity=None,
+             known_history=None,
              **kwargs):
         """
         Polls a decision task and returns the token and the full history of the
         workflow's events.
 
+        When *known_history* is given, the history is fetched newest events
+        first and the pagination stops as soon as an already known event is
+        reached: the new events are then appended to the known ones. If they
+        don't match, the remaining pages are fetched as usual.
+
         :param task_list: task list to poll for decision tasks from.
         :type task_list: str
 
@@ -67,11 +102,17 @@ class Decider(Actor):
         workflow history.
         :type identity: str
 
+        :param known_history: callable returning the history already known
+        for a run id, or None.
+        :type known_history: Optional[(str) -> Optional[swf.models.history.History]]
+
         :returns: a Response object with history, token, and execution set
         :rtype: swf.responses.Response
 
         """
         task_list = task_list or self.task_list
+        if known_history is not None:
+            kwargs['reverse_order'] = True
 
         task = self.connection.poll_for_decision_task(
             self.domain.name,
@@ -85,33 +126,35 @@ class Decider(Actor):
 
         events = task['events']
 
+        known = None
+        if known_history is not None:
+            known = known_history(task['workflowExecution']['runId']) or None
+        last_known_id = len(known) if known is not None else 0
+
         next_page = task.get('nextPageToken')
         while next_page:
-            try:
-                task = self.connection.poll_for_decision_task(
-                    self.domain.name,
-                    task_list=task_list,
-                    identity=identity,
-                    next_page_token=next_page,
-                    **kwargs
-                )
-            except boto.exception.SWFResponseError as e:
-                if e.error_code == 'UnknownResourceFault':
-                    raise DoesNotExistError(
-                        "Unable to poll decision task",
-                        e.body['message'],
-                    )
-
-                raise ResponseError(e.body['message'])
-
-            token = task.get('taskToken')
-            if token is None:
-                raise PollTimeout("Decider poll timed out")
-
-            events.extend(task['events'])
-            next_page = task.get('nextPageToken')
-
-        history = History.from_event_list(events)
+            if last_known_id and events and events[-1]['eventId'] <= last_known_id:
+                break
+            page = self._poll_page(task_list, identity, next_page, **kwargs)
+            events.extend(page['events'])
+            next_page = page.get('nextPageToken')
+
+        history = None
+        if known is not None:
+            history = self._extend_history(known, events)
+            if history is None:
+                logger.warning('cannot extend known history of run_id={}, '
+                               'fetching all of it'.format(
+                                   task['workflowExecution']['runId']))
+                while next_page:
+                    page = self._poll_page(task_list, identity, next_page, **kwargs)
+                    events.extend(page['events'])
+                    next_page = page.get('nextPageToken')
+
+        if history is None:
+            if kwargs.get('reverse_order'):
+                events.reverse()
+            history = History.from_event_list(events)
 
         workflow_type = WorkflowType(
             domain=self.domain,
@@ -127,3 +170,71 @@ class Decider(Actor):
 
         # TODO: move history into execution (needs refactoring on WorkflowExecution.history())
         return Response(token=token, history=history, execution=execution)
+
+    def _poll_page(self, task_list, identity, next_page_token, **kwargs):
+        """
+        Get the next page of the history of the polled decision task.
+
+        :type task_list: str
+        :type identity: str
+        :type next_page_token: str
+        :rtype: dict[str, Any]
+        """
+        try:
+            task = self.connection.poll_for_decision_task(
+                self.domain.name,
+                task_list=task_list,
+                identity=identity,
+                next_page_token=next_page_token,
+                **kwargs
+            )
+        except boto.exception.SWFResponseError as e:
+            if e.error_code == 'UnknownResourceFault':
+                raise DoesNotExistError(
+                    "Unable to poll decision task",
+                    e.body['message'],
+                )
+
+            raise ResponseError(e.body['message'])
+
+        if task.get('taskToken') is None:
+            raise PollTimeout("Decider poll timed out")
+        return task
+
+    @staticmethod
+    def _extend_history(known, events):
+        """
+        Append the new events of a reverse-ordered page list to *known*.
+
+        :param known: history already known
+        :type known: History
+        :param events: raw events, newest first, down to a known one
+        :type events: list[dict[str, Any]]
+        :return: the whole history, or None if *events* don't extend *known*
+        :rtype: Optional[History]
+        """
+        last_known_id = len(known)
+        last_known = known.events[-1].raw
+        tail = []
+        for event in events:
+            if event['eventId'] <= last_known_id:
+                if (event['eventId'] != last_known_id or
+                        event.get('eventType') != last_known.get('eventType') or
+                        event.get('eventTimestamp') != last_known.get('eventTimestamp')):
+                    return None
+                break
+            tail.append(event)
+        else:
+            return None
+
+        tail.reverse()
+        if tail and tail[0]['eventId'] != last_known_id + 1:
+            return None
+
+        raw = getattr(known, 'raw', None)
+        if raw is not None:
+            raw = raw + tail
+        return History(
+            events=known.events + [EventFactory(event) for event in tail],
+            raw=raw,
+        )
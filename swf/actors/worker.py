@@ -128,6 +128,33 @@ class ActivityWorker(Actor):
 
             raise ResponseError(e.body['message'])
 
+    def count_pending(self, task_list=None):
+        """Returns the approximate number of activity tasks waiting
+        in a task list
+
+        :param  task_list: task list to count; defaults to the actor's
+        :type   task_list: string
+
+        :returns: number of pending activity tasks
+        :rtype: int
+        """
+        task_list = task_list or self.task_list
+        try:
+            response = self.connection.count_pending_activity_tasks(
+                self.domain.name,
+                task_list,
+            )
+        except boto.exception.SWFResponseError as e:
+            if e.error_code == 'UnknownResourceFault':
+                raise DoesNotExistError(
+                    "Unable to count activity tasks",
+                    e.body['message'],
+                )
+
+            raise ResponseError(e.body['message'])
+
+        return response['count']
+
     def poll(self, task_list=None, identity=None):
         """Polls for an activity task to process from current
         actor's instance defined ``task_list``
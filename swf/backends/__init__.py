@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Backends replacing the SWF service, selected by URL:
+
+- ``sqlite:///path/to/swf.db``: an engine running in the current process
+  on a SQLite database, that other processes may share; the seconds a
+  poll waits for a task may be set with ``?poll_timeout=5``;
+- ``http://host:port``: an engine served by ``simpleflow swf.serve``.
+"""
+from __future__ import absolute_import
+
+import os
+import threading
+
+try:
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from urlparse import parse_qs, urlparse
+
+from .engine import Engine, Fault  # NOQA
+from .layer1 import Layer1, connect_to_server
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(path, **kwargs):
+    """
+    Engine of a database, shared in the current process.
+
+    :type path: str
+    :param kwargs: parameters of a new engine
+    :rtype: Engine
+    """
+    path = os.path.abspath(path)
+    with _engines_lock:
+        engine = _engines.get(path)
+        if engine is None:
+            engine = _engines[path] = Engine(path, **kwargs)
+        return engine
+
+
+def connect(url, aws_access_key_id=None, aws_secret_access_key=None):
+    """
+    Connection to a backend.
+
+    >>> connect('ftp://example.com')
+    Traceback (most recent call last):
+        ...
+    ValueError: unsupported SWF backend: ftp://example.com
+
+    :param url: see above
+    :type url: str
+    :rtype: boto.swf.layer1.Layer1
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == 'sqlite':
+        path, _, query = url[len('sqlite://'):].partition('?')
+        kwargs = {}
+        poll_timeout = parse_qs(query).get('poll_timeout')
+        if poll_timeout:
+            kwargs['poll_timeout'] = float(poll_timeout[0])
+        return Layer1(get_engine(path, **kwargs))
+    if parsed.scheme == 'http' and parsed.hostname:
+        return connect_to_server(parsed.hostname, parsed.port or 80,
+                                 aws_access_key_id, aws_secret_access_key)
+    raise ValueError('unsupported SWF backend: {}'.format(url))
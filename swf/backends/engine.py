@@ -0,0 +1,1438 @@
+# -*- coding: utf-8 -*-
+"""
+SWF-compatible engine storing its state in SQLite.
+
+It implements the actions of the SWF API used by simpleflow, taking and
+returning the same JSON documents as the service: the JSON body of a
+request becomes the *data* of :meth:`Engine.handle`. The database is in
+WAL mode, so that the processes of several supervisors can share it; each
+request is a transaction.
+
+Timeouts (timers, activity and decision task timeouts, execution timeouts)
+are processed lazily, by the requests following their due date; the
+long-polls wake up in time for the next one.
+"""
+from __future__ import absolute_import
+
+import base64
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from swf.utils import camel_to_underscore, decapitalize
+
+from .notify import Notifier
+
+
+# Seconds a poll waits for a task, as the SWF service
+POLL_TIMEOUT = 60
+
+# Maximum number of events or items per page
+PAGE_SIZE = 1000
+
+# Seconds to wait for the lock of the database
+BUSY_TIMEOUT = 30
+
+FAULT_PREFIX = 'com.amazonaws.swf.base.model#'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS domains (
+    name TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    description TEXT,
+    retention TEXT
+);
+CREATE TABLE IF NOT EXISTS types (
+    domain TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    status TEXT NOT NULL,
+    description TEXT,
+    configuration TEXT NOT NULL,
+    creation_date REAL NOT NULL,
+    deprecation_date REAL,
+    PRIMARY KEY (domain, kind, name, version)
+);
+CREATE TABLE IF NOT EXISTS executions (
+    run_id TEXT PRIMARY KEY,
+    domain TEXT NOT NULL,
+    workflow_id TEXT NOT NULL,
+    workflow_name TEXT NOT NULL,
+    workflow_version TEXT NOT NULL,
+    task_list TEXT NOT NULL,
+    configuration TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    status TEXT NOT NULL,
+    close_status TEXT,
+    start_timestamp REAL NOT NULL,
+    close_timestamp REAL,
+    parent_run_id TEXT,
+    parent_workflow_id TEXT,
+    parent_initiated_event_id INTEGER,
+    parent_started_event_id INTEGER,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    next_event_id INTEGER NOT NULL DEFAULT 1,
+    decision_state TEXT NOT NULL DEFAULT 'none',
+    decision_scheduled_id INTEGER,
+    decision_scheduled_at REAL,
+    decision_started_id INTEGER,
+    previous_started_id INTEGER NOT NULL DEFAULT 0,
+    decision_pending INTEGER NOT NULL DEFAULT 0,
+    latest_context TEXT,
+    latest_activity_timestamp REAL
+);
+CREATE INDEX IF NOT EXISTS executions_workflow_id
+    ON executions (domain, workflow_id, status);
+CREATE INDEX IF NOT EXISTS executions_decisions
+    ON executions (domain, task_list, decision_state, decision_scheduled_at);
+CREATE INDEX IF NOT EXISTS executions_parent
+    ON executions (parent_run_id, status);
+CREATE TABLE IF NOT EXISTS events (
+    run_id TEXT NOT NULL,
+    event_id INTEGER NOT NULL,
+    event_type TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    attributes TEXT NOT NULL,
+    PRIMARY KEY (run_id, event_id)
+);
+CREATE TABLE IF NOT EXISTS activity_tasks (
+    token TEXT PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    task_list TEXT NOT NULL,
+    activity_id TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    scheduled_at REAL NOT NULL,
+    scheduled_event_id INTEGER NOT NULL,
+    started_event_id INTEGER,
+    state TEXT NOT NULL,
+    cancel_requested_event_id INTEGER,
+    details TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS activity_tasks_id
+    ON activity_tasks (run_id, activity_id);
+CREATE INDEX IF NOT EXISTS activity_tasks_queue
+    ON activity_tasks (domain, task_list, state, priority, scheduled_at);
+CREATE TABLE IF NOT EXISTS timeouts (
+    id INTEGER PRIMARY KEY,
+    due REAL NOT NULL,
+    kind TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS timeouts_due ON timeouts (due);
+CREATE INDEX IF NOT EXISTS timeouts_ref ON timeouts (run_id, kind, ref);
+"""
+
+# Closing decisions: (event type, close status, event of the parent)
+CLOSING_DECISIONS = {
+    'CompleteWorkflowExecution': (
+        'WorkflowExecutionCompleted', 'COMPLETED', 'ChildWorkflowExecutionCompleted'),
+    'FailWorkflowExecution': (
+        'WorkflowExecutionFailed', 'FAILED', 'ChildWorkflowExecutionFailed'),
+    'CancelWorkflowExecution': (
+        'WorkflowExecutionCanceled', 'CANCELED', 'ChildWorkflowExecutionCanceled'),
+    'ContinueAsNewWorkflowExecution': (
+        'WorkflowExecutionContinuedAsNew', 'CONTINUED_AS_NEW', None),
+}
+
+ACTIVITY_TIMEOUTS = (
+    ('SCHEDULE_TO_START', 'scheduleToStartTimeout'),
+    ('SCHEDULE_TO_CLOSE', 'scheduleToCloseTimeout'),
+    ('START_TO_CLOSE', 'startToCloseTimeout'),
+    ('HEARTBEAT', 'heartbeatTimeout'),
+)
+
+
+class Fault(Exception):
+    """
+    Error returned by an action, as the SWF faults.
+
+    :ivar fault: e.g. 'UnknownResourceFault'
+    :type fault: str
+    :ivar cause: cause of the matching failure event, e.g.
+                 'WORKFLOW_TYPE_DOES_NOT_EXIST'
+    :type cause: Optional[str]
+    """
+    def __init__(self, fault, message, cause=None):
+        super(Fault, self).__init__(message)
+        self.fault = fault
+        self.message = message
+        self.cause = cause
+
+    @property
+    def body(self):
+        """
+        :return: the JSON body of the response
+        :rtype: dict
+        """
+        return {'__type': FAULT_PREFIX + self.fault, 'message': self.message}
+
+
+def unknown_execution(workflow_id, run_id=None):
+    return Fault(
+        'UnknownResourceFault',
+        'Unknown execution: WorkflowExecution=[workflowId={}, runId={}]'.format(workflow_id, run_id),
+    )
+
+
+def encode_token(**values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_token(token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+    except (TypeError, ValueError):
+        raise Fault('ValidationException', 'Invalid token: {}'.format(token))
+
+
+def _compact(attributes):
+    return {key: value for key, value in attributes.items() if value is not None}
+
+
+def _normalize(attributes):
+    """
+    Remove the null values and the empty objects, as boto does for the
+    requests but not for the decisions, e.g. ``'taskList': {'name': None}``.
+    """
+    normalized = {}
+    for key, value in attributes.items():
+        if isinstance(value, dict):
+            value = _normalize(value)
+        if value is not None and value != {}:
+            normalized[key] = value
+    return normalized
+
+
+def _execution(row):
+    return {'workflowId': row['workflow_id'], 'runId': row['run_id']}
+
+
+def _workflow_type(row):
+    return {'name': row['workflow_name'], 'version': row['workflow_version']}
+
+
+class Transaction(object):
+    """
+    Connection to the database inside a transaction, and the task lists
+    to notify once it's committed.
+    """
+    def __init__(self, db):
+        self.db = db
+        self.notifications = set()
+        self.now = time.time()
+
+    def execute(self, query, parameters=()):
+        return self.db.execute(query, parameters)
+
+    def notify(self, kind, domain, task_list):
+        self.notifications.add((kind, domain, task_list))
+
+
+class Engine(object):
+    """
+    SWF actions on a SQLite database. An engine is thread-safe; each
+    thread and process has its own connection to the database.
+
+    :ivar path: path of the database
+    :type path: str
+    """
+    ACTIONS = frozenset((
+        'CountClosedWorkflowExecutions',
+        'CountOpenWorkflowExecutions',
+        'CountPendingActivityTasks',
+        'CountPendingDecisionTasks',
+        'DeprecateActivityType',
+        'DeprecateDomain',
+        'DeprecateWorkflowType',
+        'DescribeActivityType',
+        'DescribeDomain',
+        'DescribeWorkflowExecution',
+        'DescribeWorkflowType',
+        'GetWorkflowExecutionHistory',
+        'ListActivityTypes',
+        'ListClosedWorkflowExecutions',
+        'ListDomains',
+        'ListOpenWorkflowExecutions',
+        'ListWorkflowTypes',
+        'PollForActivityTask',
+        'PollForDecisionTask',
+        'RecordActivityTaskHeartbeat',
+        'RegisterActivityType',
+        'RegisterDomain',
+        'RegisterWorkflowType',
+        'RequestCancelWorkflowExecution',
+        'RespondActivityTaskCanceled',
+        'RespondActivityTaskCompleted',
+        'RespondActivityTaskFailed',
+        'RespondDecisionTaskCompleted',
+        'SignalWorkflowExecution',
+        'StartWorkflowExecution',
+        'TerminateWorkflowExecution',
+    ))
+
+    def __init__(self, path, poll_timeout=POLL_TIMEOUT, notifier=None):
+        """
+        :param path: path of the database, created if needed
+        :type path: str
+        :param poll_timeout: seconds a poll waits for a task
+        :type poll_timeout: float
+        :type notifier: Optional[swf.backends.notify.Notifier]
+        """
+        self.path = os.path.abspath(path)
+        self.poll_timeout = poll_timeout
+        self.notifier = notifier or Notifier(self.path)
+        self._local = threading.local()
+        db = self._db()
+        db.execute('PRAGMA journal_mode=WAL')
+        db.executescript(SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            # Connections inherited from the parent process are left alone
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                 check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    @contextlib.contextmanager
+    def _transaction(self, write=True):
+        tx = Transaction(self._db())
+        tx.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+        try:
+            yield tx
+        except BaseException:
+            tx.execute('ROLLBACK')
+            raise
+        tx.execute('COMMIT')
+        for kind, domain, task_list in tx.notifications:
+            self.notifier.notify(kind, domain, task_list)
+
+    def handle(self, action, data):
+        """
+        Run an action of the SWF API.
+
+        :param action: e.g. 'PollForDecisionTask'
+        :type action: str
+        :param data: request
+        :type data: dict
+        :return: response
+        :rtype: dict
+        :raises: Fault
+        """
+        if action not in self.ACTIONS:
+            raise Fault('UnknownOperationException', 'Unknown action: {}'.format(action))
+        self.process_timeouts()
+        return getattr(self, camel_to_underscore(action))(data) or {}
+
+    # Timeouts
+
+    def _add_timeout(self, tx, kind, run_id, ref, seconds, data=None):
+        if seconds is None or seconds == 'NONE':
+            return
+        tx.execute(
+            'INSERT INTO timeouts (due, kind, run_id, ref, data) VALUES (?, ?, ?, ?, ?)',
+            (tx.now + float(seconds), kind, run_id, str(ref),
+             json.dumps(data) if data is not None else None))
+
+    def _cancel_timeouts(self, tx, run_id, kind, ref):
+        tx.execute('DELETE FROM timeouts WHERE run_id=? AND kind LIKE ? AND ref=?',
+                   (run_id, kind, str(ref)))
+
+    def process_timeouts(self):
+        """
+        Fire the timeouts that are due.
+
+        :return: due date of the next timeout, if any
+        :rtype: Optional[float]
+        """
+        due = self._db().execute('SELECT MIN(due) FROM timeouts').fetchone()[0]
+        if due is None or due > time.time():
+            return due
+        with self._transaction() as tx:
+            rows = tx.execute('SELECT * FROM timeouts WHERE due <= ? ORDER BY due, id',
+                              (tx.now,)).fetchall()
+            for row in rows:
+                # May have been removed by a previous one, e.g. when closing an execution
+                if tx.execute('DELETE FROM timeouts WHERE id=?', (row['id'],)).rowcount:
+                    self._fire_timeout(tx, row)
+            due = tx.execute('SELECT MIN(due) FROM timeouts').fetchone()[0]
+        return due
+
+    def _fire_timeout(self, tx, timeout):
+        run_id = timeout['run_id']
+        kind = timeout['kind']
+        if kind == 'timer':
+            data = json.loads(timeout['data'])
+            self._add_event(tx, run_id, 'TimerFired', {
+                'timerId': timeout['ref'],
+                'startedEventId': data['startedEventId'],
+            })
+            self._schedule_decision(tx, run_id)
+        elif kind == 'decision':
+            execution = self._get_run(tx, run_id)
+            if (execution['decision_state'] != 'started' or
+                    str(execution['decision_started_id']) != timeout['ref']):
+                return
+            self._add_event(tx, run_id, 'DecisionTaskTimedOut', {
+                'timeoutType': 'START_TO_CLOSE',
+                'scheduledEventId': execution['decision_scheduled_id'],
+                'startedEventId': execution['decision_started_id'],
+            })
+            self._update_run(tx, run_id, decision_state='none')
+            self._schedule_decision(tx, run_id)
+        elif kind.startswith('activity:'):
+            task = tx.execute('SELECT * FROM activity_tasks WHERE token=?',
+                              (timeout['ref'],)).fetchone()
+            if task is None:
+                return
+            self._close_activity(tx, task, 'ActivityTaskTimedOut', {
+                'timeoutType': kind.split(':', 1)[1],
+                'details': task['details'],
+            })
+        elif kind == 'workflow':
+            execution = self._get_run(tx, run_id)
+            config = json.loads(execution['configuration'])
+            self._close(tx, execution, 'TIMED_OUT', 'WorkflowExecutionTimedOut', {
+                'timeoutType': 'START_TO_CLOSE',
+                'childPolicy': config['childPolicy'],
+            }, 'ChildWorkflowExecutionTimedOut', {'timeoutType': 'START_TO_CLOSE'})
+            self._apply_child_policy(tx, execution, config['childPolicy'])
+
+    # Executions and their events
+
+    def _get_run(self, tx, run_id):
+        return tx.execute('SELECT * FROM executions WHERE run_id=?', (run_id,)).fetchone()
+
+    def _update_run(self, tx, run_id, **values):
+        columns = sorted(values)
+        tx.execute('UPDATE executions SET {} WHERE run_id=?'.format(
+            ', '.join('{}=?'.format(column) for column in columns)),
+            [values[column] for column in columns] + [run_id])
+
+    def _find_execution(self, tx, domain, workflow_id, run_id=None, open_only=False):
+        query = 'SELECT * FROM executions WHERE domain=? AND workflow_id=?'
+        parameters = [domain, workflow_id]
+        if run_id:
+            query += ' AND run_id=?'
+            parameters.append(run_id)
+        if open_only or not run_id:
+            # Without run id, the open execution
+            query += " AND status='OPEN'"
+        return tx.execute(query, parameters).fetchone()
+
+    def _get_execution(self, tx, domain, execution, open_only=False):
+        row = self._find_execution(tx, domain, execution.get('workflowId'),
+                                   execution.get('runId'), open_only=open_only)
+        if row is None:
+            raise unknown_execution(execution.get('workflowId'), execution.get('runId'))
+        return row
+
+    def _add_event(self, tx, run_id, event_type, attributes):
+        event_id = tx.execute('SELECT next_event_id FROM executions WHERE run_id=?',
+                              (run_id,)).fetchone()[0]
+        tx.execute('UPDATE executions SET next_event_id=? WHERE run_id=?',
+                   (event_id + 1, run_id))
+        tx.execute('INSERT INTO events VALUES (?, ?, ?, ?, ?)',
+                   (run_id, event_id, event_type, tx.now, json.dumps(_compact(attributes))))
+        return event_id
+
+    def _get_event_attributes(self, tx, run_id, event_id):
+        row = tx.execute('SELECT attributes FROM events WHERE run_id=? AND event_id=?',
+                         (run_id, event_id)).fetchone()
+        return json.loads(row[0])
+
+    def _schedule_decision(self, tx, run_id):
+        """
+        Schedule a decision task after new events, or once the current one
+        is completed.
+        """
+        execution = self._get_run(tx, run_id)
+        if execution['status'] != 'OPEN':
+            return
+        state = execution['decision_state']
+        if state == 'scheduled':
+            return
+        if state != 'none':
+            self._update_run(tx, run_id, decision_pending=1)
+            return
+        config = json.loads(execution['configuration'])
+        event_id = self._add_event(tx, run_id, 'DecisionTaskScheduled', {
+            'taskList': config['taskList'],
+            'startToCloseTimeout': config['taskStartToCloseTimeout'],
+            'taskPriority': config.get('taskPriority'),
+        })
+        self._update_run(tx, run_id, decision_state='scheduled', decision_scheduled_id=event_id,
+                         decision_scheduled_at=time.time(), decision_pending=0)
+        tx.notify('decision', execution['domain'], execution['task_list'])
+
+    def _prepare_execution(self, tx, domain, attributes):
+        """
+        Check the type of a new execution and complete its configuration
+        with the defaults of the type.
+
+        :return: configuration of the execution
+        :rtype: dict
+        :raises: Fault with the cause of the failure
+        """
+        self._get_domain(tx, domain, registered=True)
+        workflow_type = attributes.get('workflowType') or {}
+        row = self._find_type(tx, domain, 'workflow', workflow_type)
+        if row is None:
+            raise Fault(
+                'UnknownResourceFault',
+                'Unknown type: WorkflowType=[name={}, version={}]'.format(
+                    workflow_type.get('name'), workflow_type.get('version')),
+                cause='WORKFLOW_TYPE_DOES_NOT_EXIST',
+            )
+        if row['status'] == 'DEPRECATED':
+            raise Fault('TypeDeprecatedFault', 'WorkflowType=[name={}, version={}]'.format(
+                row['name'], row['version']), cause='WORKFLOW_TYPE_DEPRECATED')
+        if self._find_execution(tx, domain, attributes.get('workflowId')) is not None:
+            raise Fault('WorkflowExecutionAlreadyStartedFault', 'Already Started',
+                        cause='WORKFLOW_ALREADY_RUNNING')
+
+        defaults = json.loads(row['configuration'])
+        config = {}
+        for key, cause in (('taskList', 'DEFAULT_TASK_LIST_UNDEFINED'),
+                           ('executionStartToCloseTimeout',
+                            'DEFAULT_EXECUTION_START_TO_CLOSE_TIMEOUT_UNDEFINED'),
+                           ('taskStartToCloseTimeout',
+                            'DEFAULT_TASK_START_TO_CLOSE_TIMEOUT_UNDEFINED'),
+                           ('childPolicy', 'DEFAULT_CHILD_POLICY_UNDEFINED'),
+                           ('taskPriority', None),
+                           ('lambdaRole', None)):
+            default_key = 'default' + key[0].upper() + key[1:]
+            value = attributes.get(key) or defaults.get(default_key)
+            if value is None and cause is not None:
+                raise Fault('DefaultUndefinedFault', key, cause=cause)
+            config[key] = value
+        return _compact(config)
+
+    def _create_execution(self, tx, domain, attributes, config, run_id=None, parent=None,
+                          continued_run_id=None):
+        """
+        :param parent: execution of the parent, id of the initiated event
+        :type parent: Optional[(sqlite3.Row, int)]
+        :return: run id of the new execution
+        :rtype: str
+        """
+        run_id = run_id or uuid.uuid4().hex
+        workflow_type = attributes['workflowType']
+        parent_execution, initiated_event_id = parent or (None, None)
+        tags = attributes.get('tagList') or []
+        tx.execute(
+            'INSERT INTO executions (run_id, domain, workflow_id, workflow_name, '
+            'workflow_version, task_list, configuration, tags, status, start_timestamp, '
+            'parent_run_id, parent_workflow_id, parent_initiated_event_id) '
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'OPEN', ?, ?, ?, ?)",
+            (run_id, domain, attributes['workflowId'], workflow_type['name'],
+             workflow_type['version'], config['taskList']['name'], json.dumps(config),
+             json.dumps(tags), tx.now,
+             parent_execution['run_id'] if parent_execution else None,
+             parent_execution['workflow_id'] if parent_execution else None,
+             initiated_event_id))
+        started = dict(config)
+        started.update({
+            'workflowType': workflow_type,
+            'input': attributes.get('input'),
+            'tagList': tags or None,
+            'continuedExecutionRunId': continued_run_id,
+        })
+        if parent_execution:
+            started['parentWorkflowExecution'] = _execution(parent_execution)
+            started['parentInitiatedEventId'] = initiated_event_id
+        self._add_event(tx, run_id, 'WorkflowExecutionStarted', started)
+        self._add_timeout(tx, 'workflow', run_id, '', config['executionStartToCloseTimeout'])
+        self._schedule_decision(tx, run_id)
+        return run_id
+
+    def _close(self, tx, execution, close_status, event_type, attributes,
+               parent_event_type=None, parent_attributes=None):
+        run_id = execution['run_id']
+        self._add_event(tx, run_id, event_type, attributes)
+        self._update_run(tx, run_id, status='CLOSED', close_status=close_status,
+                         close_timestamp=tx.now, decision_state='none', decision_pending=0)
+        tx.execute('DELETE FROM activity_tasks WHERE run_id=?', (run_id,))
+        tx.execute('DELETE FROM timeouts WHERE run_id=?', (run_id,))
+
+        parent_run_id = execution['parent_run_id']
+        if parent_event_type is None or not parent_run_id:
+            return
+        parent = self._get_run(tx, parent_run_id)
+        if parent is None or parent['status'] != 'OPEN':
+            return
+        event = {
+            'workflowExecution': _execution(execution),
+            'workflowType': _workflow_type(execution),
+            'initiatedEventId': execution['parent_initiated_event_id'],
+            'startedEventId': execution['parent_started_event_id'],
+        }
+        event.update(parent_attributes or {})
+        self._add_event(tx, parent_run_id, parent_event_type, event)
+        self._schedule_decision(tx, parent_run_id)
+
+    def _terminate(self, tx, execution, reason=None, details=None, child_policy=None,
+                   cause=None):
+        config = json.loads(execution['configuration'])
+        child_policy = child_policy or config['childPolicy']
+        self._close(tx, execution, 'TERMINATED', 'WorkflowExecutionTerminated', {
+            'reason': reason,
+            'details': details,
+            'childPolicy': child_policy,
+            'cause': cause,
+        }, 'ChildWorkflowExecutionTerminated')
+        self._apply_child_policy(tx, execution, child_policy)
+
+    def _apply_child_policy(self, tx, execution, child_policy):
+        if child_policy == 'ABANDON':
+            return
+        children = tx.execute("SELECT * FROM executions WHERE parent_run_id=? AND status='OPEN'",
+                              (execution['run_id'],)).fetchall()
+        for child in children:
+            if child_policy == 'TERMINATE':
+                self._terminate(tx, child, cause='CHILD_POLICY_APPLIED')
+            elif child_policy == 'REQUEST_CANCEL':
+                self._request_cancel(tx, child, cause='CHILD_POLICY_APPLIED')
+
+    def _request_cancel(self, tx, execution, external=None, initiated_event_id=None,
+                        cause=None):
+        run_id = execution['run_id']
+        self._add_event(tx, run_id, 'WorkflowExecutionCancelRequested', {
+            'externalWorkflowExecution': external,
+            'externalInitiatedEventId': initiated_event_id,
+            'cause': cause,
+        })
+        self._update_run(tx, run_id, cancel_requested=1)
+        self._schedule_decision(tx, run_id)
+
+    def _signal(self, tx, execution, signal_name, input=None, external=None,
+                initiated_event_id=None):
+        run_id = execution['run_id']
+        self._add_event(tx, run_id, 'WorkflowExecutionSignaled', {
+            'signalName': signal_name,
+            'input': input,
+            'externalWorkflowExecution': external,
+            'externalInitiatedEventId': initiated_event_id,
+        })
+        self._schedule_decision(tx, run_id)
+
+    def _history_page(self, tx, run_id, last_event_id=None, after=None, page_size=None,
+                      reverse_order=False):
+        """
+        :param last_event_id: the page ends at this event
+        :type last_event_id: Optional[int]
+        :param after: the page starts after this event
+        :type after: Optional[int]
+        :return: events of the page, cursor of the next page if any
+        :rtype: (list[dict], Optional[int])
+        """
+        page_size = min(int(page_size or PAGE_SIZE), PAGE_SIZE)
+        query = 'SELECT * FROM events WHERE run_id=?'
+        parameters = [run_id]
+        if last_event_id is not None:
+            query += ' AND event_id <= ?'
+            parameters.append(last_event_id)
+        if after is not None:
+            query += ' AND event_id {} ?'.format('<' if reverse_order else '>')
+            parameters.append(after)
+        query += ' ORDER BY event_id {} LIMIT ?'.format('DESC' if reverse_order else 'ASC')
+        parameters.append(page_size + 1)
+        rows = tx.execute(query, parameters).fetchall()
+        events = []
+        for row in rows[:page_size]:
+            events.append({
+                'eventId': row['event_id'],
+                'eventType': row['event_type'],
+                'eventTimestamp': row['timestamp'],
+                decapitalize(row['event_type']) + 'EventAttributes': json.loads(row['attributes']),
+            })
+        cursor = events[-1]['eventId'] if len(rows) > page_size else None
+        return events, cursor
+
+    # Domains
+
+    def _get_domain(self, tx, name, registered=False):
+        row = tx.execute('SELECT * FROM domains WHERE name=?', (name,)).fetchone()
+        if row is None:
+            raise Fault('UnknownResourceFault', 'Unknown domain: {}'.format(name),
+                        cause='UNKNOWN_DOMAIN')
+        if registered and row['status'] != 'REGISTERED':
+            raise Fault('DomainDeprecatedFault', name, cause='DOMAIN_DEPRECATED')
+        return row
+
+    @staticmethod
+    def _domain_info(row):
+        return _compact({
+            'name': row['name'],
+            'status': row['status'],
+            'description': row['description'],
+        })
+
+    def register_domain(self, data):
+        with self._transaction() as tx:
+            if tx.execute('SELECT 1 FROM domains WHERE name=?', (data['name'],)).fetchone():
+                raise Fault('DomainAlreadyExistsFault', data['name'])
+            tx.execute("INSERT INTO domains VALUES (?, 'REGISTERED', ?, ?)", (
+                data['name'],
+                data.get('description'),
+                data.get('workflowExecutionRetentionPeriodInDays'),
+            ))
+
+    def describe_domain(self, data):
+        with self._transaction(write=False) as tx:
+            row = self._get_domain(tx, data['name'])
+        return {
+            'domainInfo': self._domain_info(row),
+            'configuration': {'workflowExecutionRetentionPeriodInDays': row['retention']},
+        }
+
+    def list_domains(self, data):
+        with self._transaction(write=False) as tx:
+            rows = tx.execute('SELECT * FROM domains WHERE status=? ORDER BY name',
+                              (data.get('registrationStatus', 'REGISTERED'),)).fetchall()
+        return self._paginate('domainInfos', [self._domain_info(row) for row in rows], data)
+
+    def deprecate_domain(self, data):
+        with self._transaction() as tx:
+            self._get_domain(tx, data['name'], registered=True)
+            tx.execute("UPDATE domains SET status='DEPRECATED' WHERE name=?", (data['name'],))
+
+    # Types
+
+    def _find_type(self, tx, domain, kind, type_):
+        return tx.execute(
+            'SELECT * FROM types WHERE domain=? AND kind=? AND name=? AND version=?',
+            (domain, kind, type_.get('name'), type_.get('version'))).fetchone()
+
+    def _get_type(self, tx, domain, kind, type_):
+        row = self._find_type(tx, domain, kind, type_)
+        if row is None:
+            raise Fault('UnknownResourceFault', 'Unknown type: {}Type=[name={}, version={}]'.format(
+                kind.capitalize(), type_.get('name'), type_.get('version')))
+        return row
+
+    @staticmethod
+    def _type_info(row):
+        return _compact({
+            '{}Type'.format(row['kind']): {'name': row['name'], 'version': row['version']},
+            'status': row['status'],
+            'description': row['description'],
+            'creationDate': row['creation_date'],
+            'deprecationDate': row['deprecation_date'],
+        })
+
+    def _register_type(self, kind, data):
+        configuration = {key: value for key, value in data.items()
+                         if key.startswith('default')}
+        with self._transaction() as tx:
+            self._get_domain(tx, data['domain'], registered=True)
+            if self._find_type(tx, data['domain'], kind, data) is not None:
+                raise Fault('TypeAlreadyExistsFault', '{}Type=[name={}, version={}]'.format(
+                    kind.capitalize(), data['name'], data['version']))
+            tx.execute("INSERT INTO types VALUES (?, ?, ?, ?, 'REGISTERED', ?, ?, ?, NULL)", (
+                data['domain'], kind, data['name'], data['version'], data.get('description'),
+                json.dumps(configuration), tx.now,
+            ))
+
+    def _describe_type(self, kind, data):
+        with self._transaction(write=False) as tx:
+            self._get_domain(tx, data['domain'])
+            row = self._get_type(tx, data['domain'], kind, data['{}Type'.format(kind)])
+        return {
+            'typeInfo': self._type_info(row),
+            'configuration': json.loads(row['configuration']),
+        }
+
+    def _list_types(self, kind, data):
+        query = 'SELECT * FROM types WHERE domain=? AND kind=? AND status=?'
+        parameters = [data['domain'], kind, data['registrationStatus']]
+        if data.get('name'):
+            query += ' AND name=?'
+            parameters.append(data['name'])
+        with self._transaction(write=False) as tx:
+            self._get_domain(tx, data['domain'])
+            rows = tx.execute(query + ' ORDER BY name, version', parameters).fetchall()
+        return self._paginate('typeInfos', [self._type_info(row) for row in rows], data)
+
+    def _deprecate_type(self, kind, data):
+        with self._transaction() as tx:
+            row = self._get_type(tx, data['domain'], kind, data['{}Type'.format(kind)])
+            if row['status'] == 'DEPRECATED':
+                raise Fault('TypeDeprecatedFault', '{}Type=[name={}, version={}]'.format(
+                    kind.capitalize(), row['name'], row['version']))
+            tx.execute(
+                "UPDATE types SET status='DEPRECATED', deprecation_date=? "
+                "WHERE domain=? AND kind=? AND name=? AND version=?",
+                (tx.now, row['domain'], kind, row['name'], row['version']))
+
+    def register_activity_type(self, data):
+        return self._register_type('activity', data)
+
+    def register_workflow_type(self, data):
+        return self._register_type('workflow', data)
+
+    def describe_activity_type(self, data):
+        return self._describe_type('activity', data)
+
+    def describe_workflow_type(self, data):
+        return self._describe_type('workflow', data)
+
+    def list_activity_types(self, data):
+        return self._list_types('activity', data)
+
+    def list_workflow_types(self, data):
+        return self._list_types('workflow', data)
+
+    def deprecate_activity_type(self, data):
+        return self._deprecate_type('activity', data)
+
+    def deprecate_workflow_type(self, data):
+        return self._deprecate_type('workflow', data)
+
+    @staticmethod
+    def _paginate(key, items, data):
+        if data.get('reverseOrder'):
+            items.reverse()
+        start = decode_token(data['nextPageToken'])['offset'] if data.get('nextPageToken') else 0
+        page_size = min(int(data.get('maximumPageSize') or PAGE_SIZE), PAGE_SIZE)
+        response = {key: items[start:start + page_size]}
+        if start + page_size < len(items):
+            response['nextPageToken'] = encode_token(offset=start + page_size)
+        return response
+
+    # Workflow executions
+
+    def start_workflow_execution(self, data):
+        with self._transaction() as tx:
+            config = self._prepare_execution(tx, data['domain'], data)
+            run_id = self._create_execution(tx, data['domain'], data, config)
+        return {'runId': run_id}
+
+    def signal_workflow_execution(self, data):
+        with self._transaction() as tx:
+            execution = self._get_execution(tx, data['domain'], data, open_only=True)
+            self._signal(tx, execution, data['signalName'], data.get('input'))
+
+    def request_cancel_workflow_execution(self, data):
+        with self._transaction() as tx:
+            execution = self._get_execution(tx, data['domain'], data, open_only=True)
+            self._request_cancel(tx, execution)
+
+    def terminate_workflow_execution(self, data):
+        with self._transaction() as tx:
+            execution = self._get_execution(tx, data['domain'], data, open_only=True)
+            self._terminate(tx, execution, data.get('reason'), data.get('details'),
+                            data.get('childPolicy'))
+
+    @staticmethod
+    def _execution_info(row):
+        info = {
+            'execution': _execution(row),
+            'workflowType': _workflow_type(row),
+            'startTimestamp': row['start_timestamp'],
+            'closeTimestamp': row['close_timestamp'],
+            'executionStatus': row['status'],
+            'closeStatus': row['close_status'],
+            'tagList': json.loads(row['tags']),
+            'cancelRequested': bool(row['cancel_requested']),
+        }
+        if row['parent_run_id']:
+            info['parent'] = {'workflowId': row['parent_workflow_id'],
+                              'runId': row['parent_run_id']}
+        return _compact(info)
+
+    def describe_workflow_execution(self, data):
+        with self._transaction(write=False) as tx:
+            self._get_domain(tx, data['domain'])
+            row = self._get_execution(tx, data['domain'], data['execution'])
+            run_id = row['run_id']
+            count = lambda query: tx.execute(query, (run_id,)).fetchone()[0]  # noqa
+            open_counts = {
+                'openActivityTasks': count('SELECT COUNT(*) FROM activity_tasks WHERE run_id=?'),
+                'openDecisionTasks': int(row['decision_state'] != 'none'),
+                'openTimers': count("SELECT COUNT(*) FROM timeouts WHERE run_id=? AND kind='timer'"),
+                'openChildWorkflowExecutions': count(
+                    "SELECT COUNT(*) FROM executions WHERE parent_run_id=? AND status='OPEN'"),
+                'openLambdaFunctions': 0,
+            }
+        return _compact({
+            'executionInfo': self._execution_info(row),
+            'executionConfiguration': json.loads(row['configuration']),
+            'openCounts': open_counts,
+            'latestActivityTaskTimestamp': row['latest_activity_timestamp'],
+            'latestExecutionContext': row['latest_context'],
+        })
+
+    def get_workflow_execution_history(self, data):
+        with self._transaction(write=False) as tx:
+            self._get_domain(tx, data['domain'])
+            row = self._get_execution(tx, data['domain'], data['execution'])
+            after = None
+            if data.get('nextPageToken'):
+                after = decode_token(data['nextPageToken'])['after']
+            events, cursor = self._history_page(tx, row['run_id'], after=after,
+                                                page_size=data.get('maximumPageSize'),
+                                                reverse_order=data.get('reverseOrder'))
+        response = {'events': events}
+        if cursor is not None:
+            response['nextPageToken'] = encode_token(after=cursor)
+        return response
+
+    def _filter_executions(self, data, status):
+        query = 'SELECT * FROM executions WHERE domain=? AND status=?'
+        parameters = [data['domain'], status]
+        for column, filter_ in (('start_timestamp', data.get('startTimeFilter')),
+                                ('close_timestamp', data.get('closeTimeFilter'))):
+            if not filter_:
+                continue
+            if filter_.get('oldestDate') is not None:
+                query += ' AND {} >= ?'.format(column)
+                parameters.append(filter_['oldestDate'])
+            if filter_.get('latestDate') is not None:
+                query += ' AND {} <= ?'.format(column)
+                parameters.append(filter_['latestDate'])
+        for column, value in (
+                ('workflow_id', data.get('executionFilter', {}).get('workflowId')),
+                ('workflow_name', data.get('typeFilter', {}).get('name')),
+                ('workflow_version', data.get('typeFilter', {}).get('version')),
+                ('close_status', data.get('closeStatusFilter', {}).get('status'))):
+            if value is not None:
+                query += ' AND {}=?'.format(column)
+                parameters.append(value)
+        order = 'close_timestamp' if data.get('closeTimeFilter') else 'start_timestamp'
+        query += ' ORDER BY {} DESC'.format(order)
+        with self._transaction(write=False) as tx:
+            self._get_domain(tx, data['domain'])
+            rows = tx.execute(query, parameters).fetchall()
+        tag = data.get('tagFilter', {}).get('tag')
+        if tag is not None:
+            rows = [row for row in rows if tag in json.loads(row['tags'])]
+        return rows
+
+    def list_open_workflow_executions(self, data):
+        rows = self._filter_executions(data, 'OPEN')
+        return self._paginate('executionInfos', [self._execution_info(row) for row in rows], data)
+
+    def list_closed_workflow_executions(self, data):
+        rows = self._filter_executions(data, 'CLOSED')
+        return self._paginate('executionInfos', [self._execution_info(row) for row in rows], data)
+
+    def count_open_workflow_executions(self, data):
+        return {'count': len(self._filter_executions(data, 'OPEN')), 'truncated': False}
+
+    def count_closed_workflow_executions(self, data):
+        return {'count': len(self._filter_executions(data, 'CLOSED')), 'truncated': False}
+
+    # Tasks
+
+    def _long_poll(self, kind, domain, task_list, take):
+        """
+        Wait for a task until it's taken or the poll times out.
+
+        :param take: returns the response if a task is available
+        :type take: () -> Optional[dict]
+        :rtype: dict
+        """
+        deadline = time.time() + self.poll_timeout
+        with self.notifier.listen(kind, domain, task_list) as listener:
+            while True:
+                next_due = self.process_timeouts()
+                response = take()
+                if response is not None:
+                    return response
+                now = time.time()
+                if now >= deadline:
+                    return {}
+                timeout = deadline - now
+                if next_due is not None:
+                    timeout = min(timeout, next_due - now)
+                listener.wait(timeout)
+
+    def count_pending_decision_tasks(self, data):
+        with self._transaction(write=False) as tx:
+            self._get_domain(tx, data['domain'])
+            count = tx.execute(
+                "SELECT COUNT(*) FROM executions "
+                "WHERE domain=? AND task_list=? AND decision_state='scheduled'",
+                (data['domain'], data['taskList']['name'])).fetchone()[0]
+        return {'count': count, 'truncated': False}
+
+    def count_pending_activity_tasks(self, data):
+        with self._transaction(write=False) as tx:
+            self._get_domain(tx, data['domain'])
+            count = tx.execute(
+                "SELECT COUNT(*) FROM activity_tasks "
+                "WHERE domain=? AND task_list=? AND state='scheduled'",
+                (data['domain'], data['taskList']['name'])).fetchone()[0]
+        return {'count': count, 'truncated': False}
+
+    def _decision_task(self, tx, execution, started_event_id, data, after=None):
+        events, cursor = self._history_page(
+            tx, execution['run_id'], last_event_id=started_event_id, after=after,
+            page_size=data.get('maximumPageSize'), reverse_order=data.get('reverseOrder'))
+        task_token = encode_token(run=execution['run_id'], started=started_event_id)
+        response = {
+            'taskToken': task_token,
+            'startedEventId': started_event_id,
+            'previousStartedEventId': execution['previous_started_id'],
+            'workflowExecution': _execution(execution),
+            'workflowType': _workflow_type(execution),
+            'events': events,
+        }
+        if cursor is not None:
+            response['nextPageToken'] = encode_token(token=task_token, after=cursor)
+        return response
+
+    def poll_for_decision_task(self, data):
+        domain = data['domain']
+        task_list = data['taskList']['name']
+        if data.get('nextPageToken'):
+            page = decode_token(data['nextPageToken'])
+            token = decode_token(page['token'])
+            with self._transaction(write=False) as tx:
+                execution = self._get_run(tx, token['run'])
+                if execution is None:
+                    raise Fault('UnknownResourceFault', 'Unknown decision task')
+                return self._decision_task(tx, execution, token['started'], data, page['after'])
+
+        with self._transaction(write=False) as tx:
+            self._get_domain(tx, domain)
+        query = ("SELECT * FROM executions WHERE domain=? AND task_list=? "
+                 "AND decision_state='scheduled' ORDER BY decision_scheduled_at LIMIT 1")
+
+        def take():
+            if self._db().execute(query, (domain, task_list)).fetchone() is None:
+                return None
+            with self._transaction() as tx:
+                execution = tx.execute(query, (domain, task_list)).fetchone()
+                if execution is None:  # taken by another poller
+                    return None
+                run_id = execution['run_id']
+                started_event_id = self._add_event(tx, run_id, 'DecisionTaskStarted', {
+                    'identity': data.get('identity'),
+                    'scheduledEventId': execution['decision_scheduled_id'],
+                })
+                self._update_run(tx, run_id, decision_state='started',
+                                 decision_started_id=started_event_id)
+                config = json.loads(execution['configuration'])
+                self._add_timeout(tx, 'decision', run_id, started_event_id,
+                                  config['taskStartToCloseTimeout'])
+                return self._decision_task(tx, execution, started_event_id, data)
+
+        return self._long_poll('decision', domain, task_list, take)
+
+    def respond_decision_task_completed(self, data):
+        token = decode_token(data['taskToken'])
+        with self._transaction() as tx:
+            execution = self._get_run(tx, token['run'])
+            if (execution is None or execution['status'] != 'OPEN' or
+                    execution['decision_state'] != 'started' or
+                    execution['decision_started_id'] != token['started']):
+                raise Fault('UnknownResourceFault', 'Unknown decision task: token={}'.format(
+                    data['taskToken']))
+            run_id = execution['run_id']
+            completed_event_id = self._add_event(tx, run_id, 'DecisionTaskCompleted', {
+                'executionContext': data.get('executionContext'),
+                'scheduledEventId': execution['decision_scheduled_id'],
+                'startedEventId': execution['decision_started_id'],
+            })
+            self._cancel_timeouts(tx, run_id, 'decision', execution['decision_started_id'])
+            # New events while deciding: the decider didn't see them
+            unhandled = bool(execution['decision_pending'])
+            self._update_run(tx, run_id, decision_state='completing', decision_pending=0,
+                             previous_started_id=execution['decision_started_id'],
+                             latest_context=data.get('executionContext'))
+
+            for decision in data.get('decisions') or []:
+                decision_type = decision['decisionType']
+                attributes = _normalize(
+                    decision.get(decapitalize(decision_type) + 'DecisionAttributes') or {})
+                if decision_type in CLOSING_DECISIONS:
+                    self._close_decision(tx, run_id, decision_type, attributes,
+                                         completed_event_id, unhandled)
+                    break
+                method = getattr(self, '_decide_' + camel_to_underscore(decision_type), None)
+                if method is None:
+                    raise Fault('ValidationException',
+                                'Unsupported decision: {}'.format(decision_type))
+                method(tx, self._get_run(tx, run_id), attributes, completed_event_id)
+
+            execution = self._get_run(tx, run_id)
+            if execution['status'] == 'OPEN':
+                self._update_run(tx, run_id, decision_state='none')
+                if execution['decision_pending']:
+                    self._schedule_decision(tx, run_id)
+
+    # Decisions
+
+    def _decision_failed(self, tx, run_id, event_type, attributes):
+        self._add_event(tx, run_id, event_type, attributes)
+        self._schedule_decision(tx, run_id)
+
+    def _close_decision(self, tx, run_id, decision_type, attributes, completed_event_id,
+                        unhandled):
+        event_type, close_status, parent_event_type = CLOSING_DECISIONS[decision_type]
+        if unhandled:
+            self._decision_failed(tx, run_id, decision_type + 'Failed', {
+                'cause': 'UNHANDLED_DECISION',
+                'decisionTaskCompletedEventId': completed_event_id,
+            })
+            return
+        execution = self._get_run(tx, run_id)
+        if decision_type == 'ContinueAsNewWorkflowExecution':
+            self._continue_as_new(tx, execution, attributes, completed_event_id)
+            return
+        event = dict(attributes, decisionTaskCompletedEventId=completed_event_id)
+        self._close(tx, execution, close_status, event_type, event,
+                    parent_event_type, attributes)
+
+    def _continue_as_new(self, tx, execution, attributes, completed_event_id):
+        domain = execution['domain']
+        new = dict(attributes)
+        new['workflowId'] = execution['workflow_id']
+        new['workflowType'] = {
+            'name': execution['workflow_name'],
+            'version': new.pop('workflowTypeVersion', None) or execution['workflow_version'],
+        }
+        # The current execution is still open
+        self._update_run(tx, execution['run_id'], status='CONTINUING')
+        try:
+            config = self._prepare_execution(tx, domain, new)
+        except Fault as fault:
+            self._update_run(tx, execution['run_id'], status='OPEN')
+            self._decision_failed(tx, execution['run_id'], 'ContinueAsNewWorkflowExecutionFailed', {
+                'cause': fault.cause or 'OPERATION_NOT_PERMITTED',
+                'decisionTaskCompletedEventId': completed_event_id,
+            })
+            return
+        new_run_id = uuid.uuid4().hex
+        event = dict(config)
+        event.update({
+            'input': new.get('input'),
+            'tagList': new.get('tagList'),
+            'workflowType': new['workflowType'],
+            'newExecutionRunId': new_run_id,
+            'decisionTaskCompletedEventId': completed_event_id,
+        })
+        self._close(tx, execution, 'CONTINUED_AS_NEW', 'WorkflowExecutionContinuedAsNew', event)
+        parent = None
+        if execution['parent_run_id']:
+            parent = self._get_run(tx, execution['parent_run_id'])
+        self._create_execution(
+            tx, domain, new, config, run_id=new_run_id, continued_run_id=execution['run_id'],
+            parent=(parent, execution['parent_initiated_event_id']) if parent else None)
+        if parent is not None:
+            self._update_run(tx, new_run_id,
+                             parent_started_event_id=execution['parent_started_event_id'])
+
+    def _decide_schedule_activity_task(self, tx, execution, attributes, completed_event_id):
+        run_id = execution['run_id']
+        domain = execution['domain']
+        activity_type = attributes.get('activityType') or {}
+        activity_id = attributes.get('activityId')
+
+        def failed(cause):
+            self._decision_failed(tx, run_id, 'ScheduleActivityTaskFailed', {
+                'activityType': activity_type,
+                'activityId': activity_id,
+                'cause': cause,
+                'decisionTaskCompletedEventId': completed_event_id,
+            })
+
+        row = self._find_type(tx, domain, 'activity', activity_type)
+        if row is None:
+            return failed('ACTIVITY_TYPE_DOES_NOT_EXIST')
+        if row['status'] == 'DEPRECATED':
+            return failed('ACTIVITY_TYPE_DEPRECATED')
+        if tx.execute('SELECT 1 FROM activity_tasks WHERE run_id=? AND activity_id=?',
+                      (run_id, activity_id)).fetchone():
+            return failed('ACTIVITY_ID_ALREADY_IN_USE')
+        defaults = json.loads(row['configuration'])
+        task_list = attributes.get('taskList') or defaults.get('defaultTaskList')
+        if not task_list:
+            return failed('DEFAULT_TASK_LIST_UNDEFINED')
+        priority = attributes.get('taskPriority') or defaults.get('defaultTaskPriority')
+        event = {
+            'activityType': activity_type,
+            'activityId': activity_id,
+            'input': attributes.get('input'),
+            'control': attributes.get('control'),
+            'taskList': task_list,
+            'taskPriority': priority,
+            'decisionTaskCompletedEventId': completed_event_id,
+        }
+        for _, key in ACTIVITY_TIMEOUTS:
+            default_key = 'defaultTask' + key[0].upper() + key[1:]
+            event[key] = attributes.get(key) or defaults.get(default_key) or 'NONE'
+        scheduled_event_id = self._add_event(tx, run_id, 'ActivityTaskScheduled', event)
+
+        token = uuid.uuid4().hex
+        tx.execute("INSERT INTO activity_tasks (token, run_id, domain, task_list, activity_id, "
+                   "priority, scheduled_at, scheduled_event_id, state) "
+                   "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'scheduled')",
+                   (token, run_id, domain, task_list['name'], activity_id, int(priority or 0),
+                    tx.now, scheduled_event_id))
+        for timeout_type, key in ACTIVITY_TIMEOUTS[:2]:
+            self._add_timeout(tx, 'activity:' + timeout_type, run_id, token, event[key])
+        self._update_run(tx, run_id, latest_activity_timestamp=tx.now)
+        tx.notify('activity', domain, task_list['name'])
+
+    def _decide_request_cancel_activity_task(self, tx, execution, attributes,
+                                             completed_event_id):
+        run_id = execution['run_id']
+        activity_id = attributes.get('activityId')
+        task = tx.execute('SELECT * FROM activity_tasks WHERE run_id=? AND activity_id=?',
+                          (run_id, activity_id)).fetchone()
+        if task is None:
+            return self._decision_failed(tx, run_id, 'RequestCancelActivityTaskFailed', {
+                'activityId': activity_id,
+                'cause': 'ACTIVITY_ID_UNKNOWN',
+                'decisionTaskCompletedEventId': completed_event_id,
+            })
+        requested_event_id = self._add_event(tx, run_id, 'ActivityTaskCancelRequested', {
+            'activityId': activity_id,
+            'decisionTaskCompletedEventId': completed_event_id,
+        })
+        if task['state'] == 'scheduled':
+            self._close_activity(tx, task, 'ActivityTaskCanceled', {
+                'latestCancelRequestedEventId': requested_event_id,
+            })
+        else:
+            tx.execute('UPDATE activity_tasks SET cancel_requested_event_id=? WHERE token=?',
+                       (requested_event_id, task['token']))
+
+    def _decide_record_marker(self, tx, execution, attributes, completed_event_id):
+        self._add_event(tx, execution['run_id'], 'MarkerRecorded', {
+            'markerName': attributes.get('markerName'),
+            'details': attributes.get('details'),
+            'decisionTaskCompletedEventId': completed_event_id,
+        })
+
+    def _decide_start_timer(self, tx, execution, attributes, completed_event_id):
+        run_id = execution['run_id']
+        timer_id = attributes.get('timerId')
+        if tx.execute("SELECT 1 FROM timeouts WHERE run_id=? AND kind='timer' AND ref=?",
+                      (run_id, timer_id)).fetchone():
+            return self._decision_failed(tx, run_id, 'StartTimerFailed', {
+                'timerId': timer_id,
+                'cause': 'TIMER_ID_ALREADY_IN_USE',
+                'decisionTaskCompletedEventId': completed_event_id,
+            })
+        started_event_id = self._add_event(tx, run_id, 'TimerStarted', {
+            'timerId': timer_id,
+            'control': attributes.get('control'),
+            'startToFireTimeout': attributes.get('startToFireTimeout'),
+            'decisionTaskCompletedEventId': completed_event_id,
+        })
+        self._add_timeout(tx, 'timer', run_id, timer_id, attributes.get('startToFireTimeout'),
+                          data={'startedEventId': started_event_id})
+
+    def _decide_cancel_timer(self, tx, execution, attributes, completed_event_id):
+        run_id = execution['run_id']
+        timer_id = attributes.get('timerId')
+        timer = tx.execute("SELECT * FROM timeouts WHERE run_id=? AND kind='timer' AND ref=?",
+                           (run_id, timer_id)).fetchone()
+        if timer is None:
+            return self._decision_failed(tx, run_id, 'CancelTimerFailed', {
+                'timerId': timer_id,
+                'cause': 'TIMER_ID_UNKNOWN',
+                'decisionTaskCompletedEventId': completed_event_id,
+            })
+        tx.execute('DELETE FROM timeouts WHERE id=?', (timer['id'],))
+        self._add_event(tx, run_id, 'TimerCanceled', {
+            'timerId': timer_id,
+            'startedEventId': json.loads(timer['data'])['startedEventId'],
+            'decisionTaskCompletedEventId': completed_event_id,
+        })
+
+    def _decide_signal_external_workflow_execution(self, tx, execution, attributes,
+                                                   completed_event_id):
+        run_id = execution['run_id']
+        initiated_event_id = self._add_event(
+            tx, run_id, 'SignalExternalWorkflowExecutionInitiated',
+            dict(attributes, decisionTaskCompletedEventId=completed_event_id))
+        target = self._find_execution(tx, execution['domain'], attributes.get('workflowId'),
+                                      attributes.get('runId'), open_only=True)
+        if target is None:
+            return self._decision_failed(tx, run_id, 'SignalExternalWorkflowExecutionFailed', {
+                'workflowId': attributes.get('workflowId'),
+                'runId': attributes.get('runId'),
+                'cause': 'UNKNOWN_EXTERNAL_WORKFLOW_EXECUTION',
+                'initiatedEventId': initiated_event_id,
+                'decisionTaskCompletedEventId': completed_event_id,
+                'control': attributes.get('control'),
+            })
+        self._signal(tx, target, attributes.get('signalName'), attributes.get('input'),
+                     external=_execution(execution), initiated_event_id=initiated_event_id)
+        self._add_event(tx, run_id, 'ExternalWorkflowExecutionSignaled', {
+            'workflowExecution': _execution(target),
+            'initiatedEventId': initiated_event_id,
+        })
+        self._schedule_decision(tx, run_id)
+
+    def _decide_request_cancel_external_workflow_execution(self, tx, execution, attributes,
+                                                           completed_event_id):
+        run_id = execution['run_id']
+        initiated_event_id = self._add_event(
+            tx, run_id, 'RequestCancelExternalWorkflowExecutionInitiated',
+            dict(attributes, decisionTaskCompletedEventId=completed_event_id))
+        target = self._find_execution(tx, execution['domain'], attributes.get('workflowId'),
+                                      attributes.get('runId'), open_only=True)
+        if target is None:
+            return self._decision_failed(
+                tx, run_id, 'RequestCancelExternalWorkflowExecutionFailed', {
+                    'workflowId': attributes.get('workflowId'),
+                    'runId': attributes.get('runId'),
+                    'cause': 'UNKNOWN_EXTERNAL_WORKFLOW_EXECUTION',
+                    'initiatedEventId': initiated_event_id,
+                    'decisionTaskCompletedEventId': completed_event_id,
+                    'control': attributes.get('control'),
+                })
+        self._request_cancel(tx, target, external=_execution(execution),
+                             initiated_event_id=initiated_event_id)
+        self._add_event(tx, run_id, 'ExternalWorkflowExecutionCancelRequested', {
+            'workflowExecution': _execution(target),
+            'initiatedEventId': initiated_event_id,
+        })
+        self._schedule_decision(tx, run_id)
+
+    def _decide_start_child_workflow_execution(self, tx, execution, attributes,
+                                               completed_event_id):
+        run_id = execution['run_id']
+        domain = execution['domain']
+        try:
+            config = self._prepare_execution(tx, domain, attributes)
+        except Fault as fault:
+            return self._decision_failed(tx, run_id, 'StartChildWorkflowExecutionFailed', {
+                'workflowType': attributes.get('workflowType'),
+                'workflowId': attributes.get('workflowId'),
+                'cause': fault.cause or 'OPERATION_NOT_PERMITTED',
+                'initiatedEventId': 0,
+                'decisionTaskCompletedEventId': completed_event_id,
+                'control': attributes.get('control'),
+            })
+        event = dict(config)
+        event.update({
+            'workflowId': attributes['workflowId'],
+            'workflowType': attributes['workflowType'],
+            'input': attributes.get('input'),
+            'control': attributes.get('control'),
+            'tagList': attributes.get('tagList'),
+            'decisionTaskCompletedEventId': completed_event_id,
+        })
+        initiated_event_id = self._add_event(tx, run_id, 'StartChildWorkflowExecutionInitiated',
+                                             event)
+        child_run_id = self._create_execution(tx, domain, attributes, config,
+                                              parent=(execution, initiated_event_id))
+        started_event_id = self._add_event(tx, run_id, 'ChildWorkflowExecutionStarted', {
+            'workflowExecution': {'workflowId': attributes['workflowId'], 'runId': child_run_id},
+            'workflowType': attributes['workflowType'],
+            'initiatedEventId': initiated_event_id,
+        })
+        self._update_run(tx, child_run_id, parent_started_event_id=started_event_id)
+        self._schedule_decision(tx, run_id)
+
+    # Activity tasks
+
+    def _close_activity(self, tx, task, event_type, attributes):
+        event = dict(attributes)
+        event['scheduledEventId'] = task['scheduled_event_id']
+        event['startedEventId'] = task['started_event_id']
+        self._add_event(tx, task['run_id'], event_type, event)
+        tx.execute('DELETE FROM activity_tasks WHERE token=?', (task['token'],))
+        self._cancel_timeouts(tx, task['run_id'], 'activity:%', task['token'])
+        self._schedule_decision(tx, task['run_id'])
+
+    def _get_started_activity(self, tx, task_token):
+        task = tx.execute("SELECT * FROM activity_tasks WHERE token=? AND state='started'",
+                          (task_token,)).fetchone()
+        if task is None:
+            raise Fault('UnknownResourceFault', 'Unknown activity: token={}'.format(task_token))
+        return task
+
+    def poll_for_activity_task(self, data):
+        domain = data['domain']
+        task_list = data['taskList']['name']
+        with self._transaction(write=False) as tx:
+            self._get_domain(tx, domain)
+        query = ("SELECT * FROM activity_tasks WHERE domain=? AND task_list=? "
+                 "AND state='scheduled' ORDER BY priority DESC, scheduled_at LIMIT 1")
+
+        def take():
+            if self._db().execute(query, (domain, task_list)).fetchone() is None:
+                return None
+            with self._transaction() as tx:
+                task = tx.execute(query, (domain, task_list)).fetchone()
+                if task is None:  # taken by another poller
+                    return None
+                run_id = task['run_id']
+                started_event_id = self._add_event(tx, run_id, 'ActivityTaskStarted', {
+                    'identity': data.get('identity'),
+                    'scheduledEventId': task['scheduled_event_id'],
+                })
+                tx.execute("UPDATE activity_tasks SET state='started', started_event_id=? "
+                           "WHERE token=?", (started_event_id, task['token']))
+                self._cancel_timeouts(tx, run_id, 'activity:SCHEDULE_TO_START', task['token'])
+                scheduled = self._get_event_attributes(tx, run_id, task['scheduled_event_id'])
+                for timeout_type, key in ACTIVITY_TIMEOUTS[2:]:
+                    self._add_timeout(tx, 'activity:' + timeout_type, run_id, task['token'],
+                                      scheduled.get(key))
+                execution = self._get_run(tx, run_id)
+                return _compact({
+                    'taskToken': task['token'],
+                    'activityId': task['activity_id'],
+                    'startedEventId': started_event_id,
+                    'workflowExecution': _execution(execution),
+                    'activityType': scheduled['activityType'],
+                    'input': scheduled.get('input'),
+                })
+
+        return self._long_poll('activity', domain, task_list, take)
+
+    def respond_activity_task_completed(self, data):
+        with self._transaction() as tx:
+            task = self._get_started_activity(tx, data['taskToken'])
+            self._close_activity(tx, task, 'ActivityTaskCompleted', {
+                'result': data.get('result'),
+            })
+
+    def respond_activity_task_failed(self, data):
+        with self._transaction() as tx:
+            task = self._get_started_activity(tx, data['taskToken'])
+            self._close_activity(tx, task, 'ActivityTaskFailed', {
+                'reason': data.get('reason'),
+                'details': data.get('details'),
+            })
+
+    def respond_activity_task_canceled(self, data):
+        with self._transaction() as tx:
+            task = self._get_started_activity(tx, data['taskToken'])
+            self._close_activity(tx, task, 'ActivityTaskCanceled', {
+                'details': data.get('details'),
+                'latestCancelRequestedEventId': task['cancel_requested_event_id'],
+            })
+
+    def record_activity_task_heartbeat(self, data):
+        with self._transaction() as tx:
+            task = self._get_started_activity(tx, data['taskToken'])
+            tx.execute('UPDATE activity_tasks SET details=? WHERE token=?',
+                       (data.get('details'), task['token']))
+            scheduled = self._get_event_attributes(tx, task['run_id'], task['scheduled_event_id'])
+            heartbeat_timeout = scheduled.get('heartbeatTimeout')
+            if heartbeat_timeout and heartbeat_timeout != 'NONE':
+                tx.execute("UPDATE timeouts SET due=? "
+                           "WHERE run_id=? AND kind='activity:HEARTBEAT' AND ref=?",
+                           (tx.now + float(heartbeat_timeout), task['run_id'], task['token']))
+        return {'cancelRequested': task['cancel_requested_event_id'] is not None}
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+boto SWF connections to a local engine.
+"""
+from __future__ import absolute_import
+
+import json
+
+import boto.swf.layer1
+from boto.regioninfo import RegionInfo
+
+from .engine import Fault
+
+
+class Layer1(boto.swf.layer1.Layer1):
+    """
+    boto's SWF client running the requests on an engine in the current
+    process instead of sending them to a service. The requests and the
+    responses are serialized as they would be over HTTP, and the faults
+    raised as the same exceptions.
+
+    :ivar engine:
+    :type engine: swf.backends.engine.Engine
+    """
+    def __init__(self, engine):
+        # No endpoint, credentials nor HTTP connection
+        self.engine = engine
+        self.region = RegionInfo(name='local', endpoint=engine.path)
+
+    def json_request(self, action, data, object_hook=None):
+        self._normalize_request_dict(data)
+        data = json.loads(json.dumps(data))
+        try:
+            response = self.engine.handle(action, data)
+        except Fault as fault:
+            body = fault.body
+            exception_class = self._fault_excp.get(body['__type'], self.ResponseError)
+            raise exception_class(400, 'Bad Request', body=body)
+        return json.loads(json.dumps(response), object_hook=object_hook)
+
+    def close(self):
+        pass
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.__class__.__name__, self.engine.path)
+
+
+def connect_to_server(host, port, aws_access_key_id=None, aws_secret_access_key=None):
+    """
+    Connect to an engine served over HTTP by :mod:`swf.backends.server`.
+
+    :type host: str
+    :type port: int
+    :param aws_access_key_id: ignored by the server, but boto signs requests
+    :type aws_access_key_id: Optional[str]
+    :type aws_secret_access_key: Optional[str]
+    :rtype: boto.swf.layer1.Layer1
+    """
+    return boto.swf.layer1.Layer1(
+        aws_access_key_id=aws_access_key_id or 'local',
+        aws_secret_access_key=aws_secret_access_key or 'local',
+        is_secure=False,
+        port=port,
+        region=RegionInfo(name='local', endpoint=host),
+    )
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Local notifications between the processes sharing a database: a long-poll
+binds a UNIX datagram socket named after its task list, the writers send a
+datagram to the sockets of the task lists they add tasks to.
+"""
+from __future__ import absolute_import
+
+import errno
+import glob
+import hashlib
+import itertools
+import os
+import select
+import socket
+import tempfile
+import threading
+
+from simpleflow import logger
+
+
+_counter = itertools.count()
+
+
+def _hash(*values):
+    digest = hashlib.sha1(u'\0'.join(values).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class Notifier(object):
+    """
+    Wakes up the long-polls on the task lists of a database.
+
+    :ivar directory: directory of the sockets
+    :type directory: str
+    """
+    def __init__(self, name, directory=None):
+        """
+        :param name: identifies the database, e.g. its absolute path
+        :type name: str
+        :param directory: parent directory of the sockets; the paths of the
+                          sockets are limited to about 100 characters
+        :type directory: Optional[str]
+        """
+        self.directory = os.path.join(
+            directory or tempfile.gettempdir(),
+            'simpleflow-swf-{}'.format(_hash(name)[:12]),
+        )
+        try:
+            os.makedirs(self.directory)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+        self._sender = None
+        self._sender_pid = None
+        self._lock = threading.Lock()
+
+    def _prefix(self, kind, domain, task_list):
+        return os.path.join(self.directory, '{}-{}'.format(kind, _hash(domain, task_list)))
+
+    def listen(self, kind, domain, task_list):
+        """
+        Listen to the notifications of a task list. The listener must be
+        created before looking for a task, so that no notification is lost.
+
+        :param kind: 'activity' or 'decision'
+        :type kind: str
+        :type domain: str
+        :type task_list: str
+        :rtype: Listener
+        """
+        path = '{}-{}-{}-{}.sock'.format(
+            self._prefix(kind, domain, task_list),
+            os.getpid(),
+            threading.current_thread().ident,
+            next(_counter),
+        )
+        return Listener(path)
+
+    def notify(self, kind, domain, task_list):
+        """
+        Wake up the listeners of a task list.
+
+        :type kind: str
+        :type domain: str
+        :type task_list: str
+        """
+        paths = glob.glob('{}-*.sock'.format(self._prefix(kind, domain, task_list)))
+        if not paths:
+            return
+        with self._lock:
+            if self._sender is None or self._sender_pid != os.getpid():
+                self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._sender.setblocking(False)
+                self._sender_pid = os.getpid()
+            for path in paths:
+                try:
+                    self._sender.sendto(b'!', path)
+                except socket.error as err:
+                    if err.errno == errno.ECONNREFUSED:
+                        # Left by a killed process
+                        logger.debug('removing stale socket {}'.format(path))
+                        _unlink(path)
+                    elif err.errno not in (errno.ENOENT, errno.EAGAIN, errno.ENOBUFS):
+                        raise
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except OSError as err:
+        if err.errno != errno.ENOENT:
+            raise
+
+
+class Listener(object):
+    """
+    Socket receiving the notifications of a task list; use as a context
+    manager.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(path)
+
+    def wait(self, timeout):
+        """
+        Wait for a notification.
+
+        :param timeout: seconds
+        :type timeout: float
+        :return: whether a notification was received
+        :rtype: bool
+        """
+        try:
+            readable, _, _ = select.select([self._socket], [], [], max(0., timeout))
+        except (select.error, OSError) as err:
+            if err.args[0] == errno.EINTR:
+                return False
+            raise
+        if not readable:
+            return False
+        # Several notifications count as one
+        self._socket.setblocking(False)
+        try:
+            while True:
+                self._socket.recv(16)
+        except socket.error:
+            pass
+        self._socket.setblocking(True)
+        return True
+
+    def close(self):
+        self._socket.close()
+        _unlink(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Local daemon serving an engine over HTTP with the wire protocol of SWF,
+so that boto clients can use it as an endpoint.
+"""
+from __future__ import absolute_import
+
+import json
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from simpleflow import logger
+
+from .engine import Fault
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        # X-Amz-Target: com.amazonaws.swf.service.model.SimpleWorkflowService.PollForActivityTask
+        action = self.headers.get('X-Amz-Target', '').rsplit('.', 1)[-1]
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            data = json.loads(self.rfile.read(length).decode('utf-8') or '{}')
+            status, body = 200, self.server.engine.handle(action, data)
+        except Fault as fault:
+            status, body = 400, fault.body
+        except Exception as err:
+            logger.exception('error handling {}: {}'.format(action, err))
+            status, body = 500, {'__type': 'InternalFailure', 'message': str(err)}
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/x-amz-json-1.0')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug('{} - {}'.format(self.address_string(), format % args))
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    """
+    Threaded HTTP server; each request, e.g. a long-poll, has its thread.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, engine):
+        """
+        :param address: host and port; port 0 picks a free one
+        :type address: (str, int)
+        :type engine: swf.backends.engine.Engine
+        """
+        HTTPServer.__init__(self, address, RequestHandler)
+        self.engine = engine
+
+
+def serve(engine, host='127.0.0.1', port=8999):
+    """
+    Serve an engine until interrupted.
+
+    :type engine: swf.backends.engine.Engine
+    :type host: str
+    :type port: int
+    """
+    server = Server((host, port), engine)
+    logger.info('serving {} on http://{}:{}'.format(engine.path, *server.server_address[:2]))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -5,6 +5,8 @@
 #
 # See the file LICENSE for copying permission.
 import os
+import threading
+import weakref
 
 from boto.exception import NoAuthHandlerFound
 import boto.swf
@@ -15,13 +17,147 @@ import boto.swf
 from simpleflow import logger
 from simpleflow.utils import retry
 
-from . import settings
+from . import backends, settings
 
 
 SETTINGS = settings.get()
 RETRIES = int(os.environ.get('SWF_CONNECTION_RETRIES', '5'))
 
 
+class ConnectionPool(object):
+    """Process-wide pool of SWF connections
+
+    Connections are shared by region and credentials; boto keeps their
+    HTTP connections alive, so reusing them avoids a TLS handshake per
+    object. Sockets must not be shared between processes, so the pool is
+    emptied when it's used after a ``fork()``, and the connections
+    inherited from the parent process are replaced.
+
+    :ivar created: number of connections created in this process
+    :type created: int
+    :ivar reused: number of connections handed out again
+    :type reused: int
+    :ivar resets: number of times the pool was emptied after a fork
+    :type resets: int
+
+    """
+    def __init__(self):
+        # Maps each pooled connection to its key, in all processes.
+        self._keys = weakref.WeakKeyDictionary()
+        self._reset()
+        self.resets = 0
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._connections = {}
+        self.created = 0
+        self.reused = 0
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            # Don't close the connections: their sockets belong to the
+            # parent process too.
+            self._reset()
+            self.resets += 1
+
+    def get(self, region, aws_access_key_id=None, aws_secret_access_key=None):
+        """Return the connection to the region for these credentials
+
+        The connection is to the backend set by the ``backend`` setting or
+        the ``SWF_BACKEND`` environment variable instead of SWF, if any; see
+        ``swf.backends``.
+
+        :type region: str
+        :rtype: boto.swf.layer1.Layer1
+
+        """
+        self._check_pid()
+        backend = get_backend()
+        key = (region, aws_access_key_id, aws_secret_access_key, backend)
+        with self._lock:
+            connection = self._connections.get(key)
+            if connection is not None:
+                self.reused += 1
+                return connection
+
+            if backend:
+                connection = backends.connect(
+                    backend,
+                    aws_access_key_id=aws_access_key_id,
+                    aws_secret_access_key=aws_secret_access_key)
+            else:
+                connection = boto.swf.connect_to_region(
+                    region,
+                    aws_access_key_id=aws_access_key_id,
+                    aws_secret_access_key=aws_secret_access_key)
+            if connection is None:
+                raise ValueError('invalid region: {}'.format(region))
+            # Only pool actual connections (they are mocked in some tests)
+            if isinstance(connection, boto.swf.layer1.Layer1):
+                self._connections[key] = connection
+                self._keys[connection] = key
+            self.created += 1
+            logger.debug("initiated connection to region={} (pid={})".format(
+                region, self._pid))
+            return connection
+
+    def clear(self):
+        """Forget the pooled connections"""
+        with self._lock:
+            self._connections.clear()
+
+    def is_stale(self, connection):
+        """Whether the connection was pooled in another process
+
+        :type connection: boto.swf.layer1.Layer1
+        :rtype: bool
+
+        """
+        self._check_pid()
+        try:
+            key = self._keys.get(connection)
+        except TypeError:  # not weakly referenceable, hence not pooled
+            return False
+        return key is not None and self._connections.get(key) is not connection
+
+    def refresh(self, connection):
+        """Return the connection replacing a stale one
+
+        :type connection: boto.swf.layer1.Layer1
+        :rtype: boto.swf.layer1.Layer1
+
+        """
+        region, aws_access_key_id, aws_secret_access_key, _ = self._keys[connection]
+        return self.get(region, aws_access_key_id, aws_secret_access_key)
+
+    @property
+    def stats(self):
+        """
+        :rtype: dict[str, int]
+        """
+        self._check_pid()
+        return {
+            'pid': self._pid,
+            'connections': len(self._connections),
+            'created': self.created,
+            'reused': self.reused,
+            'resets': self.resets,
+        }
+
+
+def get_backend():
+    """URL of the backend replacing SWF, if any
+
+    :rtype: Optional[str]
+
+    """
+    return SETTINGS.get('backend') or os.environ.get('SWF_BACKEND') or None
+
+
+connection_pool = ConnectionPool()
+
+
 class ConnectedSWFObject(object):
     """Authenticated object interface
 
@@ -29,13 +165,14 @@ class ConnectedSWFObject(object):
 
     :ivar region: name of the AWS region
     :type region: str
-    :ivar connection: connection to the SWF endpoint
+    :ivar connection: connection to the SWF endpoint, taken from
+                      ``connection_pool`` unless one is passed
     :type connection: boto.swf.layer1.Layer1
 
     """
     __slots__ = [
         'region',
-        'connection'
+        '_connection',
     ]
 
     @retry.with_delay(nb_times=RETRIES,
@@ -50,9 +187,15 @@ class ConnectedSWFObject(object):
                        kwargs.get('region') or
                        boto.swf.layer1.Layer1.DefaultRegionName)
 
-        self.connection = (kwargs.pop('connection', None) or
-                           boto.swf.connect_to_region(self.region, **settings_))
-        if self.connection is None:
-            raise ValueError('invalid region: {}'.format(self.region))
+        self._connection = (kwargs.pop('connection', None) or
+                            connection_pool.get(self.region, **settings_))
+
+    @property
+    def connection(self):
+        if connection_pool.is_stale(self._connection):
+            self._connection = connection_pool.refresh(self._connection)
+        return self._connection
 
-        logger.debug("initiated connection to region={}".format(self.region))
+    @connection.setter
+    def connection(self, connection):
+        self._connection = connection
@@ -5,13 +5,33 @@
 #
 # See the file LICENSE for copying permission.
 
-import json
-
 from datetime import datetime
 import pytz
 from future.utils import iteritems
 
-from swf.utils import camel_to_underscore, cached_property
+from simpleflow import codec
+from swf.utils import camel_to_underscore, decapitalize, underscore_to_camel
+
+
+# Attribute name -> raw attributes key, e.g. 'activity_id' -> 'activityId'
+_ATTRIBUTE_KEYS = {}
+
+
+def attribute_key(name):
+    """
+    Raw attribute key of an underscored attribute name.
+
+    >>> attribute_key('scheduled_event_id')
+    'scheduledEventId'
+
+    :param name:
+    :type name: str
+    :rtype: str
+    """
+    key = _ATTRIBUTE_KEYS.get(name)
+    if key is None:
+        key = _ATTRIBUTE_KEYS[name] = decapitalize(underscore_to_camel(name))
+    return key
 
 
 class Event(object):
@@ -31,6 +51,10 @@ class Event(object):
     instance would for example have type 'DecisionTask',
     name 'DecisionTaskScheduleFailed', id '1' and state 'failed'.
 
+    The event attributes are not copied: they are looked up in the raw data
+    when accessed, ``event.activity_id`` reading the ``activityId``
+    attribute. The ``input`` payload is decoded on first access.
+
     :param  id: event id provided by amazon service
     :type   id: string
 
@@ -42,11 +66,25 @@ class Event(object):
 
     :param  raw_data: raw_event representation provided by amazon service
     :type   raw_data: dict
+
+    :param  name: event name; defaults to the raw eventType
+    :type   name: str
+
+    :param  attributes_key: key of the attributes in the raw data
+    :type   attributes_key: str
     """
+    __slots__ = (
+        '_id',
+        '_state',
+        '_timestamp',
+        '_datetime',
+        '_input',
+        '_name',
+        '_attributes_key',
+        'raw',
+    )
+
     _type = None
-    _name = None
-    _attributes_key = None
-    _attributes = None
 
     excluded_attributes = (
         'eventId',
@@ -54,20 +92,52 @@ class Event(object):
         'eventTimestamp'
     )
 
-    def __init__(self, id, state, timestamp, raw_data):
+    def __init__(self, id, state, timestamp, raw_data,
+                 name=None, attributes_key=None):
         """
         """
         self._id = id
         self._state = state
         self._timestamp = timestamp
-        self._input = {}
+        self._datetime = None
+        self._input = None
         self.raw = raw_data or {}
-
-        self.process_attributes()
+        if name is None:
+            name = self.raw.get('eventType')
+        if attributes_key is None and name:
+            # amazon swf format is not very normalized and event attributes
+            # response field is non-capitalized...
+            attributes_key = decapitalize(name) + 'EventAttributes'
+        self._name = name
+        self._attributes_key = attributes_key
 
     def __repr__(self):
         return '<Event %s %s : %s >' % (self.id, self.type, self.state)
 
+    def __getattr__(self, name):
+        # Only called when the regular lookup fails: look for an attribute
+        if name.startswith('_') or name == 'raw':
+            raise AttributeError(name)
+        attributes = self.attributes
+        try:
+            return attributes[attribute_key(name)]
+        except KeyError:
+            pass
+        for key, value in iteritems(attributes):
+            if camel_to_underscore(key) == name:
+                return value
+        raise AttributeError("'{}' object has no attribute '{}'".format(
+            self.__class__.__name__, name))
+
+    def __getstate__(self):
+        return dict(
+            (slot, getattr(self, slot)) for slot in Event.__slots__
+        )
+
+    def __setstate__(self, state):
+        for slot, value in iteritems(state):
+            setattr(self, slot, value)
+
     @property
     def id(self):
         return self._id
@@ -84,20 +154,32 @@ class Event(object):
     def state(self):
         return self._state
 
-    @cached_property
+    @property
+    def attributes(self):
+        """
+        :return: raw attributes of the event
+        :rtype: dict[str, Any]
+        """
+        return self.raw.get(self._attributes_key) or {}
+
+    @property
     def timestamp(self):
-        return datetime.fromtimestamp(self._timestamp, tz=pytz.UTC)
+        if self._datetime is None:
+            self._datetime = datetime.fromtimestamp(self._timestamp, tz=pytz.UTC)
+        return self._datetime
 
     @property
     def input(self):
+        if self._input is None:
+            value = self.attributes.get('input')
+            self._input = codec.loads(value) if value is not None else {}
         return self._input
 
-    @input.setter
-    def input(self, value):
-        self._input = json.loads(value)
+    def copy_from(self, event):
+        """
+        Make this event a copy of *event*.
 
-    def process_attributes(self):
-        """Processes the event raw_data attributes_key elements
-        and sets current instance attributes accordingly"""
-        for key, value in iteritems(self.raw[self._attributes_key]):
-            setattr(self, camel_to_underscore(key), value)
+        :param  event:
+        :type   event: Event
+        """
+        self.__setstate__(event.__getstate__())
@@ -67,7 +67,7 @@ class CompiledEvent(Event, Stateful):
             raise InconsistentStateError("Provided event is in {0} state "
                                          "when attended intial state is {1}"
                                          .format(event.state, self.initial_state))
-        self.__dict__ = event.__dict__.copy()
+        self.copy_from(event)
 
     def __repr__(self):
         return '<CompiledEvent %s %s>' % (self.type, self.state)
@@ -91,4 +91,4 @@ class CompiledEvent(Event, Stateful):
         if event.state not in self.transitions[self.state]:
             raise TransitionError("Transition to state %s not allowed")
 
-        self.__dict__ = event.__dict__.copy()
+        self.copy_from(event)
@@ -69,6 +69,58 @@ EVENTS = collections.OrderedDict([
 ])
 
 
+# Every event type of the SWF API that maps to an Event subclass
+EVENT_TYPES = (
+    'WorkflowExecutionStarted',
+    'WorkflowExecutionCancelRequested',
+    'WorkflowExecutionCompleted',
+    'CompleteWorkflowExecutionFailed',
+    'WorkflowExecutionFailed',
+    'FailWorkflowExecutionFailed',
+    'WorkflowExecutionTimedOut',
+    'WorkflowExecutionCanceled',
+    'CancelWorkflowExecutionFailed',
+    'WorkflowExecutionContinuedAsNew',
+    'ContinueAsNewWorkflowExecutionFailed',
+    'WorkflowExecutionTerminated',
+    'WorkflowExecutionSignaled',
+    'DecisionTaskScheduled',
+    'DecisionTaskStarted',
+    'DecisionTaskCompleted',
+    'DecisionTaskTimedOut',
+    'ActivityTaskScheduled',
+    'ScheduleActivityTaskFailed',
+    'ActivityTaskStarted',
+    'ActivityTaskCompleted',
+    'ActivityTaskFailed',
+    'ActivityTaskTimedOut',
+    'ActivityTaskCanceled',
+    'ActivityTaskCancelRequested',
+    'RequestCancelActivityTaskFailed',
+    'MarkerRecorded',
+    'RecordMarkerFailed',
+    'TimerStarted',
+    'StartTimerFailed',
+    'TimerFired',
+    'TimerCanceled',
+    'CancelTimerFailed',
+    'StartChildWorkflowExecutionInitiated',
+    'StartChildWorkflowExecutionFailed',
+    'ChildWorkflowExecutionStarted',
+    'ChildWorkflowExecutionCompleted',
+    'ChildWorkflowExecutionFailed',
+    'ChildWorkflowExecutionTimedOut',
+    'ChildWorkflowExecutionCanceled',
+    'ChildWorkflowExecutionTerminated',
+    'SignalExternalWorkflowExecutionInitiated',
+    'SignalExternalWorkflowExecutionFailed',
+    'ExternalWorkflowExecutionSignaled',
+    'RequestCancelExternalWorkflowExecutionInitiated',
+    'RequestCancelExternalWorkflowExecutionFailed',
+    'ExternalWorkflowExecutionCancelRequested',
+)
+
+
 class EventFactory(object):
     """Processes an input json event representation, and instantiates
     an ``swf.models.event.Event`` subclass instance accordingly.
@@ -102,29 +154,50 @@ class EventFactory(object):
     # eventType to Event subclass bindings
     events = EVENTS
 
+    # eventType -> (Event subclass, state, attributes key)
+    event_types = {}
+
     def __new__(klass, raw_event):
-        event_id = raw_event['eventId']
         event_name = raw_event['eventType']
-        event_timestamp = raw_event['eventTimestamp']
+        try:
+            event_class, event_state, event_attributes_key = \
+                EventFactory.event_types[event_name]
+        except KeyError:
+            event_class, event_state, event_attributes_key = \
+                EventFactory._register_event_type(event_name)
+
+        return event_class(
+            id=raw_event['eventId'],
+            state=event_state,
+            timestamp=raw_event['eventTimestamp'],
+            raw_data=raw_event,
+            name=event_name,
+            attributes_key=event_attributes_key,
+        )
+
+    @classmethod
+    def _register_event_type(klass, event_name):
+        """Computes and stores how to build an event of type *event_name*
 
+        :param  event_name: e.g. 'StartChildWorkflowExecutionInitiated'
+        :type   event_name: str
+
+        :returns: Event subclass, state and attributes key
+        :rtype: (type, str, str)
+        """
         event_type = klass._extract_event_type(event_name)
         event_state = klass._extract_event_state(event_type, event_name)
         # amazon swf format is not very normalized and event attributes
         # response field is non-capitalized...
         event_attributes_key = decapitalize(event_name) + 'EventAttributes'
 
-        klass = EventFactory.events[event_type]['event']
-        klass._name = event_name
-        klass._attributes_key = event_attributes_key
-
-        instance = klass(
-            id=event_id,
-            state=event_state,
-            timestamp=event_timestamp,
-            raw_data=raw_event
+        entry = (
+            klass.events[event_type]['event'],
+            event_state,
+            event_attributes_key,
         )
-
-        return instance
+        EventFactory.event_types[event_name] = entry
+        return entry
 
     @classmethod
     def _extract_event_type(klass, event_name):
@@ -165,6 +238,10 @@ class EventFactory(object):
         return camel_to_underscore(left + right)
 
 
+for _event_name in EVENT_TYPES:
+    EventFactory._register_event_type(_event_name)
+
+
 class CompiledEventFactory(object):
     """
     Process an Event object and instantiates the corresponding
@@ -10,6 +10,7 @@ from swf.models.event.compiler import CompiledEvent
 
 
 class TimerEvent(Event):
+    __slots__ = ()
     _type = 'Timer'
 
 
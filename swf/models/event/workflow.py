@@ -10,6 +10,7 @@ from swf.models.event.compiler import CompiledEvent
 
 
 class WorkflowExecutionEvent(Event):
+    __slots__ = ()
     _type = 'WorkflowExecution'
 
 
@@ -52,6 +53,7 @@ class CompiledWorkflowExecutionEvent(CompiledEvent):
 
 
 class ChildWorkflowExecutionEvent(Event):
+    __slots__ = ()
     _type = 'ChildWorkflowExecution'
 
 
@@ -79,6 +81,7 @@ class CompiledChildWorkflowExecutionEvent(CompiledEvent):
 
 
 class ExternalWorkflowExecutionEvent(Event):
+    __slots__ = ()
     _type = 'ExternalWorkflowExecution'
 
 
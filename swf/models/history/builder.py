@@ -1,4 +1,5 @@
 import swf.models.event.workflow
+from simpleflow import codec
 from simpleflow.utils import json_dumps
 from swf.models.event.factory import EventFactory
 
@@ -228,7 +229,8 @@ class History(swf.models.History):
                                    activity.name, hash(activity.name))),
                 "scheduleToStartTimeout": activity.task_schedule_to_start_timeout,
                 "decisionTaskCompletedEventId": decision_id,
-                "input": json_dumps(input if input is not None else {}),
+                "input": codec.dumps(input if input is not None else {},
+                                     getattr(activity, 'codec', None)),
                 "startToCloseTimeout": activity.task_start_to_close_timeout,
             }
         }))
@@ -257,7 +259,7 @@ class History(swf.models.History):
             "activityTaskCompletedEventAttributes": {
                 "startedEventId": started,
                 "scheduledEventId": scheduled,
-                "result": json_dumps(result) if result is not None else None,
+                "result": codec.dumps(result) if result is not None else None,
             }
         }))
 
@@ -650,6 +652,20 @@ class History(swf.models.History):
 
         return self
 
+    def add_marker(self, name, details=None, decision_id=None):
+        self.events.append(EventFactory({
+            'eventId': self.next_id,
+            'eventTimestamp': new_timestamp_string(),
+            'eventType': 'MarkerRecorded',
+            'markerRecordedEventAttributes': {
+                'decisionTaskCompletedEventId': decision_id or self.last_id,
+                'details': details,
+                'markerName': name,
+            }
+        }))
+
+        return self
+
     def add_signal(self, name, input=None, external_event_id=0):
         self.events.append(EventFactory({
             'eventId': self.next_id,
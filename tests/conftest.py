@@ -0,0 +1,11 @@
+import pytest
+
+from swf.core import connection_pool
+
+
+@pytest.fixture(autouse=True)
+def clear_connection_pool():
+    # Pooled connections would outlive the SWF mocks and VCR cassettes
+    connection_pool.clear()
+    yield
+    connection_pool.clear()
@@ -0,0 +1,56 @@
+import unittest
+
+import mock
+
+from simpleflow.process.autoscaler import Autoscaler, LoadStats, get_target
+
+
+class TestGetTarget(unittest.TestCase):
+    def test_scale_up_to_the_backlog(self):
+        # 4 busy children + 3 pending tasks
+        self.assertEqual(7, get_target(4, 3, 0., 1, 10))
+        # 2 busy children + 3 pending tasks, but never below the current number
+        self.assertEqual(5, get_target(4, 3, 0.5, 1, 10))
+        self.assertEqual(4, get_target(4, 1, 1., 1, 10))
+        self.assertEqual(10, get_target(4, 30, 0., 1, 10))
+
+    def test_scale_down_one_at_a_time(self):
+        self.assertEqual(3, get_target(4, 0, 0.9, 1, 10))
+        self.assertEqual(4, get_target(4, 0, 0.1, 1, 10))
+        self.assertEqual(4, get_target(4, 0, None, 1, 10))
+        self.assertEqual(2, get_target(2, 0, 1., 2, 10))
+
+
+class TestAutoscaler(unittest.TestCase):
+    def test_bounds(self):
+        with self.assertRaises(ValueError):
+            Autoscaler(3, 2, lambda: 0)
+        autoscaler = Autoscaler(2, 4, lambda: 0)
+        self.assertEqual(2, autoscaler.clamp(None))
+        self.assertEqual(4, autoscaler.clamp(8))
+        self.assertEqual(3, autoscaler.clamp(3))
+
+    def test_get_target(self):
+        stats = LoadStats()
+        backlog = mock.Mock(return_value=5)
+        autoscaler = Autoscaler(1, 8, backlog, stats=stats, interval=0)
+
+        stats.add(busy=2.)
+        self.assertEqual(7, autoscaler.get_target(2))
+        self.assertEqual(0., autoscaler.idle_ratio)
+        self.assertEqual(5, autoscaler.nb_pending)
+
+        backlog.return_value = 0
+        stats.add(idle=3., busy=1.)
+        self.assertEqual(6, autoscaler.get_target(7))
+        self.assertEqual(0.75, autoscaler.idle_ratio)
+
+        backlog.side_effect = Exception('throttled')
+        self.assertEqual(6, autoscaler.get_target(6))
+
+    def test_interval(self):
+        backlog = mock.Mock(return_value=5)
+        autoscaler = Autoscaler(1, 8, backlog, interval=60)
+        self.assertEqual(2, autoscaler.get_target(2))
+        self.assertFalse(backlog.called)
+        self.assertGreater(autoscaler.timeout(), 0)
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from simpleflow.process import Supervisor, cpu
+
+
+class TestCgroupCpuLimit(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.proc_self_cgroup = os.path.join(self.root, 'proc-self-cgroup')
+
+    def write(self, path, content):
+        path = os.path.join(self.root, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def get_limit(self):
+        return cpu.get_cgroup_cpu_limit(self.root, self.proc_self_cgroup)
+
+    def test_v2(self):
+        self.write('cgroup.controllers', 'cpu memory\n')
+        self.write('proc-self-cgroup', '0::/kubepods/pod1\n')
+        self.assertIsNone(self.get_limit())
+
+        self.write('kubepods/pod1/cpu.max', 'max 100000\n')
+        self.assertIsNone(self.get_limit())
+
+        self.write('kubepods/pod1/cpu.max', '150000 100000\n')
+        self.assertEqual(1.5, self.get_limit())
+
+        # A parent cgroup is more restrictive
+        self.write('kubepods/cpu.max', '50000 100000\n')
+        self.assertEqual(0.5, self.get_limit())
+
+    def test_v1(self):
+        self.write('proc-self-cgroup', '4:cpu,cpuacct:/docker/abc\n2:memory:/docker/abc\n')
+        self.write('cpu,cpuacct/docker/abc/cpu.cfs_quota_us', '-1\n')
+        self.write('cpu,cpuacct/docker/abc/cpu.cfs_period_us', '100000\n')
+        self.assertIsNone(self.get_limit())
+
+        self.write('cpu,cpuacct/docker/abc/cpu.cfs_quota_us', '200000\n')
+        self.assertEqual(2., self.get_limit())
+
+    def test_no_cgroup(self):
+        self.assertIsNone(self.get_limit())
+
+
+class TestCpuCount(unittest.TestCase):
+    def test_quota(self):
+        with mock.patch.object(cpu, 'get_available_cpus', return_value=list(range(64))):
+            with mock.patch.object(cpu, 'get_cgroup_cpu_limit', return_value=1.5):
+                self.assertEqual(2, cpu.cpu_count())
+            with mock.patch.object(cpu, 'get_cgroup_cpu_limit', return_value=0.1):
+                self.assertEqual(1, cpu.cpu_count())
+            with mock.patch.object(cpu, 'get_cgroup_cpu_limit', return_value=None):
+                self.assertEqual(64, cpu.cpu_count())
+
+    def test_affinity(self):
+        with mock.patch.object(cpu, 'get_available_cpus', return_value=[2, 3]):
+            with mock.patch.object(cpu, 'get_cgroup_cpu_limit', return_value=None):
+                self.assertEqual(2, cpu.cpu_count())
+
+
+class TestSupervisorCpuAffinity(unittest.TestCase):
+    def test_get_free_cpu(self):
+        with mock.patch.object(cpu, 'get_available_cpus', return_value=[2, 3]):
+            supervisor = Supervisor(lambda: None, nb_children=3, cpu_affinity=True)
+        self.assertEqual(2, supervisor._get_free_cpu())
+        supervisor._pinned = {100: 2}
+        self.assertEqual(3, supervisor._get_free_cpu())
+        supervisor._pinned = {100: 2, 101: 3, 102: 3}
+        self.assertEqual(2, supervisor._get_free_cpu())
+
+    def test_no_affinity(self):
+        supervisor = Supervisor(lambda: None, nb_children=1)
+        self.assertIsNone(supervisor._get_free_cpu())
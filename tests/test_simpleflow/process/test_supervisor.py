@@ -12,6 +12,7 @@ from setproctitle import setproctitle
 from sure import expect
 
 from simpleflow.process import Supervisor, reset_signal_handlers
+from simpleflow.process.autoscaler import Autoscaler, LoadStats
 from tests.utils import IntegrationTestCase
 
 
@@ -124,6 +125,31 @@ class TestSupervisor(IntegrationTestCase):
         expect(len(new_workers)).to.equal(1)
         expect(new_workers[0].pid).to.not_be.equal(old_workers[0].pid)
 
+    @mark.skipif(platform.system() == 'Darwin', reason="setproctitle doesn't work reliably on MacOSX")
+    def test_autoscale(self):
+        def sleep_long(seconds):
+            setproctitle("simpleflow Worker(autoscaled)")
+            time.sleep(seconds)
+
+        backlog = multiprocessing.Value('i', 5)
+        stats = LoadStats()
+        autoscaler = Autoscaler(1, 3, lambda: backlog.value, stats=stats, interval=0.1)
+        supervisor = Supervisor(sleep_long, arguments=(30,), nb_children=1,
+                                background=True, autoscaler=autoscaler)
+        supervisor.start()
+
+        # scale up to the maximum
+        self.wait(1)
+        self.assertProcess(r'Worker\(autoscaled\)', count=3)
+
+        # idle children without backlog: scale down to the minimum
+        backlog.value = 0
+        for _ in range(10):
+            stats.add(idle=1.)
+            self.wait(0.1)
+        self.wait(0.5)
+        self.assertProcess(r'Worker\(autoscaled\)', count=1)
+
     # NB: not in the Supervisor class but we want to benefit from the tearDown()
     @mark.skipif(platform.system() == 'Darwin', reason="setproctitle doesn't work reliably on MacOSX")
     def test_reset_signal_handlers(self):
@@ -0,0 +1,87 @@
+import json
+import unittest
+from datetime import datetime
+
+import mock
+import pytz
+
+from simpleflow.history import History
+from simpleflow.swf.stats import WorkflowStats, columnar, get_start_to_close_timing, pretty
+from simpleflow.swf.stats.columnar import ColumnarHistory
+from swf.models import History as BasicHistory
+from swf.models.history import builder
+from tests.data import BaseTestWorkflow, increment
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=pytz.UTC)
+
+
+def fake_history():
+    with open("tests/data/dumps/workflow_execution_basic.json") as f:
+        basic_history_tree = json.loads(f.read())
+    return History(BasicHistory.from_event_list(basic_history_tree["events"]))
+
+
+class TestColumnarHistory(unittest.TestCase):
+    def test_build(self):
+        history = fake_history()
+        columnar = ColumnarHistory(history.raw_history)
+        self.assertEqual(len(history.events), len(columnar))
+        self.assertEqual([e.id for e in history.events], list(columnar.event_id))
+        self.assertEqual([e.state for e in history.events],
+                         [columnar.states[c] for c in columnar.state_code])
+        self.assertEqual(
+            ["activity-examples.basic.increment-1", "activity-examples.basic.Delay-1",
+             "activity-examples.basic.double-1"],
+            columnar.tasks,
+        )
+
+    def test_timings_match_workflow_stats(self):
+        history = fake_history()
+        expected = WorkflowStats(history).get_timings_with_percentage()
+        timings = ColumnarHistory(history.raw_history).get_timings_with_percentage()
+
+        self.assertEqual(len(expected), len(timings))
+        for row, other in zip(expected, timings):
+            self.assertEqual(row[:2], other[:2])
+            for value, timestamp in zip(row[2:5], other[2:5]):
+                self.assertAlmostEqual((value - EPOCH).total_seconds(), timestamp, places=3)
+            self.assertAlmostEqual(row[5], other[5], places=3)
+            self.assertAlmostEqual(row[6], other[6], places=3)
+
+    def test_timings_match_parsed_history(self):
+        history = fake_history()
+        history.parse()
+        expected = [
+            (task_id,) + get_start_to_close_timing(task)
+            for task_id, task in history.activities.items()
+        ]
+        self.assertEqual(expected, WorkflowStats(history).get_timings())
+
+    def test_without_numpy(self):
+        history = ColumnarHistory(fake_history().raw_history)
+        expected = history.get_timings_with_percentage(), history.get_concurrency()
+        with mock.patch.object(columnar, 'numpy', None):
+            self.assertEqual(expected, (history.get_timings_with_percentage(), history.get_concurrency()))
+
+    def test_concurrency(self):
+        history = builder.History(BaseTestWorkflow)
+        for index in (1, 2):
+            history.add_activity_task_scheduled(increment, history.last_id,
+                                                activity_id='activity-{}'.format(index))
+        history.add_activity_task_started(scheduled=4)
+        history.add_activity_task_started(scheduled=5)
+        history.add_activity_task_completed(scheduled=4, started=6)
+        history.add_activity_task_completed(scheduled=5, started=7)
+
+        columnar = ColumnarHistory(history)
+        self.assertEqual([1, 2, 1, 0], [running for _, running in columnar.get_concurrency()])
+        self.assertEqual(2, columnar.max_concurrency())
+
+    def test_profile(self):
+        execution = mock.Mock()
+        execution.history.return_value = fake_history().raw_history
+        header, rows = pretty.profile(execution, nb_tasks=2)
+        self.assertEqual(8, len(header))
+        self.assertEqual(2, len(rows))
+        self.assertGreaterEqual(rows[0][5], rows[1][5])
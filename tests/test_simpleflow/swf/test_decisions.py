@@ -0,0 +1,47 @@
+import collections
+import json
+import unittest
+
+import swf.models.decision
+from simpleflow import exceptions
+from simpleflow.swf.decisions import DecisionBatch
+
+
+ActivityType = collections.namedtuple('ActivityType', 'name version')
+
+
+def make_decision(index, input_size=10):
+    decision = swf.models.decision.ActivityTaskDecision(
+        'schedule',
+        activity_id='activity-{}'.format(index),
+        activity_type=ActivityType('test', 'v1'),
+        input='*' * input_size,
+    )
+    return decision
+
+
+class TestDecisionBatch(unittest.TestCase):
+    def test_size(self):
+        batch = DecisionBatch(max_decisions=100, max_size=10 ** 6)
+        self.assertEqual(len(json.dumps([])), batch.size)
+        for index in range(5):
+            batch.schedule([make_decision(index, input_size=index * 100)], 'timer')
+            self.assertEqual(len(json.dumps(batch.decisions)), batch.size)
+
+    def test_max_decisions(self):
+        batch = DecisionBatch(max_decisions=4, max_size=10 ** 6)
+        batch.schedule([make_decision(1)], 'timer-1')
+        batch.schedule([make_decision(2)], 'timer-2')
+        with self.assertRaises(exceptions.ExecutionBlocked):
+            batch.schedule([make_decision(3)], 'timer-3')
+        self.assertEqual(4, len(batch))
+        self.assertEqual('StartTimer', batch[-1].type)
+        self.assertEqual(len(json.dumps(batch.decisions)), batch.size)
+
+    def test_max_size(self):
+        batch = DecisionBatch(max_decisions=100, max_size=3000)
+        batch.schedule([make_decision(1, input_size=1000)], 'timer-1')
+        with self.assertRaises(exceptions.ExecutionBlocked):
+            batch.schedule([make_decision(2, input_size=2000)], 'timer-2')
+        self.assertEqual(['ScheduleActivityTask', 'StartTimer'],
+                         [decision.type for decision in batch])
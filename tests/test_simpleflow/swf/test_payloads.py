@@ -0,0 +1,198 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import boto
+import mock
+from moto import mock_s3, mock_swf
+
+import swf.models
+from swf.models.history import builder
+from swf.responses import Response
+
+from simpleflow import activity, settings
+from simpleflow.history import History
+from simpleflow.swf import helpers, payloads
+from simpleflow.swf.executor import Executor
+from simpleflow.swf.process.decider.base import DeciderPoller
+from simpleflow.swf.process.worker.base import ActivityWorker
+from tests.data import BaseTestWorkflow, DOMAIN
+
+
+@activity.with_attributes(task_list='test_task_list', version='test')
+def repeat(text, times):
+    return text * times
+
+
+class RepeatWorkflow(BaseTestWorkflow):
+    def run(self, text, times):
+        return len(self.submit(repeat, text, times).result)
+
+
+class PayloadsTestCase(unittest.TestCase):
+    storage = None
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        patcher = mock.patch.multiple(
+            settings,
+            PAYLOAD_STORAGE=self.storage or self.directory,
+            PAYLOAD_OFFLOAD_THRESHOLD=100,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(payloads._cache.clear)
+        self.addCleanup(shutil.rmtree, self.directory)
+
+
+class TestLocalPayloads(PayloadsTestCase):
+    def test_small_payload(self):
+        message = json.dumps('x' * 10)
+        self.assertEqual(payloads.offload(message, 'wf', 'run'), message)
+
+    def test_disabled(self):
+        with mock.patch.object(settings, 'PAYLOAD_STORAGE', None):
+            self.assertIsNone(payloads.make_reference(json.dumps('x' * 1000), 'wf', 'run'))
+
+    def test_offload(self):
+        value = {'text': 'x' * 1000}
+        reference = json.loads(payloads.offload(json.dumps(value), 'wf', 'run'))
+        self.assertTrue(payloads.is_reference(reference))
+        url = reference[payloads.PAYLOAD_KEY]
+        self.assertTrue(url.startswith(os.path.join(self.directory, 'wf', 'run') + '/'))
+        self.assertTrue(os.path.exists(url))
+
+        self.assertEqual(payloads.resolve(reference), value)
+        payloads._cache.clear()
+        self.assertEqual(payloads.resolve(reference), value)
+        self.assertEqual(payloads.resolve(value), value)
+
+        self.assertEqual(payloads.collect('wf', 'run'), 1)
+        self.assertFalse(os.path.exists(url))
+        self.assertEqual(payloads.collect('wf', 'run'), 0)
+
+
+    def test_localize(self):
+        value = ['x' * 1000]
+        message = payloads.offload(json.dumps(value), 'wf', 'run')
+        self.assertEqual(payloads.localize(message, 'wf', 'run'), message)
+
+        copy = payloads.localize(message, 'wf', 'run-2')
+        self.assertIn('/wf/run-2/', json.loads(copy)[payloads.PAYLOAD_KEY])
+        payloads.collect('wf', 'run')
+        payloads._cache.clear()
+        self.assertEqual(payloads.resolve(json.loads(copy)), value)
+
+        self.assertEqual(payloads.localize('[1]', 'wf', 'run-2'), '[1]')
+
+
+class TestS3Payloads(PayloadsTestCase):
+    storage = 's3://bucket/payloads'
+
+    @mock_s3
+    def test_offload(self):
+        connection = boto.connect_s3()
+        bucket = connection.create_bucket('bucket')
+        value = ['x' * 1000]
+        reference = payloads.make_reference(json.dumps(value), 'wf', 'run')
+        self.assertEqual(len(list(bucket.list('payloads/wf/run/'))), 1)
+
+        payloads._cache.clear()
+        self.assertEqual(payloads.resolve(reference), value)
+
+        self.assertEqual(payloads.collect('wf', 'run'), 1)
+        self.assertEqual(list(bucket.list('payloads/')), [])
+
+
+class TestExecutor(PayloadsTestCase):
+    @mock_swf
+    def test_replay(self):
+        execution = swf.models.WorkflowExecution(
+            DOMAIN, 'wf', 'run',
+            workflow_type=swf.models.WorkflowType(DOMAIN, RepeatWorkflow.name, RepeatWorkflow.version),
+        )
+        executor = Executor(DOMAIN, RepeatWorkflow)
+        history = builder.History(RepeatWorkflow, input={'args': ['x' * 200, 2]})
+        decisions, _ = executor.replay(Response(history=history, execution=execution))
+        input = json.loads(decisions[0]['scheduleActivityTaskDecisionAttributes']['input'])
+        self.assertTrue(payloads.is_reference(input))
+        self.assertIn('/wf/run/', input[payloads.PAYLOAD_KEY])
+        self.assertEqual(payloads.resolve(input)['args'], ['x' * 200, 2])
+
+        result = payloads.make_reference(json.dumps('x' * 400), 'wf', 'run')
+        history.add_activity_task(
+            repeat, decision_id=history.last_id, activity_id='activity-{}-1'.format(repeat.name),
+            last_state='completed', result=result)
+        history.add_decision_task()
+        payloads._cache.clear()
+        decisions, _ = executor.replay(Response(history=history, execution=execution))
+        result = decisions[0]['completeWorkflowExecutionDecisionAttributes']['result']
+        self.assertEqual(json.loads(result), 400)
+
+    @mock_swf
+    def test_rejected_close(self):
+        execution = swf.models.WorkflowExecution(
+            DOMAIN, 'wf', 'run',
+            workflow_type=swf.models.WorkflowType(DOMAIN, RepeatWorkflow.name, RepeatWorkflow.version),
+        )
+        history = builder.History(RepeatWorkflow, input={'args': ['x', 2]})
+        result = payloads.make_reference(json.dumps('x' * 400), 'wf', 'run')
+        history.add_activity_task(
+            repeat, decision_id=history.last_id, activity_id='activity-{}-1'.format(repeat.name),
+            last_state='completed', result=result)
+        history.add_decision_task()
+
+        poller = DeciderPoller([Executor(DOMAIN, RepeatWorkflow)], DOMAIN, 'test_task_list')
+        poller.complete = mock.Mock()
+        poller.process(Response(token='token', history=history, execution=execution))
+        decisions = poller.complete.call_args[0][1]
+        self.assertEqual(decisions[0]['decisionType'], 'CompleteWorkflowExecution')
+
+        # SWF may reject the closing decision, e.g. if an event arrived
+        # meanwhile: the payloads are still needed by the next replay
+        self.assertTrue(os.path.exists(result[payloads.PAYLOAD_KEY]))
+        history.add_signal('late')
+        history.add_decision_task()
+        payloads._cache.clear()
+        poller.process(Response(token='token', history=history, execution=execution))
+        decisions = poller.complete.call_args[0][1]
+        result = decisions[0]['completeWorkflowExecutionDecisionAttributes']['result']
+        self.assertEqual(json.loads(result), 400)
+
+
+class TestHelpers(PayloadsTestCase):
+    def test_find_activity(self):
+        input = payloads.make_reference(json.dumps({'args': ['x' * 200, 3]}), 'wf', 'run')
+        history = builder.History(RepeatWorkflow, input={'args': ['x' * 200, 3]})
+        history.add_activity_task(
+            repeat, decision_id=history.last_id, activity_id='activity-{}-1'.format(repeat.name),
+            input=input, last_state='completed', result=600)
+        history = History(history)
+        history.parse()
+        payloads._cache.clear()
+        func, args, kwargs, _ = helpers.find_activity(
+            history, activity_id='activity-{}-1'.format(repeat.name))
+        self.assertEqual(func(*args, **kwargs), 'x' * 600)
+
+
+class TestWorker(PayloadsTestCase):
+    def test_process(self):
+        input = payloads.make_reference(json.dumps({'args': ['x' * 200, 3]}), 'wf', 'run')
+        task = swf.models.ActivityTask.from_poll(DOMAIN, 'test_task_list', {
+            'taskToken': 'token',
+            'activityType': {'name': repeat.name, 'version': 'test'},
+            'workflowExecution': {'workflowId': 'wf', 'runId': 'run'},
+            'activityId': 'activity-1',
+            'startedEventId': 1,
+            'input': json.dumps(input),
+        })
+        poller = mock.Mock()
+        payloads._cache.clear()
+        ActivityWorker().process(poller, 'token', task)
+
+        poller._complete.assert_called_once_with('token', mock.ANY)
+        result = json.loads(poller._complete.call_args[0][1])
+        self.assertTrue(payloads.is_reference(result))
+        self.assertEqual(payloads.resolve(result), 'x' * 600)
@@ -0,0 +1,81 @@
+from __future__ import absolute_import
+
+import unittest
+
+import boto
+import mock
+from moto import mock_swf
+
+import swf.models
+from simpleflow.swf import registration
+from simpleflow.swf.task import ActivityTask
+from tests.data import (
+    BaseTestWorkflow,
+    DOMAIN,
+    increment,
+    double,
+)
+
+
+class TestRegistration(unittest.TestCase):
+    def setUp(self):
+        registration.clear()
+
+    def tearDown(self):
+        registration.clear()
+
+    def make_swf_environment(self):
+        self.conn = boto.connect_swf()
+        self.conn.register_domain('TestDomain', '50')
+
+    @mock_swf
+    def test_register_types(self):
+        self.make_swf_environment()
+        counts = registration.register_types(
+            'TestDomain', activities=[increment, double], workflows=[BaseTestWorkflow])
+        # The workflow is also registered as a child workflow
+        self.assertEqual({'created': 4, 'existing': 0, 'errors': 0}, counts)
+        self.assertTrue(registration.is_known(
+            registration.ACTIVITY, DOMAIN, increment.name, increment.version))
+        self.assertTrue(registration.is_known(
+            registration.WORKFLOW, 'TestDomain', BaseTestWorkflow.name, BaseTestWorkflow.version))
+        self.assertTrue(registration.is_known(
+            registration.WORKFLOW, 'TestDomain', 'tests.data.workflows.BaseTestWorkflow',
+            BaseTestWorkflow.version))
+
+        activity_type = self.conn.describe_activity_type(
+            'TestDomain', increment.name, increment.version)
+        self.assertEqual(increment.task_list,
+                         activity_type['configuration']['defaultTaskList']['name'])
+
+        with mock.patch.object(swf.models.ActivityType, 'save') as save:
+            counts = registration.register_types(
+                'TestDomain', activities=[increment, double], workflows=[BaseTestWorkflow])
+        self.assertEqual(0, save.call_count)
+        self.assertEqual({'created': 0, 'existing': 4, 'errors': 0}, counts)
+
+    def test_registered_activities(self):
+        activities = registration.registered_activities()
+        self.assertIn(increment, activities)
+        self.assertEqual(len(activities), len(set((a.name, a.version) for a in activities)))
+
+    def test_module_workflows(self):
+        self.assertEqual([BaseTestWorkflow], registration.module_workflows([BaseTestWorkflow]))
+        self.assertEqual('tests.data.workflows.BaseTestWorkflow',
+                         registration.child_workflow_name(BaseTestWorkflow))
+
+    @mock_swf
+    def test_register_existing_types(self):
+        self.make_swf_environment()
+        registration.register_types('TestDomain', activities=[increment], nb_threads=1)
+        registration.clear()
+        counts = registration.register_types('TestDomain', activities=[increment], nb_threads=1)
+        self.assertEqual({'created': 0, 'existing': 1, 'errors': 0}, counts)
+
+    def test_schedule_does_not_touch_the_type_api(self):
+        with mock.patch('boto.swf.connect_to_region') as connect:
+            decisions = ActivityTask(increment, 1).schedule(DOMAIN)
+        self.assertEqual(0, connect.call_count)
+        attributes = decisions[0]['scheduleActivityTaskDecisionAttributes']
+        self.assertEqual({'name': increment.name, 'version': increment.version},
+                         attributes['activityType'])
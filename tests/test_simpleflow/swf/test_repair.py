@@ -0,0 +1,209 @@
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import mock
+from moto import mock_swf
+
+import swf.models
+
+from swf.models.history import builder
+from swf.responses import Response
+
+from simpleflow import activity, settings
+from simpleflow.history import History
+from simpleflow.swf import payloads, repair
+from simpleflow.swf.executor import Executor
+from simpleflow.swf.repair import RepairIndex
+from tests.data import BaseTestWorkflow, DOMAIN
+
+
+@activity.with_attributes(task_list='test_task_list', version='test')
+def double(x):
+    return x * 2
+
+
+@activity.with_attributes(task_list='test_task_list', version='test')
+def repeat(x):
+    return x * 20000
+
+
+class RepeatWorkflow(BaseTestWorkflow):
+    def run(self):
+        return self.submit(double, len(self.submit(repeat, 'ab').result)).result
+
+
+class DoubleTwiceWorkflow(BaseTestWorkflow):
+    def run(self, x):
+        y = self.submit(double, x).result
+        z = self.submit(double, y).result
+        return z
+
+
+def activity_id(number):
+    return 'activity-{}-{}'.format(double.name, number)
+
+
+class TestRepair(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        previous = builder.History(DoubleTwiceWorkflow, input={'args': [1]})
+        previous.add_activity_task(
+            double, decision_id=previous.last_id, activity_id=activity_id(1),
+            input={'args': [1]}, last_state='completed', result=2)
+        previous.add_decision_task()
+        previous.add_activity_task(
+            double, decision_id=previous.last_id, activity_id=activity_id(2),
+            input={'args': [2]}, last_state='failed')
+        self.previous = History(previous)
+        self.previous.parse()
+        self.index = RepairIndex.build(self.previous, os.path.join(self.directory, 'repair.sqlite'))
+
+    def test_index(self):
+        self.assertEqual(self.index.get(activity_id(1)), {
+            'id': activity_id(1), 'type': 'activity', 'state': 'completed', 'result': '2'})
+        # Failed in the previous execution
+        self.assertIsNone(self.index.get(activity_id(2)))
+
+        index = pickle.loads(pickle.dumps(self.index))
+        self.assertEqual(index.path, self.index.path)
+        self.assertEqual(index.get(activity_id(1))['result'], '2')
+
+    def test_marker(self):
+        marker = repair.make_marker('activity-1', '{"a": 1}')
+        details = marker['recordMarkerDecisionAttributes']['details']
+        self.assertEqual(repair.parse_marker(details), ('activity-1', '{"a": 1}'))
+        self.assertIsNone(repair.make_marker('activity-1', 'x' * 40000))
+
+        marker = repair.make_index_marker('activity-1')
+        details = marker['recordMarkerDecisionAttributes']['details']
+        self.assertEqual(repair.parse_marker(details), ('activity-1', repair.IN_INDEX))
+
+    def build_large_result_index(self):
+        previous = builder.History(RepeatWorkflow, input={})
+        previous.add_activity_task(
+            repeat, decision_id=previous.last_id, activity_id='activity-{}-1'.format(repeat.name),
+            input={'args': ['ab']}, last_state='completed', result='ab' * 20000)
+        previous = History(previous)
+        previous.parse()
+        return RepairIndex.build(previous, os.path.join(self.directory, 'large.sqlite'))
+
+    @mock_swf
+    def test_large_result(self):
+        index = self.build_large_result_index()
+        history = builder.History(RepeatWorkflow, input={})
+        decisions, _ = Executor(DOMAIN, RepeatWorkflow, repair_with=index).replay(
+            Response(history=history, execution=None))
+        # Reused, not executed again
+        self.assertEqual(
+            [decision['decisionType'] for decision in decisions],
+            ['RecordMarker', 'ScheduleActivityTask'])
+        details = decisions[0]['recordMarkerDecisionAttributes']['details']
+        self.assertEqual(details, 'activity-{}-1'.format(repeat.name))
+        attrs = decisions[1]['scheduleActivityTaskDecisionAttributes']
+        self.assertEqual(json.loads(attrs['input'])['args'], [40000])
+
+        # Later replays read the result from the index
+        history.add_marker(repair.MARKER_NAME, details)
+        decisions, _ = Executor(DOMAIN, RepeatWorkflow, repair_with=index).replay(
+            Response(history=history, execution=None))
+        self.assertEqual(decisions[0]['decisionType'], 'ScheduleActivityTask')
+
+    @mock_swf
+    def test_previous_payload_copied(self):
+        storage = os.path.join(self.directory, 'payloads')
+        with mock.patch.multiple(settings, PAYLOAD_STORAGE=storage, PAYLOAD_OFFLOAD_THRESHOLD=10):
+            self.addCleanup(payloads._cache.clear)
+            result = payloads.make_reference(json.dumps('ab' * 100), 'wf', 'old')
+            previous = builder.History(RepeatWorkflow, input={})
+            previous.add_activity_task(
+                repeat, decision_id=previous.last_id, activity_id='activity-{}-1'.format(repeat.name),
+                input={'args': ['ab']}, last_state='completed', result=result)
+            previous = History(previous)
+            previous.parse()
+
+            execution = swf.models.WorkflowExecution(
+                DOMAIN, 'wf', 'new',
+                workflow_type=swf.models.WorkflowType(DOMAIN, RepeatWorkflow.name, RepeatWorkflow.version),
+            )
+            history = builder.History(RepeatWorkflow, input={})
+            decisions, _ = Executor(DOMAIN, RepeatWorkflow, repair_with=previous).replay(
+                Response(history=history, execution=execution))
+            details = decisions[0]['recordMarkerDecisionAttributes']['details']
+            reference = json.loads(repair.parse_marker(details)[1])
+            self.assertIn('/wf/new/', reference[payloads.PAYLOAD_KEY])
+
+            # The previous execution can be collected
+            payloads.collect('wf', 'old')
+            payloads._cache.clear()
+            self.assertEqual(payloads.resolve(reference), 'ab' * 100)
+
+    @mock_swf
+    def test_large_result_offloaded(self):
+        index = self.build_large_result_index()
+        storage = os.path.join(self.directory, 'payloads')
+        with mock.patch.object(settings, 'PAYLOAD_STORAGE', storage):
+            self.addCleanup(payloads._cache.clear)
+            history = builder.History(RepeatWorkflow, input={})
+            decisions, _ = Executor(DOMAIN, RepeatWorkflow, repair_with=index).replay(
+                Response(history=history, execution=None))
+            details = decisions[0]['recordMarkerDecisionAttributes']['details']
+            task_id, result = repair.parse_marker(details)
+            self.assertTrue(payloads.is_reference(json.loads(result)))
+
+            # The marker is enough, without the index
+            history.add_marker(repair.MARKER_NAME, details)
+            decisions, _ = Executor(DOMAIN, RepeatWorkflow).replay(
+                Response(history=history, execution=None))
+            attrs = decisions[0]['scheduleActivityTaskDecisionAttributes']
+            self.assertEqual(json.loads(attrs['input'])['args'], [40000])
+
+    @mock_swf
+    def test_replay(self):
+        history = builder.History(DoubleTwiceWorkflow, input={'args': [1]})
+        executor = Executor(DOMAIN, DoubleTwiceWorkflow, repair_with=self.index)
+        decisions, _ = executor.replay(Response(history=history, execution=None))
+        # The first result is recorded, the second activity is scheduled
+        self.assertEqual(
+            [decision['decisionType'] for decision in decisions],
+            ['RecordMarker', 'ScheduleActivityTask'])
+        details = decisions[0]['recordMarkerDecisionAttributes']['details']
+        self.assertEqual(details, '{}\n2'.format(activity_id(1)))
+        attrs = decisions[1]['scheduleActivityTaskDecisionAttributes']
+        self.assertEqual(attrs['activityId'], activity_id(2))
+        self.assertEqual(attrs['taskList']['name'], 'test_task_list')
+
+        # Later replays read the result from the marker, even without the
+        # previous execution
+        history.add_marker(repair.MARKER_NAME, details)
+        history.add_activity_task(
+            double, decision_id=history.last_id, activity_id=activity_id(2),
+            input={'args': [2]}, last_state='completed', result=4)
+        history.add_decision_task()
+        executor = Executor(DOMAIN, DoubleTwiceWorkflow)
+        decisions, _ = executor.replay(Response(history=history, execution=None))
+        self.assertEqual(decisions[0]['decisionType'], 'CompleteWorkflowExecution')
+        self.assertEqual(decisions[0]['completeWorkflowExecutionDecisionAttributes']['result'], '4')
+
+    @mock_swf
+    def test_force_activities(self):
+        history = builder.History(DoubleTwiceWorkflow, input={'args': [1]})
+        executor = Executor(DOMAIN, DoubleTwiceWorkflow, repair_with=self.index,
+                            force_activities='double')
+        decisions, _ = executor.replay(Response(history=history, execution=None))
+        self.assertEqual(decisions[0]['decisionType'], 'ScheduleActivityTask')
+
+    @mock_swf
+    def test_history(self):
+        # A parsed history is accepted as well as its index
+        history = builder.History(DoubleTwiceWorkflow, input={'args': [1]})
+        executor = Executor(DOMAIN, DoubleTwiceWorkflow, repair_with=self.previous)
+        decisions, _ = executor.replay(Response(history=history, execution=None))
+        self.assertEqual(
+            [decision['decisionType'] for decision in decisions],
+            ['RecordMarker', 'ScheduleActivityTask'])
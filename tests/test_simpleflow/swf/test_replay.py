@@ -0,0 +1,97 @@
+from __future__ import absolute_import
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+import swf.models
+from swf.models.history import builder
+
+from simpleflow import futures
+from simpleflow.command import cli
+from simpleflow.swf import replay
+from tests.data import BaseTestWorkflow, double, increment
+
+
+class ReplayedWorkflow(BaseTestWorkflow):
+    def run(self, x):
+        y = self.submit(increment, x)
+        z = self.submit(double, y)
+        futures.wait(z)
+        return z.result
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        connection = replay.OfflineConnection()
+        domain = swf.models.Domain('TestDomain', connection=connection)
+        self.execution = swf.models.WorkflowExecution(
+            domain,
+            'test-workflow',
+            run_id='test-run',
+            workflow_type=swf.models.WorkflowType(
+                domain, 'tests.test_simpleflow.swf.test_replay.ReplayedWorkflow', 'test_version',
+                connection=connection),
+            task_list='test_task_list',
+            connection=connection,
+        )
+        self.history = builder.History(ReplayedWorkflow, input={'args': [4]})
+        self.history.add_activity_task(
+            increment, self.history.last_id, activity_id='activity-tests.data.activities.increment-1',
+            input={'args': [4]}, result=5)
+        self.history.add_decision_task()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def save(self, filename):
+        path = os.path.join(self.root, filename)
+        replay.save_history(path, self.execution, self.history)
+        return path
+
+    def test_load_history(self):
+        execution, history = replay.load_history(self.save('history.json.gz'))
+        self.assertEqual(execution.workflow_id, 'test-workflow')
+        self.assertEqual(execution.run_id, 'test-run')
+        self.assertEqual(execution.domain.name, 'TestDomain')
+        self.assertEqual(execution.workflow_type.name, self.execution.workflow_type.name)
+        self.assertEqual(history.raw, [event.raw for event in self.history.events])
+        with self.assertRaises(replay.OfflineError):
+            execution.history()
+
+    def test_replay(self):
+        result = replay.replay(self.save('history.json'), repeat=2, trace_memory=True)
+        self.assertEqual(result.nb_events, len(self.history.events))
+        self.assertEqual(result.decision_types, ['ScheduleActivityTask'])
+        attributes = result.decisions[0]['scheduleActivityTaskDecisionAttributes']
+        self.assertEqual(attributes['activityType']['name'], 'tests.data.activities.double')
+        self.assertGreater(result.wall_time, 0)
+        self.assertGreater(result.peak_memory, 0)
+        self.assertTrue(replay.top_allocations([result], 3))
+
+    def test_find_histories(self):
+        os.mkdir(os.path.join(self.root, 'crawls'))
+        paths = [self.save('crawls/b.json.gz'), self.save('a.json')]
+        with open(os.path.join(self.root, 'notes.txt'), 'w') as fp:
+            fp.write('not a history')
+        self.assertEqual(replay.find_histories([self.root]), sorted(paths))
+
+    def test_command(self):
+        path = self.save('history.json')
+        output = os.path.join(self.root, 'results.json')
+        result = CliRunner().invoke(cli, [
+            'replay', '--profile', '5', '--decisions', '--output', output, self.root,
+        ])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('ScheduleActivityTask', result.output)
+        self.assertIn('cumulative', result.output)
+        with open(output) as fp:
+            measures = json.load(fp)
+        self.assertEqual(len(measures), 1)
+        self.assertEqual(measures[0]['history'], path)
+        self.assertEqual(measures[0]['decisions'], ['ScheduleActivityTask'])
@@ -0,0 +1,188 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import boto
+import mock
+from moto import mock_s3
+
+import swf.models
+
+from simpleflow import activity, settings, storage
+from simpleflow.swf import result_cache
+from simpleflow.swf.process.worker.base import ActivityWorker
+from simpleflow.swf.result_cache import ResultCache
+from tests.data import DOMAIN
+
+calls = []
+
+
+@activity.with_attributes(task_list='test_task_list', version='test', idempotent=True)
+def square(x):
+    calls.append(x)
+    return x * x
+
+
+@activity.with_attributes(task_list='test_task_list', version='test', idempotent=True,
+                          start_to_close_timeout=1)
+def quick_square(x):
+    calls.append(x)
+    return x * x
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = ResultCache(self.directory, poll_interval=0.01)
+        del calls[:]
+
+    def compute(self, x, cache=None):
+        return (cache or self.cache).get_or_compute(square, [x], {}, lambda: square.callable(x))
+
+
+class TestLocalResultCache(ResultCacheTestCase):
+    def test_get_or_compute(self):
+        self.assertEqual(self.compute(3), 9)
+        self.assertEqual(self.compute(3), 9)
+        self.assertEqual(self.compute(4), 16)
+        self.assertEqual(calls, [3, 4])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+        url = self.cache.entry_url(square, [3], {})
+        self.assertTrue(url.startswith(os.path.join(self.directory, square.name, 'test') + '/'))
+        self.assertFalse(os.path.exists(url[:-len('.json')] + '.lease'))
+
+    def test_failures_are_not_cached(self):
+        def fail():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            self.cache.get_or_compute(square, [3], {}, fail)
+        self.assertEqual(self.compute(3), 9)
+        self.assertEqual(calls, [3])
+
+    def test_ttl(self):
+        cache = ResultCache(self.directory, ttl=60)
+        self.compute(3, cache)
+        with mock.patch('simpleflow.swf.result_cache.time.time', return_value=time.time() + 61):
+            self.compute(3, cache)
+        self.assertEqual(calls, [3, 3])
+
+    def test_evict(self):
+        cache = ResultCache(self.directory, max_size=1)
+        urls = []
+        for x in range(3):
+            self.compute(x, cache)
+            urls.append(cache.entry_url(square, [x], {}))
+            os.utime(urls[-1], (1000 + x, 1000 + x))
+        # The sizes of the entries depend on their creation time
+        cache.max_size = sum(os.path.getsize(url) for url in urls[1:])
+        self.assertEqual(cache.evict(), 1)
+        self.assertFalse(os.path.exists(cache.entry_url(square, [0], {})))
+        self.assertTrue(os.path.exists(cache.entry_url(square, [1], {})))
+
+    def test_concurrent_calls(self):
+        def compute():
+            time.sleep(0.1)
+            return square.callable(5)
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                self.cache.get_or_compute(square, [5], {}, compute)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [25] * 4)
+        self.assertEqual(calls, [5])
+
+    def test_wait_for_another_worker(self):
+        url = self.cache.entry_url(square, [6], {})
+        lease_url = url[:-len('.json')] + '.lease'
+        storage.write(lease_url, str(time.time() + 60))
+        timer = threading.Timer(0.05, ResultCache(self.directory).put, (url, 36))
+        timer.start()
+        self.assertEqual(self.compute(6), 36)
+        timer.join()
+        self.assertEqual(calls, [])
+
+    def test_expired_lease(self):
+        url = self.cache.entry_url(square, [6], {})
+        storage.write(url[:-len('.json')] + '.lease', str(time.time() - 1))
+        self.assertEqual(self.compute(6), 36)
+        self.assertEqual(calls, [6])
+
+    def test_lease_is_created_atomically(self):
+        url = os.path.join(self.directory, 'lease')
+        self.assertTrue(storage.create(url, '1'))
+        self.assertFalse(storage.create(url, '2'))
+        self.assertEqual(storage.read(url), '1')
+
+    def test_lease_is_renewed(self):
+        cache = ResultCache(self.directory, lease_duration=0.06)
+        url = cache.entry_url(square, [7], {})
+        lease_url = url[:-len('.json')] + '.lease'
+
+        def compute():
+            time.sleep(0.2)
+            # Still valid after more than its duration
+            self.assertGreater(result_cache._read_lease(lease_url), time.time())
+            return square.callable(7)
+
+        self.assertEqual(cache.get_or_compute(square, [7], {}, compute), 49)
+        self.assertFalse(os.path.exists(lease_url))
+
+    def test_wait_is_bounded(self):
+        url = self.cache.entry_url(quick_square, [8], {})
+        lease_url = url[:-len('.json')] + '.lease'
+        storage.write(lease_url, str(time.time() + 60))
+        start = time.time()
+        self.assertEqual(self.cache.get_or_compute(
+            quick_square, [8], {}, lambda: quick_square.callable(8)), 64)
+        # Half the start-to-close timeout
+        self.assertLess(time.time() - start, 0.8)
+        self.assertEqual(calls, [8])
+        # The lease of the other worker is left alone
+        self.assertTrue(os.path.exists(lease_url))
+
+
+class TestS3ResultCache(ResultCacheTestCase):
+    @mock_s3
+    def test_get_or_compute(self):
+        bucket = boto.connect_s3().create_bucket('cache')
+        cache = ResultCache('s3://cache/results/', max_size=1)
+        self.assertEqual(self.compute(3, cache), 9)
+        self.assertEqual(self.compute(3, cache), 9)
+        self.assertEqual(calls, [3])
+        self.assertEqual(len(list(bucket.list('results/'))), 1)
+        self.assertEqual(cache.evict(), 1)
+        self.assertEqual(list(bucket.list('results/')), [])
+
+
+class TestWorker(ResultCacheTestCase):
+    def test_process(self):
+        patcher = mock.patch.object(settings, 'RESULT_CACHE', self.directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        for _ in range(2):
+            task = swf.models.ActivityTask.from_poll(DOMAIN, 'test_task_list', {
+                'taskToken': 'token',
+                'activityType': {'name': square.name, 'version': 'test'},
+                'workflowExecution': {'workflowId': 'wf', 'runId': 'run'},
+                'activityId': 'activity-1',
+                'startedEventId': 1,
+                'input': json.dumps({'args': [7]}),
+            })
+            poller = mock.Mock()
+            ActivityWorker().process(poller, 'token', task)
+            poller._complete.assert_called_once_with('token', '49')
+        self.assertEqual(calls, [7])
+        self.assertEqual(result_cache.get_cache().hits, 1)
@@ -1,3 +1,5 @@
+import threading
+
 from sure import expect
 
 from simpleflow import activity
@@ -25,6 +27,30 @@ def test_task_attaches_context_to_functions():
     ctx = {'foo': 'bar'}
     expect(ActivityTask(show_context_func, context=ctx).execute()).to.equal(ctx)
     expect(show_context_func.context).to.equal(ctx)
+    expect(show_context_func.callable.context).to.equal(ctx)
+
+
+def test_task_context_is_per_thread():
+    barrier = threading.Barrier(2) if hasattr(threading, 'Barrier') else None
+    results = {}
+
+    @activity.with_attributes()
+    def wait_and_show_context():
+        if barrier is not None:
+            barrier.wait()
+        return wait_and_show_context.context
+
+    def run(i):
+        results[i] = ActivityTask(wait_and_show_context, context={'activity_id': i}).execute()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    expect(results).to.equal({0: {'activity_id': 0}, 1: {'activity_id': 1}})
+    expect(wait_and_show_context.context).to.be.none
+    expect(hasattr(wait_and_show_context.callable, 'context')).to.be.false
 
 
 def test_task_attaches_context_to_object_instances():
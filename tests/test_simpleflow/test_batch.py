@@ -0,0 +1,142 @@
+import json
+import unittest
+
+from moto import mock_swf
+
+from swf.models.history import builder
+from swf.responses import Response
+
+from simpleflow import batch, exceptions, futures, workflow
+from simpleflow.activity import set_context, with_attributes
+from simpleflow.local.executor import Executor
+from simpleflow.swf.executor import Executor as SWFExecutor
+from tests.data import BaseTestWorkflow, DOMAIN
+
+
+@with_attributes(task_list='batches', version='test')
+def invert(x):
+    return 1.0 / x
+
+
+@with_attributes(task_list='batches', version='test', raises_on_failure=True)
+def strict_invert(x):
+    return 1.0 / x
+
+
+@with_attributes(task_list='batches', version='test')
+def read_context(x):
+    return read_context.context['activity_id']
+
+
+class BaseWorkflow(workflow.Workflow):
+    name = 'test_workflow'
+    version = 'test_version'
+    task_list = 'test_task_list'
+    decision_tasks_timeout = '300'
+    execution_timeout = '3600'
+    tag_list = None
+    child_policy = None
+
+
+class BatchedWorkflow(BaseWorkflow):
+    def run(self, values, batch_size=2, max_parallel=None, nb_threads=None):
+        results = self.map_batched(invert, values, batch_size=batch_size,
+                                   max_parallel=max_parallel, nb_threads=nb_threads)
+        futures.wait(*results)
+        return [f.result if f.exception is None else f.exception.reason for f in results]
+
+
+class StrictBatchedWorkflow(BaseWorkflow):
+    def run(self, values):
+        results = self.map_batched(strict_invert, values, batch_size=2)
+        outcomes = []
+        for future in results:
+            try:
+                outcomes.append(future.result)
+            except exceptions.TaskFailed as err:
+                outcomes.append(err.reason)
+        return outcomes
+
+
+class SWFBatchedWorkflow(BaseTestWorkflow):
+    def run(self, values):
+        results = self.map_batched(invert, values, batch_size=2)
+        return futures.wait(*results)
+
+
+class TestRunBatch(unittest.TestCase):
+    def test_sequential(self):
+        self.assertEqual(batch.run_batch(invert.name, [1, 2]), [{'result': 1.0}, {'result': 0.5}])
+
+    def test_errors(self):
+        outcomes = batch.run_batch(invert.name, [0, 4], nb_threads=2)
+        self.assertEqual(outcomes[0]['error']['reason'], 'float division by zero')
+        self.assertIn('ZeroDivisionError', outcomes[0]['error']['details'])
+        self.assertEqual(outcomes[1], {'result': 0.25})
+
+    def test_context(self):
+        set_context(batch.run_batch, {'activity_id': 'activity-1'})
+        self.addCleanup(set_context, batch.run_batch, None)
+        self.assertEqual(batch.run_batch(read_context.name, [1]), [{'result': 'activity-1'}])
+
+    def test_batch_activity(self):
+        runner = batch.batch_activity(invert)
+        self.assertIs(runner, batch.batch_activity(invert))
+        self.assertEqual(runner.name, batch.BATCH_ACTIVITY_NAME)
+        self.assertEqual(runner.task_list, 'batches')
+        self.assertEqual(runner.version, 'test')
+
+
+class TestLocalMapBatched(unittest.TestCase):
+    def test_synchronous(self):
+        executor = Executor(BatchedWorkflow)
+        result = executor.run({'args': [[1, 2, 0, 4, 5]]})
+        self.assertEqual(result, [1.0, 0.5, 'float division by zero', 0.25, 0.2])
+        # One activity per batch
+        self.assertEqual(3, len(executor._history.activities))
+
+    def test_raises_on_failure(self):
+        executor = Executor(StrictBatchedWorkflow)
+        result = executor.run({'args': [[1, 0, 4]]})
+        self.assertEqual(result, [1.0, 'float division by zero', 0.25])
+
+    def test_threads(self):
+        executor = Executor(BatchedWorkflow, nb_workers=2, use_threads=True)
+        result = executor.run({
+            'args': [[1, 2, 4, 5, 8, 10]],
+            'kwargs': {'batch_size': 2, 'max_parallel': 1, 'nb_threads': 2},
+        })
+        self.assertEqual(result, [1.0, 0.5, 0.25, 0.2, 0.125, 0.1])
+
+
+class TestSWFMapBatched(unittest.TestCase):
+    @mock_swf
+    def test_replay(self):
+        executor = SWFExecutor(DOMAIN, SWFBatchedWorkflow)
+        history = builder.History(SWFBatchedWorkflow, input={'args': [[1, 0, 4]]})
+
+        decisions, _ = executor.replay(Response(history=history, execution=None))
+        self.assertEqual(len(decisions), 2)
+        attributes = decisions[0]['scheduleActivityTaskDecisionAttributes']
+        self.assertEqual(attributes['activityType']['name'], batch.BATCH_ACTIVITY_NAME)
+        self.assertEqual(attributes['taskList']['name'], 'batches')
+        self.assertEqual(json.loads(attributes['input'])['args'], [invert.name, [1, 0], None])
+
+        runner = batch.batch_activity(invert)
+        decision_id = history.last_id
+        history.add_activity_task(
+            runner, decision_id, activity_id='activity-simpleflow.batch.run_batch-1',
+            result=[{'result': 1.0}, {'error': {'reason': 'float division by zero', 'details': ''}}])
+        history.add_activity_task(
+            runner, decision_id, activity_id='activity-simpleflow.batch.run_batch-2', last_state='started')
+        history.add_decision_task()
+        decisions, _ = executor.replay(Response(history=history, execution=None))
+        self.assertEqual(decisions, [])
+
+        history.add_activity_task_completed(
+            scheduled=history.last_id - 4, started=history.last_id - 3, result=[{'result': 0.25}])
+        history.add_decision_task()
+        decisions, _ = executor.replay(Response(history=history, execution=None))
+        self.assertEqual(decisions[0]['decisionType'], 'CompleteWorkflowExecution')
+        result = decisions[0]['completeWorkflowExecutionDecisionAttributes']['result']
+        self.assertEqual(json.loads(result), [1.0, None, 0.25])
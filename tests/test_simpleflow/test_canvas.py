@@ -157,6 +157,30 @@ class TestGroup(unittest.TestCase):
         ).submit(executor)
         self.assertTrue(future.finished)
 
+    def test_max_parallel_finished_later(self):
+        future = Group(
+            *[ActivityTask(running_task, i) for i in range(4)],
+            max_parallel=2
+        ).submit(executor)
+        self.assertEquals(len(future.futures), 2)
+
+        # Activities finishing after their submission free their slot
+        future.futures[0].set_finished(True)
+        future._submit_next()
+        self.assertEquals(len(future.futures), 3)
+        future._submit_next()
+        self.assertEquals(len(future.futures), 3)
+
+        for f in future.futures:
+            f.set_finished(True)
+        future._submit_next()
+        self.assertEquals(len(future.futures), 4)
+        future.futures[3].set_finished(True)
+        future.sync_state()
+        future.sync_result()
+        self.assertTrue(future.finished)
+        self.assertEquals(future.result, [True] * 4)
+
 
 class TestChain(unittest.TestCase):
     def test(self):
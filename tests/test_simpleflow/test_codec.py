@@ -0,0 +1,143 @@
+import datetime
+import json
+import unittest
+
+import mock
+from moto import mock_swf
+
+import swf.models
+from swf.models.history import builder
+from swf.responses import Response
+
+from simpleflow import activity, codec, settings
+from simpleflow.local.executor import Executor
+from simpleflow.swf.executor import Executor as SWFExecutor
+from simpleflow.swf.process.worker.base import ActivityWorker
+from tests.data import BaseTestWorkflow, DOMAIN
+
+LONG_TEXT = 'simpleflow ' * 100
+
+
+@activity.with_attributes(task_list='test_task_list', version='test', codec='zlib')
+def shout(text):
+    return text.upper()
+
+
+@activity.with_attributes(task_list='test_task_list', version='test')
+def whisper(text):
+    return text.lower()
+
+
+class ShoutWorkflow(BaseTestWorkflow):
+    def run(self, text):
+        return self.submit(shout, text).result
+
+
+class CompressedWorkflow(BaseTestWorkflow):
+    codec = 'zlib'
+
+    def run(self, text):
+        return self.submit(whisper, text).result
+
+
+class TestCodec(unittest.TestCase):
+    def test_json(self):
+        value = {'text': LONG_TEXT, 'numbers': [1, 2.5, None]}
+        message = codec.dumps(value, 'json')
+        self.assertEqual(json.loads(message), value)
+        self.assertEqual(codec.detect(message), 'json')
+        self.assertEqual(codec.loads(message), value)
+
+    def test_complex_objects(self):
+        message = codec.dumps({'date': datetime.datetime(2017, 1, 2, 3, 4, 5)})
+        self.assertEqual(codec.loads(message), {'date': '2017-01-02T03:04:05'})
+
+    def test_zlib(self):
+        value = [LONG_TEXT] * 10
+        message = codec.dumps(value, 'zlib')
+        self.assertTrue(message.startswith('!zlib:'))
+        self.assertEqual(codec.detect(message), 'zlib')
+        self.assertLess(len(message), len(json.dumps(value)) / 5)
+        self.assertEqual(codec.loads(message), value)
+
+    def test_short_payload_is_not_compressed(self):
+        self.assertEqual(codec.dumps([1, 2], 'zlib'), '[1,2]')
+
+    def test_default_codec(self):
+        with mock.patch.object(settings, 'PAYLOAD_CODEC', 'zlib'):
+            self.assertEqual(codec.detect(codec.dumps(LONG_TEXT)), 'zlib')
+        self.assertEqual(codec.detect(codec.dumps(LONG_TEXT)), 'json')
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            codec.dumps(LONG_TEXT, 'lzma')
+        with self.assertRaises(ValueError):
+            codec.loads('!lzma:AAAA')
+
+
+class TestSWF(unittest.TestCase):
+    def replay(self, workflow, history):
+        executor = SWFExecutor(DOMAIN, workflow)
+        decisions, _ = executor.replay(Response(history=history, execution=None))
+        return decisions
+
+    @mock_swf
+    def test_activity_codec(self):
+        history = builder.History(ShoutWorkflow, input={'args': [LONG_TEXT]})
+        decisions = self.replay(ShoutWorkflow, history)
+        input = decisions[0]['scheduleActivityTaskDecisionAttributes']['input']
+        self.assertEqual(codec.detect(input), 'zlib')
+        self.assertEqual(codec.loads(input), {'args': [LONG_TEXT], 'kwargs': {}, 'codec': 'zlib'})
+
+        history.add_activity_task(
+            shout, decision_id=history.last_id, activity_id='activity-{}-1'.format(shout.name),
+            input={'args': [LONG_TEXT], 'kwargs': {}}, last_state='completed', result=LONG_TEXT.upper())
+        history.add_decision_task()
+        decisions = self.replay(ShoutWorkflow, history)
+        result = decisions[0]['completeWorkflowExecutionDecisionAttributes']['result']
+        # Plain JSON: the workflow has no codec
+        self.assertEqual(json.loads(result), LONG_TEXT.upper())
+
+    @mock_swf
+    def test_workflow_codec(self):
+        history = builder.History(CompressedWorkflow, input={'args': [LONG_TEXT]})
+        decisions = self.replay(CompressedWorkflow, history)
+        input = decisions[0]['scheduleActivityTaskDecisionAttributes']['input']
+        self.assertEqual(codec.loads(input)['codec'], 'zlib')
+
+        # Plain and compressed payloads coexist in a history
+        history.add_activity_task(
+            whisper, decision_id=history.last_id, activity_id='activity-{}-1'.format(whisper.name),
+            input={'args': [LONG_TEXT], 'kwargs': {}}, last_state='completed', result=LONG_TEXT)
+        history.events[-1].raw['activityTaskCompletedEventAttributes']['result'] = codec.dumps(
+            LONG_TEXT, 'zlib')
+        history.add_decision_task()
+        decisions = self.replay(CompressedWorkflow, history)
+        result = decisions[0]['completeWorkflowExecutionDecisionAttributes']['result']
+        self.assertEqual(codec.detect(result), 'zlib')
+        self.assertEqual(codec.loads(result), LONG_TEXT)
+
+    def test_worker(self):
+        task = swf.models.ActivityTask.from_poll(DOMAIN, 'test_task_list', {
+            'taskToken': 'token',
+            'activityType': {'name': whisper.name, 'version': 'test'},
+            'workflowExecution': {'workflowId': 'wf', 'runId': 'run'},
+            'activityId': 'activity-1',
+            'startedEventId': 1,
+            'input': codec.dumps({'args': [LONG_TEXT.upper()], 'codec': 'zlib'}, 'zlib'),
+        })
+        poller = mock.Mock()
+        ActivityWorker().process(poller, 'token', task)
+
+        result = poller._complete.call_args[0][1]
+        self.assertEqual(codec.detect(result), 'zlib')
+        self.assertEqual(codec.loads(result), LONG_TEXT)
+
+
+class TestLocal(unittest.TestCase):
+    def test_history(self):
+        executor = Executor(ShoutWorkflow)
+        self.assertEqual(executor.run({'args': [LONG_TEXT]}), LONG_TEXT.upper())
+        activity = executor._history.activities['0']
+        self.assertEqual(activity['input'], {'args': [LONG_TEXT], 'kwargs': {}})
+        self.assertEqual(codec.loads(activity['result']), LONG_TEXT.upper())
@@ -144,9 +144,8 @@ def test_workflow_with_repair_if_task_successful():
     # The executor should not schedule anything, it should use previous history
     decisions, _ = executor.replay(Response(history=history, execution=None))
     assert len(decisions) == 1
-    assert decisions[0]['decisionType'] == 'ScheduleActivityTask'
-    attrs = decisions[0]['scheduleActivityTaskDecisionAttributes']
-    assert attrs['taskList']['name'].startswith("FAKE-")
+    assert decisions[0]['decisionType'] == 'CompleteWorkflowExecution'
+    assert decisions[0]['completeWorkflowExecutionDecisionAttributes']['result'] == '57'
 
 
 @mock_swf
@@ -1677,3 +1676,44 @@ def test_workflow_idempotent_task_naming():
             }
         }
     ]
+
+
+class ATestDefinitionSkippingIdleReplays(ATestDefinitionWithInput):
+    skip_idle_replays = True
+
+
+@mock_swf
+def test_workflow_skipping_idle_replays():
+    workflow = ATestDefinitionSkippingIdleReplays
+    executor = Executor(DOMAIN, workflow)
+    history = builder.History(workflow, input={'args': (4,)})
+
+    # First decision task: no completed decision yet, replay.
+    decisions, _ = executor.replay(Response(history=history, execution=None))
+    check_task_scheduled_decision(decisions[0], increment)
+
+    # The activity only started: nothing can change, skip.
+    history.add_decision_task_completed()
+    history.add_activity_task(increment,
+                              decision_id=history.last_id,
+                              last_state='started',
+                              activity_id='activity-tests.data.activities.increment-1',
+                              input={'args': 4})
+    history.add_decision_task_scheduled()
+    history.add_decision_task_started()
+    decisions, _ = executor.replay(Response(history=history, execution=None))
+    assert decisions == []
+    assert executor.skipped_replays == 1
+
+    # The activity completed: replay.
+    history.add_decision_task_completed()
+    history.add_activity_task_completed(scheduled=history.last_id - 4,
+                                        started=history.last_id - 3,
+                                        result=5)
+    history.add_decision_task_scheduled()
+    history.add_decision_task_started()
+    decisions, _ = executor.replay(Response(history=history, execution=None))
+    workflow_completed = swf.models.decision.WorkflowExecutionDecision()
+    workflow_completed.complete(result=json_dumps(5))
+    assert decisions[0] == workflow_completed
+    assert executor.skipped_replays == 1
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import unittest
+
+import mock
+from moto import mock_swf
+
+from simpleflow.history import History, HistoryCache
+from simpleflow.swf.executor import Executor
+from swf.models.history import builder
+from swf.responses import Response
+from tests.data import (
+    BaseTestWorkflow,
+    DOMAIN,
+    increment,
+)
+
+
+class ATestDefinitionWithTwoSteps(BaseTestWorkflow):
+    def run(self):
+        a = self.submit(increment, 1)
+        b = self.submit(increment, a.result)
+        return b.result
+
+
+def make_execution(run_id):
+    execution = mock.Mock(workflow_id='workflow-id', run_id=run_id)
+    execution.workflow_type.name = ATestDefinitionWithTwoSteps.name
+    execution.workflow_type.version = ATestDefinitionWithTwoSteps.version
+    return execution
+
+
+def add_increment(history, activity_id, input, result):
+    (history
+     .add_activity_task(increment,
+                        decision_id=history.last_id,
+                        last_state='completed',
+                        activity_id=activity_id,
+                        input=input,
+                        result=result)
+     .add_decision_task_scheduled()
+     .add_decision_task_started())
+
+
+class TestHistory(unittest.TestCase):
+    def test_parse_is_incremental(self):
+        history = builder.History(ATestDefinitionWithTwoSteps)
+        parsed = History(history)
+        parsed.parse()
+        self.assertEqual(len(history), parsed.last_event_id)
+        self.assertEqual([], parsed.tasks)
+
+        history.add_decision_task_completed()
+        add_increment(history, 'activity-1', {'args': [1]}, 2)
+        parsed.parse()
+        parsed.parse()
+        self.assertEqual(len(history), parsed.last_event_id)
+        self.assertEqual(1, len(parsed.tasks))
+        self.assertEqual('completed', parsed.activities['activity-1']['state'])
+
+    def test_update(self):
+        history = builder.History(ATestDefinitionWithTwoSteps)
+        parsed = History(history)
+        parsed.parse()
+
+        newer = builder.History(ATestDefinitionWithTwoSteps)
+        newer.events = list(history.events)
+        newer.add_decision_task_completed()
+        add_increment(newer, 'activity-1', {'args': [1]}, 2)
+        parsed.update(newer)
+        self.assertEqual(len(newer), parsed.last_event_id)
+        self.assertEqual('completed', parsed.activities['activity-1']['state'])
+
+    def test_update_rejects_another_history(self):
+        history = builder.History(ATestDefinitionWithTwoSteps)
+        history.add_decision_task_completed()
+        parsed = History(history)
+        parsed.parse()
+
+        with self.assertRaises(ValueError):
+            parsed.update(builder.History(ATestDefinitionWithTwoSteps))
+
+        other = builder.History(ATestDefinitionWithTwoSteps)
+        other.add_decision_task_timed_out()
+        with self.assertRaises(ValueError):
+            parsed.update(other)
+
+
+class TestHistoryCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        cache = HistoryCache(2)
+        history = builder.History(ATestDefinitionWithTwoSteps)
+        parsed = cache.parse('run-1', history)
+        self.assertIs(parsed, cache.parse('run-1', history))
+        self.assertEqual({'size': 1, 'hits': 1, 'misses': 1, 'fallbacks': 0},
+                         cache.stats)
+
+    def test_fallback(self):
+        cache = HistoryCache(2)
+        history = builder.History(ATestDefinitionWithTwoSteps)
+        history.add_decision_task_completed()
+        parsed = cache.parse('run-1', history)
+
+        other = builder.History(ATestDefinitionWithTwoSteps)
+        reparsed = cache.parse('run-1', other)
+        self.assertIsNot(parsed, reparsed)
+        self.assertEqual(len(other), reparsed.last_event_id)
+        self.assertEqual(1, cache.fallbacks)
+        self.assertEqual(2, cache.misses)
+
+    def test_lru_eviction(self):
+        cache = HistoryCache(2)
+        history = builder.History(ATestDefinitionWithTwoSteps)
+        cache.parse('run-1', history)
+        cache.parse('run-2', history)
+        cache.get('run-1')
+        cache.parse('run-3', history)
+        self.assertEqual(2, len(cache))
+        self.assertIn('run-1', cache)
+        self.assertNotIn('run-2', cache)
+
+    def test_disabled(self):
+        cache = HistoryCache(0)
+        cache.parse('run-1', builder.History(ATestDefinitionWithTwoSteps))
+        self.assertEqual(0, len(cache))
+
+
+@mock_swf
+def test_replay_with_history_cache():
+    workflow = ATestDefinitionWithTwoSteps
+    executor = Executor(DOMAIN, workflow)
+    cache = HistoryCache(4)
+    execution = make_execution('run-1')
+
+    history = builder.History(workflow)
+    decisions, _ = executor.replay(Response(history=history, execution=execution),
+                                   history_cache=cache)
+    assert decisions[0]['decisionType'] == 'ScheduleActivityTask'
+    assert 'run-1' in cache
+
+    history.add_decision_task_completed()
+    add_increment(history, 'activity-tests.data.activities.increment-1', {'args': [1]}, 2)
+    decisions, _ = executor.replay(Response(history=history, execution=execution),
+                                   history_cache=cache)
+    attributes = decisions[0]['scheduleActivityTaskDecisionAttributes']
+    assert attributes['input'] == '{"args":[2],"kwargs":{}}'
+    assert cache.hits == 1
+
+    history.add_decision_task_completed()
+    add_increment(history, 'activity-tests.data.activities.increment-2', {'args': [2]}, 3)
+    decisions, _ = executor.replay(Response(history=history, execution=execution),
+                                   history_cache=cache)
+    assert decisions[0]['decisionType'] == 'CompleteWorkflowExecution'
+    assert cache.hits == 2
+    assert 'run-1' not in cache
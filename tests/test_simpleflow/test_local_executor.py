@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+import time
+import unittest
+
+import mock
+
+from simpleflow import compat, exceptions, futures, workflow
+from simpleflow.local import executor as local_executor
+from simpleflow.activity import with_attributes
+from simpleflow.canvas import Chain, Group
+from simpleflow.local.executor import Executor
+from simpleflow.task import ActivityTask
+
+
+class Concurrency(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+    def __exit__(self, *exc_info):
+        with self.lock:
+            self.running -= 1
+
+
+concurrency = Concurrency()
+
+
+@with_attributes()
+def sleep_and_double(x):
+    with concurrency:
+        time.sleep(0.1)
+    return x * 2
+
+
+@with_attributes()
+def sleep_longer_and_double(x):
+    time.sleep(0.3)
+    return x * 2
+
+
+@with_attributes()
+def die():
+    os._exit(1)
+
+
+@with_attributes(raises_on_failure=True)
+def die_and_raise():
+    os._exit(1)
+
+
+@with_attributes()
+def unpicklable():
+    return threading.Lock()
+
+
+@with_attributes()
+def add(x, y):
+    return x + y
+
+
+@with_attributes(raises_on_failure=True)
+def crash():
+    raise ValueError('crash')
+
+
+class BaseWorkflow(workflow.Workflow):
+    name = 'test_workflow'
+    version = 'test_version'
+    task_list = 'test_task_list'
+    decision_tasks_timeout = '300'
+    execution_timeout = '3600'
+    tag_list = None
+    child_policy = None
+
+
+class MapWorkflow(BaseWorkflow):
+    def run(self, values):
+        return [f.result for f in self.map(sleep_and_double, values)]
+
+
+class SlowMapWorkflow(BaseWorkflow):
+    def run(self, values):
+        return [f.result for f in self.map(sleep_longer_and_double, values)]
+
+
+class DyingWorkflow(BaseWorkflow):
+    def run(self):
+        lost = self.submit(die)
+        futures.wait(lost)
+        return type(lost.exception).__name__, self.submit(add, 1, 2).result
+
+
+class DyingAndRaisingWorkflow(BaseWorkflow):
+    def run(self):
+        return self.submit(die_and_raise).result
+
+
+class UnpicklableWorkflow(BaseWorkflow):
+    def run(self):
+        future = self.submit(unpicklable)
+        futures.wait(future)
+        return future.exception is not None, self.submit(add, 1, 2).result
+
+
+class GroupWorkflow(BaseWorkflow):
+    def run(self, values, max_parallel=None):
+        group = Group(*[ActivityTask(sleep_and_double, v) for v in values],
+                      max_parallel=max_parallel)
+        return self.submit(group).result
+
+
+class ChainWorkflow(BaseWorkflow):
+    def run(self):
+        chain = Chain(
+            ActivityTask(sleep_and_double, 1),
+            ActivityTask(add, 10),
+            send_result=True,
+        )
+        return self.submit(chain).result
+
+
+class DataflowWorkflow(BaseWorkflow):
+    def run(self):
+        x = self.submit(sleep_and_double, 1)
+        y = self.submit(sleep_and_double, 2)
+        z = self.submit(add, x, y)
+        return futures.wait(z)[0]
+
+
+class FailingWorkflow(BaseWorkflow):
+    def run(self):
+        self.submit(crash)
+
+
+class TestLocalExecutor(unittest.TestCase):
+    def setUp(self):
+        concurrency.max_running = 0
+
+    def test_synchronous(self):
+        executor = Executor(MapWorkflow)
+        self.assertEqual([2, 4, 6], executor.run({'args': [[1, 2, 3]]}))
+        self.assertEqual(1, concurrency.max_running)
+
+    def test_map_threads(self):
+        executor = Executor(MapWorkflow, nb_workers=4, use_threads=True)
+        start = time.time()
+        self.assertEqual([2 * i for i in range(8)], executor.run({'args': [list(range(8))]}))
+        self.assertLess(time.time() - start, 0.6)
+        self.assertEqual(4, concurrency.max_running)
+
+    def test_map_processes(self):
+        executor = Executor(SlowMapWorkflow, nb_workers=4)
+        start = time.time()
+        self.assertEqual([2 * i for i in range(8)], executor.run({'args': [list(range(8))]}))
+        # 2.4 seconds sequentially
+        self.assertLess(time.time() - start, 1.5)
+
+    @mock.patch.object(local_executor, 'WORKER_CHECK_INTERVAL', 0.05)
+    def test_lost_process(self):
+        executor = Executor(DyingWorkflow, nb_workers=2)
+        self.assertEqual(('TaskTerminated', 3), executor.run())
+
+    @mock.patch.object(local_executor, 'WORKER_CHECK_INTERVAL', 0.05)
+    def test_lost_process_raises_on_failure(self):
+        executor = Executor(DyingAndRaisingWorkflow, nb_workers=2)
+        with self.assertRaises(exceptions.TaskFailed):
+            executor.run()
+
+    @unittest.skipIf(compat.PY2, 'no error callback on Python 2')
+    def test_unpicklable_result(self):
+        executor = Executor(UnpicklableWorkflow, nb_workers=2)
+        self.assertEqual((True, 3), executor.run())
+
+    def test_unrecordable_result(self):
+        # The result cannot be serialized in the history
+        executor = Executor(UnpicklableWorkflow, nb_workers=2, use_threads=True)
+        self.assertEqual((True, 3), executor.run())
+
+    def test_group_max_parallel(self):
+        executor = Executor(GroupWorkflow, nb_workers=4, use_threads=True)
+        result = executor.run({'args': [list(range(6))], 'kwargs': {'max_parallel': 2}})
+        self.assertEqual([2 * i for i in range(6)], result)
+        self.assertEqual(2, concurrency.max_running)
+
+    def test_chain(self):
+        executor = Executor(ChainWorkflow, nb_workers=2, use_threads=True)
+        self.assertEqual([2, 12], executor.run())
+
+    def test_dataflow(self):
+        executor = Executor(DataflowWorkflow, nb_workers=2, use_threads=True)
+        self.assertEqual(6, executor.run())
+
+    def test_raises_on_failure(self):
+        executor = Executor(FailingWorkflow, nb_workers=2, use_threads=True)
+        with self.assertRaises(exceptions.TaskFailed):
+            executor.run()
+
+    def test_history(self):
+        executor = Executor(MapWorkflow, nb_workers=4, use_threads=True)
+        executor.run({'args': [list(range(4))]})
+        history = executor._history
+        self.assertEqual(4, len(history.activities))
+        for activity_id, activity in history.activities.items():
+            self.assertEqual('completed', activity['state'])
+            self.assertEqual(int(activity_id) * 2, json.loads(activity['result']))
+        event_ids = [event.id for event in history.events]
+        self.assertEqual(list(range(1, len(event_ids) + 1)), event_ids)
@@ -0,0 +1,55 @@
+from __future__ import absolute_import
+
+import gc
+import sys
+import unittest
+
+import mock
+
+from simpleflow import preload
+
+
+class TestPreload(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(preload, _initializers=[], _pending=[],
+                                      _initialized=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_initializers(self):
+        calls = []
+
+        @preload.on_worker_init
+        def init():
+            calls.append('init')
+
+        self.assertEqual([], calls)
+        preload.run_initializers()
+        self.assertEqual(['init'], calls)
+
+        # Already called: not called again
+        self.assertEqual(0, preload.run_initializers())
+        self.assertEqual(['init'], calls)
+
+        # Registered after the initialization: called immediately
+        preload.on_worker_init(lambda: calls.append('late'))
+        self.assertEqual(['init', 'late'], calls)
+        preload.run_initializers()
+        self.assertEqual(['init', 'late'], calls)
+
+    def test_prepare(self):
+        sys.modules.pop('colorsys', None)
+        stats = preload.prepare(['colorsys'])
+        self.assertIn('colorsys', sys.modules)
+        self.assertTrue(preload._initialized)
+        self.assertGreaterEqual(stats['duration'], 0)
+        self.assertGreater(stats['rss_after'], 0)
+
+    def test_freeze_gc(self):
+        with mock.patch.object(gc, 'freeze', create=True) as freeze:
+            self.assertTrue(preload.freeze_gc())
+        freeze.assert_called_once_with()
+
+    def test_freeze_gc_unavailable(self):
+        with mock.patch('simpleflow.preload.gc', spec=['collect']):
+            self.assertFalse(preload.freeze_gc())
@@ -1,10 +1,13 @@
 import boto
 import unittest
+import mock
 from moto import mock_swf
 
 from swf.exceptions import PollTimeout
 from swf.actors import Decider
 from swf.models import Domain
+from swf.models.history import History, builder
+from tests.data import BaseTestWorkflow
 
 
 class TestActor(unittest.TestCase):
@@ -46,3 +49,72 @@ class TestActor(unittest.TestCase):
         )
         self.assertEquals(response.execution.workflow_id, 'wfe-1234')
         self.assertIsNotNone(response.execution.run_id)
+
+    @mock_swf
+    def test_count_pending(self):
+        conn = self.make_swf_environment()
+        self.assertEqual(0, self.actor.count_pending())
+        conn.start_workflow_execution("TestDomain", "wfe-1234", "test-workflow", "v1.2")
+        self.assertEqual(1, self.actor.count_pending())
+
+
+class TestDeciderPartialHistory(unittest.TestCase):
+    def setUp(self):
+        self.domain = Domain("TestDomain")
+        self.actor = Decider(self.domain, "test-task-list")
+        self.history = builder.History(BaseTestWorkflow)
+        for _ in range(3):
+            self.history.add_decision_task()
+        self.raw_events = [event.raw for event in self.history.events]
+
+    def make_pages(self, events, page_size=2):
+        pages = []
+        for index in range(0, len(events), page_size):
+            pages.append({
+                'taskToken': 'token',
+                'workflowType': {'name': 'test-workflow', 'version': 'v1.2'},
+                'workflowExecution': {'workflowId': 'wfe-1234', 'runId': 'run-1'},
+                'events': events[index:index + page_size],
+                'nextPageToken': 'page-{}'.format(index),
+            })
+        del pages[-1]['nextPageToken']
+        return pages
+
+    def poll(self, pages, known):
+        with mock.patch.object(self.actor.connection, 'poll_for_decision_task',
+                               side_effect=pages) as poll:
+            response = self.actor.poll(known_history=lambda run_id: known)
+        return response, poll
+
+    def test_poll_with_known_history(self):
+        known = History(events=self.history.events[:5])
+        pages = self.make_pages(list(reversed(self.raw_events)))
+        response, poll = self.poll(pages, known)
+
+        self.assertEqual(4, poll.call_count)
+        self.assertEqual(6, len(pages))
+        self.assertTrue(poll.call_args[1]['reverse_order'])
+        self.assertEqual([e['eventId'] for e in self.raw_events],
+                         [e.id for e in response.history])
+        self.assertIs(known.events[0], response.history.events[0])
+
+    def test_poll_without_known_history(self):
+        pages = self.make_pages(list(reversed(self.raw_events)))
+        response, poll = self.poll(pages, None)
+
+        self.assertEqual(len(pages), poll.call_count)
+        self.assertEqual([e['eventId'] for e in self.raw_events],
+                         [e.id for e in response.history])
+
+    def test_poll_with_inconsistent_known_history(self):
+        other = builder.History(BaseTestWorkflow)
+        other.add_decision_task_timed_out()
+        other.add_decision_task()
+        known = History(events=other.events[:5])
+        pages = self.make_pages(list(reversed(self.raw_events)))
+        response, poll = self.poll(pages, known)
+
+        self.assertEqual(len(pages), poll.call_count)
+        self.assertEqual([e['eventId'] for e in self.raw_events],
+                         [e.id for e in response.history])
+        self.assertIsNot(known.events[0], response.history.events[0])
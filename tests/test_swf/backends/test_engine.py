@@ -0,0 +1,281 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import boto.swf.exceptions
+from boto.exception import SWFResponseError
+from mock import patch
+
+import swf.models
+from swf.actors import ActivityWorker, Decider
+from swf.backends import Engine, Layer1, connect
+from swf.backends.server import Server
+from swf.models.decision import (
+    ActivityTaskDecision,
+    ChildWorkflowExecutionDecision,
+    ExternalWorkflowExecutionDecision,
+    TimerDecision,
+    WorkflowExecutionDecision,
+)
+from swf.querysets import WorkflowExecutionQuerySet
+
+DOMAIN = 'TestDomain'
+TASK_LIST = 'test-task-list'
+
+
+def event_types(events):
+    return [event['eventType'] for event in events]
+
+
+class EngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.engine = Engine(os.path.join(self.directory, 'swf.db'), poll_timeout=0.2)
+        self.conn = Layer1(self.engine)
+        self.conn.register_domain(DOMAIN, '1')
+        self.conn.register_workflow_type(
+            DOMAIN, 'workflow', '1', task_list=TASK_LIST, default_child_policy='TERMINATE',
+            default_execution_start_to_close_timeout='60',
+            default_task_start_to_close_timeout='10')
+        self.conn.register_activity_type(
+            DOMAIN, 'activity', '1', task_list=TASK_LIST,
+            default_task_heartbeat_timeout='NONE', default_task_schedule_to_close_timeout='60',
+            default_task_schedule_to_start_timeout='60',
+            default_task_start_to_close_timeout='60')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def start(self, workflow_id='workflow-id', **kwargs):
+        return self.conn.start_workflow_execution(
+            DOMAIN, workflow_id, 'workflow', '1', **kwargs)['runId']
+
+    def decide(self, *decisions):
+        task = self.conn.poll_for_decision_task(DOMAIN, TASK_LIST)
+        self.assertIn('taskToken', task)
+        self.conn.respond_decision_task_completed(task['taskToken'], list(decisions))
+        return task
+
+    def history(self, run_id, workflow_id='workflow-id'):
+        return self.conn.get_workflow_execution_history(DOMAIN, run_id, workflow_id)['events']
+
+
+class TestEngine(EngineTestCase):
+    def test_domains_and_types(self):
+        with self.assertRaises(boto.swf.exceptions.SWFDomainAlreadyExistsError):
+            self.conn.register_domain(DOMAIN, '1')
+        with self.assertRaises(boto.swf.exceptions.SWFTypeAlreadyExistsError):
+            self.conn.register_activity_type(DOMAIN, 'activity', '1')
+        self.assertEqual('REGISTERED', self.conn.describe_domain(DOMAIN)['domainInfo']['status'])
+        description = self.conn.describe_activity_type(DOMAIN, 'activity', '1')
+        self.assertEqual({'name': TASK_LIST},
+                         description['configuration']['defaultTaskList'])
+
+        self.conn.deprecate_workflow_type(DOMAIN, 'workflow', '1')
+        self.assertEqual([], self.conn.list_workflow_types(DOMAIN, 'REGISTERED')['typeInfos'])
+        self.assertEqual(1, len(self.conn.list_workflow_types(DOMAIN, 'DEPRECATED')['typeInfos']))
+        with self.assertRaises(SWFResponseError) as context:
+            self.start()
+        self.assertEqual('TypeDeprecatedFault', context.exception.error_code)
+
+        with self.assertRaises(SWFResponseError) as context:
+            self.conn.describe_domain('unknown')
+        self.assertEqual('UnknownResourceFault', context.exception.error_code)
+
+    def test_activity(self):
+        run_id = self.start(input='in')
+        with self.assertRaises(boto.swf.exceptions.SWFWorkflowExecutionAlreadyStartedError):
+            self.start()
+        self.assertEqual(1, self.conn.count_pending_decision_tasks(DOMAIN, TASK_LIST)['count'])
+
+        task = self.decide(ActivityTaskDecision(
+            'schedule', activity_id='a1', activity_type=swf.models.ActivityType(
+                swf.models.Domain(DOMAIN), 'activity', '1'), input='x'))
+        self.assertEqual(run_id, task['workflowExecution']['runId'])
+        self.assertEqual(
+            ['WorkflowExecutionStarted', 'DecisionTaskScheduled', 'DecisionTaskStarted'],
+            event_types(task['events']))
+        self.assertEqual(1, self.conn.count_pending_activity_tasks(DOMAIN, TASK_LIST)['count'])
+
+        activity = self.conn.poll_for_activity_task(DOMAIN, TASK_LIST, identity='me')
+        self.assertEqual('a1', activity['activityId'])
+        self.assertEqual('"x"', activity['input'])
+        self.assertEqual({'cancelRequested': False},
+                         self.conn.record_activity_task_heartbeat(activity['taskToken']))
+        self.conn.respond_activity_task_completed(activity['taskToken'], 'result')
+        with self.assertRaises(SWFResponseError) as context:
+            self.conn.respond_activity_task_completed(activity['taskToken'], 'result')
+        self.assertEqual('UnknownResourceFault', context.exception.error_code)
+
+        task = self.decide(WorkflowExecutionDecision('complete', result='done'))
+        self.assertEqual(3, task['previousStartedEventId'])
+        self.assertEqual({}, self.conn.poll_for_decision_task(DOMAIN, TASK_LIST))
+
+        self.assertEqual([
+            'WorkflowExecutionStarted',
+            'DecisionTaskScheduled',
+            'DecisionTaskStarted',
+            'DecisionTaskCompleted',
+            'ActivityTaskScheduled',
+            'ActivityTaskStarted',
+            'ActivityTaskCompleted',
+            'DecisionTaskScheduled',
+            'DecisionTaskStarted',
+            'DecisionTaskCompleted',
+            'WorkflowExecutionCompleted',
+        ], event_types(self.history(run_id)))
+        info = self.conn.describe_workflow_execution(DOMAIN, run_id, 'workflow-id')
+        self.assertEqual('COMPLETED', info['executionInfo']['closeStatus'])
+        self.assertEqual(1, self.conn.count_closed_workflow_executions(DOMAIN)['count'])
+        self.assertEqual(0, self.conn.count_open_workflow_executions(
+            DOMAIN, time.time(), 0)['count'])
+
+    def test_pagination(self):
+        run_id = self.start()
+        for i in range(5):
+            self.conn.signal_workflow_execution(DOMAIN, 'signal-{}'.format(i), 'workflow-id')
+
+        task = self.conn.poll_for_decision_task(DOMAIN, TASK_LIST, maximum_page_size=3,
+                                                reverse_order=True)
+        events = task['events']
+        while 'nextPageToken' in task:
+            task = self.conn.poll_for_decision_task(
+                DOMAIN, TASK_LIST, maximum_page_size=3, reverse_order=True,
+                next_page_token=task['nextPageToken'])
+            events.extend(task['events'])
+        self.assertEqual(list(range(8, 0, -1)), [event['eventId'] for event in events])
+
+        response = self.conn.get_workflow_execution_history(
+            DOMAIN, run_id, 'workflow-id', maximum_page_size=5)
+        self.assertEqual(5, len(response['events']))
+        response = self.conn.get_workflow_execution_history(
+            DOMAIN, run_id, 'workflow-id', maximum_page_size=5,
+            next_page_token=response['nextPageToken'])
+        self.assertEqual([6, 7, 8], [event['eventId'] for event in response['events']])
+        self.assertNotIn('nextPageToken', response)
+
+    def test_events_while_deciding(self):
+        self.start()
+        task = self.conn.poll_for_decision_task(DOMAIN, TASK_LIST)
+        self.conn.signal_workflow_execution(DOMAIN, 'signal', 'workflow-id', input='in')
+        self.conn.respond_decision_task_completed(
+            task['taskToken'], [WorkflowExecutionDecision('complete')])
+        # The decider didn't see the signal
+        task = self.conn.poll_for_decision_task(DOMAIN, TASK_LIST)
+        self.assertEqual([
+            'DecisionTaskCompleted',
+            'CompleteWorkflowExecutionFailed',
+            'DecisionTaskScheduled',
+            'DecisionTaskStarted',
+        ], event_types(task['events'][-4:]))
+        self.assertEqual('in', task['events'][3]['workflowExecutionSignaledEventAttributes']['input'])
+
+    def test_timers(self):
+        run_id = self.start()
+        self.decide(TimerDecision('start', id='t1', start_to_fire_timeout='0'),
+                    TimerDecision('start', id='t2', start_to_fire_timeout='60'))
+        task = self.decide(TimerDecision('cancel', id='t2'))
+        self.assertEqual('TimerFired', task['events'][-3]['eventType'])
+        self.assertIn('TimerCanceled', event_types(self.history(run_id)))
+
+    def test_timeouts(self):
+        run_id = self.start()
+        self.decide(ActivityTaskDecision(
+            'schedule', activity_id='a1', activity_type=swf.models.ActivityType(
+                swf.models.Domain(DOMAIN), 'activity', '1'), task_timeout='0.1'))
+        activity = self.conn.poll_for_activity_task(DOMAIN, TASK_LIST)
+        time.sleep(0.1)
+        task = self.conn.poll_for_decision_task(DOMAIN, TASK_LIST)
+        timed_out = task['events'][-3]
+        self.assertEqual('ActivityTaskTimedOut', timed_out['eventType'])
+        self.assertEqual('START_TO_CLOSE',
+                         timed_out['activityTaskTimedOutEventAttributes']['timeoutType'])
+        with self.assertRaises(SWFResponseError):
+            self.conn.respond_activity_task_completed(activity['taskToken'])
+        self.conn.terminate_workflow_execution(DOMAIN, 'workflow-id', reason='test')
+        self.assertEqual('WorkflowExecutionTerminated', self.history(run_id)[-1]['eventType'])
+
+    def test_child_workflow(self):
+        run_id = self.start()
+        self.decide(ChildWorkflowExecutionDecision(
+            'start', workflow_type=swf.models.WorkflowType(
+                swf.models.Domain(DOMAIN), 'workflow', '1'), workflow_id='child-id',
+            task_list=TASK_LIST))
+        self.assertIn('ChildWorkflowExecutionStarted', event_types(self.history(run_id)))
+
+        # The child and the parent decisions
+        task = self.conn.poll_for_decision_task(DOMAIN, TASK_LIST)
+        self.assertEqual('child-id', task['workflowExecution']['workflowId'])
+        self.conn.respond_decision_task_completed(
+            task['taskToken'], [WorkflowExecutionDecision('complete', result='child')])
+        task = self.conn.poll_for_decision_task(DOMAIN, TASK_LIST)
+        self.assertEqual(run_id, task['workflowExecution']['runId'])
+        completed = [event for event in task['events']
+                     if event['eventType'] == 'ChildWorkflowExecutionCompleted']
+        self.assertEqual('child', completed[0]['childWorkflowExecutionCompletedEventAttributes'][
+            'result'])
+
+        signal = ExternalWorkflowExecutionDecision()
+        signal.signal('signal', 'unknown-id')
+        self.conn.respond_decision_task_completed(task['taskToken'], [signal])
+        events = self.history(run_id)
+        self.assertIn('SignalExternalWorkflowExecutionFailed', event_types(events))
+
+    def test_continue_as_new(self):
+        run_id = self.start()
+        self.decide(WorkflowExecutionDecision('continue_as_new', input='next'))
+        info = self.conn.list_open_workflow_executions(DOMAIN, 0)['executionInfos']
+        self.assertEqual(1, len(info))
+        new_run_id = info[0]['execution']['runId']
+        self.assertNotEqual(run_id, new_run_id)
+        started = self.history(new_run_id)[0]['workflowExecutionStartedEventAttributes']
+        self.assertEqual(run_id, started['continuedExecutionRunId'])
+        self.assertEqual('"next"', started['input'])
+
+    def test_long_poll(self):
+        self.engine.poll_timeout = 10
+        thread = threading.Timer(0.2, self.start)
+        thread.start()
+        start = time.time()
+        task = self.conn.poll_for_decision_task(DOMAIN, TASK_LIST)
+        self.assertIn('taskToken', task)
+        self.assertLess(time.time() - start, 5)
+        thread.join()
+
+    def test_poll_timeout(self):
+        start = time.time()
+        self.assertEqual({}, self.conn.poll_for_activity_task(DOMAIN, TASK_LIST))
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+
+class TestBackends(EngineTestCase):
+    def test_connection_pool(self):
+        url = 'sqlite://{}'.format(self.engine.path)
+        with patch.dict(os.environ, {'SWF_BACKEND': url}):
+            run_id = self.start()
+            decider = Decider(swf.models.Domain(DOMAIN), TASK_LIST)
+            response = decider.poll()
+            self.assertEqual(run_id, response.execution.run_id)
+            decider.complete(response.token, [WorkflowExecutionDecision('complete')])
+            self.assertEqual(0, ActivityWorker(swf.models.Domain(DOMAIN), TASK_LIST).count_pending())
+            execution = WorkflowExecutionQuerySet(swf.models.Domain(DOMAIN)).get(
+                'workflow-id', run_id)
+            self.assertEqual('CLOSED', execution.status)
+
+    def test_server(self):
+        server = Server(('127.0.0.1', 0), self.engine)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            conn = connect('http://127.0.0.1:{}'.format(server.server_address[1]))
+            self.assertEqual(DOMAIN, conn.describe_domain(DOMAIN)['domainInfo']['name'])
+            with self.assertRaises(SWFResponseError) as context:
+                conn.describe_domain('unknown')
+            self.assertEqual('UnknownResourceFault', context.exception.error_code)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
@@ -6,7 +6,10 @@ from datetime import datetime
 
 import pytz
 
-from swf.models.event import Event
+import pickle
+
+from swf.models.event import Event, EventFactory
+from swf.models.event.task import ActivityTaskEvent
 from swf.models.history import History
 import swf.constants
 
@@ -35,6 +38,41 @@ class TestEvent(unittest.TestCase):
         ev = Event('WorkflowExecutionStarted', 'REGISTERED', 0, {None: {}})
         self.assertEqual(datetime(1970, 1, 1, 0, 0, tzinfo=pytz.UTC), ev.timestamp)
 
+    def test_factory(self):
+        ev = EventFactory({
+            'eventId': 5,
+            'eventType': 'ScheduleActivityTaskFailed',
+            'eventTimestamp': 0,
+            'scheduleActivityTaskFailedEventAttributes': {
+                'activityId': 'activity-1',
+                'cause': 'ACTIVITY_TYPE_DOES_NOT_EXIST',
+            },
+        })
+        self.assertIsInstance(ev, ActivityTaskEvent)
+        self.assertEqual('schedule_failed', ev.state)
+        self.assertEqual('ScheduleActivityTaskFailed', ev.name)
+        self.assertEqual('activity-1', ev.activity_id)
+        self.assertEqual('ACTIVITY_TYPE_DOES_NOT_EXIST', ev.cause)
+        self.assertFalse(hasattr(ev, 'details'))
+        self.assertFalse(hasattr(ev, '__dict__'))
+
+    def test_lazy_input(self):
+        ev = EventFactory({
+            'eventId': 1,
+            'eventType': 'ActivityTaskScheduled',
+            'eventTimestamp': 0,
+            'activityTaskScheduledEventAttributes': {
+                'input': '{"args": [1]}',
+            },
+        })
+        self.assertEqual({'args': [1]}, ev.input)
+        self.assertIs(ev.input, ev.input)
+
+        copy = pickle.loads(pickle.dumps(ev))
+        self.assertEqual(ev.id, copy.id)
+        self.assertEqual(ev.name, copy.name)
+        self.assertEqual({'args': [1]}, copy.input)
+
 
 class TestHistory(unittest.TestCase):
 
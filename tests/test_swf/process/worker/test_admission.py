@@ -0,0 +1,48 @@
+import unittest
+
+import mock
+
+from simpleflow.swf.process.worker.admission import AdmissionControl
+
+
+class TestAdmissionControl(unittest.TestCase):
+    def test_from_limits(self):
+        self.assertIsNone(AdmissionControl.from_limits())
+        self.assertIsNotNone(AdmissionControl.from_limits(max_load=2.))
+
+    def test_check(self):
+        admission = AdmissionControl(max_load=1., min_available_memory=100,
+                                     max_children_memory=200)
+        with mock.patch.multiple(admission,
+                                 get_load=mock.Mock(return_value=0.5),
+                                 get_available_memory=mock.Mock(return_value=500),
+                                 get_children_memory=mock.Mock(return_value=100)):
+            self.assertIsNone(admission.check())
+            admission.get_children_memory.return_value = 300
+            self.assertEqual('children_memory', admission.check())
+            admission.get_available_memory.return_value = 50
+            self.assertEqual('available_memory', admission.check())
+            admission.get_load.return_value = 1.5
+            self.assertEqual('load', admission.check())
+        self.assertEqual(4, admission.stats['checks'])
+
+    def test_wait(self):
+        admission = AdmissionControl(max_load=1., check_delay=0.01)
+        with mock.patch.object(admission, 'get_load', side_effect=[2., 2., 0.5, 0.5]):
+            self.assertGreater(admission.wait(), 0)
+            self.assertEqual(0, admission.wait())
+        self.assertEqual(1, admission.stats['delays'])
+        self.assertEqual({'load': 1}, admission.stats['reasons'])
+        self.assertGreater(admission.stats['delay'], 0)
+
+    def test_wait_stopped(self):
+        admission = AdmissionControl(max_load=1., check_delay=0.01)
+        with mock.patch.object(admission, 'get_load', return_value=2.):
+            admission.wait(lambda: False)
+        self.assertEqual(1, admission.stats['delays'])
+
+    def test_resources(self):
+        admission = AdmissionControl(max_load=1.)
+        self.assertGreaterEqual(admission.get_load(), 0)
+        self.assertGreater(admission.get_available_memory(), 0)
+        self.assertGreaterEqual(admission.get_children_memory(), 0)
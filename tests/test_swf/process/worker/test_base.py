@@ -0,0 +1,109 @@
+import threading
+import time
+import unittest
+
+import boto
+import mock
+from moto import mock_swf
+
+import swf.exceptions
+import swf.models
+
+from simpleflow.swf import registration
+from simpleflow.swf.process.worker import base
+from simpleflow.swf.process.worker.base import ActivityPoller
+from tests.data import DOMAIN, increment
+
+
+class FakeActivityPoller(ActivityPoller):
+    def __init__(self, nb_tasks, **kwargs):
+        super(FakeActivityPoller, self).__init__(DOMAIN, 'test-task-list', heartbeat=0, **kwargs)
+        self._nb_tasks = nb_tasks
+        self._lock = threading.Lock()
+        self.polled = 0
+        self.processed = []
+        self.running = 0
+        self.max_running = 0
+        self.max_in_flight = 0
+
+    def poll(self, task_list=None, identity=None):
+        with self._lock:
+            if self.polled >= self._nb_tasks:
+                if len(self.processed) >= self._nb_tasks:
+                    self.is_alive = False
+                raise swf.exceptions.PollTimeout('no task')
+            self.polled += 1
+            self.max_in_flight = max(self.max_in_flight, self.polled - len(self.processed))
+            return 'token-{}'.format(self.polled), None
+
+    def process(self, request):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.02)
+        with self._lock:
+            self.running -= 1
+            self.processed.append(request[0])
+
+    def bind_signal_handlers(self):
+        pass
+
+    def set_process_name(self, name=None):
+        pass
+
+
+class TestActivityPoller(unittest.TestCase):
+    def test_sequential(self):
+        poller = FakeActivityPoller(5)
+        poller.start()
+        self.assertEqual(5, len(poller.processed))
+        self.assertEqual(1, poller.max_running)
+
+    def test_concurrent(self):
+        poller = FakeActivityPoller(20, nb_executors=4, nb_pollers=2)
+        poller.start()
+        self.assertEqual(sorted('token-{}'.format(i) for i in range(1, 21)),
+                         sorted(poller.processed))
+        self.assertEqual(4, poller.max_running)
+        # Tasks are polled only when an executor is available
+        self.assertLessEqual(poller.max_in_flight, 4)
+
+    def test_nb_pollers(self):
+        poller = FakeActivityPoller(1, nb_executors=2, nb_pollers=4)
+        self.assertEqual(2, poller.nb_pollers)
+
+    def test_admission_control(self):
+        poller = FakeActivityPoller(2, max_load=1.)
+        admission_control = poller.admission_control
+        admission_control.check_delay = 0.01
+        with mock.patch.object(admission_control, 'get_load', side_effect=[2., 0.5] + [0.] * 10):
+            poller.start()
+        self.assertEqual(2, len(poller.processed))
+        self.assertEqual(1, admission_control.stats['delays'])
+
+
+class TestHeartbeatTimeout(unittest.TestCase):
+    def setUp(self):
+        registration.clear()
+        self.addCleanup(registration.clear)
+        self.addCleanup(base._heartbeat_timeouts.clear)
+
+    @mock_swf
+    def test_heartbeat_timeout(self):
+        boto.connect_swf().register_domain(DOMAIN.name, '50')
+        registration.register_types(DOMAIN.name, activities=[increment])
+        task = swf.models.ActivityTask.from_poll(DOMAIN, 'test_task_list', {
+            'taskToken': 'token',
+            'activityType': {'name': increment.name, 'version': increment.version},
+            'workflowExecution': {'workflowId': 'wf', 'runId': 'run'},
+            'activityId': 'activity-1',
+            'startedEventId': 1,
+            'input': '{"args": [1], "kwargs": {}}',
+        })
+        self.assertEqual(str(increment.task_heartbeat_timeout),
+                         str(ActivityPoller.get_heartbeat_timeout(task)))
+
+        # Described once per type
+        with mock.patch('swf.querysets.ActivityTypeQuerySet.get') as get:
+            ActivityPoller.get_heartbeat_timeout(task)
+        self.assertFalse(get.called)
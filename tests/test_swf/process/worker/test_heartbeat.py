@@ -1,13 +1,16 @@
 import unittest
 import os
 import signal
+import threading
 import time
 from uuid import uuid4
 import multiprocessing as mp
 
+import mock
 import swf.exceptions
 
 from simpleflow.swf.process.worker.heartbeat import (
+    HeartbeatManager,
     HeartbeatProcess,
     Heartbeater,
 )
@@ -196,3 +199,97 @@ class TestHeartbeater(unittest.TestCase):
         heartbeater.stop()
         heartbeater._heartbeater.join()
         self.assertTrue(toggler.value)
+
+
+class FakeHeartbeatResponses(object):
+    def __init__(self, responses):
+        self._responses = responses
+        self.tokens = []
+
+    def __call__(self, token):
+        self.tokens.append(token)
+        response = self._responses.get(token, {})
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def wait_for(predicate, timeout=5):
+    end = time.time() + timeout
+    while not predicate() and time.time() < end:
+        time.sleep(0.01)
+    return predicate()
+
+
+@mock.patch('simpleflow.swf.process.worker.heartbeat.COALESCE_DELAY', 0)
+class TestHeartbeatManager(unittest.TestCase):
+    def make_manager(self, heartbeat, interval):
+        manager = HeartbeatManager(heartbeat, interval=interval)
+        self.addCleanup(manager.stop)
+        return manager
+
+    def test_interval(self):
+        manager = HeartbeatManager(FakeHeartbeatResponses({}), interval=60)
+        self.assertTrue(9 <= manager.get_interval(30) <= 11)
+        self.assertTrue(54 <= manager.get_interval('300') <= 66)
+        self.assertTrue(54 <= manager.get_interval('NONE') <= 66)
+        self.assertTrue(54 <= manager.get_interval(None) <= 66)
+
+    def test_heartbeats(self):
+        heartbeat = FakeHeartbeatResponses({})
+        manager = self.make_manager(heartbeat, interval=0.05)
+        manager.add('token-1', FakeTask('task-1'))
+        manager.add('token-2', FakeTask('task-2'))
+        self.assertTrue(wait_for(lambda: heartbeat.tokens.count('token-1') >= 3))
+        self.assertIn('token-2', heartbeat.tokens)
+
+        manager.remove('token-1')
+        count = heartbeat.tokens.count('token-1')
+        self.assertTrue(wait_for(lambda: heartbeat.tokens.count('token-2') >= 6))
+        self.assertEqual(count, heartbeat.tokens.count('token-1'))
+        self.assertEqual(1, len(manager))
+
+    def test_stop(self):
+        heartbeat = FakeHeartbeatResponses({})
+        manager = self.make_manager(heartbeat, interval=0.05)
+        manager.add('token', FakeTask('task'))
+        self.assertTrue(wait_for(lambda: 'token' in heartbeat.tokens))
+        manager.stop()
+        self.assertEqual(0, len(manager))
+        count = len(heartbeat.tokens)
+        time.sleep(0.15)
+        self.assertEqual(count, len(heartbeat.tokens))
+
+        # Started again by a new task
+        manager.add('token', FakeTask('task'))
+        self.assertTrue(wait_for(lambda: len(heartbeat.tokens) > count))
+
+    def test_concurrent_start(self):
+        heartbeat = FakeHeartbeatResponses({})
+        manager = self.make_manager(heartbeat, interval=60)
+        threads = [
+            threading.Thread(target=manager.add, args=('token-{}'.format(i), FakeTask('task')))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(8, len(manager))
+
+    def test_cancel_and_lost(self):
+        heartbeat = FakeHeartbeatResponses({
+            'cancelled': {'cancelRequested': True},
+            'lost': swf.exceptions.DoesNotExistError('lost'),
+            'error': Exception('error'),
+        })
+        manager = self.make_manager(heartbeat, interval=0.05)
+        calls = []
+        for token in ('cancelled', 'lost', 'error'):
+            manager.add(token, FakeTask(token),
+                        on_cancel=lambda token=token: calls.append(('cancel', token)),
+                        on_lost=lambda token=token: calls.append(('lost', token)))
+        self.assertTrue(wait_for(lambda: len(calls) == 2 and heartbeat.tokens.count('error') >= 2))
+        self.assertEqual([('cancel', 'cancelled'), ('lost', 'lost')], sorted(calls))
+        self.assertEqual(1, len(manager))
+        self.assertIn('error', manager)
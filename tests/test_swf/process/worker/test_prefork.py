@@ -0,0 +1,119 @@
+import json
+import multiprocessing as mp
+import os
+import time
+import unittest
+
+import swf.models
+
+from simpleflow import activity
+from simpleflow.swf.process.worker.prefork import ExecutorPool
+from tests.data import DOMAIN
+
+
+@activity.with_attributes(version='test')
+def get_pid():
+    return os.getpid()
+
+
+@activity.with_attributes(version='test')
+def die():
+    os._exit(3)
+
+
+@activity.with_attributes(version='test')
+def sleep_long():
+    time.sleep(30)
+
+
+class FakePoller(object):
+    def __init__(self, cancel=False):
+        self.domain = DOMAIN
+        self.task_list = 'test-task-list'
+        self.results = mp.Queue()
+        self._cancel = cancel
+
+    def heartbeat(self, token):
+        return {'cancelRequested': self._cancel}
+
+    def _complete(self, token, result):
+        self.results.put(('completed', token, json.loads(result)))
+
+    def fail(self, token, task, reason=None, details=None):
+        self.results.put(('failed', token, reason))
+
+
+def make_task(name, token='token'):
+    data = {
+        'taskToken': token,
+        'activityType': {'name': 'tests.test_swf.process.worker.test_prefork.' + name,
+                         'version': 'test'},
+        'workflowExecution': {'workflowId': 'workflow-id', 'runId': 'run-id'},
+        'input': json.dumps({'args': [], 'kwargs': {}}),
+        'activityId': 'activity-id',
+        'startedEventId': 1,
+    }
+    return swf.models.ActivityTask.from_poll(DOMAIN, 'test-task-list', data)
+
+
+class TestExecutorPool(unittest.TestCase):
+    def run_tasks(self, pool, poller, names, heartbeat=60):
+        results = []
+        for index, name in enumerate(names):
+            pool.run('token-{}'.format(index), make_task(name, 'token-{}'.format(index)), heartbeat)
+            results.append(poller.results.get(timeout=10))
+        return results
+
+    def test_reuse(self):
+        poller = FakePoller()
+        pool = ExecutorPool(poller)
+        try:
+            results = self.run_tasks(pool, poller, ['get_pid'] * 3)
+        finally:
+            pool.stop()
+        pids = set(result[2] for result in results)
+        self.assertEqual(1, len(pids))
+        self.assertNotIn(os.getpid(), pids)
+        self.assertEqual(1, pool.nb_executors)
+
+    def test_max_tasks(self):
+        poller = FakePoller()
+        pool = ExecutorPool(poller, max_tasks=2)
+        try:
+            results = self.run_tasks(pool, poller, ['get_pid'] * 3)
+        finally:
+            pool.stop()
+        self.assertEqual(2, len(set(result[2] for result in results)))
+        self.assertEqual(2, pool.nb_executors)
+
+    def test_max_memory(self):
+        poller = FakePoller()
+        pool = ExecutorPool(poller, max_memory=1)
+        try:
+            self.run_tasks(pool, poller, ['get_pid'] * 2)
+        finally:
+            pool.stop()
+        self.assertEqual(2, pool.nb_executors)
+
+    def test_process_died(self):
+        poller = FakePoller()
+        pool = ExecutorPool(poller)
+        try:
+            results = self.run_tasks(pool, poller, ['die', 'get_pid'])
+        finally:
+            pool.stop()
+        self.assertEqual('failed', results[0][0])
+        self.assertIn('exit code 3', results[0][2])
+        self.assertEqual('completed', results[1][0])
+        self.assertEqual(2, pool.nb_executors)
+
+    def test_cancel(self):
+        poller = FakePoller(cancel=True)
+        pool = ExecutorPool(poller)
+        start = time.time()
+        try:
+            pool.run('token', make_task('sleep_long'), heartbeat=0.1)
+        finally:
+            pool.stop()
+        self.assertLess(time.time() - start, 10)
+        self.assertTrue(poller.results.empty())
@@ -0,0 +1,52 @@
+import os
+import unittest
+
+from boto.swf.layer1 import Layer1
+from mock import patch
+
+from swf.core import ConnectedSWFObject, ConnectionPool
+
+
+class TestConnectionPool(unittest.TestCase):
+    def test_reuse(self):
+        pool = ConnectionPool()
+        conn = pool.get('us-east-1', 'key', 'secret')
+        self.assertIsInstance(conn, Layer1)
+        self.assertIs(conn, pool.get('us-east-1', 'key', 'secret'))
+        self.assertIsNot(conn, pool.get('us-east-1', 'other-key', 'secret'))
+        self.assertIsNot(conn, pool.get('eu-west-1', 'key', 'secret'))
+        self.assertEqual(3, pool.stats['created'])
+        self.assertEqual(1, pool.stats['reused'])
+
+    def test_invalid_region(self):
+        with self.assertRaises(ValueError):
+            ConnectionPool().get('nowhere-1')
+
+    def test_fork(self):
+        pool = ConnectionPool()
+        conn = pool.get('us-east-1')
+        with patch.object(os, 'getpid', return_value=os.getpid() + 1):
+            self.assertTrue(pool.is_stale(conn))
+            new_conn = pool.refresh(conn)
+            self.assertIsNot(conn, new_conn)
+            self.assertEqual(1, pool.stats['resets'])
+            self.assertEqual(1, pool.stats['created'])
+
+
+class TestConnectedSWFObject(unittest.TestCase):
+    def test_shared_connection(self):
+        first = ConnectedSWFObject()
+        second = ConnectedSWFObject()
+        self.assertIs(first.connection, second.connection)
+
+    def test_connection_replaced_after_fork(self):
+        obj = ConnectedSWFObject()
+        conn = obj.connection
+        with patch.object(os, 'getpid', return_value=os.getpid() + 1):
+            self.assertIsNot(conn, obj.connection)
+            self.assertIs(obj.connection, ConnectedSWFObject().connection)
+
+    def test_explicit_connection(self):
+        conn = object()
+        obj = ConnectedSWFObject(connection=conn)
+        self.assertIs(conn, obj.connection)